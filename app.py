@@ -4,15 +4,33 @@ import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
 import altair as alt
-from typing import Optional
+from typing import Optional, Callable
 import numpy as np
 import time
+import os
+import asyncio
+import tempfile
+
+from query_tag import query_context, tag_section
+from entity_loader import LOOKUP_KEY_COLUMN, parse_id_list, parse_id_csv
+from query_registry import QUERY_CLASS_ANALYTICS, QUERY_CLASS_ADHOC
+from sql_utils import cap_rows
+from query_history import summarize_history, hourly_history
+from render_profiler import RenderProfile, profile_rerun, profile_sections, CATEGORIES
+from sampling_profiler import (
+    SamplingProfiler, MODE_SAMPLE, default_profile_dir, list_profiles, prune_profiles,
+    read_collapsed, flame_nodes
+)
+from memory_accounting import (
+    RESULT_AGES_KEY, process_memory, session_usage, enforce_session_cap, active_session_states
+)
 
 # Local imports (these would work when dependencies are installed)
 try:
-    from auth import SimpleAuthenticator, require_auth
-    from snowflake_connector import get_snowflake_connector
     from config import Config
+    from auth import SimpleAuthenticator, require_auth
+    from snowflake_connector import get_snowflake_connector, get_allocation_tracker
+    from query_planner import PagePlan, fetch_scalar_metrics
 except ImportError:
     # Fallback for development/demo
     pass
@@ -248,6 +266,190 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# Headline counts. Each group is fused into one single-row statement, so a
+# page pays one warehouse round trip for all of its metric cards
+LIVE_METRICS = {
+    'users': "select count(*) from users",
+    'connections': "select count(*) from connections",
+    'flows': "select count(*) from flows",
+    'licenses': "select count(*) from licenses where expires > current_date()"
+}
+
+KPI_METRICS = {name: LIVE_METRICS[name] for name in ('users', 'flows', 'connections')}
+
+# Statements behind the Dashboard Overview sections. The overview registers
+# them all with a PagePlan so they run concurrently before rendering
+OVERVIEW_QUERIES = {
+    'oauth': """
+SELECT APP, Count(*) as ConnectionCount FROM
+(
+  SELECT * FROM DATA_ROOM.MONGODB.CONNECTIONS
+                        WHERE HTTP:auth:oauth is NOT NULL
+    ) Group by APP ORDER BY ConnectionCount desc
+""",
+    'endpoints': """
+select endpoint, COUNT(*) as occurrence from connections
+where app='http' group by endpoint order by occurrence desc limit 10
+""",
+    'anomalies': "select * from influxdb.anomaly_events order by time desc limit 10",
+    'canary_groups': "select * from release_canary_groups",
+    'canary_phases': """
+WITH user_group as (SELECT
+    u._id AS user_id,
+    u.name,
+    u.email,
+    CASE
+        WHEN u.emailDomain = 'celigo.com' THEN 'internal'
+        WHEN l.tier = 'free' and l.trialenddate > CURRENT_DATE() THEN 'free-trial'
+        WHEN l.tier = 'free' THEN 'free'
+        ELSE ef.canary_group_name
+    END as phase,
+    l.tier
+FROM users u
+INNER JOIN licenses l ON l._userId = u._id
+LEFT JOIN (
+    SELECT e.canary_group_name, f.value::STRING AS user_id
+    FROM release_canary_groups e,
+    LATERAL FLATTEN(input => e.USER_IDS) f
+) ef ON ef.user_id = u._id and ef.RELEASE_NAME='2025.5.1' and ef.version='1.0'
+WHERE l.type in ('integrator', 'endpoint', 'platform', 'diy')
+    and l.tier != 'none'
+    and (l.tier = 'free' OR l.expires > current_date())
+)
+select phase, count(*) as user_count from user_group group by phase
+""",
+    'tiers': """
+select tier, count(*) as count from licenses
+where expires > current_date()
+group by tier order by count desc
+""",
+    'verification': "select verified, count(*) as count from users group by verified"
+}
+
+# Heavy 90-day analytics behind the Builder and Bubble pages. Shared by the
+# per-tab buttons and the "run all" path, which submits them asynchronously
+BUILDER_QUERIES = {
+    'builders': """
+select name, email, role, count(email) as num_flow_steps_created, _userId from 
+(select distinct _resourceId, _byUserId from audits where source = 'ui' and event = 'create' and resourcetype in ('import', 'export') and time > current_date - 90) as a
+inner join (select exp_or_imp_id, sum(stat_count) as success_count from influxdb.usage_stats where stat_type = 's' and end_date > current_date - 90 group by exp_or_imp_id) as active on a._resourceId=active.exp_or_imp_id
+left join (select _id, name as import_name from imports) as i on a._resourceId = i._id
+left join (select _id, name as export_name from exports) as e on a._resourceId = e._id
+inner join (select _id as _userId, name, email, role, emailDomain from users) as u on a._byUserId = u._userId
+group by name, email, role, _userId
+order by num_flow_steps_created desc
+""",
+    'domains': """
+select emailDomain, count(emailDomain) as num_builders from
+(select emailDomain, email, count(email) as num_flow_steps_created from 
+(select distinct _resourceId, _byUserId from audits where source = 'ui' and event = 'create' and resourcetype in ('import', 'export') and time > current_date - 90) as a
+inner join (select exp_or_imp_id, sum(stat_count) as success_count from influxdb.usage_stats where stat_type = 's' and end_date > current_date - 90  group by exp_or_imp_id) as active on a._resourceId=active.exp_or_imp_id
+left join (select _id, name as import_name from imports) as i on a._resourceId = i._id
+left join (select _id, name as export_name from exports) as e on a._resourceId = e._id
+inner join (select _id as _userId, name, email, emailDomain from users) as u on a._byUserId = u._userId
+group by emailDomain, email
+order by emailDomain asc)
+group by emailDomain
+order by num_builders desc
+""",
+    'certifications': """
+select emailDomain, email, count(email) as num_flow_steps_created, IFNULL(num_certifications, 0) as num_certifications, QUAD_BASED_ON_LOB, _ownerUserId from 
+(select distinct _resourceId, _byUserId, _userId as _ownerUserId from audits where source = 'ui' and event = 'create' and resourcetype in ('import', 'export') and time > current_date - 90) as a
+inner join (select exp_or_imp_id, sum(stat_count) as success_count from influxdb.usage_stats where stat_type = 's' and end_date > current_date - 90  group by exp_or_imp_id) as active on a._resourceId=active.exp_or_imp_id
+left join (select _id, name as import_name from imports) as i on a._resourceId = i._id
+left join (select _id, name as export_name from exports) as e on a._resourceId = e._id
+inner join (select _id as _userId, name, email, emailDomain from users) as u on a._byUserId = u._userId
+left join (select email as litmos_email, io_user_id, count(io_user_id) as num_certifications from 
+(select user_id, course_id, title, type from litmos.certification) as certification
+inner join (select course_id, active, name as litmos_course_name from litmos.course) as course on certification.course_id=course.course_id
+inner join (select user_id, custom_field9 as io_user_id, email from litmos.user) as litmos_user on certification.user_id=litmos_user.user_id
+group by email, io_user_id
+order by num_certifications desc) as litmos on u._userId = litmos.io_user_id
+left join (select IO_ID, QUAD_BASED_ON_LOB from 
+(select NS_CUSTOMER_ID, IO_ID from netsuite.customer_ids) as customer_id
+inner join (select NS_CUSTOMER_ID, QUAD_BASED_ON_LOB, month from ANALYTICS.COMPANY.CORE_ARR_BUILDUP where month >= current_date - 90) as core_arr_buildup on customer_id.NS_CUSTOMER_ID = core_arr_buildup.NS_CUSTOMER_ID) as quad on a._ownerUserId = quad.IO_ID
+group by emailDomain, email, _userId, _ownerUserId, num_certifications, QUAD_BASED_ON_LOB
+order by num_flow_steps_created desc
+"""
+}
+
+BUBBLE_QUERIES = {
+    'new': """
+select app, count(distinct b._id) as total_bubbles from (
+select _id, TO_VARIANT('data_loader') as app, _userid, createdat, _connectorid from exports where type = 'simple'
+union
+select _id, webhook:provider as app, _userid, createdat, _connectorid from exports where type = 'webhook'
+union (
+select _id, coalesce(http_connector_name, con.app) as app, _userid, createdat, _connectorid from (
+select _id, _userid, _connectionid, createdat, _connectorid from exports where ((type != 'simple' and type != 'webhook') or type is null)
+union
+select _id, _userid, _connectionid, createdat, _connectorid from imports
+) as bubble
+inner join (
+select connections._id as connection_id, connections.app, http_connectors.name as http_connector_name
+from connections 
+left join http_connectors on connections.http:_httpConnectorId = http_connectors._id) as con on bubble._connectionid=con.connection_id)) as b
+inner join (select _id, emaildomain from users where emaildomain != 'celigo.com') as non_celigo_user on b._userid = non_celigo_user._id
+where b._connectorid is null and createdat >= current_date - 90 and not exists (
+select 1 from influxdb.usage_stats where stat_type = 's' and end_date > current_date - 30 and exp_or_imp_id = b._id)
+group by app
+order by total_bubbles desc
+""",
+    'running': """
+select app, count(distinct b._id) as total_bubbles from (
+select _id, TO_VARIANT('data_loader') as app, _userid, createdat, _connectorid from exports where type = 'simple'
+union
+select _id, webhook:provider as app, _userid, createdat, _connectorid from exports where type = 'webhook'
+union (
+select _id, coalesce(http_connector_name, con.app) as app, _userid, createdat, _connectorid from (
+select _id, _userid, _connectionid, createdat, _connectorid from exports where ((type != 'simple' and type != 'webhook') or type is null)
+union
+select _id, _userid, _connectionid, createdat, _connectorid from imports
+) as bubble
+inner join (
+select connections._id as connection_id, connections.app, http_connectors.name as http_connector_name
+from connections 
+left join http_connectors on connections.http:_httpConnectorId = http_connectors._id) as con on bubble._connectionid=con.connection_id)) as b
+inner join (select _id, emaildomain from users where emaildomain != 'celigo.com') as non_celigo_user on b._userid = non_celigo_user._id
+where b._connectorid is null and exists (
+select 1 from influxdb.usage_stats where stat_type = 's' and end_date > current_date - 30 and exp_or_imp_id = b._id)
+group by app
+order by total_bubbles desc
+""",
+    'users': """
+select app, count(distinct _userid) as total_users from (
+select _id, TO_VARIANT('data_loader') as app, _userid, createdat, _connectorid from exports where type = 'simple'
+union
+select _id, webhook:provider as app, _userid, createdat, _connectorid from exports where type = 'webhook'
+union (
+select _id, coalesce(http_connector_name, con.app) as app, _userid, createdat, _connectorid from (
+select _id, _userid, _connectionid, createdat, _connectorid from exports where ((type != 'simple' and type != 'webhook') or type is null)
+union
+select _id, _userid, _connectionid, createdat, _connectorid from imports
+) as bubble
+inner join (
+select connections._id as connection_id, connections.app, http_connectors.name as http_connector_name
+from connections 
+left join http_connectors on connections.http:_httpConnectorId = http_connectors._id) as con on bubble._connectionid=con.connection_id)) as b
+inner join (select _id, emaildomain from users where emaildomain != 'celigo.com') as non_celigo_user on b._userid = non_celigo_user._id
+where b._connectorid is null and createdat >= current_date - 90 and not exists (
+select 1 from influxdb.usage_stats where stat_type = 's' and end_date > current_date - 30 and exp_or_imp_id = b._id)
+group by app
+order by total_users desc
+"""
+}
+
+# Bulk ID Lookup page options -> keys of entity_loader.ENTITY_TABLES
+BULK_LOOKUP_ENTITIES = {
+    "👤 Users": 'users',
+    "⚙️ Flows": 'flows',
+    "📤 Exports": 'exports',
+    "📥 Imports": 'imports',
+    "🔗 Connections": 'connections',
+    "📜 Licenses (by user ID)": 'licenses'
+}
+
+@profile_sections
 class SnowflakeDashboard:
     """Main dashboard class with all functionality"""
     
@@ -280,12 +482,76 @@ class SnowflakeDashboard:
             self.auth.login()
             return
         
+        # Queries the previous run left behind have no reader any more
+        if self.has_connector:
+            self.connector.cancel_abandoned_queries()
+        
+        if not st.session_state.pop('profile_next_rerun', False):
+            self._render_profiled()
+            return
+        
+        profiler = SamplingProfiler(
+            interval=Config.PROFILE_SAMPLE_INTERVAL_MS / 1000,
+            mode=Config.PROFILE_MODE,
+            root_file=__file__
+        )
+        profiler.start()
+        try:
+            self._render_profiled()
+        finally:
+            # Saved even when the rerun is interrupted, e.g. by st.rerun()
+            summary = self._save_profile(profiler)
+        if summary is not None:
+            with st.expander(f"🔬 Rerun profile: {summary['elapsed_seconds']:.2f}s", expanded=True):
+                self._show_profile_report(summary)
+    
+    def _render_profiled(self):
+        """Render the page, under the render profiler when it is switched on"""
+        if not (Config.RENDER_PROFILER_ENABLED and st.session_state.get('render_profiler')):
+            self._render()
+            return
+        
+        with profile_rerun() as profile:
+            self._render()
+        self._show_render_profile(profile)
+    
+    def _save_profile(self, profiler: 'SamplingProfiler') -> Optional[dict]:
+        """Stop a rerun profile and save it, keeping the newest ``Config.PROFILE_KEEP`` reports"""
+        report = profiler.stop()
+        directory = Config.PROFILE_DIR or default_profile_dir()
+        try:
+            summary = report.save(directory, st.session_state.get('current_page', 'rerun'))
+            prune_profiles(directory, Config.PROFILE_KEEP)
+            return summary
+        except OSError as e:
+            st.warning(f"⚠️ Could not save the rerun profile to {directory}: {str(e)}")
+            return None
+    
+    def _render(self):
+        """Render the header, sidebar and selected page"""
         self._show_header()
         self._show_sidebar()
         
         # Main content area based on selected page
         current_page = st.session_state.get('current_page', '📊 Customer Data Analytics')
         
+        # Statements issued while rendering are tagged with the page they serve
+        if not self.has_connector:
+            with query_context(page=current_page):
+                self._show_page(current_page)
+            return
+        
+        with query_context(page=current_page), get_allocation_tracker().measure(current_page):
+            self._show_page(current_page)
+        
+        # Result objects past the per-session cap are dropped, oldest first
+        evicted = enforce_session_cap(st.session_state, Config.SESSION_MEMORY_CAP_MB * 1024 * 1024)
+        if evicted:
+            freed = sum(size for _, size in evicted)
+            st.toast(f"🧹 Freed {freed / 1024 / 1024:.1f} MB of old results: {', '.join(key for key, _ in evicted)}")
+    
+    def _show_page(self, current_page: str):
+        """Render the selected page"""
         # Core Analytics Pages
         if current_page == '🔗 Connection Test':
             self._show_connection_test()
@@ -293,6 +559,8 @@ class SnowflakeDashboard:
             self._show_customer_configurations()
         elif current_page == '🔍 Customer Details':
             self._show_customer_details()
+        elif current_page == '📦 Bulk ID Lookup':
+            self._show_bulk_lookup()
         elif current_page == '📊 Advanced Analytics':
             self._show_analytics()
         elif current_page == '🛠️ Query Builder':
@@ -321,6 +589,7 @@ class SnowflakeDashboard:
             self._show_system_architecture()
         elif current_page == '⚡ Performance Monitor':
             self._show_performance_monitor()
+            self._show_saved_profiles()
         elif current_page == '🔍 Flow Analytics':
             self._show_flow_analytics()
         elif current_page == '⚠️ Anomaly Detection':
@@ -343,11 +612,67 @@ class SnowflakeDashboard:
             self._show_trends_analysis()
         elif current_page == '🔄 Health Checks':
             self._show_system_health()
+            if self.has_connector:
+                self._show_resilience_stats()
+                self._show_workload_stats()
+                self._show_memory_stats()
         
         # Default to Customer Data Analytics
         else:
             self._show_executive_dashboard()
     
+    def _show_render_profile(self, profile: 'RenderProfile'):
+        """
+        Waterfall of the rerun's sections, split into SQL, pandas, Plotly and Streamlit time
+        
+        Args:
+            profile: Finished profile of this rerun
+        """
+        budget = Config.RENDER_SECTION_BUDGET_MS / 1000
+        rows = pd.DataFrame(profile.rows(budget))
+        total = rows['duration'].iloc[0]
+        over = rows[rows['over_budget']]
+        title = f"⏱️ Render profile: {total:.2f}s"
+        if not over.empty:
+            title += f" · {len(over)} section(s) over the {Config.RENDER_SECTION_BUDGET_MS:,} ms budget"
+        
+        with st.expander(title, expanded=not over.empty):
+            labels = {'sql': "SQL (Snowflake)", 'pandas': "pandas & Python", 'plotly': "Plotly figures",
+                      'streamlit': "Streamlit elements"}
+            colors = {'sql': '#1f77b4', 'pandas': '#ff7f0e', 'plotly': '#2ca02c', 'streamlit': '#9467bd'}
+            names = [("🔴 " if row.over_budget else "") + "· " * row.depth + row.name for row in rows.itertuples()]
+            
+            # Each bar starts when its section started; its segments show the section's time split
+            fig = go.Figure()
+            offset = rows['start'].copy()
+            for category in CATEGORIES:
+                fig.add_trace(go.Bar(
+                    y=list(rows.index), x=rows[category] * 1000, base=offset * 1000, orientation='h',
+                    name=labels[category], marker_color=colors[category],
+                    hovertemplate="%{x:.0f} ms<extra>" + labels[category] + "</extra>"
+                ))
+                offset = offset + rows[category]
+            fig.update_layout(
+                barmode='overlay', title="Where the Rerun Time Went", xaxis_title="ms since rerun start",
+                yaxis=dict(tickvals=list(rows.index), ticktext=names, autorange='reversed'),
+                height=max(250, 28 * len(rows) + 120)
+            )
+            if budget:
+                fig.add_vline(x=budget * 1000, line_dash='dot', line_color='red')
+            st.plotly_chart(fig, use_container_width=True)
+            
+            table = pd.DataFrame({
+                "Section": names,
+                "Start (ms)": (rows['start'] * 1000).round(0),
+                "Total (ms)": (rows['duration'] * 1000).round(0)
+            })
+            for category in CATEGORIES:
+                table[labels[category] + " (ms)"] = (rows[category] * 1000).round(0)
+            st.dataframe(table, use_container_width=True, hide_index=True)
+            st.caption("Section times include their subsections. pandas & Python is the time not spent waiting "
+                       "for Snowflake, building Plotly figures or calling Streamlit elements; "
+                       "set RENDER_SECTION_BUDGET_MS to change the budget")
+    
     def _show_header(self):
         """Display application header"""
         st.title("❄️ Snowflake Customer Dashboard")
@@ -381,6 +706,7 @@ class SnowflakeDashboard:
                 "🔗 Connection Test", 
                 "👥 Customer Configurations",
                 "🔍 Customer Details",
+                "📦 Bulk ID Lookup",
                 "📊 Advanced Analytics",
                 "🛠️ Query Builder"
             ]
@@ -442,16 +768,45 @@ class SnowflakeDashboard:
                 st.markdown("**Cache**: 🟡 Warm")
                 st.markdown("**Flows**: 🟢 Active")
             
+            if self.has_connector:
+                self._show_running_queries()
+            
             # Configuration section
             st.markdown("## ⚙️ Configuration")
             
             if st.button("🔄 Refresh All Data", use_container_width=True):
                 st.cache_data.clear()
+                if self.has_connector:
+                    self.connector.clear_cache()
                 st.success("✅ All caches cleared!")
             
+            if self.has_connector and st.button("🔁 Refresh Changed Data", use_container_width=True,
+                                                help="Recompute only results whose source tables changed"):
+                with st.spinner("Checking source tables..."):
+                    outcome = self.connector.refresh_changed_data()
+                if outcome is not None:
+                    if outcome['invalidated']:
+                        st.success(f"✅ Refreshed {outcome['invalidated']} cached results "
+                                   f"({outcome['tables_checked']} tables checked)")
+                    else:
+                        st.success(f"✅ Cached data is current ({outcome['tables_checked']} tables checked)")
+            
             if st.button("📊 Export Report", use_container_width=True):
                 st.info("📋 Report generation started...")
             
+            if Config.RENDER_PROFILER_ENABLED:
+                st.checkbox("⏱️ Profile page render", key='render_profiler',
+                            help="Time each section of this page and show where the rerun went, below the page. "
+                                 "The first use wraps Plotly and Streamlit functions for every session "
+                                 "until the server restarts; they cost little while nobody profiles")
+            
+            if st.button("🔬 Profile Next Rerun", use_container_width=True,
+                         help="Sample the call stacks of the next rerun and save a flamegraph file and a "
+                              "table of the hottest functions"):
+                st.session_state.profile_next_rerun = True
+            if st.session_state.get('profile_next_rerun'):
+                st.caption("🔬 The next rerun will be profiled; interact with the page to start it")
+            
             # Environment info
             st.markdown("## 🌐 Environment")
             env_info = {
@@ -473,6 +828,33 @@ class SnowflakeDashboard:
                 st.markdown("### 🔐 Demo Mode")
                 st.info("Enable authentication for full team features")
     
+    def _show_running_queries(self):
+        """Sidebar panel with this session's queries running on Snowflake"""
+        st.markdown("## ⏱️ Running Queries")
+        
+        running = self.connector.get_running_queries()
+        if not running:
+            st.caption("No queries running")
+        
+        for query in running:
+            col1, col2 = st.columns([4, 1])
+            with col1:
+                status = "cancelling..." if query['cancelling'] else f"{query['elapsed_seconds']:.0f}s"
+                preview = ' '.join(query['query'].split())[:60]
+                st.caption(f"**{query['query_class']}** · {status}  \n`{preview}`")
+            with col2:
+                if st.button("✖️", key=f"cancel_query_{query['token']}", help="Cancel this query",
+                             disabled=query['cancelling']):
+                    if self.connector.cancel_query(query['token']):
+                        st.success("✅ Cancel sent")
+                    else:
+                        st.info("Query already finished")
+        
+        other_sessions = len(self.connector.get_running_queries(all_sessions=True)) - len(running)
+        if other_sessions:
+            st.caption(f"{other_sessions} more running for other sessions")
+    
+    @tag_section
     def _show_connection_test(self):
         """Display connection test page"""
         st.header("🔗 Snowflake Connection Test")
@@ -544,12 +926,110 @@ class SnowflakeDashboard:
                             st.error(f"❌ Connection test failed: {str(e)}")
                 else:
                     st.error("❌ Snowflake connector not available")
-    
+
+        # Connection lifecycle statistics
+        if self.has_connector:
+            st.markdown("---")
+            st.subheader("♻️ Connection Lifecycle")
+
+            stats = self.connector.get_connection_stats()
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("Status", "🟢 Open" if stats['connected'] else "⚪ Idle")
+            with col2:
+                st.metric("Logins", stats['login_count'])
+            with col3:
+                last_login = stats['last_login_seconds']
+                st.metric("Last Login", f"{last_login:.2f}s" if last_login is not None else "N/A")
+            with col4:
+                avg_login = stats['avg_login_seconds']
+                st.metric("Avg Login", f"{avg_login:.2f}s" if avg_login is not None else "N/A")
+
+            st.caption(
+                f"Reconnects: {stats['reconnects']} · Health checks: {stats['health_checks']} · "
+                f"Login failures: {stats['login_failures']} · In use: {stats['in_use']} · "
+                f"Idle: {stats['idle']} · Waiting: {stats['waiting']}"
+            )
+
+            pool_stats = self.connector.pool.get_stats()
+            if pool_stats:
+                with st.expander("🏊 Connection Pool (all sessions)"):
+                    st.dataframe(pd.DataFrame(pool_stats), use_container_width=True, hide_index=True)
+
+            st.subheader("🗄️ Query Result Cache")
+
+            cache_stats = self.connector.get_cache_stats()
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                hit_rate = cache_stats['hit_rate']
+                st.metric("Hit Rate", f"{hit_rate:.0%}" if hit_rate is not None else "N/A")
+            with col2:
+                st.metric("Entries", cache_stats['entries'])
+            with col3:
+                st.metric("Memory", f"{cache_stats['bytes'] / 1024 / 1024:.1f} MB",
+                          help=f"Budget: {cache_stats['max_bytes'] / 1024 / 1024:.0f} MB")
+            with col4:
+                st.metric("Evictions", cache_stats['evictions'])
+
+            st.caption(
+                f"Hits: {cache_stats['hits']} · Misses: {cache_stats['misses']} · "
+                f"Expired: {cache_stats['expirations']} · Too large: {cache_stats['rejected']} · "
+                f"TTL: {Config.QUERY_CACHE_TTL}s"
+            )
+
+            disk_stats = cache_stats['disk']
+            if disk_stats:
+                st.caption(
+                    f"Disk tier: {disk_stats['entries']} results · "
+                    f"{disk_stats['bytes'] / 1024 / 1024:.1f} / {disk_stats['max_bytes'] / 1024 / 1024:.0f} MB · "
+                    f"Disk hits: {cache_stats['disk_hits']} · Stale results served: {cache_stats['stale_served']}"
+                )
+
+            flight_stats = self.connector.get_single_flight_stats()
+            st.caption(
+                f"Identical in-flight queries: {flight_stats['coalesced']} executions saved by sharing "
+                f"{flight_stats['executions']} runs · In flight now: {flight_stats['in_flight']}"
+            )
+
+            loader_stats = self.connector.get_entity_loader_stats()
+            ids_per_query = loader_stats['ids_per_query']
+            st.caption(
+                f"ID lookups: {loader_stats['requests']} requests for {loader_stats['ids_requested']} IDs · "
+                f"{loader_stats['queries']} batched queries"
+                + (f" · {ids_per_query:.1f} IDs per query" if ids_per_query is not None else "")
+            )
+
+            invalidation_stats = self.connector.get_invalidation_stats()
+            last_poll = invalidation_stats['last_poll_at']
+            st.caption(
+                f"Table change polls: {invalidation_stats['polls']} · "
+                f"Last poll: {datetime.fromtimestamp(last_poll).strftime('%H:%M:%S') if last_poll else 'never'} · "
+                f"Tables tracked: {invalidation_stats['tracked_tables']} · "
+                f"Results invalidated: {invalidation_stats['results_invalidated']}"
+                + (f" · Last changed: {', '.join(invalidation_stats['last_changed'])}"
+                   if invalidation_stats['last_changed'] else "")
+            )
+
+    @tag_section
     def _show_dashboard_overview(self):
         """Display main dashboard overview with real Snowflake data"""
         st.header("📊 Dashboard Overview")
         
         if self.has_connector:
+            # Every section's queries start together; each section then waits
+            # only for its own results
+            plan = PagePlan(self.connector)
+            with query_context(section='live_metrics'):
+                plan.add_scalars(LIVE_METRICS)
+            for name, query in OVERVIEW_QUERIES.items():
+                with query_context(section=name):
+                    # The canary rollup is slow and only needs to be minutes fresh
+                    if name.startswith('canary_'):
+                        plan.add(query, soft_ttl=Config.QUERY_CACHE_SOFT_TTL, query_class=QUERY_CLASS_ANALYTICS)
+                    else:
+                        plan.add(query)
+            plan.execute()
+            
             # Real data from Snowflake
             col1, col2 = st.columns([3, 1])
             
@@ -571,6 +1051,7 @@ class SnowflakeDashboard:
                     with st.spinner("Analyzing data..."):
                         try:
                             df = self.connector.execute_query(quick_queries[selected_query])
+                            self._show_data_freshness(df)
                             if df is not None and not df.empty:
                                 st.success(f"✅ Found {len(df)} records")
                                 
@@ -601,23 +1082,13 @@ class SnowflakeDashboard:
             with col2:
                 st.subheader("📈 Live Metrics")
                 
-                # Get real counts
+                # Get real counts (one fused statement for all four)
                 try:
-                    # Total users
-                    user_count_df = self.connector.execute_query("select count(*) as total from users")
-                    user_count = user_count_df.iloc[0]['TOTAL'] if user_count_df is not None and not user_count_df.empty else 0
-                    
-                    # Total connections
-                    conn_count_df = self.connector.execute_query("select count(*) as total from connections")
-                    conn_count = conn_count_df.iloc[0]['TOTAL'] if conn_count_df is not None and not conn_count_df.empty else 0
-                    
-                    # Total flows
-                    flow_count_df = self.connector.execute_query("select count(*) as total from flows")
-                    flow_count = flow_count_df.iloc[0]['TOTAL'] if flow_count_df is not None and not flow_count_df.empty else 0
-                    
-                    # Active licenses
-                    license_count_df = self.connector.execute_query("select count(*) as total from licenses where expires > current_date()")
-                    license_count = license_count_df.iloc[0]['TOTAL'] if license_count_df is not None and not license_count_df.empty else 0
+                    metrics = plan.scalars(LIVE_METRICS)
+                    user_count = metrics['users'] or 0
+                    conn_count = metrics['connections'] or 0
+                    flow_count = metrics['flows'] or 0
+                    license_count = metrics['licenses'] or 0
                     
                     st.metric("👥 Total Users", f"{user_count:,}")
                     st.metric("🔗 Connections", f"{conn_count:,}")
@@ -633,24 +1104,30 @@ class SnowflakeDashboard:
             tab1, tab2, tab3, tab4 = st.tabs(["🔗 Connections", "⚠️ Anomalies", "🚀 Canary Rollout", "📊 System Health"])
             
             with tab1:
-                self._show_connections_analysis()
+                self._show_connections_analysis(plan)
                 
             with tab2:
-                self._show_anomaly_analysis()
+                self._show_anomaly_analysis(plan)
                 
             with tab3:
-                self._show_canary_analysis()
+                self._show_canary_analysis(plan)
                 
             with tab4:
-                self._show_system_health()
+                self._show_system_health(plan)
                 
         else:
             # Fallback for demo mode
             st.info("📊 Enable Snowflake connection to see real-time analytics")
             self._show_demo_overview()
     
-    def _show_connections_analysis(self):
-        """Show connection analysis with real data"""
+    @tag_section
+    def _show_connections_analysis(self, plan: Optional['PagePlan'] = None):
+        """
+        Show connection analysis with real data
+        
+        Args:
+            plan: Page plan that already started this section's queries
+        """
         st.subheader("🔗 Connection Analysis")
         
         col1, col2 = st.columns(2)
@@ -658,14 +1135,7 @@ class SnowflakeDashboard:
         with col1:
             try:
                 # OAuth connections by app
-                oauth_query = """
-                SELECT APP, Count(*) as ConnectionCount FROM
-                (
-                  SELECT * FROM DATA_ROOM.MONGODB.CONNECTIONS 
-                                        WHERE HTTP:auth:oauth is NOT NULL
-                    ) Group by APP ORDER BY ConnectionCount desc
-                """
-                df_oauth = self.connector.execute_query(oauth_query)
+                df_oauth = self._planned_query(plan, OVERVIEW_QUERIES['oauth'])
                 
                 if df_oauth is not None and not df_oauth.empty:
                     st.markdown("**OAuth Connections by App**")
@@ -681,11 +1151,7 @@ class SnowflakeDashboard:
         with col2:
             try:
                 # HTTP endpoint analysis
-                endpoint_query = """
-                select endpoint, COUNT(*) as occurrence from connections 
-                where app='http' group by endpoint order by occurrence desc limit 10
-                """
-                df_endpoints = self.connector.execute_query(endpoint_query)
+                df_endpoints = self._planned_query(plan, OVERVIEW_QUERIES['endpoints'])
                 
                 if df_endpoints is not None and not df_endpoints.empty:
                     st.markdown("**Top HTTP Endpoints**")
@@ -698,14 +1164,19 @@ class SnowflakeDashboard:
             except Exception as e:
                 st.error(f"Error loading endpoint data: {str(e)}")
     
-    def _show_anomaly_analysis(self):
-        """Show anomaly detection analysis"""
+    @tag_section
+    def _show_anomaly_analysis(self, plan: Optional['PagePlan'] = None):
+        """
+        Show anomaly detection analysis
+        
+        Args:
+            plan: Page plan that already started this section's queries
+        """
         st.subheader("⚠️ Anomaly Detection")
         
         try:
             # Recent anomalies
-            anomaly_query = "select * from influxdb.anomaly_events order by time desc limit 10"
-            df_anomalies = self.connector.execute_query(anomaly_query)
+            df_anomalies = self._planned_query(plan, OVERVIEW_QUERIES['anomalies'])
             
             if df_anomalies is not None and not df_anomalies.empty:
                 st.markdown(f"**Recent Anomalies ({len(df_anomalies)} found)**")
@@ -723,47 +1194,26 @@ class SnowflakeDashboard:
         except Exception as e:
             st.error(f"Error loading anomaly data: {str(e)}")
     
-    def _show_canary_analysis(self):
-        """Show canary rollout analysis"""
+    @tag_section
+    def _show_canary_analysis(self, plan: Optional['PagePlan'] = None):
+        """
+        Show canary rollout analysis
+        
+        Args:
+            plan: Page plan that already started this section's queries
+        """
         st.subheader("🚀 Canary Rollout Analysis")
         
         try:
             # Canary groups
-            canary_query = "select * from release_canary_groups"
-            df_canary = self.connector.execute_query(canary_query)
+            df_canary = self._planned_query(plan, OVERVIEW_QUERIES['canary_groups'], Config.QUERY_CACHE_SOFT_TTL)
             
             if df_canary is not None and not df_canary.empty:
                 st.markdown("**Active Canary Groups**")
                 st.dataframe(df_canary, use_container_width=True)
                 
                 # Phase distribution query
-                phase_query = """
-                WITH user_group as (SELECT
-                    u._id AS user_id,
-                    u.name,
-                    u.email,
-                    CASE
-                        WHEN u.emailDomain = 'celigo.com' THEN 'internal'
-                        WHEN l.tier = 'free' and l.trialenddate > CURRENT_DATE() THEN 'free-trial'
-                        WHEN l.tier = 'free' THEN 'free'
-                        ELSE ef.canary_group_name
-                    END as phase,
-                    l.tier
-                FROM users u
-                INNER JOIN licenses l ON l._userId = u._id
-                LEFT JOIN (
-                    SELECT e.canary_group_name, f.value::STRING AS user_id
-                    FROM release_canary_groups e,
-                    LATERAL FLATTEN(input => e.USER_IDS) f
-                ) ef ON ef.user_id = u._id and ef.RELEASE_NAME='2025.5.1' and ef.version='1.0'
-                WHERE l.type in ('integrator', 'endpoint', 'platform', 'diy')
-                    and l.tier != 'none'
-                    and (l.tier = 'free' OR l.expires > current_date())
-                )
-                select phase, count(*) as user_count from user_group group by phase
-                """
-                
-                df_phases = self.connector.execute_query(phase_query)
+                df_phases = self._planned_query(plan, OVERVIEW_QUERIES['canary_phases'], Config.QUERY_CACHE_SOFT_TTL)
                 if df_phases is not None and not df_phases.empty:
                     fig = px.pie(df_phases, values='USER_COUNT', names='PHASE', 
                                title="User Distribution by Phase")
@@ -774,8 +1224,14 @@ class SnowflakeDashboard:
         except Exception as e:
             st.error(f"Error loading canary data: {str(e)}")
     
-    def _show_system_health(self):
-        """Show system health metrics"""
+    @tag_section
+    def _show_system_health(self, plan: Optional['PagePlan'] = None):
+        """
+        Show system health metrics
+        
+        Args:
+            plan: Page plan that already started this section's queries
+        """
         st.subheader("📊 System Health")
         
         col1, col2 = st.columns(2)
@@ -783,12 +1239,7 @@ class SnowflakeDashboard:
         with col1:
             try:
                 # User tier distribution
-                tier_query = """
-                select tier, count(*) as count from licenses 
-                where expires > current_date() 
-                group by tier order by count desc
-                """
-                df_tiers = self.connector.execute_query(tier_query)
+                df_tiers = self._planned_query(plan, OVERVIEW_QUERIES['tiers'])
                 
                 if df_tiers is not None and not df_tiers.empty:
                     st.markdown("**License Tier Distribution**")
@@ -802,8 +1253,7 @@ class SnowflakeDashboard:
         with col2:
             try:
                 # Verification status
-                verification_query = "select verified, count(*) as count from users group by verified"
-                df_verification = self.connector.execute_query(verification_query)
+                df_verification = self._planned_query(plan, OVERVIEW_QUERIES['verification'])
                 
                 if df_verification is not None and not df_verification.empty:
                     st.markdown("**User Verification Status**")
@@ -814,6 +1264,191 @@ class SnowflakeDashboard:
             except Exception as e:
                 st.error(f"Error loading verification data: {str(e)}")
     
+    def _show_resilience_stats(self):
+        """Retry and circuit breaker counters for Snowflake calls from all sessions"""
+        st.subheader("🛡️ Snowflake Resilience")
+        
+        stats = self.connector.get_resilience_stats()
+        circuit = stats['circuit']
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            labels = {'closed': "🟢 Closed", 'half_open': "🟡 Half-open", 'open': "🔴 Open"}
+            st.metric("Circuit", labels.get(circuit['state'], circuit['state']),
+                      help="Open: calls fail fast and cached results are served until Snowflake recovers")
+        with col2:
+            st.metric("Retries", stats['retries'])
+        with col3:
+            st.metric("Recovered", stats['recovered'], help="Calls that succeeded after retrying")
+        with col4:
+            st.metric("Failed Fast", stats['short_circuited'])
+        
+        if circuit['state'] != 'closed':
+            st.warning(f"⏳ Snowflake calls are failing fast; next attempt in {circuit['retry_in']:.0f}s")
+        st.caption(
+            f"Calls: {stats['calls']} · Transient failures: {stats['transient_failures']} · "
+            f"Other failures: {stats['permanent_failures']} · Circuit opened: {stats['circuit_opened']} times"
+            + (f" · Open now: {', '.join(stats['open_circuits'])}" if stats['open_circuits'] else "")
+        )
+    
+    def _show_workload_stats(self):
+        """Warehouse and statement latency per query class, to check workload routing"""
+        st.subheader("🚦 Workload Routing")
+        
+        stats = pd.DataFrame(self.connector.get_workload_stats())
+        labels = {
+            'lookup': "Point lookup",
+            'interactive': "Dashboard aggregate",
+            'analytics': "Heavy analytic",
+            'adhoc': "Ad-hoc (Query Builder)",
+            'export': "Export / bulk"
+        }
+        stats['query_class'] = stats['query_class'].map(lambda name: labels.get(name, name))
+        stats['routed'] = stats['routed'].map({True: "Dedicated", False: "Login default"})
+        for column in ('mean_seconds', 'p50_seconds', 'p95_seconds', 'max_seconds'):
+            stats[column] = stats[column].round(2)
+        stats.columns = ["Class", "Warehouse", "Routing", "Statements", "Mean (s)", "p50 (s)", "p95 (s)", "Max (s)"]
+        st.dataframe(stats, use_container_width=True, hide_index=True)
+        st.caption("Latency covers the most recent statements per class, from all sessions; "
+                   "set WAREHOUSE_<CLASS> to give a class its own warehouse")
+    
+    def _show_memory_stats(self):
+        """Process, result cache and per-session memory, and the allocations each page render keeps"""
+        st.subheader("🧠 Memory")
+        
+        process = process_memory()
+        cache_stats = self.connector.get_cache_stats()
+        sessions = active_session_states() or [
+            {'session_id': None, 'state': st.session_state.to_dict(), 'current': True}
+        ]
+        own = session_usage(st.session_state.to_dict(), st.session_state.get(RESULT_AGES_KEY))
+        cap = Config.SESSION_MEMORY_CAP_MB * 1024 * 1024
+        
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            rss = process['rss']
+            st.metric("Process RSS", f"{rss / 1024 / 1024:.0f} MB" if rss is not None else "–",
+                      help=f"Peak: {process['peak_rss'] / 1024 / 1024:.0f} MB" if process['peak_rss'] else None)
+        with col2:
+            st.metric("Result Cache", f"{cache_stats['bytes'] / 1024 / 1024:.1f} MB",
+                      help=f"{cache_stats['entries']} results; budget: {cache_stats['max_bytes'] / 1024 / 1024:.0f} MB")
+        with col3:
+            st.metric("This Session", f"{sum(row['bytes'] for row in own) / 1024 / 1024:.1f} MB",
+                      help=f"Cap: {Config.SESSION_MEMORY_CAP_MB} MB" if cap else "No per-session cap")
+        with col4:
+            st.metric("Sessions", len(sessions))
+        
+        dtypes = self.connector.get_dtype_stats()
+        if dtypes['optimized']:
+            st.caption(
+                f"Dtype optimisation saved {dtypes['bytes_saved'] / 1024 / 1024:.1f} MB "
+                f"({dtypes['saved_ratio']:.0%} of the converted columns) across {dtypes['optimized']} of "
+                f"{dtypes['frames']} large results in {self._format_seconds(dtypes['seconds'])}: "
+                + ", ".join(f"{count} {kind}" for kind, count in sorted(dtypes['conversions'].items()))
+            )
+        
+        rows = []
+        for session in sessions:
+            usage = session_usage(session['state'], session['state'].get(RESULT_AGES_KEY))
+            page = session['state'].get('current_page')
+            rows.append({
+                "Session": (session['session_id'] or "–")[:8] + (" (you)" if session['current'] else ""),
+                "Page": page if isinstance(page, str) else "–",
+                "Keys": len(usage),
+                "Results": sum(1 for row in usage if row['result']),
+                "MB": round(sum(row['bytes'] for row in usage) / 1024 / 1024, 2),
+                "Largest Key": usage[0]['key'] if usage else "–"
+            })
+        st.dataframe(pd.DataFrame(rows).sort_values("MB", ascending=False),
+                     use_container_width=True, hide_index=True)
+        st.caption("Session bytes count DataFrames and containers in st.session_state; results taken from the "
+                   "cache share column data with it, so session and cache bytes can overlap. "
+                   + (f"Sessions over {Config.SESSION_MEMORY_CAP_MB} MB lose their oldest result objects first."
+                      if cap else "Set SESSION_MEMORY_CAP_MB to cap each session."))
+        
+        with st.expander(f"This session's state ({len(own)} keys)"):
+            now = time.monotonic()
+            st.dataframe(pd.DataFrame([
+                {
+                    "Key": row['key'],
+                    "Type": row['type'],
+                    "KB": round(row['bytes'] / 1024, 1),
+                    "Result": "✅" if row['result'] else "",
+                    "Age (s)": round(now - row['first_seen']) if row['first_seen'] is not None else None
+                }
+                for row in own
+            ]), use_container_width=True, hide_index=True)
+        
+        st.markdown("**Allocations per page (tracemalloc)**")
+        tracker = get_allocation_tracker()
+        traced = tracker.traced_memory()
+        if traced is None:
+            if st.button("▶️ Trace Allocations", help="Start tracemalloc for this server process; every page "
+                                                     "render is then diffed, which slows renders down"):
+                tracker.start()
+                st.rerun()
+        else:
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Traced", f"{traced['current'] / 1024 / 1024:.1f} MB")
+            with col2:
+                st.metric("Traced Peak", f"{traced['peak'] / 1024 / 1024:.1f} MB")
+            with col3:
+                if st.button("⏹️ Stop Tracing", use_container_width=True):
+                    tracker.stop()
+                    st.rerun()
+        
+        pages = tracker.get_pages()
+        if not pages:
+            if traced is not None:
+                st.info("No page measured yet; open a page to record the allocations its render keeps")
+            return
+        selected = st.selectbox("Page", sorted(pages), key='memory_page')
+        measured = pages[selected]
+        st.caption(f"Measured {measured['measured_at'].strftime('%H:%M:%S')} · render "
+                   f"{self._format_seconds(measured['render_seconds'])} · net "
+                   f"{measured['net_bytes'] / 1024 / 1024:+.2f} MB (includes other sessions' allocations "
+                   f"made while it rendered)")
+        if measured['allocators']:
+            st.dataframe(pd.DataFrame([
+                {
+                    "Location": row['location'],
+                    "Retained KB": round(row['size_diff'] / 1024, 1),
+                    "Blocks": row['count_diff'],
+                    "Total KB": round(row['size'] / 1024, 1)
+                }
+                for row in measured['allocators']
+            ]), use_container_width=True, hide_index=True)
+    
+    def _planned_query(self, plan: Optional['PagePlan'], query: str,
+                       soft_ttl: Optional[float] = None) -> Optional[pd.DataFrame]:
+        """Results from the page plan when there is one, otherwise run the query now"""
+        if plan is not None:
+            df = plan.result(query)
+        else:
+            df = self.connector.execute_query(query, soft_ttl=soft_ttl)
+        self._show_data_freshness(df, show_age=soft_ttl is not None)
+        return df
+    
+    def _show_data_freshness(self, df: Optional[pd.DataFrame], show_age: bool = False):
+        """
+        Tell the user how fresh a result is
+        
+        Args:
+            df: Query result, carrying ``fetched_at``/``stale``/``refreshing`` attrs
+            show_age: Also caption the age of live (possibly cached) results
+        """
+        if df is None:
+            return
+        fetched_at = df.attrs.get('fetched_at')
+        if df.attrs.get('stale'):
+            when = datetime.fromtimestamp(fetched_at).strftime('%Y-%m-%d %H:%M') if fetched_at else "an earlier run"
+            st.warning(f"⚠️ Snowflake is unreachable - showing last known good data from {when}")
+        elif show_age and fetched_at:
+            age = max(0, int(time.time() - fetched_at))
+            age_text = f"{age}s" if age < 60 else f"{age // 60}m {age % 60}s"
+            refreshing = " · 🔄 refreshing in the background, rerun to see the update" if df.attrs.get('refreshing') else ""
+            st.caption(f"🕒 Data as of {datetime.fromtimestamp(fetched_at).strftime('%H:%M:%S')} ({age_text} old){refreshing}")
+    
     def _show_demo_overview(self):
         """Fallback demo overview"""
         st.warning("📊 Demo Mode - Install Snowflake connector for real data")
@@ -829,6 +1464,7 @@ class SnowflakeDashboard:
         with col4:
             st.metric("Licenses", "1,123", "23")
     
+    @tag_section
     def _show_customer_configurations(self):
         """Display customer configurations with real Snowflake data"""
         st.header("⚙️ Customer Configurations")
@@ -873,45 +1509,60 @@ class SnowflakeDashboard:
                     else:
                         query = f"{base_query} LIMIT 100"
                     
-                    with st.spinner("Loading connection data..."):
-                        try:
-                            df = self.connector.execute_query(query)
-                            
-                            if df is not None and not df.empty:
-                                st.success(f"✅ Found {len(df)} connections")
+                    try:
+                        summary = st.empty()
+                        unique_apps = set()
+                        unique_users = set()
+                        
+                        def track_uniques(batch: pd.DataFrame):
+                            if 'APP' in batch.columns:
+                                unique_apps.update(batch['APP'].dropna().unique())
+                            if '_USERID' in batch.columns:
+                                unique_users.update(batch['_USERID'].dropna().unique())
+                        
+                        display_columns = ['_ID', 'APP', 'TYPE', '_USERID', 'NAME']
+                        if connection_id.strip() and not app_filter and not user_id.strip():
+                            # Plain ID lookups are batched with other sessions' lookups
+                            df = self.connector.lookup_entity(
+                                'connections', connection_id,
+                                columns="_id, app, type, _userId, name, OBJECT_CONSTRUCT(*) as full_data"
+                            )
+                            if df is None:
+                                df = pd.DataFrame()
+                            total_rows = len(df)
+                            if total_rows:
+                                track_uniques(df)
+                                st.dataframe(df[[col for col in display_columns if col in df.columns]],
+                                             use_container_width=True, hide_index=True)
+                        else:
+                            df, total_rows = self._stream_query_results(
+                                query,
+                                download_label="📥 Download Connections CSV",
+                                file_name=f"connections_{datetime.now().strftime('%Y%m%d')}.csv",
+                                display_columns=display_columns,
+                                on_batch=track_uniques
+                            )
+                        
+                        if total_rows:
+                            with summary.container():
+                                st.success(f"✅ Found {total_rows:,} connections")
                                 
                                 # Summary metrics
                                 col1, col2, col3 = st.columns(3)
                                 with col1:
-                                    st.metric("Total Connections", len(df))
+                                    st.metric("Total Connections", total_rows)
                                 with col2:
-                                    unique_apps = df['APP'].nunique() if 'APP' in df.columns else 0
-                                    st.metric("Unique Apps", unique_apps)
+                                    st.metric("Unique Apps", len(unique_apps))
                                 with col3:
-                                    unique_users = df['_USERID'].nunique() if '_USERID' in df.columns else 0
-                                    st.metric("Unique Users", unique_users)
-                                
-                                # Display data
-                                display_columns = ['_ID', 'APP', 'TYPE', '_USERID', 'NAME']
-                                available_columns = [col for col in display_columns if col in df.columns]
-                                st.dataframe(df[available_columns], use_container_width=True, hide_index=True)
-                                
-                                # Detailed view
-                                if st.checkbox("Show Full Connection Details"):
-                                    st.json(df.to_dict(orient='records'))
-                                
-                                # Export
-                                csv = df.to_csv(index=False)
-                                st.download_button(
-                                    label="📥 Download Connections CSV",
-                                    data=csv,
-                                    file_name=f"connections_{datetime.now().strftime('%Y%m%d')}.csv",
-                                    mime="text/csv"
-                                )
-                            else:
-                                st.warning("⚠️ No connections found matching criteria")
-                        except Exception as e:
-                            st.error(f"❌ Error: {str(e)}")
+                                    st.metric("Unique Users", len(unique_users))
+                            
+                            # Detailed view (limited to the on-screen preview rows)
+                            if st.checkbox("Show Full Connection Details"):
+                                st.json(df.to_dict(orient='records'))
+                        else:
+                            st.warning("⚠️ No connections found matching criteria")
+                    except Exception as e:
+                        st.error(f"❌ Error: {str(e)}")
             
             with tab2:
                 st.subheader("📥 Import Configurations")
@@ -925,11 +1576,11 @@ class SnowflakeDashboard:
                 with col2:
                     if st.button("🔍 Get Import Details", type="primary"):
                         if import_id.strip():
-                            query = f"select OBJECT_CONSTRUCT( * ) as import_data from imports where _id='{import_id.strip()}'"
-                            
                             with st.spinner("Loading import details..."):
                                 try:
-                                    df = self.connector.execute_query(query)
+                                    df = self.connector.lookup_entity(
+                                        'imports', import_id, columns="OBJECT_CONSTRUCT( * ) as import_data"
+                                    )
                                     if df is not None and not df.empty:
                                         st.success("✅ Import found!")
                                         st.json(df.iloc[0]['IMPORT_DATA'])
@@ -970,11 +1621,11 @@ class SnowflakeDashboard:
                 with col2:
                     if st.button("🔍 Get Export Details", type="primary"):
                         if export_id.strip():
-                            query = f"select OBJECT_CONSTRUCT( * ) as export_data from exports where _id='{export_id.strip()}'"
-                            
                             with st.spinner("Loading export details..."):
                                 try:
-                                    df = self.connector.execute_query(query)
+                                    df = self.connector.lookup_entity(
+                                        'exports', export_id, columns="OBJECT_CONSTRUCT( * ) as export_data"
+                                    )
                                     if df is not None and not df.empty:
                                         st.success("✅ Export found!")
                                         st.json(df.iloc[0]['EXPORT_DATA'])
@@ -1019,11 +1670,11 @@ class SnowflakeDashboard:
                 with col1:
                     if st.button("🔍 Get Flow Details", type="primary"):
                         if flow_id.strip():
-                            query = f"select OBJECT_CONSTRUCT( * ) as flow_data from flows where _id='{flow_id.strip()}'"
-                            
                             with st.spinner("Loading flow details..."):
                                 try:
-                                    df = self.connector.execute_query(query)
+                                    df = self.connector.lookup_entity(
+                                        'flows', flow_id, columns="OBJECT_CONSTRUCT( * ) as flow_data"
+                                    )
                                     if df is not None and not df.empty:
                                         st.success("✅ Flow found!")
                                         st.json(df.iloc[0]['FLOW_DATA'])
@@ -1091,6 +1742,77 @@ class SnowflakeDashboard:
             st.info("📊 Enable Snowflake connection to see real configuration data")
             self._show_demo_configurations()
     
+    def _stream_query_results(self, query: str, download_label: str, file_name: str,
+                              display_columns: Optional[list] = None,
+                              on_batch: Optional[Callable[[pd.DataFrame], None]] = None,
+                              query_class: Optional[str] = None,
+                              max_rows: Optional[int] = None):
+        """
+        Stream a query into an on-screen preview and a CSV download
+        
+        The first batch is rendered as soon as it arrives. Every batch is
+        appended to a temporary CSV file, so only one batch plus the preview
+        (``Config.STREAM_PREVIEW_ROWS``) is held in memory while rows arrive.
+        
+        Args:
+            query: SQL query string
+            download_label: Label for the CSV download button
+            file_name: File name offered for the download
+            display_columns: Optional subset of columns to show in the preview
+            on_batch: Optional callback invoked with every batch
+            query_class: Statement timeout and warehouse class; defaults to 'export'
+            max_rows: Rows past this many are counted but neither shown,
+                passed to ``on_batch`` nor downloaded
+            
+        Returns:
+            Tuple of (preview DataFrame, total row count the query returned)
+        """
+        status = st.empty()
+        preview_slot = st.empty()
+        preview_parts = []
+        preview_rows = 0
+        kept_rows = 0
+        total_rows = 0
+        
+        csv_fd, csv_path = tempfile.mkstemp(suffix='.csv')
+        try:
+            with os.fdopen(csv_fd, 'w', newline='', encoding='utf-8') as csv_file:
+                status.info("⏳ Running query...")
+                for batch in self.connector.execute_query_iter(query, query_class=query_class):
+                    total_rows += len(batch)
+                    if max_rows is not None:
+                        batch = batch.head(max(0, max_rows - kept_rows))
+                    batch.to_csv(csv_file, index=False, header=kept_rows == 0)
+                    kept_rows += len(batch)
+                    if on_batch:
+                        on_batch(batch)
+                    
+                    if preview_rows < Config.STREAM_PREVIEW_ROWS:
+                        part = batch.head(Config.STREAM_PREVIEW_ROWS - preview_rows)
+                        preview_parts.append(part)
+                        preview_rows += len(part)
+                        preview = pd.concat(preview_parts, ignore_index=True)
+                        if display_columns:
+                            preview = preview[[col for col in display_columns if col in preview.columns]]
+                        preview_slot.dataframe(preview, use_container_width=True, hide_index=True)
+                    
+                    status.info(f"⏳ Streaming results... {kept_rows:,} rows received")
+            status.empty()
+            
+            if kept_rows:
+                with open(csv_path, 'rb') as csv_file:
+                    st.download_button(
+                        label=download_label,
+                        data=csv_file,
+                        file_name=file_name,
+                        mime="text/csv"
+                    )
+        finally:
+            os.remove(csv_path)
+        
+        preview = pd.concat(preview_parts, ignore_index=True) if preview_parts else pd.DataFrame()
+        return preview, total_rows
+    
     def _show_demo_configurations(self):
         """Demo configuration data"""
         st.warning("📊 Demo Mode - Enable Snowflake for real data")
@@ -1104,6 +1826,7 @@ class SnowflakeDashboard:
         })
         st.dataframe(demo_data, use_container_width=True)
     
+    @tag_section
     def _show_customer_details(self):
         """Display customer details with real Snowflake user data"""
         st.header("👥 Customer Details")
@@ -1122,22 +1845,17 @@ class SnowflakeDashboard:
                 with col2:
                     if st.button("🔍 Search User by ID", type="primary"):
                         if user_id.strip():
-                            query = f"select * from DATA_ROOM.MONGODB.USERS WHERE _ID = '{user_id.strip()}'"
                             with st.spinner("Loading user details..."):
                                 try:
-                                    df = self.connector.execute_query(query)
+                                    df = self.connector.lookup_entity('users', user_id)
                                     if df is not None and not df.empty:
                                         st.success("✅ User found!")
                                         st.dataframe(df, use_container_width=True)
                                         
-                                        # Show microservices info
-                                        if '_ID' in df.columns:
-                                            user_id_found = df.iloc[0]['_ID']
-                                            ms_query = f"select microservices from users where _id = '{user_id_found}'"
-                                            ms_df = self.connector.execute_query(ms_query)
-                                            if ms_df is not None and not ms_df.empty:
-                                                st.subheader("🛠️ Microservices Configuration")
-                                                st.json(ms_df.iloc[0]['MICROSERVICES'])
+                                        # Show microservices info (already part of the user row)
+                                        if 'MICROSERVICES' in df.columns:
+                                            st.subheader("🛠️ Microservices Configuration")
+                                            st.json(df.iloc[0]['MICROSERVICES'])
                                     else:
                                         st.warning("⚠️ User not found")
                                 except Exception as e:
@@ -1216,9 +1934,8 @@ class SnowflakeDashboard:
                 with col1:
                     if st.button("📜 Get License Info"):
                         if license_user_id.strip():
-                            query = f"select * from licenses WHERE _userid= '{license_user_id.strip()}'"
                             try:
-                                df = self.connector.execute_query(query)
+                                df = self.connector.lookup_entity('licenses', license_user_id)
                                 if df is not None and not df.empty:
                                     st.success("✅ License found!")
                                     st.dataframe(df, use_container_width=True)
@@ -1245,6 +1962,82 @@ class SnowflakeDashboard:
             demo_data = self._get_demo_customer_data()
             st.dataframe(demo_data, use_container_width=True, hide_index=True)
     
+    @tag_section
+    def _show_bulk_lookup(self):
+        """Look up hundreds or thousands of pasted or uploaded IDs at once"""
+        st.header("📦 Bulk ID Lookup")
+        
+        if not self.has_connector:
+            st.info("📊 Enable Snowflake connection for bulk ID lookups")
+            return
+        
+        col1, col2 = st.columns([1, 2])
+        with col1:
+            entity = BULK_LOOKUP_ENTITIES[st.selectbox("Look up", list(BULK_LOOKUP_ENTITIES))]
+            uploaded = st.file_uploader("Or upload a CSV of IDs", type=['csv', 'txt'])
+        with col2:
+            pasted = st.text_area("IDs", height=180,
+                                  placeholder="Paste IDs separated by commas, spaces or new lines...")
+        
+        requested = parse_id_list(pasted)
+        if uploaded is not None:
+            requested += parse_id_csv(uploaded.getvalue())
+        ids = list(dict.fromkeys(requested))
+        chunk_count = -(-len(ids) // Config.ENTITY_LOADER_CHUNK_SIZE)
+        
+        if ids:
+            st.caption(
+                f"{len(ids):,} unique IDs ({len(requested) - len(ids):,} duplicates removed) · "
+                f"{chunk_count} queries of up to {Config.ENTITY_LOADER_CHUNK_SIZE:,} IDs, "
+                f"{Config.BULK_LOOKUP_MAX_WORKERS} at a time"
+            )
+        
+        if st.button("🔍 Look Up IDs", type="primary", disabled=not ids):
+            progress = st.progress(0.0, text="⏳ Running lookups...")
+            grid = st.empty()
+            parts = []
+            done = 0
+            row_count = 0
+            preview = None
+            
+            for chunk_df in self.connector.bulk_lookup_iter(entity, ids):
+                parts.append(chunk_df)
+                done += 1
+                row_count += len(chunk_df)
+                progress.progress(min(done / chunk_count, 1.0),
+                                  text=f"⏳ {done}/{chunk_count} chunks · {row_count:,} rows received")
+                # Only the first chunks reach the preview; everything is merged once at the end
+                if not chunk_df.empty and (preview is None or len(preview) < Config.STREAM_PREVIEW_ROWS):
+                    head = chunk_df.head(Config.STREAM_PREVIEW_ROWS - (0 if preview is None else len(preview)))
+                    preview = head if preview is None else pd.concat([preview, head], ignore_index=True)
+                    grid.dataframe(preview, use_container_width=True, hide_index=True)
+            progress.empty()
+            
+            merged = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
+            found = set(merged[LOOKUP_KEY_COLUMN].astype(str)) if LOOKUP_KEY_COLUMN in merged.columns else set()
+            missing = [entity_id for entity_id in ids if entity_id not in found]
+            
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("IDs Found", f"{len(found):,} / {len(ids):,}")
+            with col2:
+                st.metric("Not Found", f"{len(missing):,}")
+            with col3:
+                st.metric("Rows", f"{len(merged):,}")
+            
+            if not merged.empty:
+                if len(merged) > Config.STREAM_PREVIEW_ROWS:
+                    st.caption(f"Showing the first {Config.STREAM_PREVIEW_ROWS:,} rows; download for all of them")
+                st.download_button(
+                    label="📥 Download Results CSV",
+                    data=merged.to_csv(index=False),
+                    file_name=f"{entity}_lookup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+                    mime="text/csv"
+                )
+            if missing:
+                with st.expander(f"⚠️ {len(missing):,} IDs returned no rows"):
+                    st.code("\n".join(missing))
+    
     def _show_customer_detail_card(self, customer):
         """Show detailed customer information card"""
         col1, col2, col3 = st.columns(3)
@@ -1298,6 +2091,7 @@ class SnowflakeDashboard:
             with tab3:
                 self._show_deep_dive_analysis()
     
+    @tag_section
     def _show_real_analytics_overview(self):
         """Show real system analytics with live data"""
         st.subheader("📊 System Overview & Performance")
@@ -1358,6 +2152,7 @@ class SnowflakeDashboard:
             except Exception as e:
                 st.error(f"Error: {str(e)}")
     
+    @tag_section
     def _show_canary_analytics(self):
         """Show canary rollout analytics"""
         st.subheader("🚀 Canary Rollout Analytics")
@@ -1404,7 +2199,9 @@ class SnowflakeDashboard:
                 group by phase
                 """
                 
-                df_canary = self.connector.execute_query(canary_query)
+                df_canary = self.connector.execute_query(canary_query, soft_ttl=Config.QUERY_CACHE_SOFT_TTL,
+                                                         query_class=QUERY_CLASS_ANALYTICS)
+                self._show_data_freshness(df_canary, show_age=True)
                 if df_canary is not None and not df_canary.empty:
                     st.success(f"✅ Canary analysis complete - {len(df_canary)} phases found")
                     
@@ -1425,6 +2222,7 @@ class SnowflakeDashboard:
             except Exception as e:
                 st.error(f"Error: {str(e)}")
     
+    @tag_section
     def _show_anomaly_analytics(self):
         """Show anomaly detection analytics"""
         st.subheader("⚠️ Anomaly Detection Analytics")
@@ -1472,10 +2270,11 @@ class SnowflakeDashboard:
         user_id_anomaly = st.text_input("Search Anomalies by User ID", placeholder="Enter user ID...")
         if st.button("🔍 Search User Anomalies") and user_id_anomaly.strip():
             try:
-                user_anomaly_query = f"select * from influxdb.anomaly_events where uid IN ('{user_id_anomaly.strip()}') ORDER BY time desc"
-                df_user_anomalies = self.connector.execute_query(user_anomaly_query)
+                df_user_anomalies = self.connector.lookup_entity('anomaly_events', user_id_anomaly)
                 
                 if df_user_anomalies is not None and not df_user_anomalies.empty:
+                    if 'TIME' in df_user_anomalies.columns:
+                        df_user_anomalies = df_user_anomalies.sort_values('TIME', ascending=False, ignore_index=True)
                     st.success(f"✅ Found {len(df_user_anomalies)} anomalies for user")
                     st.dataframe(df_user_anomalies, use_container_width=True)
                 else:
@@ -1483,6 +2282,7 @@ class SnowflakeDashboard:
             except Exception as e:
                 st.error(f"Error: {str(e)}")
     
+    @tag_section
     def _show_integration_analytics(self):
         """Show integration and flow analytics"""
         st.subheader("🔗 Integration & Flow Analytics")
@@ -1535,6 +2335,7 @@ class SnowflakeDashboard:
             except Exception as e:
                 st.error(f"Error: {str(e)}")
     
+    @tag_section
     def _show_query_builder(self):
         """Display custom query builder"""
         st.header("🔧 Custom Query Builder")
@@ -1563,6 +2364,16 @@ class SnowflakeDashboard:
                 help="Write your custom SQL query to fetch data from Snowflake"
             )
             
+            # Unbounded SELECTs are capped so one query cannot exhaust the app's memory
+            col_cap, col_mode = st.columns(2)
+            with col_cap:
+                row_cap = st.number_input("Row cap", min_value=100, max_value=1000000,
+                                          value=Config.QUERY_BUILDER_ROW_CAP, step=1000,
+                                          help="Most rows a query without its own LIMIT may return")
+            with col_mode:
+                cap_mode = st.radio("Over the cap", ["First rows", "Random sample"], horizontal=True,
+                                    help="LIMIT to the first rows, or SAMPLE random rows from the whole result")
+            
             col_a, col_b = st.columns(2)
             with col_a:
                 execute_query = st.button("▶️ Execute Query", type="primary")
@@ -1575,33 +2386,137 @@ class SnowflakeDashboard:
             
             if execute_query and query.strip():
                 if self.has_connector:
-                    with st.spinner("Executing query..."):
-                        try:
-                            result = self.connector.execute_query(query)
-                            if result is not None and not result.empty:
-                                st.success(f"✅ Query executed successfully! ({len(result)} rows)")
-                                st.dataframe(result, use_container_width=True)
-                                
-                                # Download option
-                                csv = result.to_csv(index=False)
-                                st.download_button(
-                                    "📥 Download Results",
-                                    csv,
-                                    f"query_results_{datetime.now().strftime('%Y%m%d_%H%M')}.csv",
-                                    mime="text/csv"
-                                )
-                            else:
-                                st.warning("⚠️ Query returned no results")
-                        except Exception as e:
-                            st.error(f"❌ Query failed: {str(e)}")
+                    try:
+                        sample = cap_mode == "Random sample"
+                        guarded_query, capped = cap_rows(query, int(row_cap), sample=sample)
+                        st.session_state.pop('builder_full_query', None)
+                        st.session_state.pop('builder_held_query', None)
+                        
+                        # Pre-flight EXPLAIN: expensive scans wait for confirmation
+                        cost, reasons = self.connector.check_query_admission(guarded_query)
+                        if cost is not None:
+                            self._show_query_cost(cost)
+                        run = {'query': query, 'guarded_query': guarded_query, 'capped': capped,
+                               'sample': sample, 'row_cap': int(row_cap)}
+                        if reasons:
+                            st.session_state.builder_held_query = dict(run, reasons=reasons)
+                        else:
+                            self._run_builder_query(**run)
+                    except Exception as e:
+                        st.error(f"❌ Query failed: {str(e)}")
                 else:
                     st.error("❌ Snowflake connector not available")
             
+            held = st.session_state.get('builder_held_query')
+            if held and self.has_connector:
+                notice = st.empty()
+                notice.warning("🛑 Query held before running:\n\n" + "\n".join(f"- {reason}" for reason in held['reasons']))
+                col_run, col_drop = st.columns(2)
+                with col_run:
+                    run_anyway = st.button("⚠️ Run Anyway", help="Run the query despite its estimated cost")
+                with col_drop:
+                    if st.button("✖️ Don't Run"):
+                        st.session_state.pop('builder_held_query', None)
+                        st.rerun()
+                if run_anyway:
+                    notice.empty()
+                    st.session_state.pop('builder_held_query', None)
+                    held.pop('reasons')
+                    try:
+                        self._run_builder_query(**held)
+                    except Exception as e:
+                        st.error(f"❌ Query failed: {str(e)}")
+            
+            if self.has_connector:
+                full_query = st.session_state.get('builder_full_query')
+                if full_query and st.button("📦 Export Full Result in Background",
+                                            help="Run the query without the row cap and write every row to a CSV file"):
+                    if self.connector.start_background_export(full_query):
+                        st.session_state.pop('builder_full_query', None)
+                        st.success("✅ Export started; it keeps running while you use the app")
+                self._show_export_jobs()
+            
             # Sample queries section
             if st.session_state.get('show_samples'):
                 st.subheader("📚 Sample Queries")
                 self._show_sample_queries()
     
+    def _run_builder_query(self, query: str, guarded_query: str, capped: bool, sample: bool, row_cap: int):
+        """Stream a Query Builder statement and report whether the row cap truncated it"""
+        # Stream batches so the first rows show up right away
+        preview, total_rows = self._stream_query_results(
+            guarded_query,
+            download_label="📥 Download Results",
+            file_name=f"query_results_{datetime.now().strftime('%Y%m%d_%H%M')}.csv",
+            query_class=QUERY_CLASS_ADHOC,
+            max_rows=row_cap if capped else None
+        )
+        # A capped statement fetches one extra row, which only arrives when the cap cut something
+        truncated = capped and total_rows > row_cap
+        total_rows = min(total_rows, row_cap) if capped else total_rows
+        if total_rows:
+            st.success(f"✅ Query executed successfully! ({total_rows:,} rows)")
+            if truncated:
+                st.session_state.builder_full_query = query
+                st.warning(
+                    f"✂️ Output truncated to {'a random sample of' if sample else 'the first'} "
+                    f"{total_rows:,} rows; the full result is larger. Export it in the background below."
+                )
+            if total_rows > len(preview):
+                st.caption(f"Showing the first {len(preview):,} rows; the download contains all {total_rows:,}")
+        else:
+            st.warning("⚠️ Query returned no results")
+    
+    def _show_query_cost(self, cost):
+        """Summarise an EXPLAIN estimate: scan size, partition pruning, tables and joins"""
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Est. Scan", f"{cost.gb_assigned:,.2f} GB")
+        with col2:
+            st.metric("Partitions", f"{cost.partitions_assigned:,} / {cost.partitions_total:,}")
+        with col3:
+            pruned = cost.pruned_fraction
+            st.metric("Pruned", f"{pruned:.0%}" if pruned is not None else "—")
+        details = [f"{table['table']}: {table['partitions_assigned']:,} partitions" for table in cost.tables]
+        if cost.joins:
+            details.append("joins: " + ", ".join(cost.joins))
+        if details:
+            st.caption("🔎 " + " · ".join(details))
+    
+    def _show_export_jobs(self):
+        """Background exports started from this session, with downloads once finished"""
+        jobs = self.connector.get_export_jobs()
+        if not jobs:
+            return
+        
+        st.markdown("#### 📦 Background Exports")
+        for job in jobs:
+            col1, col2, col3 = st.columns([4, 1, 1])
+            size_mb = job['bytes'] / 1024 / 1024
+            with col1:
+                st.caption(f"`{' '.join(job['query'].split())[:80]}`")
+                if job['status'] == 'running':
+                    st.caption(f"⏳ Running · {job['rows']:,} rows written · {job['elapsed_seconds']:.0f}s")
+                elif job['status'] == 'done':
+                    st.caption(f"✅ {job['rows']:,} rows · {size_mb:.1f} MB · {job['elapsed_seconds']:.0f}s")
+                else:
+                    st.caption(f"❌ Failed: {job['error']}")
+            with col2:
+                if job['status'] == 'running':
+                    st.button("🔄", key=f"export_refresh_{job['id']}", help="Refresh status")
+                elif job['status'] == 'done' and size_mb <= Config.QUERY_EXPORT_MAX_DOWNLOAD_MB:
+                    with open(job['path'], 'rb') as csv_file:
+                        st.download_button("📥", data=csv_file, key=f"export_download_{job['id']}",
+                                           file_name=f"query_export_{job['id']}.csv", mime="text/csv",
+                                           help="Download CSV")
+                elif job['status'] == 'done':
+                    st.caption(f"Saved to `{job['path']}`")
+            with col3:
+                if job['status'] != 'running' and st.button("🗑️", key=f"export_discard_{job['id']}",
+                                                          help="Delete this export"):
+                    self.connector.discard_export(job['id'])
+                    st.rerun()
+    
     def _show_sample_queries(self):
         """Show sample SQL queries"""
         
@@ -1915,6 +2830,7 @@ select * from influxdb.api_anomaly_events order by time desc limit 10;
     # NEW DEVELOPER & QA FOCUSED PAGES FOR E2E TEAM
     # =============================================================================
     
+    @tag_section
     def _show_kpi_dashboard(self):
         """Professional KPI Dashboard with enhanced visualizations"""
         st.markdown("""
@@ -1928,10 +2844,11 @@ select * from influxdb.api_anomaly_events order by time desc limit 10;
         col1, col2, col3, col4 = st.columns(4)
         
         try:
-            # Get real KPI data from Snowflake
+            # Get real KPI data from Snowflake in one round trip
+            kpis = fetch_scalar_metrics(self.connector, KPI_METRICS) if self.has_connector else {}
+            
             with col1:
-                users_df = self.connector.execute_query("SELECT COUNT(*) as total FROM users") if self.has_connector else None
-                user_count = users_df.iloc[0]['TOTAL'] if users_df is not None and not users_df.empty else 125450
+                user_count = 125450 if kpis.get('users') is None else kpis['users']
                 st.markdown(f"""
                 <div class="kpi-card">
                     <div class="kpi-title">👥 Total Users</div>
@@ -1941,8 +2858,7 @@ select * from influxdb.api_anomaly_events order by time desc limit 10;
                 """, unsafe_allow_html=True)
             
             with col2:
-                flows_df = self.connector.execute_query("SELECT COUNT(*) as total FROM flows") if self.has_connector else None
-                flow_count = flows_df.iloc[0]['TOTAL'] if flows_df is not None and not flows_df.empty else 8943
+                flow_count = 8943 if kpis.get('flows') is None else kpis['flows']
                 st.markdown(f"""
                 <div class="kpi-card">
                     <div class="kpi-title">⚙️ Active Flows</div>
@@ -1952,8 +2868,7 @@ select * from influxdb.api_anomaly_events order by time desc limit 10;
                 """, unsafe_allow_html=True)
             
             with col3:
-                conn_df = self.connector.execute_query("SELECT COUNT(*) as total FROM connections") if self.has_connector else None
-                conn_count = conn_df.iloc[0]['TOTAL'] if conn_df is not None and not conn_df.empty else 23678
+                conn_count = 23678 if kpis.get('connections') is None else kpis['connections']
                 st.markdown(f"""
                 <div class="kpi-card">
                     <div class="kpi-title">🔗 Connections</div>
@@ -1993,6 +2908,7 @@ select * from influxdb.api_anomaly_events order by time desc limit 10;
         with tab4:
             self._show_goal_tracking()
     
+    @tag_section
     def _show_system_architecture(self):
         """System Architecture Overview for Dev/QA"""
         st.markdown("""
@@ -2084,6 +3000,7 @@ select * from influxdb.api_anomaly_events order by time desc limit 10;
             st.metric("Memory Usage", "67%", "+5%")
             st.metric("Storage", "2.3TB", "+45GB")
     
+    @tag_section
     def _show_performance_monitor(self):
         """Performance monitoring dashboard"""
         st.markdown("""
@@ -2093,55 +3010,246 @@ select * from influxdb.api_anomaly_events order by time desc limit 10;
         </div>
         """, unsafe_allow_html=True)
         
+        if not self.has_connector:
+            st.info("📊 Enable Snowflake connection to see the dashboard's query costs")
+            return
+        
+        self._show_latency_breakdown()
+        
+        st.subheader("💸 Snowflake Query Cost")
+        # Every statement the dashboard sends carries a QUERY_TAG naming its page and section
+        sources = {"Information Schema (last 7 days, no delay)": 'information_schema',
+                   "Account Usage (all users, ~45 min delay)": 'account_usage'}
+        col_source, col_hours = st.columns([2, 1])
+        with col_source:
+            default_source = list(sources.values()).index(Config.QUERY_HISTORY_SOURCE) \
+                if Config.QUERY_HISTORY_SOURCE in sources.values() else 0
+            source_label = st.selectbox("Query history source", list(sources), index=default_source)
+        with col_hours:
+            windows = {"Last hour": 1, "Last 6 hours": 6, "Last 24 hours": 24, "Last 3 days": 72, "Last 7 days": 168}
+            window_label = st.selectbox("Window", list(windows), index=2)
+        
+        history = self.connector.get_query_history(hours=windows[window_label], source=sources[source_label])
+        if history is None:
+            return
+        if history.empty:
+            st.info("No tagged dashboard queries in this window yet")
+            return
+        
         # Performance metrics
         col1, col2, col3, col4 = st.columns(4)
-        
         with col1:
-            st.metric("Response Time", "125ms", "-15ms")
+            st.metric("Statements", f"{len(history):,}")
         with col2:
-            st.metric("Throughput", "2.4K/sec", "+340")
+            st.metric("Median Elapsed", f"{history['TOTAL_ELAPSED_SECONDS'].median():.2f}s")
         with col3:
-            st.metric("Active Sessions", "1,247", "+23")
+            st.metric("Queued", f"{history['QUEUED_SECONDS'].sum():,.0f}s",
+                      help="Time statements waited for warehouse capacity")
         with col4:
-            st.metric("Queue Length", "12", "-8")
+            st.metric("Est. Credits", f"{history['EST_CREDITS'].sum():,.2f}",
+                      help="Execution time at the warehouse size's hourly rate plus cloud services; "
+                           "an upper bound when statements share a warehouse")
+        
+        by_section = summarize_history(history)
+        by_section['SECTION_LABEL'] = by_section['PAGE'] + " › " + by_section['SECTION']
         
-        # Performance charts
-        tab1, tab2, tab3 = st.tabs(["📈 Response Times", "🔥 Load Analysis", "💾 Resource Usage"])
+        tab1, tab2, tab3 = st.tabs(["💸 Cost by Section", "⏱️ Time Breakdown", "📈 Hourly Trend"])
         
         with tab1:
-            # Mock time series data for response times
-            dates = pd.date_range(start='2024-01-01', periods=24*7, freq='H')
-            response_times = np.random.normal(120, 20, len(dates))
-            df_perf = pd.DataFrame({'Time': dates, 'Response Time (ms)': response_times})
-            
-            fig = px.line(df_perf, x='Time', y='Response Time (ms)', 
-                         title='Response Time Trend (Last 7 Days)')
+            top = by_section.head(15)
+            fig = px.bar(top, x='EST_CREDITS', y='SECTION_LABEL', orientation='h',
+                         hover_data=['STATEMENTS', 'GB_SCANNED', 'EXECUTION_SECONDS'],
+                         title="Most Expensive Dashboard Sections",
+                         labels={'EST_CREDITS': 'Est. credits', 'SECTION_LABEL': ''})
+            fig.update_layout(yaxis={'categoryorder': 'total ascending'})
             st.plotly_chart(fig, use_container_width=True)
+            
+            st.dataframe(
+                by_section.drop(columns='SECTION_LABEL').round(3),
+                use_container_width=True, hide_index=True
+            )
         
         with tab2:
-            # Load analysis with heatmap
-            hours = list(range(24))
-            days = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
-            load_data = np.random.rand(7, 24) * 100
-            
-            fig = px.imshow(load_data, 
-                           x=hours, y=days,
-                           labels=dict(x="Hour of Day", y="Day of Week", color="Load %"),
-                           title="System Load Heatmap")
+            top = by_section.head(15).melt(
+                id_vars='SECTION_LABEL',
+                value_vars=['COMPILE_SECONDS', 'QUEUED_SECONDS', 'EXECUTION_SECONDS'],
+                var_name='Phase', value_name='Seconds'
+            )
+            top['Phase'] = top['Phase'].str.replace('_SECONDS', '').str.title()
+            fig = px.bar(top, x='Seconds', y='SECTION_LABEL', color='Phase', orientation='h',
+                         title="Compile, Queue and Execution Time by Section",
+                         labels={'SECTION_LABEL': ''})
+            fig.update_layout(yaxis={'categoryorder': 'total ascending'})
             st.plotly_chart(fig, use_container_width=True)
+            
+            by_class = summarize_history(history, by=('QUERY_CLASS', 'CACHE'))
+            st.markdown("**By query class and cache status**")
+            st.dataframe(by_class.round(3), use_container_width=True, hide_index=True)
         
         with tab3:
-            # Resource usage over time
-            times = pd.date_range(start='2024-01-01', periods=168, freq='H')
-            cpu_usage = np.random.normal(45, 15, len(times))
-            memory_usage = np.random.normal(65, 10, len(times))
-            
+            hourly = hourly_history(history)
             fig = go.Figure()
-            fig.add_trace(go.Scatter(x=times, y=cpu_usage, name='CPU %', line=dict(color='blue')))
-            fig.add_trace(go.Scatter(x=times, y=memory_usage, name='Memory %', line=dict(color='red')))
-            fig.update_layout(title='Resource Usage (Last 7 Days)', yaxis_title='Usage %')
+            fig.add_trace(go.Bar(x=hourly['HOUR'], y=hourly['STATEMENTS'], name='Statements', yaxis='y2',
+                                 marker_color='lightgray'))
+            fig.add_trace(go.Scatter(x=hourly['HOUR'], y=hourly['EXECUTION_SECONDS'], name='Execution s',
+                                     line=dict(color='blue')))
+            fig.add_trace(go.Scatter(x=hourly['HOUR'], y=hourly['QUEUED_SECONDS'], name='Queued s',
+                                     line=dict(color='red')))
+            fig.update_layout(title='Dashboard Query Load per Hour', yaxis_title='Seconds',
+                              yaxis2=dict(title='Statements', overlaying='y', side='right'))
             st.plotly_chart(fig, use_container_width=True)
     
+    @staticmethod
+    def _format_seconds(seconds: Optional[float]) -> str:
+        """Latency as milliseconds below a second, seconds above"""
+        if seconds is None:
+            return "–"
+        return f"{seconds * 1000:.0f}ms" if seconds < 1 else f"{seconds:.2f}s"
+    
+    @tag_section
+    def _show_latency_breakdown(self):
+        """Stage latency percentiles, throughput and error rates for this server's statements"""
+        st.subheader("⏱️ Query Latency (this server)")
+        
+        # Compile/queued/warehouse time comes from Snowflake by query id
+        self.connector.refresh_server_timings()
+        perf = self.connector.get_perf_stats()
+        summary = perf['summary']
+        if not summary['statements']:
+            st.info("No statements have run on this server yet")
+            return
+        
+        col1, col2, col3, col4, col5 = st.columns(5)
+        with col1:
+            st.metric("Statements/min", f"{summary['per_minute']:,.1f}",
+                      help=f"{summary['statements']:,} since start-up; {summary['cache_hit_rate']:.0%} from cache")
+        with col2:
+            st.metric("p50", self._format_seconds(summary['p50_seconds']))
+        with col3:
+            st.metric("p95", self._format_seconds(summary['p95_seconds']))
+        with col4:
+            st.metric("p99", self._format_seconds(summary['p99_seconds']))
+        with col5:
+            st.metric("Error Rate", f"{summary['error_rate']:.1%}", help=f"{summary['errors']:,} failed statements")
+        
+        labels = {
+            'checkout': "Pool checkout", 'login': "Login",
+            'execute': "Execute (client)", 'fetch': "Fetch", 'dataframe': "DataFrame build",
+            'compile': "Compile (Snowflake)", 'queued': "Queued (Snowflake)",
+            'warehouse': "Execution (Snowflake)", 'total': "End to end"
+        }
+        stages = pd.DataFrame(perf['stages'])
+        stages['stage'] = stages['stage'].map(lambda name: labels.get(name, name))
+        
+        tab1, tab2, tab3 = st.tabs(["🧱 By Stage", "🔎 By Query", "📄 By Page"])
+        
+        with tab1:
+            chart = stages.melt(id_vars='stage', value_vars=['p50_seconds', 'p95_seconds', 'p99_seconds'],
+                                var_name='Percentile', value_name='Seconds')
+            chart['Percentile'] = chart['Percentile'].str.replace('_seconds', '')
+            fig = px.bar(chart, x='Seconds', y='stage', color='Percentile', orientation='h', barmode='group',
+                         title="Latency by Stage", labels={'stage': ''})
+            st.plotly_chart(fig, use_container_width=True)
+            
+            table = stages[['stage', 'count', 'mean_seconds', 'p50_seconds', 'p95_seconds', 'p99_seconds',
+                            'max_seconds']].copy()
+            for column in table.columns[2:]:
+                table[column] = table[column].map(self._format_seconds)
+            table.columns = ["Stage", "Samples", "Mean", "p50", "p95", "p99", "Max"]
+            st.dataframe(table, use_container_width=True, hide_index=True)
+            st.caption("End to end includes cache hits; Snowflake's own compile, queue and execution times "
+                       f"are looked up by query id ({summary['pending_query_ids']} pending)")
+        
+        for tab, key, title in ((tab2, 'fingerprints', "Query (literals stripped)"), (tab3, 'pages', "Page")):
+            with tab:
+                rows = pd.DataFrame(perf[key])
+                if rows.empty:
+                    st.info("No statements yet")
+                    continue
+                table = pd.DataFrame({
+                    title: rows['label'].str.slice(0, 120),
+                    "Statements": rows['statements'],
+                    "Cached": rows['cached'],
+                    "Errors": rows['errors'],
+                    "Error Rate": rows['error_rate'].map(lambda rate: f"{rate:.1%}"),
+                    "p50": rows['p50_seconds'].map(self._format_seconds),
+                    "p95": rows['p95_seconds'].map(self._format_seconds),
+                    "p99": rows['p99_seconds'].map(self._format_seconds),
+                    "Total Time (s)": rows['total_seconds'].round(1)
+                })
+                st.dataframe(table, use_container_width=True, hide_index=True)
+        st.caption("Since this server started, across all sessions; ranked by total time spent")
+    
+    def _show_saved_profiles(self):
+        """Rerun profiles saved with "Profile Next Rerun", newest first"""
+        st.subheader("🔬 Rerun Profiles")
+        
+        profiles = list_profiles(Config.PROFILE_DIR or default_profile_dir())
+        if not profiles:
+            st.info("No rerun profiles yet; use 🔬 Profile Next Rerun in the sidebar to capture one")
+            return
+        
+        options = {
+            f"{summary['created_at'].replace('T', ' ')} · {summary['name']} · {summary['elapsed_seconds']:.2f}s": summary
+            for summary in profiles
+        }
+        selected = st.selectbox("Profile", list(options), key='saved_profile')
+        self._show_profile_report(options[selected])
+    
+    def _show_profile_report(self, summary: dict):
+        """
+        Flamegraph and hottest functions of a saved rerun profile
+        
+        Args:
+            summary: Report summary from ``ProfileReport.save`` or ``list_profiles``
+        """
+        sampled = summary['mode'] == MODE_SAMPLE
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Rerun Time", f"{summary['elapsed_seconds']:.2f}s")
+        with col2:
+            st.metric("Profiler", "Stack sampling" if sampled else "cProfile")
+        with col3:
+            if sampled:
+                st.metric("Samples", f"{summary['samples']:,}",
+                          help=f"Every {summary['interval_seconds'] * 1000:.0f} ms")
+        
+        if sampled and os.path.exists(summary['data_path']):
+            ids, labels, parents, values = flame_nodes(read_collapsed(summary['data_path']))
+            if ids:
+                fig = go.Figure(go.Icicle(
+                    ids=ids, labels=labels, parents=parents, values=values, branchvalues='total',
+                    tiling=dict(orientation='v', flip='y'), maxdepth=12
+                ))
+                fig.update_layout(title="Flame Graph (click a frame to zoom)", height=600,
+                                  margin=dict(t=40, l=0, r=0, b=0))
+                st.plotly_chart(fig, use_container_width=True)
+        
+        functions = pd.DataFrame(summary['functions'])
+        if not functions.empty:
+            table = pd.DataFrame({
+                "Function": functions['function'],
+                "Self %": functions['self_pct'].round(1),
+                "Total %": functions['total_pct'].round(1),
+                "Self (s)": functions['self_seconds'].round(3),
+                "Total (s)": functions['total_seconds'].round(3)
+            })
+            if 'calls' in functions:
+                table["Calls"] = functions['calls']
+            st.markdown("**Hottest functions** (by time spent in the function itself)")
+            st.dataframe(table, use_container_width=True, hide_index=True)
+        
+        if os.path.exists(summary['data_path']):
+            with open(summary['data_path'], 'rb') as f:
+                st.download_button(
+                    "⬇️ Download " + ("collapsed stacks" if sampled else "cProfile stats"), f.read(),
+                    file_name=os.path.basename(summary['data_path']),
+                    key=f"profile_download_{os.path.basename(summary['data_path'])}"
+                )
+        st.caption(f"Saved to {summary['data_path']}" + (
+            " · open in speedscope.app or flamegraph.pl" if sampled else " · open with pstats or snakeviz"
+        ))
+    
     def _show_flow_analytics(self):
         """Flow analytics for developers"""
         st.markdown("""
@@ -2534,51 +3642,76 @@ select * from influxdb.api_anomaly_events order by time desc limit 10;
         </div>
         """, unsafe_allow_html=True)
         
-        # Real-time metrics dashboard
+        if not self.has_connector:
+            st.info("📊 Enable Snowflake connection to see live query metrics")
+            return
+        
+        # Last 5 minutes, compared with the 5 before
+        recent = self.connector.get_perf_stats(minutes=5)
+        earlier = self.connector.get_perf_stats(minutes=10)['summary']
+        now = recent['summary']
+        before = {
+            'statements': earlier['statements'] - now['statements'],
+            'errors': earlier['errors'] - now['errors']
+        }
         col1, col2, col3, col4 = st.columns(4)
         
         with col1:
-            st.metric("Active Users", "2,847", "+127")
+            st.metric("Statements/min", f"{now['per_minute']:,.1f}",
+                      f"{(now['statements'] - before['statements']) / 5:+,.1f}" if before['statements'] else None)
         with col2:
-            st.metric("Requests/min", "18,493", "+1,234")
+            st.metric("p50 Latency", self._format_seconds(now['p50_seconds']))
         with col3:
-            st.metric("Response Time", "125ms", "-8ms")
+            st.metric("p95 Latency", self._format_seconds(now['p95_seconds']),
+                      help=f"p99: {self._format_seconds(now['p99_seconds'])}")
         with col4:
-            st.metric("Error Rate", "0.02%", "-0.01%")
+            before_rate = before['errors'] / before['statements'] if before['statements'] else None
+            st.metric("Error Rate", f"{now['error_rate']:.1%}",
+                      f"{now['error_rate'] - before_rate:+.1%}" if before_rate is not None else None,
+                      delta_color='inverse')
         
         # Real-time charts
         st.markdown("### 📊 Live Activity Feed")
         
-        # Mock real-time data
-        import time
-        current_time = datetime.now()
-        times = [current_time - timedelta(minutes=i) for i in range(60, 0, -1)]
-        requests = np.random.poisson(300, 60)
-        
-        df_realtime = pd.DataFrame({
-            'Time': times,
-            'Requests': requests
-        })
-        
-        fig = px.line(df_realtime, x='Time', y='Requests', 
-                     title='Requests per Minute (Last Hour)')
-        st.plotly_chart(fig, use_container_width=True)
+        throughput = pd.DataFrame(self.connector.get_perf_stats(minutes=60)['throughput'])
+        if throughput.empty:
+            st.info("No statements in the last hour")
+        else:
+            throughput['Time'] = pd.to_datetime(throughput['minute'], unit='s', utc=True) \
+                .dt.tz_convert(datetime.now().astimezone().tzinfo)
+            fig = go.Figure()
+            fig.add_trace(go.Bar(x=throughput['Time'], y=throughput['statements'] - throughput['errors'],
+                                 name='Succeeded', marker_color='lightgray'))
+            fig.add_trace(go.Bar(x=throughput['Time'], y=throughput['errors'], name='Failed',
+                                 marker_color='red'))
+            fig.add_trace(go.Scatter(x=throughput['Time'], y=throughput['p95_seconds'], name='p95 s',
+                                     yaxis='y2', line=dict(color='blue')))
+            fig.update_layout(title='Statements per Minute (Last Hour)', barmode='stack',
+                              yaxis_title='Statements',
+                              yaxis2=dict(title='p95 seconds', overlaying='y', side='right'))
+            st.plotly_chart(fig, use_container_width=True)
         
         # System status
         st.markdown("### 🚦 System Status")
         col1, col2 = st.columns(2)
         
         with col1:
-            st.markdown("**🟢 Healthy Services**")
-            healthy_services = ["API Gateway", "Database", "Auth Service", "Cache", "Queue"]
-            for service in healthy_services:
-                st.markdown(f"✅ {service}")
+            circuit = self.connector.get_resilience_stats()['circuit']
+            icons = {'closed': "🟢", 'half_open': "🟡", 'open': "🔴"}
+            st.markdown(f"{icons.get(circuit['state'], '⚪')} **Snowflake:** circuit {circuit['state'].replace('_', '-')}")
+            pool = self.connector.get_connection_stats()
+            st.markdown(f"🔌 **Connections:** {pool['in_use']} in use, {pool['idle']} idle, {pool['waiting']} waiting")
+            running = self.connector.get_running_queries(all_sessions=True)
+            st.markdown(f"⏳ **Running statements:** {len(running)}")
         
         with col2:
-            st.markdown("**🟡 Monitoring**")
-            monitoring_items = ["CPU Usage: 23%", "Memory: 67%", "Disk: 45%", "Network: Normal"]
-            for item in monitoring_items:
-                st.markdown(f"📊 {item}")
+            hit_rate = self.connector.get_cache_stats()['hit_rate']
+            st.markdown(f"💾 **Result cache hit rate:** {hit_rate:.0%}" if hit_rate is not None
+                        else "💾 **Result cache:** no lookups yet")
+            stages = {row['stage']: row for row in recent['stages']}
+            for stage, label in (('checkout', "Pool checkout"), ('execute', "Execute"), ('fetch', "Fetch")):
+                if stage in stages:
+                    st.markdown(f"📊 **{label} p95:** {self._format_seconds(stages[stage]['p95_seconds'])}")
     
     def _show_alert_center(self):
         """Alert center for system notifications"""
@@ -2646,6 +3779,7 @@ select * from influxdb.api_anomaly_events order by time desc limit 10;
             st.slider("Memory Alert Threshold", 0, 100, 85, help="Alert when memory usage exceeds this %")
             st.slider("Response Time Alert (ms)", 0, 1000, 500, help="Alert when response time exceeds this value")
 
+    @tag_section
     def _show_builder_analytics(self):
         """Comprehensive builder analytics dashboard"""
         st.markdown("""
@@ -2688,184 +3822,73 @@ select * from influxdb.api_anomaly_events order by time desc limit 10;
         </style>
         """, unsafe_allow_html=True)
         
+        # Submit every builder query at once; each tab renders as its query completes
+        run_all = self.has_connector and st.button(
+            "⚡ Run All Builder Analyses",
+            help="Start all three builder queries in parallel instead of one at a time"
+        )
+        
         # Builder Analytics Tabs
         tab1, tab2, tab3, tab4 = st.tabs(["🏗️ Builder Overview", "🌐 Domain Analysis", "🎓 Certifications", "📊 Performance"])
+        sections = {}
         
         with tab1:
             st.subheader("🏗️ All Builders Analysis")
             
             if self.has_connector:
-                # SQL Query for all builders
-                builders_query = """
-                select name, email, role, count(email) as num_flow_steps_created, _userId from 
-                (select distinct _resourceId, _byUserId from audits where source = 'ui' and event = 'create' and resourcetype in ('import', 'export') and time > current_date - 90) as a
-                inner join (select exp_or_imp_id, sum(stat_count) as success_count from influxdb.usage_stats where stat_type = 's' and end_date > current_date - 90 group by exp_or_imp_id) as active on a._resourceId=active.exp_or_imp_id
-                left join (select _id, name as import_name from imports) as i on a._resourceId = i._id
-                left join (select _id, name as export_name from exports) as e on a._resourceId = e._id
-                inner join (select _id as _userId, name, email, role, emailDomain from users) as u on a._byUserId = u._userId
-                group by name, email, role, _userId
-                order by num_flow_steps_created desc
-                """
-                
                 if st.button("🔍 Analyze All Builders", type="primary"):
                     with st.spinner("Analyzing builder data..."):
                         try:
-                            df = self.connector.execute_query(builders_query)
-                            if df is not None and not df.empty:
-                                st.success(f"✅ Found {len(df)} active builders")
-                                
-                                # Key metrics
-                                col1, col2, col3, col4 = st.columns(4)
-                                with col1:
-                                    st.markdown('<div class="metric-card"><h3>Total Builders</h3><h2>' + str(len(df)) + '</h2></div>', unsafe_allow_html=True)
-                                with col2:
-                                    avg_flows = df['NUM_FLOW_STEPS_CREATED'].mean()
-                                    st.markdown(f'<div class="metric-card"><h3>Avg Flows/Builder</h3><h2>{avg_flows:.1f}</h2></div>', unsafe_allow_html=True)
-                                with col3:
-                                    top_builder = df.iloc[0]['NUM_FLOW_STEPS_CREATED']
-                                    st.markdown(f'<div class="metric-card"><h3>Top Builder Flows</h3><h2>{top_builder}</h2></div>', unsafe_allow_html=True)
-                                with col4:
-                                    unique_domains = df['EMAIL'].str.split('@').str[1].nunique()
-                                    st.markdown(f'<div class="metric-card"><h3>Active Domains</h3><h2>{unique_domains}</h2></div>', unsafe_allow_html=True)
-                                
-                                # Top builders chart
-                                top_10 = df.head(10)
-                                fig = px.bar(top_10, x='NUM_FLOW_STEPS_CREATED', y='NAME', 
-                                           orientation='h', title='🏆 Top 10 Builders by Flow Creation')
-                                fig.update_traces(marker_color='rgba(102, 126, 234, 0.8)')
-                                st.plotly_chart(fig, use_container_width=True)
-                                
-                                # Detailed table
-                                st.markdown("### 📋 Detailed Builder Information")
-                                st.dataframe(df, use_container_width=True)
-                                
-                            else:
-                                st.warning("No builder data found")
+                            df = self.connector.execute_query(BUILDER_QUERIES['builders'], soft_ttl=Config.QUERY_CACHE_SOFT_TTL,
+                                                              query_class=QUERY_CLASS_ANALYTICS)
+                            self._show_data_freshness(df, show_age=True)
+                            self._render_builders_overview(df)
                         except Exception as e:
                             st.error(f"❌ Query failed: {str(e)}")
+                
+                # Filled by the "run all" path when this query completes
+                sections['builders'] = (BUILDER_QUERIES['builders'], st.container(), self._render_builders_overview)
             else:
                 st.info("🔧 Connect to Snowflake to view real builder analytics")
-                
+        
         with tab2:
             st.subheader("🌐 Builders per Domain Analysis")
             
             if self.has_connector:
-                # SQL Query for builders per domain
-                domain_query = """
-                select emailDomain, count(emailDomain) as num_builders from
-                (select emailDomain, email, count(email) as num_flow_steps_created from 
-                (select distinct _resourceId, _byUserId from audits where source = 'ui' and event = 'create' and resourcetype in ('import', 'export') and time > current_date - 90) as a
-                inner join (select exp_or_imp_id, sum(stat_count) as success_count from influxdb.usage_stats where stat_type = 's' and end_date > current_date - 90  group by exp_or_imp_id) as active on a._resourceId=active.exp_or_imp_id
-                left join (select _id, name as import_name from imports) as i on a._resourceId = i._id
-                left join (select _id, name as export_name from exports) as e on a._resourceId = e._id
-                inner join (select _id as _userId, name, email, emailDomain from users) as u on a._byUserId = u._userId
-                group by emailDomain, email
-                order by emailDomain asc)
-                group by emailDomain
-                order by num_builders desc
-                """
-                
                 if st.button("🌐 Analyze Domain Distribution", type="primary"):
                     with st.spinner("Analyzing domain data..."):
                         try:
-                            df = self.connector.execute_query(domain_query)
-                            if df is not None and not df.empty:
-                                st.success(f"✅ Found {len(df)} active domains")
-                                
-                                # Domain distribution pie chart
-                                fig = px.pie(df, values='NUM_BUILDERS', names='EMAILDOMAIN', 
-                                           title='🌐 Builder Distribution by Domain')
-                                st.plotly_chart(fig, use_container_width=True)
-                                
-                                # Top domains bar chart
-                                top_domains = df.head(15)
-                                fig2 = px.bar(top_domains, x='EMAILDOMAIN', y='NUM_BUILDERS',
-                                            title='🏢 Top 15 Domains by Builder Count')
-                                fig2.update_traces(marker_color='rgba(118, 75, 162, 0.8)')
-                                st.plotly_chart(fig2, use_container_width=True)
-                                
-                                # Domain details table
-                                st.markdown("### 📊 Domain Builder Statistics")
-                                st.dataframe(df, use_container_width=True)
-                                
-                            else:
-                                st.warning("No domain data found")
+                            df = self.connector.execute_query(BUILDER_QUERIES['domains'], soft_ttl=Config.QUERY_CACHE_SOFT_TTL,
+                                                              query_class=QUERY_CLASS_ANALYTICS)
+                            self._show_data_freshness(df, show_age=True)
+                            self._render_builder_domains(df)
                         except Exception as e:
                             st.error(f"❌ Query failed: {str(e)}")
+                
+                # Filled by the "run all" path when this query completes
+                sections['domains'] = (BUILDER_QUERIES['domains'], st.container(), self._render_builder_domains)
             else:
                 st.info("🔧 Connect to Snowflake to view domain analytics")
-                
+        
         with tab3:
             st.subheader("🎓 Builder Certifications & Quadrant Analysis")
             
             if self.has_connector:
-                # SQL Query for builders with certifications
-                certification_query = """
-                select emailDomain, email, count(email) as num_flow_steps_created, IFNULL(num_certifications, 0) as num_certifications, QUAD_BASED_ON_LOB, _ownerUserId from 
-                (select distinct _resourceId, _byUserId, _userId as _ownerUserId from audits where source = 'ui' and event = 'create' and resourcetype in ('import', 'export') and time > current_date - 90) as a
-                inner join (select exp_or_imp_id, sum(stat_count) as success_count from influxdb.usage_stats where stat_type = 's' and end_date > current_date - 90  group by exp_or_imp_id) as active on a._resourceId=active.exp_or_imp_id
-                left join (select _id, name as import_name from imports) as i on a._resourceId = i._id
-                left join (select _id, name as export_name from exports) as e on a._resourceId = e._id
-                inner join (select _id as _userId, name, email, emailDomain from users) as u on a._byUserId = u._userId
-                left join (select email as litmos_email, io_user_id, count(io_user_id) as num_certifications from 
-                (select user_id, course_id, title, type from litmos.certification) as certification
-                inner join (select course_id, active, name as litmos_course_name from litmos.course) as course on certification.course_id=course.course_id
-                inner join (select user_id, custom_field9 as io_user_id, email from litmos.user) as litmos_user on certification.user_id=litmos_user.user_id
-                group by email, io_user_id
-                order by num_certifications desc) as litmos on u._userId = litmos.io_user_id
-                left join (select IO_ID, QUAD_BASED_ON_LOB from 
-                (select NS_CUSTOMER_ID, IO_ID from netsuite.customer_ids) as customer_id
-                inner join (select NS_CUSTOMER_ID, QUAD_BASED_ON_LOB, month from ANALYTICS.COMPANY.CORE_ARR_BUILDUP where month >= current_date - 90) as core_arr_buildup on customer_id.NS_CUSTOMER_ID = core_arr_buildup.NS_CUSTOMER_ID) as quad on a._ownerUserId = quad.IO_ID
-                group by emailDomain, email, _userId, _ownerUserId, num_certifications, QUAD_BASED_ON_LOB
-                order by num_flow_steps_created desc
-                """
-                
                 if st.button("🎓 Analyze Certifications", type="primary"):
                     with st.spinner("Analyzing certification data..."):
                         try:
-                            df = self.connector.execute_query(certification_query)
-                            if df is not None and not df.empty:
-                                st.success(f"✅ Found {len(df)} builders with certification data")
-                                
-                                # Certification metrics
-                                certified_builders = df[df['NUM_CERTIFICATIONS'] > 0]
-                                col1, col2, col3 = st.columns(3)
-                                with col1:
-                                    cert_rate = len(certified_builders) / len(df) * 100
-                                    st.markdown(f'<div class="metric-card"><h3>Certification Rate</h3><h2>{cert_rate:.1f}%</h2></div>', unsafe_allow_html=True)
-                                with col2:
-                                    avg_certs = certified_builders['NUM_CERTIFICATIONS'].mean() if len(certified_builders) > 0 else 0
-                                    st.markdown(f'<div class="metric-card"><h3>Avg Certs/Builder</h3><h2>{avg_certs:.1f}</h2></div>', unsafe_allow_html=True)
-                                with col3:
-                                    max_certs = df['NUM_CERTIFICATIONS'].max()
-                                    st.markdown(f'<div class="metric-card"><h3>Max Certifications</h3><h2>{max_certs}</h2></div>', unsafe_allow_html=True)
-                                
-                                # Certification vs Flow Creation scatter plot
-                                fig = px.scatter(df, x='NUM_CERTIFICATIONS', y='NUM_FLOW_STEPS_CREATED',
-                                               hover_data=['EMAIL', 'EMAILDOMAIN'],
-                                               title='🎯 Certifications vs Flow Creation Activity')
-                                st.plotly_chart(fig, use_container_width=True)
-                                
-                                # Quadrant analysis if available
-                                if 'QUAD_BASED_ON_LOB' in df.columns:
-                                    quad_data = df.dropna(subset=['QUAD_BASED_ON_LOB'])
-                                    if not quad_data.empty:
-                                        fig2 = px.bar(quad_data.groupby('QUAD_BASED_ON_LOB').size().reset_index(name='count'),
-                                                    x='QUAD_BASED_ON_LOB', y='count',
-                                                    title='📊 Builder Distribution by Business Quadrant')
-                                        st.plotly_chart(fig2, use_container_width=True)
-                                
-                                # Detailed certification table
-                                st.markdown("### 🏆 Builder Certification Details")
-                                st.dataframe(df[['EMAIL', 'EMAILDOMAIN', 'NUM_FLOW_STEPS_CREATED', 'NUM_CERTIFICATIONS', 'QUAD_BASED_ON_LOB']], use_container_width=True)
-                                
-                            else:
-                                st.warning("No certification data found")
+                            df = self.connector.execute_query(BUILDER_QUERIES['certifications'], soft_ttl=Config.QUERY_CACHE_SOFT_TTL,
+                                                              query_class=QUERY_CLASS_ANALYTICS)
+                            self._show_data_freshness(df, show_age=True)
+                            self._render_builder_certifications(df)
                         except Exception as e:
                             st.error(f"❌ Query failed: {str(e)}")
+                
+                # Filled by the "run all" path when this query completes
+                sections['certifications'] = (BUILDER_QUERIES['certifications'], st.container(), self._render_builder_certifications)
             else:
                 st.info("🔧 Connect to Snowflake to view certification analytics")
-                
+        
         with tab4:
             st.subheader("📊 Builder Performance Metrics")
             
@@ -2896,7 +3919,108 @@ select * from influxdb.api_anomaly_events order by time desc limit 10;
                 fig = px.line(x=dates, y=activity, title='Daily Builder Activity')
                 fig.update_traces(line_color='rgba(102, 126, 234, 0.8)')
                 st.plotly_chart(fig, use_container_width=True)
-
+        
+        if run_all:
+            self._run_queries_concurrently(sections)
+    
+    def _render_builders_overview(self, df: Optional[pd.DataFrame]):
+        """Render the all-builders analysis"""
+        if df is not None and not df.empty:
+            st.success(f"✅ Found {len(df)} active builders")
+            
+            # Key metrics
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.markdown('<div class="metric-card"><h3>Total Builders</h3><h2>' + str(len(df)) + '</h2></div>', unsafe_allow_html=True)
+            with col2:
+                avg_flows = df['NUM_FLOW_STEPS_CREATED'].mean()
+                st.markdown(f'<div class="metric-card"><h3>Avg Flows/Builder</h3><h2>{avg_flows:.1f}</h2></div>', unsafe_allow_html=True)
+            with col3:
+                top_builder = df.iloc[0]['NUM_FLOW_STEPS_CREATED']
+                st.markdown(f'<div class="metric-card"><h3>Top Builder Flows</h3><h2>{top_builder}</h2></div>', unsafe_allow_html=True)
+            with col4:
+                unique_domains = df['EMAIL'].str.split('@').str[1].nunique()
+                st.markdown(f'<div class="metric-card"><h3>Active Domains</h3><h2>{unique_domains}</h2></div>', unsafe_allow_html=True)
+            
+            # Top builders chart
+            top_10 = df.head(10)
+            fig = px.bar(top_10, x='NUM_FLOW_STEPS_CREATED', y='NAME', 
+                       orientation='h', title='🏆 Top 10 Builders by Flow Creation')
+            fig.update_traces(marker_color='rgba(102, 126, 234, 0.8)')
+            st.plotly_chart(fig, use_container_width=True)
+            
+            # Detailed table
+            st.markdown("### 📋 Detailed Builder Information")
+            st.dataframe(df, use_container_width=True)
+        
+        else:
+            st.warning("No builder data found")
+    
+    def _render_builder_domains(self, df: Optional[pd.DataFrame]):
+        """Render builders per email domain"""
+        if df is not None and not df.empty:
+            st.success(f"✅ Found {len(df)} active domains")
+            
+            # Domain distribution pie chart
+            fig = px.pie(df, values='NUM_BUILDERS', names='EMAILDOMAIN', 
+                       title='🌐 Builder Distribution by Domain')
+            st.plotly_chart(fig, use_container_width=True)
+            
+            # Top domains bar chart
+            top_domains = df.head(15)
+            fig2 = px.bar(top_domains, x='EMAILDOMAIN', y='NUM_BUILDERS',
+                        title='🏢 Top 15 Domains by Builder Count')
+            fig2.update_traces(marker_color='rgba(118, 75, 162, 0.8)')
+            st.plotly_chart(fig2, use_container_width=True)
+            
+            # Domain details table
+            st.markdown("### 📊 Domain Builder Statistics")
+            st.dataframe(df, use_container_width=True)
+        
+        else:
+            st.warning("No domain data found")
+    
+    def _render_builder_certifications(self, df: Optional[pd.DataFrame]):
+        """Render builder certifications and quadrants"""
+        if df is not None and not df.empty:
+            st.success(f"✅ Found {len(df)} builders with certification data")
+            
+            # Certification metrics
+            certified_builders = df[df['NUM_CERTIFICATIONS'] > 0]
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                cert_rate = len(certified_builders) / len(df) * 100
+                st.markdown(f'<div class="metric-card"><h3>Certification Rate</h3><h2>{cert_rate:.1f}%</h2></div>', unsafe_allow_html=True)
+            with col2:
+                avg_certs = certified_builders['NUM_CERTIFICATIONS'].mean() if len(certified_builders) > 0 else 0
+                st.markdown(f'<div class="metric-card"><h3>Avg Certs/Builder</h3><h2>{avg_certs:.1f}</h2></div>', unsafe_allow_html=True)
+            with col3:
+                max_certs = df['NUM_CERTIFICATIONS'].max()
+                st.markdown(f'<div class="metric-card"><h3>Max Certifications</h3><h2>{max_certs}</h2></div>', unsafe_allow_html=True)
+            
+            # Certification vs Flow Creation scatter plot
+            fig = px.scatter(df, x='NUM_CERTIFICATIONS', y='NUM_FLOW_STEPS_CREATED',
+                           hover_data=['EMAIL', 'EMAILDOMAIN'],
+                           title='🎯 Certifications vs Flow Creation Activity')
+            st.plotly_chart(fig, use_container_width=True)
+            
+            # Quadrant analysis if available
+            if 'QUAD_BASED_ON_LOB' in df.columns:
+                quad_data = df.dropna(subset=['QUAD_BASED_ON_LOB'])
+                if not quad_data.empty:
+                    fig2 = px.bar(quad_data.groupby('QUAD_BASED_ON_LOB', observed=True).size().reset_index(name='count'),
+                                x='QUAD_BASED_ON_LOB', y='count',
+                                title='📊 Builder Distribution by Business Quadrant')
+                    st.plotly_chart(fig2, use_container_width=True)
+            
+            # Detailed certification table
+            st.markdown("### 🏆 Builder Certification Details")
+            st.dataframe(df[['EMAIL', 'EMAILDOMAIN', 'NUM_FLOW_STEPS_CREATED', 'NUM_CERTIFICATIONS', 'QUAD_BASED_ON_LOB']], use_container_width=True)
+        
+        else:
+            st.warning("No certification data found")
+    
+    @tag_section
     def _show_bubble_analytics(self):
         """Comprehensive bubble analytics dashboard"""
         st.markdown("""
@@ -2906,197 +4030,73 @@ select * from influxdb.api_anomaly_events order by time desc limit 10;
         </div>
         """, unsafe_allow_html=True)
         
+        # Submit every bubble query at once; each tab renders as its query completes
+        run_all = self.has_connector and st.button(
+            "⚡ Run All Bubble Analyses",
+            help="Start all three bubble queries in parallel instead of one at a time"
+        )
+        
         # Bubble Analytics Tabs
         tab1, tab2, tab3, tab4 = st.tabs(["🆕 New Bubbles", "🏃 Running Bubbles", "👥 User Activity", "📊 App Analysis"])
+        sections = {}
         
         with tab1:
             st.subheader("🆕 New Unmanaged Bubbles Analysis")
             
             if self.has_connector:
-                # SQL Query for new unmanaged bubbles grouped by app
-                new_bubbles_query = """
-                select app, count(distinct b._id) as total_bubbles from (
-                select _id, TO_VARIANT('data_loader') as app, _userid, createdat, _connectorid from exports where type = 'simple'
-                union
-                select _id, webhook:provider as app, _userid, createdat, _connectorid from exports where type = 'webhook'
-                union (
-                select _id, coalesce(http_connector_name, con.app) as app, _userid, createdat, _connectorid from (
-                select _id, _userid, _connectionid, createdat, _connectorid from exports where ((type != 'simple' and type != 'webhook') or type is null)
-                union
-                select _id, _userid, _connectionid, createdat, _connectorid from imports
-                ) as bubble
-                inner join (
-                select connections._id as connection_id, connections.app, http_connectors.name as http_connector_name
-                from connections 
-                left join http_connectors on connections.http:_httpConnectorId = http_connectors._id) as con on bubble._connectionid=con.connection_id)) as b
-                inner join (select _id, emaildomain from users where emaildomain != 'celigo.com') as non_celigo_user on b._userid = non_celigo_user._id
-                where b._connectorid is null and createdat >= current_date - 90 and not exists (
-                select 1 from influxdb.usage_stats where stat_type = 's' and end_date > current_date - 30 and exp_or_imp_id = b._id)
-                group by app
-                order by total_bubbles desc
-                """
-                
                 if st.button("🆕 Analyze New Bubbles", type="primary"):
                     with st.spinner("Analyzing new bubble data..."):
                         try:
-                            df = self.connector.execute_query(new_bubbles_query)
-                            if df is not None and not df.empty:
-                                st.success(f"✅ Found {df['TOTAL_BUBBLES'].sum()} new unmanaged bubbles across {len(df)} applications")
-                                
-                                # Key metrics
-                                col1, col2, col3, col4 = st.columns(4)
-                                with col1:
-                                    st.metric("Total New Bubbles", df['TOTAL_BUBBLES'].sum())
-                                with col2:
-                                    st.metric("Applications", len(df))
-                                with col3:
-                                    top_app_bubbles = df.iloc[0]['TOTAL_BUBBLES']
-                                    st.metric("Top App Bubbles", top_app_bubbles)
-                                with col4:
-                                    avg_bubbles = df['TOTAL_BUBBLES'].mean()
-                                    st.metric("Avg Bubbles/App", f"{avg_bubbles:.1f}")
-                                
-                                # New bubbles by app chart
-                                fig = px.bar(df.head(15), x='APP', y='TOTAL_BUBBLES',
-                                           title='🆕 New Unmanaged Bubbles by Application (Last 90 Days)')
-                                fig.update_traces(marker_color='rgba(255, 193, 7, 0.8)')
-                                st.plotly_chart(fig, use_container_width=True)
-                                
-                                # Pie chart for distribution
-                                fig2 = px.pie(df, values='TOTAL_BUBBLES', names='APP',
-                                            title='📊 New Bubble Distribution by App')
-                                st.plotly_chart(fig2, use_container_width=True)
-                                
-                                # Detailed table
-                                st.markdown("### 📋 New Bubble Details by Application")
-                                st.dataframe(df, use_container_width=True)
-                                
-                            else:
-                                st.warning("No new bubble data found")
+                            df = self.connector.execute_query(BUBBLE_QUERIES['new'], soft_ttl=Config.QUERY_CACHE_SOFT_TTL,
+                                                              query_class=QUERY_CLASS_ANALYTICS)
+                            self._show_data_freshness(df, show_age=True)
+                            self._render_new_bubbles(df)
                         except Exception as e:
                             st.error(f"❌ Query failed: {str(e)}")
+                
+                # Filled by the "run all" path when this query completes
+                sections['new'] = (BUBBLE_QUERIES['new'], st.container(), self._render_new_bubbles)
             else:
                 st.info("🔧 Connect to Snowflake to view new bubble analytics")
-                
+        
         with tab2:
             st.subheader("🏃 Running Unmanaged Bubbles Analysis")
             
             if self.has_connector:
-                # SQL Query for running unmanaged bubbles
-                running_bubbles_query = """
-                select app, count(distinct b._id) as total_bubbles from (
-                select _id, TO_VARIANT('data_loader') as app, _userid, createdat, _connectorid from exports where type = 'simple'
-                union
-                select _id, webhook:provider as app, _userid, createdat, _connectorid from exports where type = 'webhook'
-                union (
-                select _id, coalesce(http_connector_name, con.app) as app, _userid, createdat, _connectorid from (
-                select _id, _userid, _connectionid, createdat, _connectorid from exports where ((type != 'simple' and type != 'webhook') or type is null)
-                union
-                select _id, _userid, _connectionid, createdat, _connectorid from imports
-                ) as bubble
-                inner join (
-                select connections._id as connection_id, connections.app, http_connectors.name as http_connector_name
-                from connections 
-                left join http_connectors on connections.http:_httpConnectorId = http_connectors._id) as con on bubble._connectionid=con.connection_id)) as b
-                inner join (select _id, emaildomain from users where emaildomain != 'celigo.com') as non_celigo_user on b._userid = non_celigo_user._id
-                where b._connectorid is null and exists (
-                select 1 from influxdb.usage_stats where stat_type = 's' and end_date > current_date - 30 and exp_or_imp_id = b._id)
-                group by app
-                order by total_bubbles desc
-                """
-                
                 if st.button("🏃 Analyze Running Bubbles", type="primary"):
                     with st.spinner("Analyzing running bubble data..."):
                         try:
-                            df = self.connector.execute_query(running_bubbles_query)
-                            if df is not None and not df.empty:
-                                st.success(f"✅ Found {df['TOTAL_BUBBLES'].sum()} running unmanaged bubbles")
-                                
-                                # Running bubbles metrics
-                                col1, col2, col3 = st.columns(3)
-                                with col1:
-                                    st.metric("Total Running", df['TOTAL_BUBBLES'].sum())
-                                with col2:
-                                    st.metric("Active Apps", len(df))
-                                with col3:
-                                    utilization = (df['TOTAL_BUBBLES'].sum() / (df['TOTAL_BUBBLES'].sum() + 100)) * 100  # Mock calculation
-                                    st.metric("Utilization Rate", f"{utilization:.1f}%")
-                                
-                                # Running bubbles chart
-                                fig = px.bar(df, x='APP', y='TOTAL_BUBBLES',
-                                           title='🏃 Running Unmanaged Bubbles by Application')
-                                fig.update_traces(marker_color='rgba(40, 167, 69, 0.8)')
-                                st.plotly_chart(fig, use_container_width=True)
-                                
-                                st.dataframe(df, use_container_width=True)
-                                
-                            else:
-                                st.warning("No running bubble data found")
+                            df = self.connector.execute_query(BUBBLE_QUERIES['running'], soft_ttl=Config.QUERY_CACHE_SOFT_TTL,
+                                                              query_class=QUERY_CLASS_ANALYTICS)
+                            self._show_data_freshness(df, show_age=True)
+                            self._render_running_bubbles(df)
                         except Exception as e:
                             st.error(f"❌ Query failed: {str(e)}")
+                
+                # Filled by the "run all" path when this query completes
+                sections['running'] = (BUBBLE_QUERIES['running'], st.container(), self._render_running_bubbles)
             else:
                 st.info("🔧 Connect to Snowflake to view running bubble analytics")
-                
+        
         with tab3:
             st.subheader("👥 Users Building New Bubbles")
             
             if self.has_connector:
-                # SQL Query for users building new bubbles
-                users_new_bubbles_query = """
-                select app, count(distinct _userid) as total_users from (
-                select _id, TO_VARIANT('data_loader') as app, _userid, createdat, _connectorid from exports where type = 'simple'
-                union
-                select _id, webhook:provider as app, _userid, createdat, _connectorid from exports where type = 'webhook'
-                union (
-                select _id, coalesce(http_connector_name, con.app) as app, _userid, createdat, _connectorid from (
-                select _id, _userid, _connectionid, createdat, _connectorid from exports where ((type != 'simple' and type != 'webhook') or type is null)
-                union
-                select _id, _userid, _connectionid, createdat, _connectorid from imports
-                ) as bubble
-                inner join (
-                select connections._id as connection_id, connections.app, http_connectors.name as http_connector_name
-                from connections 
-                left join http_connectors on connections.http:_httpConnectorId = http_connectors._id) as con on bubble._connectionid=con.connection_id)) as b
-                inner join (select _id, emaildomain from users where emaildomain != 'celigo.com') as non_celigo_user on b._userid = non_celigo_user._id
-                where b._connectorid is null and createdat >= current_date - 90 and not exists (
-                select 1 from influxdb.usage_stats where stat_type = 's' and end_date > current_date - 30 and exp_or_imp_id = b._id)
-                group by app
-                order by total_users desc
-                """
-                
                 if st.button("👥 Analyze User Activity", type="primary"):
                     with st.spinner("Analyzing user bubble activity..."):
                         try:
-                            df = self.connector.execute_query(users_new_bubbles_query)
-                            if df is not None and not df.empty:
-                                st.success(f"✅ Found {df['TOTAL_USERS'].sum()} users building new bubbles")
-                                
-                                # User activity metrics
-                                col1, col2, col3 = st.columns(3)
-                                with col1:
-                                    st.metric("Active Users", df['TOTAL_USERS'].sum())
-                                with col2:
-                                    st.metric("Apps Used", len(df))
-                                with col3:
-                                    avg_users = df['TOTAL_USERS'].mean()
-                                    st.metric("Avg Users/App", f"{avg_users:.1f}")
-                                
-                                # Users building bubbles chart
-                                fig = px.bar(df, x='APP', y='TOTAL_USERS',
-                                           title='👥 Users Building New Unmanaged Bubbles by App')
-                                fig.update_traces(marker_color='rgba(220, 53, 69, 0.8)')
-                                fig.update_xaxes(tickangle=45)
-                                st.plotly_chart(fig, use_container_width=True)
-                                
-                                st.dataframe(df, use_container_width=True)
-                                
-                            else:
-                                st.warning("No user bubble activity data found")
+                            df = self.connector.execute_query(BUBBLE_QUERIES['users'], soft_ttl=Config.QUERY_CACHE_SOFT_TTL,
+                                                              query_class=QUERY_CLASS_ANALYTICS)
+                            self._show_data_freshness(df, show_age=True)
+                            self._render_bubble_users(df)
                         except Exception as e:
                             st.error(f"❌ Query failed: {str(e)}")
+                
+                # Filled by the "run all" path when this query completes
+                sections['users'] = (BUBBLE_QUERIES['users'], st.container(), self._render_bubble_users)
             else:
                 st.info("🔧 Connect to Snowflake to view user bubble analytics")
-                
+        
         with tab4:
             st.subheader("📊 Application Analysis")
             
@@ -3127,6 +4127,122 @@ select * from influxdb.api_anomaly_events order by time desc limit 10;
                             title='Daily Bubble Activity Trend')
                 fig.update_traces(fill='tonexty', line_color='rgba(255, 193, 7, 0.8)')
                 st.plotly_chart(fig, use_container_width=True)
+        
+        if run_all:
+            self._run_queries_concurrently(sections)
+    
+    def _render_new_bubbles(self, df: Optional[pd.DataFrame]):
+        """Render new unmanaged bubbles by application"""
+        if df is not None and not df.empty:
+            st.success(f"✅ Found {df['TOTAL_BUBBLES'].sum()} new unmanaged bubbles across {len(df)} applications")
+            
+            # Key metrics
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("Total New Bubbles", df['TOTAL_BUBBLES'].sum())
+            with col2:
+                st.metric("Applications", len(df))
+            with col3:
+                top_app_bubbles = df.iloc[0]['TOTAL_BUBBLES']
+                st.metric("Top App Bubbles", top_app_bubbles)
+            with col4:
+                avg_bubbles = df['TOTAL_BUBBLES'].mean()
+                st.metric("Avg Bubbles/App", f"{avg_bubbles:.1f}")
+            
+            # New bubbles by app chart
+            fig = px.bar(df.head(15), x='APP', y='TOTAL_BUBBLES',
+                       title='🆕 New Unmanaged Bubbles by Application (Last 90 Days)')
+            fig.update_traces(marker_color='rgba(255, 193, 7, 0.8)')
+            st.plotly_chart(fig, use_container_width=True)
+            
+            # Pie chart for distribution
+            fig2 = px.pie(df, values='TOTAL_BUBBLES', names='APP',
+                        title='📊 New Bubble Distribution by App')
+            st.plotly_chart(fig2, use_container_width=True)
+            
+            # Detailed table
+            st.markdown("### 📋 New Bubble Details by Application")
+            st.dataframe(df, use_container_width=True)
+        
+        else:
+            st.warning("No new bubble data found")
+    
+    def _render_running_bubbles(self, df: Optional[pd.DataFrame]):
+        """Render running unmanaged bubbles by application"""
+        if df is not None and not df.empty:
+            st.success(f"✅ Found {df['TOTAL_BUBBLES'].sum()} running unmanaged bubbles")
+            
+            # Running bubbles metrics
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Total Running", df['TOTAL_BUBBLES'].sum())
+            with col2:
+                st.metric("Active Apps", len(df))
+            with col3:
+                utilization = (df['TOTAL_BUBBLES'].sum() / (df['TOTAL_BUBBLES'].sum() + 100)) * 100  # Mock calculation
+                st.metric("Utilization Rate", f"{utilization:.1f}%")
+            
+            # Running bubbles chart
+            fig = px.bar(df, x='APP', y='TOTAL_BUBBLES',
+                       title='🏃 Running Unmanaged Bubbles by Application')
+            fig.update_traces(marker_color='rgba(40, 167, 69, 0.8)')
+            st.plotly_chart(fig, use_container_width=True)
+            
+            st.dataframe(df, use_container_width=True)
+        
+        else:
+            st.warning("No running bubble data found")
+    
+    def _render_bubble_users(self, df: Optional[pd.DataFrame]):
+        """Render users building new bubbles"""
+        if df is not None and not df.empty:
+            st.success(f"✅ Found {df['TOTAL_USERS'].sum()} users building new bubbles")
+            
+            # User activity metrics
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Active Users", df['TOTAL_USERS'].sum())
+            with col2:
+                st.metric("Apps Used", len(df))
+            with col3:
+                avg_users = df['TOTAL_USERS'].mean()
+                st.metric("Avg Users/App", f"{avg_users:.1f}")
+            
+            # Users building bubbles chart
+            fig = px.bar(df, x='APP', y='TOTAL_USERS',
+                       title='👥 Users Building New Unmanaged Bubbles by App')
+            fig.update_traces(marker_color='rgba(220, 53, 69, 0.8)')
+            fig.update_xaxes(tickangle=45)
+            st.plotly_chart(fig, use_container_width=True)
+            
+            st.dataframe(df, use_container_width=True)
+        
+        else:
+            st.warning("No user bubble activity data found")
+    
+    def _run_queries_concurrently(self, sections: dict):
+        """
+        Submit several heavy queries at once and render each section as soon
+        as its own query completes
+        
+        Args:
+            sections: Mapping of name -> (query, container, render function)
+        """
+        async def run_section(query, container, render):
+            with container:
+                status = st.empty()
+            status.info("⏳ Query submitted, waiting for results...")
+            df = await self.connector.execute_query_async(query, soft_ttl=Config.QUERY_CACHE_SOFT_TTL,
+                                                          query_class=QUERY_CLASS_ANALYTICS)
+            status.empty()
+            with container:
+                self._show_data_freshness(df, show_age=True)
+                render(df)
+        
+        async def run_all():
+            await asyncio.gather(*(run_section(*section) for section in sections.values()))
+        
+        asyncio.run(run_all())
 
 
 def main():
@@ -0,0 +1,140 @@
+"""
+Background CSV exports
+Full query results are written to disk by a worker thread, so a large
+export neither blocks the page nor has to fit in the Streamlit process
+"""
+
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+from typing import Optional, Dict, Any, List, Callable
+
+logger = logging.getLogger(__name__)
+
+EXPORT_RUNNING = 'running'
+EXPORT_DONE = 'done'
+EXPORT_FAILED = 'failed'
+
+
+class ExportJob:
+    """One query being exported to a CSV file"""
+
+    def __init__(self, owner: Optional[str], query: str, path: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.owner = owner
+        self.query = query
+        self.path = path
+        self.status = EXPORT_RUNNING
+        self.rows = 0
+        self.error: Optional[str] = None
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'id': self.id,
+            'query': self.query,
+            'path': self.path,
+            'status': self.status,
+            'rows': self.rows,
+            'error': self.error,
+            'started_at': self.started_at,
+            'elapsed_seconds': (self.finished_at or time.time()) - self.started_at,
+            'bytes': os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        }
+
+
+class ExportManager:
+    """
+    Runs CSV exports on daemon threads and keeps their files until discarded
+
+    Jobs belong to the session that started them. Finished files older than
+    ``retention`` seconds are deleted the next time an export starts.
+    """
+
+    def __init__(self, directory: Optional[str] = None, retention: float = 86400):
+        self.directory = directory or os.path.join(tempfile.gettempdir(), 'dashboard_exports')
+        self.retention = retention
+        os.makedirs(self.directory, exist_ok=True)
+        self._jobs: Dict[str, ExportJob] = {}
+        self._lock = threading.Lock()
+
+    def start(self, owner: Optional[str], query: str,
+              write: Callable[[str, Callable[[int], None]], int]) -> ExportJob:
+        """
+        Start exporting a query in the background
+
+        Args:
+            owner: Streamlit session id the export belongs to
+            query: SQL text, for display
+            write: ``(path, progress) -> rows`` writer; calls ``progress(rows_so_far)``
+                as batches land and raises on failure
+
+        Returns:
+            The new job
+        """
+        self._purge_expired()
+        fd, path = tempfile.mkstemp(prefix='export_', suffix='.csv', dir=self.directory)
+        os.close(fd)
+        job = ExportJob(owner, query, path)
+        with self._lock:
+            self._jobs[job.id] = job
+        threading.Thread(target=self._run, args=(job, write), name='query-export', daemon=True).start()
+        return job
+
+    def _run(self, job: ExportJob, write: Callable[[str, Callable[[int], None]], int]):
+        def progress(rows: int):
+            job.rows = rows
+
+        try:
+            job.rows = write(job.path, progress)
+            job.status = EXPORT_DONE
+            logger.info(f"Background export {job.id} finished with {job.rows} rows")
+        except Exception as e:
+            job.error = str(e)
+            job.status = EXPORT_FAILED
+            logger.error(f"Background export {job.id} failed: {str(e)}")
+        finally:
+            job.finished_at = time.time()
+
+    def jobs(self, owner: Optional[str]) -> List[ExportJob]:
+        """A session's exports, newest first"""
+        with self._lock:
+            jobs = [job for job in self._jobs.values() if job.owner == owner]
+        return sorted(jobs, key=lambda job: job.started_at, reverse=True)
+
+    def get(self, job_id: str) -> Optional[ExportJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def discard(self, job_id: str) -> bool:
+        """Forget a finished export and delete its file; running exports are kept"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status == EXPORT_RUNNING:
+                return False
+            del self._jobs[job_id]
+        self._remove_file(job)
+        return True
+
+    def _purge_expired(self):
+        cutoff = time.time() - self.retention
+        with self._lock:
+            expired = [
+                job for job in self._jobs.values()
+                if job.finished_at is not None and job.finished_at < cutoff
+            ]
+            for job in expired:
+                del self._jobs[job.id]
+        for job in expired:
+            self._remove_file(job)
+
+    @staticmethod
+    def _remove_file(job: ExportJob):
+        try:
+            os.remove(job.path)
+        except OSError:
+            pass
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Benchmark the Arrow and DictCursor result fetch paths
+Serves a synthetic result from a fake cursor and reports rows/sec, peak RSS
+and the memory the dtype optimiser saves on each path
+"""
+
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pyarrow as pa
+
+from dtype_optimizer import DtypeOptimizer
+from snowflake_connector import frame_from_arrow_cursor, frame_from_dict_cursor
+
+BATCH_ROWS = 100_000
+APPS = ['http', 'rest', 'ftp', 'sftp', 'netsuite', 'salesforce', 'shopify', 'mongodb']
+TYPES = ['http', 'rest', 'ftp', 'rdbms', 'wrapper']
+TIERS = ['free', 'professional', 'enterprise']
+
+
+def build_batches(rows: int, seed: int = 42) -> list:
+    """Build the synthetic result as Arrow record batches, like downloaded result chunks"""
+    rng = np.random.default_rng(seed)
+    batches = []
+    for start in range(0, rows, BATCH_ROWS):
+        count = min(BATCH_ROWS, rows - start)
+        ids = np.arange(start, start + count)
+        batches.append(pa.RecordBatch.from_pydict({
+            '_ID': [f"{i:024x}" for i in ids],
+            'APP': pa.array(rng.choice(APPS, count)),
+            'TYPE': pa.array(rng.choice(TYPES, count)),
+            '_USERID': [f"{i % 5000:024x}" for i in ids],
+            'NAME': [f"Connection {i}" for i in ids],
+            'CREATED': pa.array(
+                np.datetime64('2024-01-01') + rng.integers(0, 365 * 86400, count).astype('timedelta64[s]')
+            ),
+            # Timestamps extracted from VARIANT documents arrive as ISO strings
+            'LASTMODIFIED': [f"2024-{1 + i % 12:02d}-{1 + i % 28:02d}T{i % 24:02d}:00:00.000Z" for i in ids],
+            'TIER': pa.array(rng.choice(TIERS, count)),
+            'OCCURRENCE': pa.array(rng.integers(0, 1000, count)),
+            'VERIFIED': pa.array(rng.random(count) > 0.2)
+        }))
+    return batches
+
+
+class FakeArrowCursor:
+    """Serves pre-built Arrow chunks the way SnowflakeCursor.fetch_arrow_all does"""
+
+    def __init__(self, batches: list):
+        self._batches = batches
+        self.description = [(name,) for name in batches[0].schema.names]
+
+    def fetch_arrow_all(self):
+        return pa.Table.from_batches(self._batches)
+
+
+class FakeDictCursor:
+    """Serves the same chunks the way DictCursor.fetchall does (one dict per row)"""
+
+    def __init__(self, batches: list):
+        self._batches = batches
+        self.description = [(name,) for name in batches[0].schema.names]
+
+    def fetchall(self):
+        rows = []
+        for batch in self._batches:
+            rows.extend(batch.to_pylist())
+        return rows
+
+
+def current_rss_mb() -> float:
+    """Current resident set size in MB (Linux /proc, falls back to 0)"""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+    except (OSError, ValueError, AttributeError):
+        return 0.0
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB"""
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux reports kilobytes
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def run_child(mode: str, rows: int, downcast_numbers: bool = False):
+    """Measure one fetch path in this process and print a JSON result line"""
+    logging.getLogger('dtype_optimizer').setLevel(logging.WARNING)
+    batches = build_batches(rows)
+    baseline_mb = current_rss_mb()
+
+    started = time.perf_counter()
+    if mode == 'arrow':
+        df = frame_from_arrow_cursor(FakeArrowCursor(batches))
+    else:
+        df = frame_from_dict_cursor(FakeDictCursor(batches))
+    elapsed = time.perf_counter() - started
+    frame_mb = df.memory_usage(deep=True).sum() / 1024 / 1024
+
+    # After the peak RSS reading, so the fetch figures are unaffected
+    started = time.perf_counter()
+    df = DtypeOptimizer(downcast_numbers=downcast_numbers).optimize(df)
+    optimize_seconds = time.perf_counter() - started
+
+    print(json.dumps({
+        'mode': mode,
+        'rows': len(df),
+        'seconds': elapsed,
+        'rows_per_sec': len(df) / elapsed if elapsed else 0.0,
+        'peak_rss_mb': peak_rss_mb(),
+        'fetch_rss_mb': peak_rss_mb() - baseline_mb,
+        'frame_mb': frame_mb,
+        'optimized_mb': df.memory_usage(deep=True).sum() / 1024 / 1024,
+        'optimize_seconds': optimize_seconds,
+        'conversions': df.attrs['dtype_optimization']['columns']
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Arrow vs DictCursor result fetching")
+    parser.add_argument('--rows', type=int, default=1_000_000, help="Synthetic result size")
+    parser.add_argument('--downcast-numbers', action='store_true',
+                        help="Also downcast integers and floats when optimising dtypes")
+    parser.add_argument('--mode', choices=['arrow', 'dict'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        run_child(args.mode, args.rows, args.downcast_numbers)
+        return
+
+    # Each path runs in its own process so peak RSS is not shared between them
+    print(f"Benchmarking result fetch paths on {args.rows:,} synthetic rows...\n")
+    print(f"{'Path':<8}{'Rows/sec':>14}{'Seconds':>10}{'Peak RSS MB':>14}{'Fetch RSS MB':>14}{'Frame MB':>10}"
+          f"{'Optimised MB':>14}{'Saved':>8}{'Optimise s':>12}")
+    conversions = {}
+    for mode in ('arrow', 'dict'):
+        output = subprocess.check_output(
+            [sys.executable, os.path.abspath(__file__), '--mode', mode, '--rows', str(args.rows)]
+            + (['--downcast-numbers'] if args.downcast_numbers else []),
+            text=True
+        )
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{result['mode']:<8}{result['rows_per_sec']:>14,.0f}{result['seconds']:>10.2f}"
+              f"{result['peak_rss_mb']:>14.1f}{result['fetch_rss_mb']:>14.1f}{result['frame_mb']:>10.1f}"
+              f"{result['optimized_mb']:>14.1f}{1 - result['optimized_mb'] / result['frame_mb']:>8.0%}"
+              f"{result['optimize_seconds']:>12.2f}")
+        conversions[mode] = result['conversions']
+    for mode, columns in conversions.items():
+        print(f"\n{mode} conversions: " + ", ".join(f"{name} -> {kind}" for name, kind in columns.items()))
+
+
+if __name__ == "__main__":
+    main()
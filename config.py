@@ -19,6 +19,139 @@ class Config:
     SNOWFLAKE_WAREHOUSE = os.getenv('SNOWFLAKE_WAREHOUSE', 'COMPUTE_WH')
     SNOWFLAKE_ROLE = os.getenv('SNOWFLAKE_ROLE', 'PRODUCT_ANALYST')
     
+    # Connection lifecycle settings
+    # Seconds between SELECT 1 liveness probes on a reused connection
+    SNOWFLAKE_HEALTH_CHECK_INTERVAL = int(os.getenv('SNOWFLAKE_HEALTH_CHECK_INTERVAL', '300'))
+    # Connection pool sizing (per account/user/role/warehouse) and timeouts in seconds
+    SNOWFLAKE_POOL_MAX_SIZE = int(os.getenv('SNOWFLAKE_POOL_MAX_SIZE', '4'))
+    SNOWFLAKE_POOL_IDLE_TIMEOUT = int(os.getenv('SNOWFLAKE_POOL_IDLE_TIMEOUT', '600'))
+    SNOWFLAKE_POOL_CHECKOUT_TIMEOUT = int(os.getenv('SNOWFLAKE_POOL_CHECKOUT_TIMEOUT', '60'))
+    
+    # Result fetch path: 'arrow' (columnar, default) or 'dict' (DictCursor fallback)
+    SNOWFLAKE_FETCH_MODE = os.getenv('SNOWFLAKE_FETCH_MODE', 'arrow').lower()
+    # Rows per batch for streamed queries, and rows kept for on-screen previews
+    SNOWFLAKE_STREAM_BATCH_ROWS = int(os.getenv('SNOWFLAKE_STREAM_BATCH_ROWS', '10000'))
+    STREAM_PREVIEW_ROWS = int(os.getenv('STREAM_PREVIEW_ROWS', '1000'))
+    # Seconds between status polls for asynchronously submitted queries
+    SNOWFLAKE_ASYNC_POLL_INTERVAL = float(os.getenv('SNOWFLAKE_ASYNC_POLL_INTERVAL', '1.0'))
+    
+    # Worker threads used to run a page's independent queries concurrently
+    QUERY_PLAN_MAX_WORKERS = int(os.getenv('QUERY_PLAN_MAX_WORKERS', '4'))
+    
+    # Query result cache: seconds an entry stays fresh (0 disables caching)
+    # and the memory budget for cached DataFrames in MB
+    QUERY_CACHE_TTL = int(os.getenv('QUERY_CACHE_TTL', '300'))
+    QUERY_CACHE_MAX_MB = int(os.getenv('QUERY_CACHE_MAX_MB', '256'))
+    
+    # Parquet copy of cached results that survives restarts and is served,
+    # marked stale, when Snowflake is unreachable (empty directory disables it)
+    QUERY_DISK_CACHE_DIR = os.getenv('QUERY_DISK_CACHE_DIR', '.query_cache')
+    QUERY_DISK_CACHE_MAX_MB = int(os.getenv('QUERY_DISK_CACHE_MAX_MB', '1024'))
+    QUERY_DISK_CACHE_COMPRESSION = os.getenv('QUERY_DISK_CACHE_COMPRESSION', 'zstd')
+    
+    # Stale-while-revalidate for expensive analytics: results older than the
+    # soft TTL are served immediately and refreshed in the background; results
+    # older than the stale TTL are never served
+    QUERY_CACHE_SOFT_TTL = int(os.getenv('QUERY_CACHE_SOFT_TTL', '300'))
+    QUERY_CACHE_STALE_TTL = int(os.getenv('QUERY_CACHE_STALE_TTL', '3600'))
+    
+    # Seconds between INFORMATION_SCHEMA polls that invalidate cached results
+    # whose source tables changed (0 disables background polling)
+    CACHE_INVALIDATION_POLL_INTERVAL = int(os.getenv('CACHE_INVALIDATION_POLL_INTERVAL', '60'))
+    
+    # ID lookups: milliseconds to collect requests into one batch and the
+    # maximum number of IDs per IN (...) list
+    ENTITY_LOADER_WINDOW_MS = int(os.getenv('ENTITY_LOADER_WINDOW_MS', '15'))
+    ENTITY_LOADER_CHUNK_SIZE = int(os.getenv('ENTITY_LOADER_CHUNK_SIZE', '1000'))
+    # IN-list chunks a bulk ID lookup runs concurrently
+    BULK_LOOKUP_MAX_WORKERS = int(os.getenv('BULK_LOOKUP_MAX_WORKERS', '4'))
+    
+    # STATEMENT_TIMEOUT_IN_SECONDS per query class (0 means Snowflake's maximum)
+    QUERY_TIMEOUT_LOOKUP = int(os.getenv('QUERY_TIMEOUT_LOOKUP', '60'))
+    QUERY_TIMEOUT_INTERACTIVE = int(os.getenv('QUERY_TIMEOUT_INTERACTIVE', '120'))
+    QUERY_TIMEOUT_ANALYTICS = int(os.getenv('QUERY_TIMEOUT_ANALYTICS', '900'))
+    QUERY_TIMEOUT_ADHOC = int(os.getenv('QUERY_TIMEOUT_ADHOC', '600'))
+    QUERY_TIMEOUT_EXPORT = int(os.getenv('QUERY_TIMEOUT_EXPORT', '3600'))
+    # Warehouse per query class: ID lookups, dashboard aggregates, heavy analytics,
+    # Query Builder statements and exports; empty uses the login's warehouse
+    WAREHOUSE_LOOKUP = os.getenv('WAREHOUSE_LOOKUP', '')
+    WAREHOUSE_INTERACTIVE = os.getenv('WAREHOUSE_INTERACTIVE', '')
+    WAREHOUSE_ANALYTICS = os.getenv('WAREHOUSE_ANALYTICS', '')
+    WAREHOUSE_ADHOC = os.getenv('WAREHOUSE_ADHOC', '')
+    WAREHOUSE_EXPORT = os.getenv('WAREHOUSE_EXPORT', '')
+    # Seconds between checks for a rerun while the script waits on a query;
+    # a rerun cancels the session's queries whose results are no longer needed
+    QUERY_CANCEL_CHECK_INTERVAL = float(os.getenv('QUERY_CANCEL_CHECK_INTERVAL', '0.25'))
+    
+    # Query Builder guard: unbounded SELECTs are capped at this many rows;
+    # full results go to background CSV exports, kept for the retention period
+    QUERY_BUILDER_ROW_CAP = int(os.getenv('QUERY_BUILDER_ROW_CAP', '10000'))
+    QUERY_EXPORT_DIR = os.getenv('QUERY_EXPORT_DIR', '')
+    QUERY_EXPORT_RETENTION_HOURS = float(os.getenv('QUERY_EXPORT_RETENTION_HOURS', '24'))
+    # Exports larger than this are left on disk instead of offered as a download
+    QUERY_EXPORT_MAX_DOWNLOAD_MB = int(os.getenv('QUERY_EXPORT_MAX_DOWNLOAD_MB', '200'))
+    
+    # Query Builder pre-flight check: statements whose EXPLAIN estimate exceeds
+    # these limits wait for confirmation (0 disables a limit)
+    QUERY_ADMISSION_MAX_GB = float(os.getenv('QUERY_ADMISSION_MAX_GB', '100'))
+    QUERY_ADMISSION_MAX_PARTITIONS = int(os.getenv('QUERY_ADMISSION_MAX_PARTITIONS', '100000'))
+    # Stricter scan limit on weekdays between these local hours, e.g. "8-18" (empty disables)
+    QUERY_ADMISSION_BUSINESS_HOURS = os.getenv('QUERY_ADMISSION_BUSINESS_HOURS', '8-18')
+    QUERY_ADMISSION_BUSINESS_HOURS_MAX_GB = float(os.getenv('QUERY_ADMISSION_BUSINESS_HOURS_MAX_GB', '10'))
+    
+    # Retries for transient Snowflake errors (network, expired session, warehouse
+    # resuming): attempts per call and jittered exponential backoff bounds in seconds
+    QUERY_RETRY_ATTEMPTS = int(os.getenv('QUERY_RETRY_ATTEMPTS', '3'))
+    QUERY_RETRY_BASE_DELAY = float(os.getenv('QUERY_RETRY_BASE_DELAY', '0.5'))
+    QUERY_RETRY_MAX_DELAY = float(os.getenv('QUERY_RETRY_MAX_DELAY', '8'))
+    # Consecutive transient failures that open an account's circuit breaker, and
+    # seconds it fails fast (serving cached results) before trying Snowflake again
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_BREAKER_FAILURE_THRESHOLD', '5'))
+    CIRCUIT_BREAKER_RESET_SECONDS = float(os.getenv('CIRCUIT_BREAKER_RESET_SECONDS', '30'))
+    
+    # Tag every statement with a JSON QUERY_TAG (page, section, session, class, cache)
+    QUERY_TAG_ENABLED = os.getenv('QUERY_TAG_ENABLED', 'true').lower() == 'true'
+    # Where the Performance Monitor reads tagged queries from: information_schema
+    # (last 7 days, current user, no delay) or account_usage (all users, ~45 min delay)
+    QUERY_HISTORY_SOURCE = os.getenv('QUERY_HISTORY_SOURCE', 'information_schema')
+    
+    # Latency metrics: distinct query fingerprints (and pages) tracked before the
+    # rest are grouped as "(other)", and minutes of per-minute throughput kept
+    PERF_METRICS_MAX_KEYS = int(os.getenv('PERF_METRICS_MAX_KEYS', '200'))
+    PERF_METRICS_WINDOW_MINUTES = int(os.getenv('PERF_METRICS_WINDOW_MINUTES', '60'))
+    
+    # Render profiler: whether the sidebar offers it (its first use wraps Plotly and
+    # Streamlit functions for the whole process, for as long as it runs), and sections
+    # slower than this are highlighted in the waterfall
+    RENDER_PROFILER_ENABLED = os.getenv('RENDER_PROFILER_ENABLED', 'false').lower() == 'true'
+    RENDER_SECTION_BUDGET_MS = int(os.getenv('RENDER_SECTION_BUDGET_MS', '1000'))
+    
+    # "Profile Next Rerun": 'sample' (stack sampling) or 'cprofile', sampling period,
+    # where reports are saved (default: a temp directory) and how many are kept
+    PROFILE_MODE = os.getenv('PROFILE_MODE', 'sample').lower()
+    PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv('PROFILE_SAMPLE_INTERVAL_MS', '5'))
+    PROFILE_DIR = os.getenv('PROFILE_DIR', '')
+    PROFILE_KEEP = int(os.getenv('PROFILE_KEEP', '20'))
+    
+    # Memory accounting: bytes of result objects a session may keep in st.session_state
+    # before the oldest are evicted (0 disables), and tracemalloc per-page allocation
+    # diffs (off unless started here or on the Health Checks page; costs CPU and memory)
+    SESSION_MEMORY_CAP_MB = int(os.getenv('SESSION_MEMORY_CAP_MB', '512'))
+    TRACEMALLOC_ENABLED = os.getenv('TRACEMALLOC_ENABLED', 'false').lower() == 'true'
+    TRACEMALLOC_FRAMES = int(os.getenv('TRACEMALLOC_FRAMES', '1'))
+    
+    # Result dtype optimisation, opted into per query class: categoricals for low-cardinality
+    # strings (at most DTYPE_CATEGORY_MAX_RATIO distinct values per row) and parsed timestamps,
+    # for results of at least DTYPE_OPTIMIZE_MIN_ROWS rows. Ad-hoc results are never converted.
+    DTYPE_OPTIMIZE_LOOKUP = os.getenv('DTYPE_OPTIMIZE_LOOKUP', 'false').lower() == 'true'
+    DTYPE_OPTIMIZE_INTERACTIVE = os.getenv('DTYPE_OPTIMIZE_INTERACTIVE', 'false').lower() == 'true'
+    DTYPE_OPTIMIZE_ANALYTICS = os.getenv('DTYPE_OPTIMIZE_ANALYTICS', 'false').lower() == 'true'
+    DTYPE_OPTIMIZE_EXPORT = os.getenv('DTYPE_OPTIMIZE_EXPORT', 'false').lower() == 'true'
+    # Also narrow integers below int64 and floats to float32 where no value changes
+    DTYPE_DOWNCAST_NUMBERS = os.getenv('DTYPE_DOWNCAST_NUMBERS', 'false').lower() == 'true'
+    DTYPE_CATEGORY_MAX_RATIO = float(os.getenv('DTYPE_CATEGORY_MAX_RATIO', '0.5'))
+    DTYPE_OPTIMIZE_MIN_ROWS = int(os.getenv('DTYPE_OPTIMIZE_MIN_ROWS', '1000'))
+    
     # Authentication settings
     
     @classmethod
@@ -38,6 +171,43 @@ class Config:
             'network_timeout': 30
         }
     
+    @classmethod
+    def get_statement_timeout(cls, query_class):
+        """Statement timeout in seconds for a query class (lookup, interactive, analytics, adhoc or export)"""
+        timeouts = {
+            'lookup': cls.QUERY_TIMEOUT_LOOKUP,
+            'interactive': cls.QUERY_TIMEOUT_INTERACTIVE,
+            'analytics': cls.QUERY_TIMEOUT_ANALYTICS,
+            'adhoc': cls.QUERY_TIMEOUT_ADHOC,
+            'export': cls.QUERY_TIMEOUT_EXPORT
+        }
+        return timeouts.get(query_class, cls.QUERY_TIMEOUT_INTERACTIVE)
+    
+    @classmethod
+    def get_query_warehouse(cls, query_class):
+        """Warehouse configured for a query class, or '' to use the login's warehouse"""
+        warehouses = {
+            'lookup': cls.WAREHOUSE_LOOKUP,
+            'interactive': cls.WAREHOUSE_INTERACTIVE,
+            'analytics': cls.WAREHOUSE_ANALYTICS,
+            'adhoc': cls.WAREHOUSE_ADHOC,
+            'export': cls.WAREHOUSE_EXPORT
+        }
+        return warehouses.get(query_class, '')
+    
+    @classmethod
+    def get_dtype_optimization(cls, query_class):
+        """Whether results of a query class get their dtypes optimised"""
+        enabled = {
+            'lookup': cls.DTYPE_OPTIMIZE_LOOKUP,
+            'interactive': cls.DTYPE_OPTIMIZE_INTERACTIVE,
+            'analytics': cls.DTYPE_OPTIMIZE_ANALYTICS,
+            # Query Builder output is arbitrary SQL shown and downloaded as fetched
+            'adhoc': False,
+            'export': cls.DTYPE_OPTIMIZE_EXPORT
+        }
+        return enabled.get(query_class, cls.DTYPE_OPTIMIZE_INTERACTIVE)
+    
     @classmethod
     def validate_config(cls):
         """Validate that required configuration is present"""
@@ -0,0 +1,415 @@
+"""
+Thread-safe Snowflake connection pool
+Connections are grouped by login identity so concurrent sessions never share
+or overwrite each other's connection
+"""
+
+import snowflake.connector
+import hashlib
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Optional, Dict, Any, List, Callable
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no pooled connection became available in time"""
+
+
+class _PooledConnection:
+    """A pooled connection plus the bookkeeping needed to reuse it safely"""
+
+    def __init__(self, connection, fingerprint: str):
+        self.connection = connection
+        self.fingerprint = fingerprint
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.last_checked = self.created_at
+        # Seconds the login took, and checkouts so far (1 means it was opened for this one)
+        self.login_seconds = 0.0
+        self.checkouts = 0
+
+
+class _KeyState:
+    """Idle connections, checkout accounting and wait queue for one pool key"""
+
+    def __init__(self):
+        self.idle = deque()
+        self.in_use = 0
+        self.waiters = deque()
+        # Extra connection for control statements such as cancels; see ConnectionPool.control_connection
+        self.control: Optional[_PooledConnection] = None
+        self.control_lock = threading.Lock()
+        self.stats = {
+            'login_count': 0,
+            'login_failures': 0,
+            'reconnects': 0,
+            'health_checks': 0,
+            'last_login_seconds': None,
+            'total_login_seconds': 0.0,
+            'checkouts': 0,
+            'waits': 0,
+            'total_wait_seconds': 0.0,
+            'timeouts': 0,
+            'evictions': 0
+        }
+
+
+class ConnectionPool:
+    """
+    Pool of authenticated Snowflake connections keyed by
+    (account, user, role, warehouse)
+
+    Each key holds at most ``max_size_per_key`` connections. Callers check a
+    connection out, use it exclusively and check it back in; when every
+    connection for a key is busy, callers wait in FIFO order until one is
+    returned or ``checkout_timeout`` expires. Idle connections are health
+    checked before reuse and closed after ``idle_timeout`` seconds. Each key
+    also keeps one control connection outside that limit, so a cancel never
+    queues behind the statements it is meant to stop.
+    """
+
+    def __init__(self, max_size_per_key: int = 4, idle_timeout: float = 600,
+                 checkout_timeout: float = 60, health_check_interval: float = 300,
+                 connect_fn: Optional[Callable[..., Any]] = None):
+        self.max_size_per_key = max(1, max_size_per_key)
+        self.idle_timeout = idle_timeout
+        self.checkout_timeout = checkout_timeout
+        self.health_check_interval = health_check_interval
+        self._connect_fn = connect_fn or snowflake.connector.connect
+        self._states: Dict[tuple, _KeyState] = {}
+        self._condition = threading.Condition()
+
+    @staticmethod
+    def pool_key(connection_params: Dict[str, Any]) -> tuple:
+        """Key used to group connections that can serve each other's queries"""
+        return (
+            connection_params.get('account'),
+            connection_params.get('user'),
+            connection_params.get('role'),
+            connection_params.get('warehouse')
+        )
+
+    @staticmethod
+    def _fingerprint(connection_params: Dict[str, Any]) -> str:
+        """Digest of every login parameter, so credential changes force a new login"""
+        parts = [f"{name}={connection_params[name]}" for name in sorted(connection_params)]
+        return hashlib.sha256('|'.join(parts).encode('utf-8')).hexdigest()
+
+    def _is_healthy(self, pooled: _PooledConnection, state: _KeyState) -> bool:
+        """
+        Cheap liveness check for an idle connection
+
+        ``is_closed()`` is checked on every checkout; a ``SELECT 1`` round trip
+        is only issued once per ``health_check_interval`` seconds.
+        """
+        if pooled.connection.is_closed():
+            return False
+
+        now = time.monotonic()
+        if now - pooled.last_checked < self.health_check_interval:
+            return True
+
+        try:
+            with self._condition:
+                state.stats['health_checks'] += 1
+            with pooled.connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+                cursor.fetchone()
+            pooled.last_checked = now
+            return True
+        except Exception as e:
+            logger.warning(f"Pooled connection failed health check, reconnecting: {str(e)}")
+            return False
+
+    def _open(self, connection_params: Dict[str, Any], fingerprint: str,
+              state: _KeyState) -> _PooledConnection:
+        """Log in to Snowflake and wrap the new connection"""
+        logger.info(f"Logging in to Snowflake - Account: {connection_params.get('account')}, User: {connection_params.get('user')}, Authenticator: {connection_params.get('authenticator')}")
+
+        started = time.perf_counter()
+        try:
+            connection = self._connect_fn(**connection_params)
+        except Exception:
+            with self._condition:
+                state.stats['login_failures'] += 1
+            raise
+        elapsed = time.perf_counter() - started
+
+        with self._condition:
+            state.stats['login_count'] += 1
+            state.stats['last_login_seconds'] = elapsed
+            state.stats['total_login_seconds'] += elapsed
+            login_count = state.stats['login_count']
+        logger.info(f"Successfully connected to Snowflake in {elapsed:.2f}s (login #{login_count} for this pool key)")
+        pooled = _PooledConnection(connection, fingerprint)
+        pooled.login_seconds = elapsed
+        return pooled
+
+    @staticmethod
+    def _close_quietly(pooled: _PooledConnection):
+        try:
+            pooled.connection.close()
+        except Exception:
+            pass
+
+    def _collect_expired(self) -> List[_PooledConnection]:
+        """Remove idle connections past ``idle_timeout``; caller holds the lock"""
+        now = time.monotonic()
+        expired = []
+        for state in self._states.values():
+            keep = deque()
+            for pooled in state.idle:
+                if now - pooled.last_used > self.idle_timeout:
+                    expired.append(pooled)
+                    state.stats['evictions'] += 1
+                else:
+                    keep.append(pooled)
+            state.idle = keep
+            control = state.control
+            if (control is not None and now - control.last_used > self.idle_timeout
+                    and state.control_lock.acquire(blocking=False)):
+                state.control = None
+                state.control_lock.release()
+                expired.append(control)
+                state.stats['evictions'] += 1
+        return expired
+
+    def checkout(self, connection_params: Dict[str, Any]) -> _PooledConnection:
+        """
+        Take exclusive ownership of a connection for the given credentials
+
+        Args:
+            connection_params: Keyword arguments for ``snowflake.connector.connect``
+
+        Returns:
+            Pooled connection; hand it back with ``checkin``
+
+        Raises:
+            PoolTimeoutError: If the key stayed saturated for ``checkout_timeout`` seconds
+        """
+        key = self.pool_key(connection_params)
+        fingerprint = self._fingerprint(connection_params)
+        ticket = object()
+        stale = []
+        reused = None
+        waited = False
+        started = time.monotonic()
+        deadline = started + self.checkout_timeout
+
+        with self._condition:
+            state = self._states.setdefault(key, _KeyState())
+            stale.extend(self._collect_expired())
+            state.waiters.append(ticket)
+            try:
+                while True:
+                    if state.waiters[0] is ticket:
+                        while state.idle and reused is None:
+                            pooled = state.idle.pop()
+                            if pooled.fingerprint == fingerprint:
+                                reused = pooled
+                            else:
+                                stale.append(pooled)
+                        if reused is not None or state.in_use < self.max_size_per_key:
+                            state.in_use += 1
+                            state.stats['checkouts'] += 1
+                            if waited:
+                                state.stats['waits'] += 1
+                                state.stats['total_wait_seconds'] += time.monotonic() - started
+                            break
+
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        state.stats['timeouts'] += 1
+                        raise PoolTimeoutError(
+                            f"No Snowflake connection available for {key[1]} after {self.checkout_timeout}s "
+                            f"({self.max_size_per_key} in use)"
+                        )
+                    waited = True
+                    self._condition.wait(remaining)
+            finally:
+                state.waiters.remove(ticket)
+                self._condition.notify_all()
+
+        for pooled in stale:
+            self._close_quietly(pooled)
+
+        try:
+            if reused is not None:
+                if self._is_healthy(reused, state):
+                    reused.checkouts += 1
+                    return reused
+                with self._condition:
+                    state.stats['reconnects'] += 1
+                self._close_quietly(reused)
+            pooled = self._open(connection_params, fingerprint, state)
+            pooled.checkouts += 1
+            return pooled
+        except Exception:
+            with self._condition:
+                state.in_use -= 1
+                self._condition.notify_all()
+            raise
+
+    def checkin(self, connection_params: Dict[str, Any], pooled: _PooledConnection,
+                discard: bool = False):
+        """
+        Return a connection to the pool
+
+        Args:
+            connection_params: The parameters the connection was checked out with
+            pooled: Connection returned by ``checkout``
+            discard: Close the connection instead of keeping it for reuse
+        """
+        key = self.pool_key(connection_params)
+        close = discard or pooled.connection.is_closed()
+
+        with self._condition:
+            state = self._states.setdefault(key, _KeyState())
+            state.in_use = max(0, state.in_use - 1)
+            if not close:
+                pooled.last_used = time.monotonic()
+                state.idle.append(pooled)
+            expired = self._collect_expired()
+            self._condition.notify_all()
+
+        if close:
+            self._close_quietly(pooled)
+        for stale in expired:
+            self._close_quietly(stale)
+
+    @contextmanager
+    def connection(self, connection_params: Dict[str, Any],
+                   timings: Optional[Dict[str, float]] = None):
+        """
+        Check out a raw Snowflake connection for the duration of a ``with`` block
+
+        Args:
+            connection_params: Keyword arguments for ``snowflake.connector.connect``
+            timings: Filled with the seconds spent on ``checkout`` (waiting and
+                health checks) and ``login`` (0 for a reused connection)
+        """
+        started = time.perf_counter()
+        pooled = self.checkout(connection_params)
+        checked_out = time.perf_counter()
+        try:
+            if timings is not None:
+                login = pooled.login_seconds if pooled.checkouts == 1 else 0.0
+                timings['checkout'] = max(0.0, checked_out - started - login)
+                timings['login'] = login
+            yield pooled.connection
+        except Exception:
+            # Probe the connection before anyone reuses it
+            pooled.last_checked = 0.0
+            raise
+        finally:
+            # Also runs when a streaming generator is closed early
+            self.checkin(connection_params, pooled)
+
+    @contextmanager
+    def control_connection(self, connection_params: Dict[str, Any]):
+        """
+        Use the key's control connection for the duration of a ``with`` block
+
+        The connection is opened on first use and kept outside
+        ``max_size_per_key`` and the checkout queue, so it is available while
+        every pooled connection is busy. Callers take turns on it; blocks
+        should run one short statement.
+
+        Args:
+            connection_params: Keyword arguments for ``snowflake.connector.connect``
+        """
+        fingerprint = self._fingerprint(connection_params)
+        with self._condition:
+            state = self._states.setdefault(self.pool_key(connection_params), _KeyState())
+
+        with state.control_lock:
+            pooled = state.control
+            if pooled is not None and (pooled.fingerprint != fingerprint or not self._is_healthy(pooled, state)):
+                state.control = None
+                self._close_quietly(pooled)
+                pooled = None
+            if pooled is None:
+                pooled = self._open(connection_params, fingerprint, state)
+                state.control = pooled
+            pooled.checkouts += 1
+            try:
+                yield pooled.connection
+            except Exception:
+                pooled.last_checked = 0.0
+                raise
+            finally:
+                pooled.last_used = time.monotonic()
+
+    def evict_idle(self, connection_params: Optional[Dict[str, Any]] = None) -> int:
+        """
+        Close idle connections, and control connections not in use
+
+        Args:
+            connection_params: Only close idle connections for this key; all keys if omitted
+
+        Returns:
+            Number of connections closed
+        """
+        with self._condition:
+            if connection_params is None:
+                states = list(self._states.values())
+            else:
+                state = self._states.get(self.pool_key(connection_params))
+                states = [state] if state else []
+
+            closing = []
+            for state in states:
+                closing.extend(state.idle)
+                state.stats['evictions'] += len(state.idle)
+                state.idle = deque()
+                if state.control is not None and state.control_lock.acquire(blocking=False):
+                    closing.append(state.control)
+                    state.stats['evictions'] += 1
+                    state.control = None
+                    state.control_lock.release()
+
+        for pooled in closing:
+            self._close_quietly(pooled)
+        return len(closing)
+
+    def get_key_stats(self, connection_params: Dict[str, Any]) -> Dict[str, Any]:
+        """Lifecycle and checkout statistics for one pool key"""
+        with self._condition:
+            state = self._states.get(self.pool_key(connection_params)) or _KeyState()
+            stats = dict(state.stats)
+            stats['in_use'] = state.in_use
+            stats['idle'] = len(state.idle)
+            stats['waiting'] = len(state.waiters)
+        stats['connected'] = stats['in_use'] + stats['idle'] > 0
+        stats['avg_login_seconds'] = (
+            stats['total_login_seconds'] / stats['login_count'] if stats['login_count'] else None
+        )
+        return stats
+
+    def get_stats(self) -> List[Dict[str, Any]]:
+        """Statistics for every pool key, without credentials"""
+        with self._condition:
+            rows = []
+            for (account, user, role, warehouse), state in self._states.items():
+                rows.append({
+                    'account': account,
+                    'user': user,
+                    'role': role,
+                    'warehouse': warehouse,
+                    'in_use': state.in_use,
+                    'idle': len(state.idle),
+                    'waiting': len(state.waiters),
+                    'max_size': self.max_size_per_key,
+                    'control': state.control is not None,
+                    'logins': state.stats['login_count'],
+                    'checkouts': state.stats['checkouts'],
+                    'waits': state.stats['waits'],
+                    'timeouts': state.stats['timeouts'],
+                    'evictions': state.stats['evictions']
+                })
+        return rows
@@ -0,0 +1,192 @@
+"""
+Result dtype optimisation
+Query results arrive with object columns for strings, timestamps and
+decimals; this converts low-cardinality strings to categoricals, parses
+timestamps to datetime64 and, when asked, downcasts numbers where no value
+changes, so cached and session-held results take less memory
+"""
+
+import decimal
+import logging
+import re
+import threading
+import time
+import warnings
+from datetime import datetime
+from typing import Optional, Dict, Any
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Values inspected to decide what an object column holds
+SAMPLE_SIZE = 100
+# Leading rows counted first, so ID-like columns are rejected without hashing every value
+CATEGORY_PROBE_ROWS = 10_000
+
+CONVERSION_CATEGORY = 'category'
+CONVERSION_INTEGER = 'integer'
+CONVERSION_FLOAT = 'float'
+CONVERSION_DATETIME = 'datetime'
+CONVERSION_DECIMAL = 'decimal'
+
+_ISO_TIMESTAMP = re.compile(r'^\d{4}-\d{2}-\d{2}([ T]\d{2}:\d{2}(:\d{2}(\.\d+)?)?)?(Z|[+-]\d{2}:?\d{2})?$')
+
+
+class DtypeOptimizer:
+    """
+    Thread-safe result dtype optimiser with process-wide savings counters
+
+    Decimals (from the DictCursor path) become float64, as scaled NUMBERs
+    already are on the Arrow path. Numbers stay 64-bit unless
+    ``downcast_numbers`` is set: integer overflow and float32 rounding in
+    later arithmetic are silent, so callers opt in. Object columns are
+    classified from a sample of their non-null values, then converted in one
+    vectorised call; a column that fails to convert is left as it was.
+    """
+
+    def __init__(self, max_category_ratio: float = 0.5, min_rows: int = 1000,
+                 downcast_numbers: bool = False):
+        """
+        Args:
+            max_category_ratio: String columns with at most this many distinct
+                values per row become categoricals
+            min_rows: Smaller results are returned unchanged
+            downcast_numbers: Downcast integers to the smallest type holding
+                their range, and floats to float32 when every value round-trips
+        """
+        self.max_category_ratio = max_category_ratio
+        self.min_rows = min_rows
+        self.downcast_numbers = downcast_numbers
+        self._lock = threading.Lock()
+        self._stats = {
+            'frames': 0,
+            'optimized': 0,
+            'columns_converted': 0,
+            'bytes_before': 0,
+            'bytes_after': 0,
+            'seconds': 0.0
+        }
+        self._conversions: Dict[str, int] = {}
+
+    def optimize(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Return ``df`` with smaller column dtypes
+
+        The frame is converted in place and its report is stored in
+        ``df.attrs['dtype_optimization']``: bytes before and after for the
+        converted columns and the conversion applied to each.
+        """
+        if len(df) < self.min_rows or not len(df.columns):
+            return df
+        started = time.perf_counter()
+        before = 0
+        after = 0
+        converted = {}
+        for name in df.columns:
+            column = df[name]
+            conversion, result = self._optimize_column(column)
+            if result is None:
+                continue
+            before += int(column.memory_usage(deep=True, index=False))
+            after += int(result.memory_usage(deep=True, index=False))
+            df[name] = result
+            converted[name] = conversion
+        elapsed = time.perf_counter() - started
+        df.attrs['dtype_optimization'] = {
+            'bytes_before': before,
+            'bytes_after': after,
+            'columns': converted
+        }
+        with self._lock:
+            self._stats['frames'] += 1
+            self._stats['seconds'] += elapsed
+            if converted:
+                self._stats['optimized'] += 1
+                self._stats['columns_converted'] += len(converted)
+                self._stats['bytes_before'] += before
+                self._stats['bytes_after'] += after
+                for conversion in converted.values():
+                    self._conversions[conversion] = self._conversions.get(conversion, 0) + 1
+        if converted:
+            logger.info(f"Optimised {len(converted)} columns of a {len(df)}-row result in {elapsed:.3f}s, "
+                        f"{before / 1024 / 1024:.1f} MB -> {after / 1024 / 1024:.1f} MB")
+        return df
+
+    def _optimize_column(self, column: pd.Series):
+        """(conversion, converted column) or (None, None) when nothing is gained"""
+        kind = column.dtype.kind
+        if kind in 'iuf' and not self.downcast_numbers:
+            return None, None
+        if kind in 'iu':
+            result = pd.to_numeric(column, downcast='integer' if kind == 'i' else 'unsigned')
+            return (CONVERSION_INTEGER, result) if result.dtype != column.dtype else (None, None)
+        if kind == 'f':
+            result = _exact_float32(column)
+            return (CONVERSION_FLOAT, result) if result is not None else (None, None)
+        if kind != 'O':
+            return None, None
+
+        values = column.dropna()
+        if values.empty:
+            return None, None
+        sample = values.iloc[:SAMPLE_SIZE]
+        try:
+            if all(isinstance(value, str) for value in sample):
+                if all(_ISO_TIMESTAMP.match(value) for value in sample):
+                    return CONVERSION_DATETIME, _to_datetime(column)
+                probe = values.iloc[:CATEGORY_PROBE_ROWS]
+                if len(values) > len(probe) and probe.nunique() > self.max_category_ratio * len(probe):
+                    return None, None
+                if values.nunique() <= self.max_category_ratio * len(column):
+                    return CONVERSION_CATEGORY, column.astype('category')
+                return None, None
+            if all(isinstance(value, (datetime, pd.Timestamp)) for value in sample):
+                return CONVERSION_DATETIME, _to_datetime(column)
+            if all(isinstance(value, decimal.Decimal) for value in sample):
+                result = column.astype(np.float64)
+                narrowed = _exact_float32(result) if self.downcast_numbers else None
+                return CONVERSION_DECIMAL, result if narrowed is None else narrowed
+        except (ValueError, TypeError, OverflowError) as e:
+            # Mixed formats or values outside datetime64's range; keep the column as fetched
+            logger.debug(f"Keeping column {column.name} as object: {str(e)}")
+        return None, None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Frames seen and optimised, bytes before and after, and conversions by kind"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['conversions'] = dict(self._conversions)
+        stats['bytes_saved'] = stats['bytes_before'] - stats['bytes_after']
+        stats['saved_ratio'] = stats['bytes_saved'] / stats['bytes_before'] if stats['bytes_before'] else None
+        return stats
+
+
+def _exact_float32(column: pd.Series) -> Optional[pd.Series]:
+    """float32 copy of a float column when every value survives the round trip, else None"""
+    if column.dtype == np.float32:
+        return None
+    result = column.astype(np.float32)
+    with np.errstate(over='ignore', invalid='ignore'):
+        exact = (result.astype(column.dtype) == column) | column.isna()
+    return result if exact.all() else None
+
+
+def _to_datetime(column: pd.Series) -> pd.Series:
+    """
+    Parse timestamps in one vectorised call
+
+    Values with mixed UTC offsets are converted to UTC; any value that does
+    not parse raises, so a column is converted whole or not at all.
+    """
+    try:
+        with warnings.catch_warnings():
+            # pandas 2.x warns, and returns an object column, for mixed offsets
+            warnings.simplefilter('ignore', FutureWarning)
+            result = pd.to_datetime(column, format='ISO8601')
+        if result.dtype.kind == 'M':
+            return result
+    except ValueError:
+        pass
+    return pd.to_datetime(column, format='ISO8601', utc=True)
@@ -0,0 +1,284 @@
+"""
+Micro-batched entity lookups
+ID lookups arriving within a short window, from any session or widget, are
+answered by one ``WHERE <key> IN (...)`` statement per table
+"""
+
+import csv
+import io
+import logging
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Dict, Any, Callable, Iterable, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Entity name -> (table, lookup column)
+ENTITY_TABLES = {
+    'users': ('DATA_ROOM.MONGODB.USERS', '_ID'),
+    'connections': ('connections', '_ID'),
+    'imports': ('imports', '_ID'),
+    'exports': ('exports', '_ID'),
+    'flows': ('flows', '_ID'),
+    'licenses': ('licenses', '_USERID'),
+    'anomaly_events': ('influxdb.anomaly_events', 'UID')
+}
+
+# Connection fields that decide which rows a lookup may see; only lookups
+# agreeing on all of them share a batch
+SCOPE_FIELDS = ('account', 'role', 'warehouse', 'database', 'schema')
+
+LOOKUP_KEY_COLUMN = 'LOOKUP_KEY'
+
+# Column headers recognised as the ID column of an uploaded CSV
+ID_COLUMN_NAMES = ('_id', 'id', '_userid', 'user_id', 'userid', 'uid')
+
+
+def parse_id_list(text: str) -> List[str]:
+    """
+    Split pasted IDs on commas, semicolons, whitespace and quotes
+
+    Args:
+        text: Free-form text, e.g. IDs copied from a ticket or a SQL IN list
+
+    Returns:
+        IDs in the order given, without blanks
+    """
+    return [token for token in re.split(r"[\s,;'\"()\[\]]+", text or '') if token]
+
+
+def parse_id_csv(data: bytes) -> List[str]:
+    """
+    Read IDs from an uploaded CSV file
+
+    Uses the first column whose header looks like an ID column, otherwise the
+    first column (treating the first row as data if it does not look like a header).
+
+    Args:
+        data: Raw file contents
+
+    Returns:
+        IDs in the order given, without blanks
+    """
+    rows = [row for row in csv.reader(io.StringIO(data.decode('utf-8-sig', errors='replace'))) if row]
+    if not rows:
+        return []
+    header = [cell.strip().lower() for cell in rows[0]]
+    column = next((header.index(name) for name in ID_COLUMN_NAMES if name in header), None)
+    if column is not None:
+        rows = rows[1:]
+    else:
+        column = 0
+    return [row[column].strip() for row in rows if len(row) > column and row[column].strip()]
+
+
+class _Batch:
+    """IDs collected for one table and scope during a window"""
+
+    def __init__(self, connection_params: Dict[str, Any]):
+        self.connection_params = connection_params
+        self.futures: Dict[str, Future] = {}
+        self.callers = 0
+
+
+class EntityLoader:
+    """
+    DataLoader-style batching of ID lookups across threads and sessions
+
+    The first caller for a table opens a batch and waits ``window_ms``; IDs
+    requested by other callers meanwhile join it. The opener then runs one
+    statement per ``chunk_size`` IDs and hands every caller the rows for the
+    IDs it asked for. Results are not remembered; the runner's result cache
+    does that.
+    """
+
+    def __init__(self, window_ms: float = 15, chunk_size: int = 1000):
+        self.window = max(0.0, window_ms) / 1000
+        self.chunk_size = max(1, chunk_size)
+        self._pending: Dict[tuple, _Batch] = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            'requests': 0,
+            'ids_requested': 0,
+            'batches': 0,
+            'queries': 0,
+            'failures': 0
+        }
+
+    @staticmethod
+    def _scope(connection_params: Dict[str, Any]) -> tuple:
+        return tuple(str(connection_params.get(field) or '').upper() for field in SCOPE_FIELDS)
+
+    def load_many(self, run: Callable[[Dict[str, Any], str, Dict[str, Any]], pd.DataFrame],
+                  connection_params: Dict[str, Any], entity: str, ids: Iterable[str],
+                  columns: str = '*') -> Dict[str, pd.DataFrame]:
+        """
+        Look up entities by ID, sharing the round trip with concurrent lookups
+
+        Args:
+            run: ``(connection_params, query, params) -> DataFrame`` runner that raises on failure
+            connection_params: Resolved login parameters for this caller
+            entity: Key of ``ENTITY_TABLES``
+            ids: IDs to look up; blanks and duplicates are ignored
+            columns: Select list for the rows returned
+
+        Returns:
+            Mapping of ID -> matching rows (empty DataFrame if none)
+
+        Raises:
+            ValueError: If the entity is unknown
+        """
+        if entity not in ENTITY_TABLES:
+            raise ValueError(f"Unknown entity: {entity!r}")
+        wanted = list(dict.fromkeys(str(entity_id).strip() for entity_id in ids if str(entity_id).strip()))
+        if not wanted:
+            return {}
+
+        batch_key = (entity, columns, self._scope(connection_params))
+        with self._lock:
+            batch = self._pending.get(batch_key)
+            leader = batch is None
+            if leader:
+                batch = _Batch(connection_params)
+                self._pending[batch_key] = batch
+            futures = {entity_id: batch.futures.setdefault(entity_id, Future()) for entity_id in wanted}
+            batch.callers += 1
+            self._stats['requests'] += 1
+            self._stats['ids_requested'] += len(wanted)
+
+        if leader:
+            time.sleep(self.window)
+            with self._lock:
+                del self._pending[batch_key]
+                self._stats['batches'] += 1
+            try:
+                self._dispatch(run, entity, columns, batch)
+            finally:
+                # Never leave other callers waiting on a batch that died
+                for future in batch.futures.values():
+                    if not future.done():
+                        future.set_exception(RuntimeError(f"{entity} lookup batch was aborted"))
+
+        return {entity_id: future.result() for entity_id, future in futures.items()}
+
+    def _dispatch(self, run, entity: str, columns: str, batch: _Batch):
+        """Run the batch in chunks and resolve every waiting future"""
+        ids = list(batch.futures)
+        if batch.callers > 1:
+            logger.info(f"Batched {len(ids)} {entity} lookups from {batch.callers} callers")
+
+        for chunk in self._chunks(ids):
+            query, params = self._chunk_query(entity, chunk, columns)
+            with self._lock:
+                self._stats['queries'] += 1
+            try:
+                df = run(batch.connection_params, query, params)
+            except Exception as e:
+                with self._lock:
+                    self._stats['failures'] += 1
+                for entity_id in chunk:
+                    batch.futures[entity_id].set_exception(e)
+                continue
+
+            for entity_id, rows in self._fan_out(df, chunk).items():
+                batch.futures[entity_id].set_result(rows)
+
+    def _chunks(self, ids: List[str]) -> List[List[str]]:
+        return [ids[start:start + self.chunk_size] for start in range(0, len(ids), self.chunk_size)]
+
+    @staticmethod
+    def _chunk_query(entity: str, chunk: List[str], columns: str) -> Tuple[str, Dict[str, str]]:
+        """IN-list statement and bound parameters for one chunk of IDs"""
+        table, key_column = ENTITY_TABLES[entity]
+        params = {f"id{n}": entity_id for n, entity_id in enumerate(chunk)}
+        placeholders = ", ".join(f"%(id{n})s" for n in range(len(chunk)))
+        query = (
+            f"SELECT {key_column} AS {LOOKUP_KEY_COLUMN}, {columns} FROM {table} "
+            f"WHERE {key_column} IN ({placeholders})"
+        )
+        return query, params
+
+    def iter_bulk(self, run: Callable[[Dict[str, Any], str, Dict[str, Any]], pd.DataFrame],
+                  connection_params: Dict[str, Any], entity: str, ids: Iterable[str],
+                  columns: str = '*', max_workers: int = 4,
+                  stop: Optional[Callable[[], bool]] = None,
+                  check_interval: float = 0.25) -> Iterator[Tuple[List[str], Future]]:
+        """
+        Look up a large list of IDs as parallel IN-list chunks
+
+        Bulk lookups skip the batching window; they already fill their chunks.
+        Closing the iterator early, or ``stop`` returning True, cancels the
+        chunks that have not started.
+
+        Args:
+            run: ``(connection_params, query, params) -> DataFrame`` runner that raises on failure
+            connection_params: Resolved login parameters, read on the calling thread
+            entity: Key of ``ENTITY_TABLES``
+            ids: IDs to look up; blanks and duplicates are ignored
+            columns: Select list for the rows returned
+            max_workers: Chunks run concurrently
+            stop: Checked every ``check_interval`` seconds while waiting; True ends the lookup
+
+        Yields:
+            ``(chunk_ids, future)`` in completion order; each future holds the
+            chunk's rows, including the ``LOOKUP_KEY`` column, or its exception
+
+        Raises:
+            ValueError: If the entity is unknown
+        """
+        if entity not in ENTITY_TABLES:
+            raise ValueError(f"Unknown entity: {entity!r}")
+        wanted = list(dict.fromkeys(str(entity_id).strip() for entity_id in ids if str(entity_id).strip()))
+        chunks = self._chunks(wanted)
+        if not chunks:
+            return
+
+        with self._lock:
+            self._stats['requests'] += 1
+            self._stats['ids_requested'] += len(wanted)
+            self._stats['queries'] += len(chunks)
+        executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(chunks))),
+                                      thread_name_prefix='bulk-lookup')
+        try:
+            futures = {}
+            for chunk in chunks:
+                query, params = self._chunk_query(entity, chunk, columns)
+                futures[executor.submit(run, connection_params, query, params)] = chunk
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, timeout=check_interval, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future.exception() is not None:
+                        with self._lock:
+                            self._stats['failures'] += 1
+                    yield futures[future], future
+                if pending and stop is not None and stop():
+                    return
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    def _fan_out(df: pd.DataFrame, ids: List[str]) -> Dict[str, pd.DataFrame]:
+        """Split a chunk's rows by lookup key"""
+        if LOOKUP_KEY_COLUMN not in df.columns:
+            empty = df.iloc[0:0]
+            return {entity_id: empty.copy() for entity_id in ids}
+        keys = df[LOOKUP_KEY_COLUMN].astype(str)
+        rows = df.drop(columns=LOOKUP_KEY_COLUMN)
+        positions = keys.groupby(keys, sort=False).indices
+        return {
+            entity_id: rows.iloc[positions.get(entity_id, [])].reset_index(drop=True)
+            for entity_id in ids
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Lookups requested, batches and statements run, and batching ratio"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['pending'] = len(self._pending)
+        stats['ids_per_query'] = stats['ids_requested'] / stats['queries'] if stats['queries'] else None
+        return stats
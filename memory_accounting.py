@@ -0,0 +1,322 @@
+"""
+Memory accounting
+Process RSS, bytes held in each session's ``st.session_state``, a per-session
+cap that evicts the oldest result objects, and optional tracemalloc diffs of
+the allocations a page render leaves behind
+"""
+
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Optional, Dict, Any, List, MutableMapping, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Session state key holding when each result object was first seen
+RESULT_AGES_KEY = '_memory_result_ages'
+# Containers are measured this many levels deep
+MAX_DEPTH = 4
+# Allocation sites kept per page
+TOP_ALLOCATORS = 15
+
+
+def process_memory() -> Dict[str, Optional[int]]:
+    """
+    Resident set size of this process
+
+    Returns:
+        Dictionary with ``rss`` and ``peak_rss`` in bytes; None where the
+        platform does not report them
+    """
+    rss = None
+    peak = None
+    try:
+        with open('/proc/self/statm') as f:
+            rss = int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Kilobytes on Linux, bytes on macOS
+        peak = peak if sys.platform == 'darwin' else peak * 1024
+    except ImportError:
+        pass
+    if rss is None:
+        try:
+            import psutil
+            info = psutil.Process().memory_info()
+            rss = info.rss
+            peak = peak or getattr(info, 'peak_wset', None)
+        except ImportError:
+            pass
+    return {'rss': rss, 'peak_rss': peak}
+
+
+def object_size(obj: Any, seen: Optional[set] = None, depth: int = 0) -> int:
+    """
+    Approximate bytes held by ``obj``
+
+    DataFrames and Series are measured with ``memory_usage(deep=True)`` and
+    arrays by ``nbytes``; dicts, lists, tuples and sets are walked
+    ``MAX_DEPTH`` levels deep. Other objects count only their own size, so a
+    connector holding process-wide pools is not charged for them. Objects
+    reached twice count once.
+    """
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(deep=True, index=True).sum())
+    if isinstance(obj, (pd.Series, pd.Index)):
+        return int(obj.memory_usage(deep=True))
+    if isinstance(obj, np.ndarray):
+        return int(obj.nbytes)
+    size = sys.getsizeof(obj)
+    if depth >= MAX_DEPTH:
+        return size
+    if isinstance(obj, dict):
+        size += sum(object_size(key, seen, depth + 1) + object_size(value, seen, depth + 1)
+                    for key, value in list(obj.items()))
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(object_size(item, seen, depth + 1) for item in list(obj))
+    return size
+
+
+def is_result(obj: Any) -> bool:
+    """Whether ``obj`` is query result data: a frame or array, or a container holding one"""
+    if isinstance(obj, (pd.DataFrame, pd.Series, np.ndarray)):
+        return True
+    if isinstance(obj, dict):
+        return any(isinstance(value, (pd.DataFrame, pd.Series, np.ndarray)) for value in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return any(isinstance(item, (pd.DataFrame, pd.Series, np.ndarray)) for item in obj)
+    return False
+
+
+def session_usage(state: Dict[str, Any], ages: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """
+    Bytes held by each session state key, largest first
+
+    Args:
+        state: Session state as a plain dictionary
+        ages: The session's ``RESULT_AGES_KEY`` entry, for result ages
+
+    Returns:
+        One dictionary per key with key, type, bytes, result flag and,
+        for results, the monotonic time the object was first seen
+    """
+    ages = ages or {}
+    seen: set = set()
+    rows = []
+    for key, value in state.items():
+        if key == RESULT_AGES_KEY:
+            continue
+        result = is_result(value)
+        rows.append({
+            'key': key,
+            'type': type(value).__name__,
+            'bytes': object_size(value, seen),
+            'result': result,
+            'first_seen': ages.get(key, (None, None))[1] if result else None
+        })
+    rows.sort(key=lambda row: row['bytes'], reverse=True)
+    return rows
+
+
+def enforce_session_cap(state: MutableMapping[str, Any], cap_bytes: int) -> List[Tuple[str, int]]:
+    """
+    Keep a session's state under ``cap_bytes`` by deleting its oldest results
+
+    Only result objects (see ``is_result``) under keys without a leading
+    underscore are evicted, oldest first; widgets, credentials and internal
+    objects are never touched. A result's age restarts when its key is
+    given a new object. Called on every render, so a result is measured
+    once, when its key is given a new object; other values are small and
+    measured each time.
+
+    Args:
+        state: ``st.session_state`` or another mutable mapping
+        cap_bytes: Bytes the session may hold; 0 disables the cap
+
+    Returns:
+        (key, bytes) of every evicted entry, oldest first
+    """
+    now = time.monotonic()
+    ages = state.get(RESULT_AGES_KEY) or {}
+    current = {}
+    other_bytes = 0
+    seen: set = set()
+    for key in list(state.keys()):
+        if key == RESULT_AGES_KEY:
+            continue
+        value = state[key]
+        if key.startswith('_') or not is_result(value):
+            if cap_bytes:
+                other_bytes += object_size(value, seen)
+            continue
+        seen_id, first_seen, size = ages.get(key, (None, None, None))
+        if seen_id != id(value):
+            first_seen, size = now, None
+        if size is None and cap_bytes:
+            size = object_size(value)
+        current[key] = (id(value), first_seen, size)
+    state[RESULT_AGES_KEY] = current
+    if not cap_bytes:
+        return []
+
+    total = other_bytes + sum(entry[2] for entry in current.values())
+    evicted = []
+    for key in sorted(current, key=lambda name: current[name][1]):
+        if total <= cap_bytes:
+            break
+        size = current[key][2]
+        total -= size
+        evicted.append((key, size))
+        del state[key]
+        del current[key]
+    if evicted:
+        logger.info(f"Session over its {cap_bytes / 1024 / 1024:.0f} MB cap; evicted "
+                    f"{', '.join(key for key, _ in evicted)}")
+    return evicted
+
+
+def active_session_states() -> List[Dict[str, Any]]:
+    """
+    Session state of every session connected to this server
+
+    Reads Streamlit's session manager, which is not public API; returns an
+    empty list when it is unavailable (e.g. outside ``streamlit run``).
+
+    Returns:
+        One dictionary per session with ``session_id``, ``state`` and
+        ``current`` (the session this call runs for)
+    """
+    try:
+        from streamlit.runtime import Runtime
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        sessions = Runtime.instance()._session_mgr.list_sessions()
+        ctx = get_script_run_ctx(suppress_warning=True)
+    except Exception as e:
+        logger.debug(f"Session list unavailable: {str(e)}")
+        return []
+    states = []
+    for info in sessions:
+        try:
+            # Copied while the session's own thread may be writing to it
+            state = dict(info.session.session_state.filtered_state)
+        except Exception as e:
+            logger.debug(f"Skipping session {info.session.id}: {str(e)}")
+            continue
+        states.append({
+            'session_id': info.session.id,
+            'state': state,
+            'current': ctx is not None and info.session.id == ctx.session_id
+        })
+    return states
+
+
+class AllocationTracker:
+    """
+    Per-page tracemalloc diffs
+
+    While tracing, each measured page render takes a snapshot before and
+    after and keeps the source lines whose allocations grew, i.e. the memory
+    the render left behind (cached results, session state). Snapshots copy
+    every live trace, so only one render is measured at a time and renders
+    running alongside it are not measured; their allocations still show in
+    the diff of the render being measured.
+    """
+
+    def __init__(self, frames: int = 1):
+        """
+        Args:
+            frames: Stack frames stored per allocation when tracing starts
+        """
+        self.frames = max(1, frames)
+        self._pages: Dict[str, Dict[str, Any]] = {}
+        self._measuring = threading.Lock()
+        self._lock = threading.Lock()
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self):
+        """Start tracing allocations in this process"""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            logger.info(f"tracemalloc started with {self.frames} frame(s)")
+
+    def stop(self):
+        """Stop tracing; the per-page diffs measured so far are kept"""
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+            logger.info("tracemalloc stopped")
+
+    def traced_memory(self) -> Optional[Dict[str, int]]:
+        """Bytes currently traced and the peak since tracing started, or None when not tracing"""
+        if not tracemalloc.is_tracing():
+            return None
+        current, peak = tracemalloc.get_traced_memory()
+        return {'current': current, 'peak': peak}
+
+    @contextmanager
+    def measure(self, page: str):
+        """Record the allocations the block leaves behind under ``page``"""
+        if not tracemalloc.is_tracing() or not self._measuring.acquire(blocking=False):
+            yield
+            return
+        try:
+            before = self._snapshot()
+            started = time.perf_counter()
+            yield
+            self._record(page, before, time.perf_counter() - started)
+        finally:
+            self._measuring.release()
+
+    def _record(self, page: str, before: tracemalloc.Snapshot, elapsed: float):
+        try:
+            diff = self._snapshot().compare_to(before, 'lineno')
+        except RuntimeError as e:
+            # Tracing was stopped while the page rendered
+            logger.warning(f"Allocation diff for {page} failed: {str(e)}")
+            return
+        allocators = [
+            {
+                'location': f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                'size_diff': stat.size_diff,
+                'count_diff': stat.count_diff,
+                'size': stat.size
+            }
+            for stat in [stat for stat in diff if stat.size_diff > 0][:TOP_ALLOCATORS]
+        ]
+        with self._lock:
+            self._pages[page] = {
+                'measured_at': datetime.now(),
+                'render_seconds': elapsed,
+                'net_bytes': sum(stat.size_diff for stat in diff),
+                'allocators': allocators
+            }
+
+    @staticmethod
+    def _snapshot() -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+            tracemalloc.Filter(False, '<unknown>')
+        ))
+
+    def get_pages(self) -> Dict[str, Dict[str, Any]]:
+        """Latest allocation diff per page"""
+        with self._lock:
+            return dict(self._pages)
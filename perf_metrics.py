@@ -0,0 +1,384 @@
+"""
+Query latency metrics
+Fixed-bucket latency histograms and counters for every stage of running a
+statement, kept per query fingerprint and per dashboard page, so the
+Performance Monitor can show percentiles, throughput and error rates for
+this deployment
+"""
+
+import bisect
+import hashlib
+import logging
+import threading
+import time
+from collections import deque
+from typing import Optional, Dict, Any, List, Iterable, Sequence
+
+logger = logging.getLogger(__name__)
+
+# Stages timed on this server for each statement
+STAGE_CHECKOUT = 'checkout'
+STAGE_LOGIN = 'login'
+STAGE_EXECUTE = 'execute'
+STAGE_FETCH = 'fetch'
+STAGE_DATAFRAME = 'dataframe'
+# Whole call as the page saw it, cache hits included
+STAGE_TOTAL = 'total'
+# Stages Snowflake reports for a query id, resolved later from its query history
+STAGE_COMPILE = 'compile'
+STAGE_QUEUED = 'queued'
+STAGE_WAREHOUSE = 'warehouse'
+STAGES = (
+    STAGE_CHECKOUT, STAGE_LOGIN, STAGE_EXECUTE, STAGE_FETCH, STAGE_DATAFRAME,
+    STAGE_COMPILE, STAGE_QUEUED, STAGE_WAREHOUSE, STAGE_TOTAL
+)
+
+OUTCOME_OK = 'ok'
+OUTCOME_CACHED = 'cached'
+OUTCOME_ERROR = 'error'
+
+# Upper bounds in seconds; anything slower lands in an overflow bucket
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+# Key that absorbs fingerprints or pages past the tracking limit
+OTHER_KEY = '(other)'
+# Query ids kept for resolving compile/queued/warehouse time
+PENDING_QUERY_IDS = 2000
+
+
+class LatencyHistogram:
+    """Counts of observations per fixed latency bucket, plus count, sum and max"""
+
+    __slots__ = ('counts', 'count', 'total', 'max')
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        seconds = max(0.0, seconds)
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def merge(self, other: 'LatencyHistogram'):
+        for index, count in enumerate(other.counts):
+            self.counts[index] += count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Estimated ``q`` quantile (0-1), interpolated within its bucket
+
+        Returns:
+            Seconds, never above the largest observation; None when empty
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = LATENCY_BUCKETS[index - 1] if index else 0.0
+                upper = LATENCY_BUCKETS[index] if index < len(LATENCY_BUCKETS) else self.max
+                estimate = lower + (upper - lower) * max(0.0, rank - seen) / count
+                return min(estimate, self.max)
+            seen += count
+        return self.max
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'count': self.count,
+            'mean_seconds': self.total / self.count if self.count else None,
+            'p50_seconds': self.quantile(0.5),
+            'p95_seconds': self.quantile(0.95),
+            'p99_seconds': self.quantile(0.99),
+            'max_seconds': self.max if self.count else None
+        }
+
+
+class _Series:
+    """Histograms per stage and outcome counters for one fingerprint, page or minute"""
+
+    __slots__ = ('stages', 'statements', 'errors', 'cached', 'rows', 'label')
+
+    def __init__(self, label: str = ''):
+        self.stages: Dict[str, LatencyHistogram] = {}
+        self.statements = 0
+        self.errors = 0
+        self.cached = 0
+        self.rows = 0
+        self.label = label
+
+    def observe(self, stage: str, seconds: float):
+        histogram = self.stages.get(stage)
+        if histogram is None:
+            histogram = self.stages[stage] = LatencyHistogram()
+        histogram.observe(seconds)
+
+    def count(self, outcome: str, rows: int):
+        self.statements += 1
+        self.rows += rows
+        if outcome == OUTCOME_ERROR:
+            self.errors += 1
+        elif outcome == OUTCOME_CACHED:
+            self.cached += 1
+
+    def merge(self, other: '_Series'):
+        for stage, histogram in other.stages.items():
+            self.stages.setdefault(stage, LatencyHistogram()).merge(histogram)
+        self.statements += other.statements
+        self.errors += other.errors
+        self.cached += other.cached
+        self.rows += other.rows
+
+
+class PerfMetrics:
+    """
+    Process-wide latency histograms and counters for Snowflake statements
+
+    Every observation is added to the overall series, the statement's
+    fingerprint series, its page series and the current minute's series.
+    Fingerprints and pages beyond ``max_keys`` share one ``(other)`` series,
+    and minutes older than ``window_minutes`` are dropped, so memory stays
+    bounded however many distinct statements run.
+    """
+
+    def __init__(self, max_keys: int = 200, window_minutes: int = 60):
+        self.max_keys = max(1, max_keys)
+        self.window_minutes = max(1, window_minutes)
+        self.started_at = time.time()
+        self._overall = _Series()
+        self._fingerprints: Dict[str, _Series] = {}
+        self._pages: Dict[str, _Series] = {}
+        self._minutes: deque = deque()
+        self._pending: deque = deque(maxlen=PENDING_QUERY_IDS)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def fingerprint_key(fingerprint: str) -> str:
+        """Short stable id for a fingerprint"""
+        return hashlib.sha1(fingerprint.encode('utf-8')).hexdigest()[:12]
+
+    def _series(self, fingerprint: Optional[str], page: Optional[str]) -> List[_Series]:
+        """Series an observation updates; caller holds the lock"""
+        series = [self._overall, self._minute()]
+        if fingerprint:
+            key = self.fingerprint_key(fingerprint)
+            if key not in self._fingerprints and len(self._fingerprints) >= self.max_keys:
+                key, fingerprint = OTHER_KEY, OTHER_KEY
+            series.append(self._fingerprints.setdefault(key, _Series(fingerprint)))
+        page = page or '(none)'
+        if page not in self._pages and len(self._pages) >= self.max_keys:
+            page = OTHER_KEY
+        series.append(self._pages.setdefault(page, _Series(page)))
+        return series
+
+    def _minute(self) -> _Series:
+        """Series for the current minute, dropping minutes outside the window; caller holds the lock"""
+        minute = int(time.time() // 60) * 60
+        if not self._minutes or self._minutes[-1][0] != minute:
+            self._minutes.append((minute, _Series()))
+            while self._minutes and self._minutes[0][0] <= minute - self.window_minutes * 60:
+                self._minutes.popleft()
+        return self._minutes[-1][1]
+
+    def record_stages(self, timings: Dict[str, float], fingerprint: Optional[str] = None,
+                      page: Optional[str] = None):
+        """
+        Add stage durations of one statement
+
+        Args:
+            timings: Seconds per stage, e.g. ``{'checkout': 0.01, 'execute': 1.2}``
+            fingerprint: ``query_fingerprint`` of the statement
+            page: Dashboard page the statement ran for
+        """
+        with self._lock:
+            for series in self._series(fingerprint, page):
+                for stage, seconds in timings.items():
+                    series.observe(stage, seconds)
+
+    def record_query(self, seconds: float, outcome: str = OUTCOME_OK, rows: int = 0,
+                     fingerprint: Optional[str] = None, page: Optional[str] = None):
+        """
+        Count one finished call and add its end-to-end duration
+
+        Args:
+            seconds: Time the caller waited, cache hits included
+            outcome: ``OUTCOME_OK``, ``OUTCOME_CACHED`` or ``OUTCOME_ERROR``
+            rows: Rows returned
+            fingerprint: ``query_fingerprint`` of the statement
+            page: Dashboard page the statement ran for
+        """
+        with self._lock:
+            for series in self._series(fingerprint, page):
+                series.observe(STAGE_TOTAL, seconds)
+                series.count(outcome, rows)
+
+    def add_query_id(self, query_id: Optional[str], fingerprint: Optional[str] = None,
+                     page: Optional[str] = None):
+        """Remember a finished statement so its server-side times can be resolved later"""
+        if query_id:
+            with self._lock:
+                self._pending.append((query_id, fingerprint, page, time.time()))
+
+    def take_query_ids(self, limit: int = 500) -> List[tuple]:
+        """
+        Remove and return up to ``limit`` pending ``(query_id, fingerprint, page, finished_at)``
+        entries, oldest first
+        """
+        with self._lock:
+            taken = []
+            while self._pending and len(taken) < limit:
+                taken.append(self._pending.popleft())
+        return taken
+
+    def requeue_query_ids(self, entries: Iterable[tuple], max_age: float = 600):
+        """Put back entries whose history rows were not available yet, unless older than ``max_age`` seconds"""
+        cutoff = time.time() - max_age
+        with self._lock:
+            for entry in entries:
+                if entry[3] >= cutoff:
+                    self._pending.append(entry)
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    @staticmethod
+    def _stage_rows(series: _Series, stages: Sequence[str]) -> List[Dict[str, Any]]:
+        rows = []
+        for stage in stages:
+            histogram = series.stages.get(stage)
+            if histogram is not None and histogram.count:
+                rows.append(dict(histogram.summary(), stage=stage))
+        return rows
+
+    def get_stage_stats(self, minutes: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Latency percentiles per stage
+
+        Args:
+            minutes: Only the last this many minutes; since start-up if None
+
+        Returns:
+            One dictionary per stage with observations: stage, count and
+            mean/p50/p95/p99/max seconds
+        """
+        with self._lock:
+            series = self._window(minutes) if minutes else self._overall
+            return self._stage_rows(series, STAGES)
+
+    def _window(self, minutes: int) -> _Series:
+        """Merged series for the last ``minutes`` minutes; caller holds the lock"""
+        cutoff = time.time() - minutes * 60
+        merged = _Series()
+        for minute, series in self._minutes:
+            if minute + 60 > cutoff:
+                merged.merge(series)
+        return merged
+
+    def get_breakdown(self, by: str = 'fingerprint', stage: str = STAGE_TOTAL,
+                      limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        Statements, errors and latency per fingerprint or page, slowest first
+
+        Args:
+            by: 'fingerprint' or 'page'
+            stage: Stage whose percentiles are reported and ranked by (total time spent)
+            limit: Most rows to return
+
+        Returns:
+            One dictionary per key with key, label, statements, errors,
+            error_rate, cached, rows, total_seconds and p50/p95/p99 seconds
+        """
+        with self._lock:
+            source = self._fingerprints if by == 'fingerprint' else self._pages
+            rows = []
+            for key, series in source.items():
+                histogram = series.stages.get(stage) or LatencyHistogram()
+                summary = histogram.summary()
+                rows.append({
+                    'key': key,
+                    'label': series.label,
+                    'statements': series.statements,
+                    'errors': series.errors,
+                    'error_rate': series.errors / series.statements if series.statements else 0.0,
+                    'cached': series.cached,
+                    'rows': series.rows,
+                    'total_seconds': histogram.total,
+                    'p50_seconds': summary['p50_seconds'],
+                    'p95_seconds': summary['p95_seconds'],
+                    'p99_seconds': summary['p99_seconds']
+                })
+        rows.sort(key=lambda row: row['total_seconds'], reverse=True)
+        return rows[:limit]
+
+    def get_stage_breakdown(self, key: str, by: str = 'fingerprint') -> List[Dict[str, Any]]:
+        """Stage percentiles for one fingerprint key or page (see ``get_stage_stats``)"""
+        with self._lock:
+            source = self._fingerprints if by == 'fingerprint' else self._pages
+            series = source.get(key)
+            return self._stage_rows(series, STAGES) if series else []
+
+    def get_throughput(self, minutes: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Per-minute counts and latency for the recent window
+
+        Args:
+            minutes: Minutes to return; defaults to the whole window
+
+        Returns:
+            One dictionary per minute that saw statements, oldest first: minute
+            (epoch seconds), statements, errors, cached and p50/p95 total seconds
+        """
+        cutoff = time.time() - (minutes or self.window_minutes) * 60
+        with self._lock:
+            rows = []
+            for minute, series in self._minutes:
+                if minute + 60 <= cutoff:
+                    continue
+                total = series.stages.get(STAGE_TOTAL) or LatencyHistogram()
+                rows.append({
+                    'minute': minute,
+                    'statements': series.statements,
+                    'errors': series.errors,
+                    'cached': series.cached,
+                    'p50_seconds': total.quantile(0.5),
+                    'p95_seconds': total.quantile(0.95)
+                })
+        return rows
+
+    def get_stats(self, minutes: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Headline numbers: statements, errors, cache hits, error and cache hit
+        rates, statements per minute and end-to-end p50/p95/p99
+
+        Args:
+            minutes: Only the last this many minutes; since start-up if None
+        """
+        with self._lock:
+            series = self._window(minutes) if minutes else self._overall
+            total = series.stages.get(STAGE_TOTAL) or LatencyHistogram()
+            uptime = time.time() - self.started_at
+            span = min(minutes * 60, uptime) if minutes else uptime
+            statements = series.statements
+            return {
+                'statements': statements,
+                'errors': series.errors,
+                'cached': series.cached,
+                'rows': series.rows,
+                'error_rate': series.errors / statements if statements else 0.0,
+                'cache_hit_rate': series.cached / statements if statements else 0.0,
+                'per_minute': statements / max(span / 60, 1 / 60),
+                'p50_seconds': total.quantile(0.5),
+                'p95_seconds': total.quantile(0.95),
+                'p99_seconds': total.quantile(0.99),
+                'fingerprints': len(self._fingerprints),
+                'pending_query_ids': len(self._pending)
+            }
@@ -0,0 +1,600 @@
+"""
+Process-wide query result cache
+Results are keyed on canonical SQL, bind parameters and login scope (account,
+role, warehouse, database, schema), expire after a per-entry TTL and are
+evicted least-recently-used under a byte budget. An optional Parquet tier on
+disk keeps results across restarts and serves them, marked stale, when
+Snowflake cannot be reached. Each entry records the tables its statement
+reads, so entries can be invalidated when those tables change
+"""
+
+import atexit
+import hashlib
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any
+
+import pandas as pd
+
+from sql_utils import canonical_sql, referenced_tables
+
+logger = logging.getLogger(__name__)
+
+
+KEY_FIELDS = ('sql', 'params', 'account', 'role', 'warehouse', 'database', 'schema')
+
+# Results waiting for the disk cache writer before new ones are dropped
+DISK_WRITE_QUEUE_SIZE = 64
+
+
+class _CacheEntry:
+    """A cached result plus its size, expiry and source tables"""
+
+    def __init__(self, df: pd.DataFrame, size_bytes: int, ttl: float, tables: frozenset):
+        self.df = df
+        self.size_bytes = size_bytes
+        self.created_at = time.time()
+        self.fetched_at = df.attrs.get('fetched_at', self.created_at)
+        self.expires_at = time.monotonic() + ttl
+        self.tables = tables
+        self.hits = 0
+
+
+def key_fingerprint(key: tuple) -> str:
+    """Stable digest of a cache key, used as the on-disk file name"""
+    return hashlib.sha256(json.dumps(list(key), default=str).encode('utf-8')).hexdigest()
+
+
+def describe_key(key: tuple) -> Dict[str, Any]:
+    """Name the parts of a ``QueryCache.make_key`` key"""
+    return dict(zip(KEY_FIELDS, key))
+
+
+def key_tables(key: tuple) -> frozenset:
+    """Fully qualified tables read by the statement in a cache key"""
+    parts = describe_key(key)
+    return frozenset(referenced_tables(parts['sql'], parts['database'], parts['schema']))
+
+
+def _changed_since(tables, fetched_at: float, altered: Dict[str, float]) -> bool:
+    """True if any source table was altered after the result was fetched"""
+    return any(altered.get(table, 0.0) > fetched_at for table in tables)
+
+
+class DiskResultCache:
+    """
+    Compressed Parquet result store with a JSON manifest
+
+    The manifest records, per result, the SQL fingerprint and text, role,
+    fetch time, row count and file size. Files are evicted least recently
+    used once their total size passes ``max_bytes``. ``put_async`` hands
+    writes to a background thread that saves the manifest once per batch.
+    """
+
+    MANIFEST = 'manifest.json'
+
+    def __init__(self, directory: str, max_bytes: int = 1024 * 1024 * 1024,
+                 compression: str = 'zstd'):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.compression = compression
+        self._lock = threading.Lock()
+        self._pending: 'queue.Queue' = queue.Queue(maxsize=DISK_WRITE_QUEUE_SIZE)
+        self._writer: Optional[threading.Thread] = None
+        os.makedirs(directory, exist_ok=True)
+        self._manifest: Dict[str, Dict[str, Any]] = self._load_manifest()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _load_manifest(self) -> Dict[str, Dict[str, Any]]:
+        """Read the manifest, dropping entries whose Parquet file is gone"""
+        try:
+            with open(self._path(self.MANIFEST), encoding='utf-8') as manifest_file:
+                manifest = json.load(manifest_file)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable result cache manifest: {str(e)}")
+            return {}
+        return {
+            fingerprint: entry for fingerprint, entry in manifest.items()
+            if os.path.exists(self._path(entry['file']))
+        }
+
+    def _save_manifest(self):
+        """Atomically rewrite the manifest; caller holds the lock"""
+        temp_path = self._path(self.MANIFEST + '.tmp')
+        with open(temp_path, 'w', encoding='utf-8') as manifest_file:
+            json.dump(self._manifest, manifest_file, indent=1)
+        os.replace(temp_path, self._path(self.MANIFEST))
+
+    def _commit_manifest(self) -> bool:
+        """Save the manifest, logging instead of raising; caller holds the lock"""
+        try:
+            self._save_manifest()
+        except OSError as e:
+            logger.warning(f"Result cache manifest not saved: {str(e)}")
+            return False
+        return True
+
+    @staticmethod
+    def _discard(path: str):
+        """Delete a file if it exists"""
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _remove(self, fingerprint: str):
+        """Delete one result file and its manifest entry; caller holds the lock"""
+        entry = self._manifest.pop(fingerprint, None)
+        if entry:
+            try:
+                os.remove(self._path(entry['file']))
+            except OSError:
+                pass
+
+    def get(self, key: tuple, max_age: Optional[float] = None) -> Optional[pd.DataFrame]:
+        """
+        Load a stored result
+
+        Args:
+            key: Key from ``QueryCache.make_key``
+            max_age: Ignore results fetched more than this many seconds ago
+
+        Returns:
+            DataFrame with ``attrs['fetched_at']`` set, or None if absent or too old
+        """
+        fingerprint = key_fingerprint(key)
+        with self._lock:
+            entry = self._manifest.get(fingerprint)
+            if entry is None:
+                return None
+            if max_age is not None and (entry.get('invalidated') or time.time() - entry['fetched_at'] > max_age):
+                return None
+            entry['last_access'] = time.time()
+            path = self._path(entry['file'])
+            fetched_at = entry['fetched_at']
+
+        try:
+            df = pd.read_parquet(path)
+        except Exception as e:
+            logger.warning(f"Dropping unreadable cached result {fingerprint[:12]}: {str(e)}")
+            with self._lock:
+                self._remove(fingerprint)
+            return None
+        df.attrs['fetched_at'] = fetched_at
+        return df
+
+    def put(self, key: tuple, df: pd.DataFrame, fetched_at: Optional[float] = None) -> bool:
+        """
+        Write a result to disk and save the manifest
+
+        Args:
+            key: Key from ``QueryCache.make_key``
+            df: Query result
+            fetched_at: Epoch seconds the result was fetched; defaults to now
+
+        Returns:
+            True if the result was written
+        """
+        if not self._write(key, df, fetched_at):
+            return False
+        with self._lock:
+            return self._commit_manifest()
+
+    def put_async(self, key: tuple, df: pd.DataFrame, fetched_at: Optional[float] = None) -> bool:
+        """
+        Queue a result for the background writer, off the query's latency path
+
+        Args:
+            key: Key from ``QueryCache.make_key``
+            df: Query result; must not be modified afterwards
+            fetched_at: Epoch seconds the result was fetched; defaults to now
+
+        Returns:
+            True if queued; False if the writer is too far behind
+        """
+        with self._lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_pending, name='disk-cache-writer', daemon=True)
+                self._writer.start()
+                # Queued results are still written when the process exits normally
+                atexit.register(self.flush)
+        try:
+            self._pending.put_nowait((key, df, fetched_at or time.time()))
+        except queue.Full:
+            logger.warning("Result not written to disk cache: writer is behind")
+            return False
+        return True
+
+    def flush(self):
+        """Block until every queued result was written"""
+        self._pending.join()
+
+    def _write_pending(self):
+        """Writer thread: write queued results, saving the manifest once for each batch"""
+        while True:
+            batch = [self._pending.get()]
+            while True:
+                try:
+                    batch.append(self._pending.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                written = [self._write(*item) for item in batch]
+                if any(written):
+                    with self._lock:
+                        self._commit_manifest()
+            except Exception as e:
+                logger.error(f"Disk cache writer failed: {str(e)}")
+            finally:
+                for _ in batch:
+                    self._pending.task_done()
+
+    def _write(self, key: tuple, df: pd.DataFrame, fetched_at: Optional[float] = None) -> bool:
+        """Write a result file and its manifest entry, evicting to fit; the manifest is not saved"""
+        fingerprint = key_fingerprint(key)
+        file_name = f"{fingerprint}.parquet"
+        temp_path = self._path(file_name + '.tmp')
+        try:
+            df.to_parquet(temp_path, compression=self.compression, index=False)
+            size_bytes = os.path.getsize(temp_path)
+        except Exception as e:
+            # e.g. object columns mixing types, which Parquet cannot represent
+            logger.warning(f"Result not written to disk cache: {str(e)}")
+            self._discard(temp_path)
+            return False
+
+        if size_bytes > self.max_bytes:
+            self._discard(temp_path)
+            return False
+
+        now = time.time()
+        with self._lock:
+            try:
+                os.replace(temp_path, self._path(file_name))
+            except OSError as e:
+                logger.warning(f"Result not written to disk cache: {str(e)}")
+                self._discard(temp_path)
+                return False
+            parts = describe_key(key)
+            self._manifest[fingerprint] = {
+                'file': file_name,
+                'sql': parts['sql'],
+                'account': parts['account'],
+                'role': parts['role'],
+                'tables': sorted(key_tables(key)),
+                'fetched_at': fetched_at or now,
+                'last_access': now,
+                'rows': len(df),
+                'bytes': size_bytes
+            }
+            total = sum(entry['bytes'] for entry in self._manifest.values())
+            for old in sorted(self._manifest, key=lambda name: self._manifest[name]['last_access']):
+                if total <= self.max_bytes:
+                    break
+                if old != fingerprint:
+                    total -= self._manifest[old]['bytes']
+                    self._remove(old)
+        return True
+
+    def tracked_tables(self, account: str) -> set:
+        """Source tables of the stored results for one account"""
+        with self._lock:
+            return {
+                table for entry in self._manifest.values()
+                if entry.get('account') == account for table in entry.get('tables', [])
+            }
+
+    def invalidate_changed(self, altered: Dict[str, float], account: str) -> set:
+        """
+        Stop treating results as fresh once a source table changed after their fetch
+
+        The files are kept as the stale fallback.
+
+        Args:
+            altered: Mapping of table name -> epoch seconds it was last altered
+            account: Only consider results fetched from this account
+
+        Returns:
+            Fingerprints of the results invalidated
+        """
+        invalidated = set()
+        with self._lock:
+            for fingerprint, entry in self._manifest.items():
+                if entry.get('invalidated') or entry.get('account') != account:
+                    continue
+                if _changed_since(entry.get('tables', []), entry['fetched_at'], altered):
+                    entry['invalidated'] = True
+                    invalidated.add(fingerprint)
+            if invalidated:
+                self._save_manifest()
+        return invalidated
+
+    def clear(self) -> int:
+        """Delete every stored result; returns the number removed"""
+        with self._lock:
+            count = len(self._manifest)
+            for fingerprint in list(self._manifest):
+                self._remove(fingerprint)
+            self._save_manifest()
+        return count
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Entry count and bytes on disk"""
+        with self._lock:
+            return {
+                'entries': len(self._manifest),
+                'bytes': sum(entry['bytes'] for entry in self._manifest.values()),
+                'max_bytes': self.max_bytes,
+                'directory': self.directory
+            }
+
+
+class QueryCache:
+    """
+    Thread-safe LRU cache of query results
+
+    Entries are measured with ``DataFrame.memory_usage(deep=True)``; when the
+    total exceeds ``max_bytes`` the least recently used entries are dropped.
+    Results larger than the whole budget are never stored.
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024, default_ttl: float = 300,
+                 disk: Optional[DiskResultCache] = None):
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.disk = disk
+        self._entries: 'OrderedDict[tuple, _CacheEntry]' = OrderedDict()
+        self._bytes = 0
+        self._cleared_at = 0.0
+        self._refreshing: set = set()
+        self._lock = threading.Lock()
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'stores': 0,
+            'evictions': 0,
+            'expirations': 0,
+            'rejected': 0,
+            'disk_hits': 0,
+            'stale_served': 0,
+            'background_refreshes': 0,
+            'invalidations': 0
+        }
+
+    @staticmethod
+    def make_key(query: str, params: Optional[Dict[str, Any]] = None,
+                 connection_params: Optional[Dict[str, Any]] = None) -> tuple:
+        """
+        Cache key for a statement as run with a given login
+
+        Args:
+            query: SQL query string
+            params: Optional bind parameters
+            connection_params: Login parameters; account, role, warehouse,
+                database and schema all scope the result
+
+        Returns:
+            Hashable key
+        """
+        connection_params = connection_params or {}
+        bound = tuple(sorted((str(name), repr(value)) for name, value in (params or {}).items()))
+        scope = tuple(
+            str(connection_params.get(name) or '').upper()
+            for name in ('account', 'role', 'warehouse', 'database', 'schema')
+        )
+        return (canonical_sql(query), bound) + scope
+
+    def _drop(self, key: tuple) -> _CacheEntry:
+        """Remove an entry; caller holds the lock"""
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size_bytes
+        return entry
+
+    def get(self, key: tuple, ttl: Optional[float] = None) -> Optional[pd.DataFrame]:
+        """
+        Look up a cached result in memory, then on disk
+
+        Args:
+            key: Key from ``make_key``
+            ttl: Maximum age of a result taken from disk; defaults to ``default_ttl``
+
+        Returns:
+            A shallow copy of the cached DataFrame, or None on a miss
+        """
+        ttl = self.default_ttl if ttl is None else ttl
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at <= time.monotonic():
+                self._drop(key)
+                self._stats['expirations'] += 1
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                entry.hits += 1
+                self._stats['hits'] += 1
+                df = entry.df
+        if entry is not None:
+            # Callers may add or drop columns without touching the cached frame
+            return df.copy(deep=False)
+
+        df = self.disk.get(key, max_age=ttl) if self.disk else None
+        with self._lock:
+            if df is not None and df.attrs['fetched_at'] < self._cleared_at:
+                df = None
+            if df is None:
+                self._stats['misses'] += 1
+                return None
+            self._stats['disk_hits'] += 1
+        # Promote for the rest of its lifetime, without writing it back to disk
+        remaining = ttl - (time.time() - df.attrs['fetched_at'])
+        self._store(key, df, remaining)
+        return df.copy(deep=False)
+
+    def get_stale(self, key: tuple) -> Optional[pd.DataFrame]:
+        """
+        Last known good result regardless of age, for when Snowflake is unreachable
+
+        Args:
+            key: Key from ``make_key``
+
+        Returns:
+            DataFrame with ``attrs['stale']`` set, or None if nothing was ever stored
+        """
+        df = self.disk.get(key) if self.disk else None
+        if df is None:
+            return None
+        df.attrs['stale'] = True
+        with self._lock:
+            self._stats['stale_served'] += 1
+        return df
+
+    def put(self, key: tuple, df: pd.DataFrame, ttl: Optional[float] = None) -> bool:
+        """
+        Store a result
+
+        Args:
+            key: Key from ``make_key``
+            df: Query result
+            ttl: Seconds until the entry expires; defaults to ``default_ttl``
+
+        Returns:
+            True if the result was stored
+        """
+        ttl = self.default_ttl if ttl is None else ttl
+        if ttl <= 0:
+            return False
+        stored = self._store(key, df, ttl)
+        if self.disk is not None:
+            self.disk.put_async(key, df, df.attrs.get('fetched_at'))
+        return stored
+
+    def _store(self, key: tuple, df: pd.DataFrame, ttl: float) -> bool:
+        """Insert into the in-memory tier, evicting LRU entries to fit"""
+        if ttl <= 0:
+            return False
+        size_bytes = int(df.memory_usage(deep=True, index=True).sum())
+
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            if size_bytes > self.max_bytes:
+                self._stats['rejected'] += 1
+                return False
+            while self._entries and self._bytes + size_bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self._stats['evictions'] += 1
+            self._entries[key] = _CacheEntry(df, size_bytes, ttl, key_tables(key))
+            self._bytes += size_bytes
+            self._stats['stores'] += 1
+        return True
+
+    def begin_refresh(self, key: tuple) -> bool:
+        """
+        Claim the background refresh for a key
+
+        Returns:
+            True if the caller should refresh; False if a refresh is already running
+        """
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+            self._stats['background_refreshes'] += 1
+            return True
+
+    def end_refresh(self, key: tuple):
+        """Release a refresh claimed with ``begin_refresh``"""
+        with self._lock:
+            self._refreshing.discard(key)
+
+    def tracked_tables(self, account: str) -> set:
+        """
+        Source tables of every cached result for one account, memory and disk
+
+        Args:
+            account: Upper-cased account identifier, as stored in cache keys
+
+        Returns:
+            Set of fully qualified table names
+        """
+        with self._lock:
+            tables = {
+                table for key, entry in self._entries.items()
+                if describe_key(key)['account'] == account for table in entry.tables
+            }
+        if self.disk is not None:
+            tables |= self.disk.tracked_tables(account)
+        return tables
+
+    def invalidate_changed(self, altered: Dict[str, float], account: str) -> int:
+        """
+        Drop results whose source tables changed after they were fetched
+
+        Args:
+            altered: Mapping of table name -> epoch seconds it was last altered
+            account: Upper-cased account the tables belong to
+
+        Returns:
+            Number of cached results invalidated (memory and disk)
+        """
+        with self._lock:
+            changed = [
+                key for key, entry in self._entries.items()
+                if describe_key(key)['account'] == account
+                and _changed_since(entry.tables, entry.fetched_at, altered)
+            ]
+            for key in changed:
+                self._drop(key)
+            self._stats['invalidations'] += len(changed)
+        invalidated = {key_fingerprint(key) for key in changed}
+        if self.disk is not None:
+            invalidated |= self.disk.invalidate_changed(altered, account)
+        return len(invalidated)
+
+    def invalidate(self, key: tuple) -> bool:
+        """Drop one entry; returns True if it was cached"""
+        with self._lock:
+            if key not in self._entries:
+                return False
+            self._drop(key)
+            return True
+
+    def clear(self) -> int:
+        """
+        Drop every entry
+
+        Results on disk stop counting as fresh but are kept as the stale
+        fallback.
+
+        Returns:
+            Number of in-memory entries removed
+        """
+        with self._lock:
+            count = len(self._entries)
+            self._entries.clear()
+            self._bytes = 0
+            self._cleared_at = time.time()
+        logger.info(f"Query cache cleared ({count} entries)")
+        return count
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss/eviction counters and current memory use"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+            stats['bytes'] = self._bytes
+            stats['refreshing'] = len(self._refreshing)
+        stats['max_bytes'] = self.max_bytes
+        lookups = stats['hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['hits'] + stats['disk_hits']) / lookups if lookups else None
+        stats['disk'] = self.disk.get_stats() if self.disk else None
+        return stats
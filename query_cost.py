@@ -0,0 +1,160 @@
+"""
+Pre-flight query cost estimates
+Reads Snowflake's ``EXPLAIN USING JSON`` plan and decides whether an
+ad-hoc statement may run without the user confirming it first
+"""
+
+import json
+import logging
+import re
+from datetime import datetime
+from typing import Optional, Dict, Any, List, Union
+
+logger = logging.getLogger(__name__)
+
+_GB = 1024 ** 3
+
+
+class QueryCost:
+    """Scan size and join shape of a statement, as estimated by the compiler"""
+
+    def __init__(self, partitions_total: int = 0, partitions_assigned: int = 0,
+                 bytes_assigned: int = 0, tables: Optional[List[Dict[str, Any]]] = None,
+                 joins: Optional[List[str]] = None):
+        self.partitions_total = partitions_total
+        self.partitions_assigned = partitions_assigned
+        self.bytes_assigned = bytes_assigned
+        self.tables = tables or []
+        self.joins = joins or []
+
+    @property
+    def gb_assigned(self) -> float:
+        return self.bytes_assigned / _GB
+
+    @property
+    def pruned_fraction(self) -> Optional[float]:
+        """Share of partitions the compiler could skip, or None without partitions"""
+        if not self.partitions_total:
+            return None
+        return 1 - self.partitions_assigned / self.partitions_total
+
+    @property
+    def cartesian_joins(self) -> int:
+        return sum(1 for join in self.joins if join.lower().startswith('cartesian'))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'partitions_total': self.partitions_total,
+            'partitions_assigned': self.partitions_assigned,
+            'bytes_assigned': self.bytes_assigned,
+            'gb_assigned': self.gb_assigned,
+            'pruned_fraction': self.pruned_fraction,
+            'tables': self.tables,
+            'joins': self.joins
+        }
+
+
+def parse_explain(plan: Union[str, Dict[str, Any]]) -> QueryCost:
+    """
+    Build a cost estimate from an ``EXPLAIN USING JSON`` plan
+
+    Args:
+        plan: The plan's JSON text (the single ``content`` value EXPLAIN returns) or parsed dict
+
+    Returns:
+        Totals from ``GlobalStats``, one entry per table scan and the join operators in plan order
+
+    Raises:
+        ValueError: If the text is not a JSON plan
+    """
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    if not isinstance(plan, dict):
+        raise ValueError("EXPLAIN output is not a JSON object")
+
+    stats = plan.get('GlobalStats') or {}
+    tables = []
+    joins = []
+    for step in plan.get('Operations') or []:
+        for operation in step:
+            name = operation.get('operation', '')
+            if name == 'TableScan':
+                tables.append({
+                    'table': ', '.join(operation.get('objects') or []),
+                    'partitions_assigned': operation.get('partitionsAssigned', 0),
+                    'partitions_total': operation.get('partitionsTotal', 0),
+                    'bytes_assigned': operation.get('bytesAssigned', 0)
+                })
+            elif name.lower().endswith('join'):
+                joins.append(name)
+
+    return QueryCost(
+        partitions_total=stats.get('partitionsTotal', 0),
+        partitions_assigned=stats.get('partitionsAssigned', 0),
+        bytes_assigned=stats.get('bytesAssigned', 0),
+        tables=tables,
+        joins=joins
+    )
+
+
+class AdmissionPolicy:
+    """
+    Thresholds above which an ad-hoc statement needs confirmation to run
+
+    A threshold of 0 disables that check. During business hours (weekdays,
+    local time) the stricter ``business_hours_max_gb`` scan limit applies.
+    """
+
+    def __init__(self, max_gb: float = 0, max_partitions: int = 0,
+                 business_hours: str = '', business_hours_max_gb: float = 0):
+        self.max_gb = max_gb
+        self.max_partitions = max_partitions
+        self.business_hours = self._parse_hours(business_hours)
+        self.business_hours_max_gb = business_hours_max_gb
+
+    @staticmethod
+    def _parse_hours(spec: str) -> Optional[tuple]:
+        """``"8-18"`` -> (8, 18); None if empty or malformed"""
+        match = re.fullmatch(r'\s*(\d{1,2})\s*-\s*(\d{1,2})\s*', spec or '')
+        if not match:
+            if spec:
+                logger.warning(f"Ignoring malformed business hours {spec!r}; expected e.g. '8-18'")
+            return None
+        start, end = int(match.group(1)), int(match.group(2))
+        return (start, end) if 0 <= start < end <= 24 else None
+
+    def in_business_hours(self, now: Optional[datetime] = None) -> bool:
+        if self.business_hours is None:
+            return False
+        now = now or datetime.now()
+        start, end = self.business_hours
+        return now.weekday() < 5 and start <= now.hour < end
+
+    def check(self, cost: QueryCost, now: Optional[datetime] = None) -> List[str]:
+        """
+        Reasons the statement should not run unconfirmed
+
+        Args:
+            cost: Estimate from ``parse_explain``
+            now: Time used for the business-hours check; defaults to the current local time
+
+        Returns:
+            Human-readable reasons; empty if the statement may run
+        """
+        reasons = []
+        max_gb = self.max_gb
+        if self.business_hours_max_gb and self.in_business_hours(now):
+            max_gb = min(max_gb, self.business_hours_max_gb) if max_gb else self.business_hours_max_gb
+            limit_label = f"the {max_gb:,.0f} GB business-hours limit"
+        else:
+            limit_label = f"the {max_gb:,.0f} GB limit"
+
+        if max_gb and cost.gb_assigned > max_gb:
+            reasons.append(f"Scans an estimated {cost.gb_assigned:,.1f} GB, over {limit_label}")
+        if self.max_partitions and cost.partitions_assigned > self.max_partitions:
+            reasons.append(
+                f"Scans {cost.partitions_assigned:,} partitions, over the {self.max_partitions:,} partition limit"
+            )
+        if cost.cartesian_joins:
+            reasons.append(f"Contains {cost.cartesian_joins} cartesian join(s); check the join conditions")
+        return reasons
@@ -0,0 +1,179 @@
+"""
+Query history analysis
+Pulls the dashboard's tagged statements from Snowflake's query history and
+totals their compile, queue and execution time, bytes scanned and estimated
+credits per page and section
+"""
+
+import logging
+from typing import Dict, Any, Sequence, Tuple
+
+import pandas as pd
+
+from query_tag import QUERY_TAG_APP, parse_query_tag
+
+logger = logging.getLogger(__name__)
+
+HISTORY_INFORMATION_SCHEMA = 'information_schema'
+HISTORY_ACCOUNT_USAGE = 'account_usage'
+
+# Credits per hour a running warehouse of each size bills
+WAREHOUSE_CREDITS_PER_HOUR = {
+    'X-SMALL': 1, 'SMALL': 2, 'MEDIUM': 4, 'LARGE': 8, 'X-LARGE': 16,
+    '2X-LARGE': 32, '3X-LARGE': 64, '4X-LARGE': 128, '5X-LARGE': 256, '6X-LARGE': 512
+}
+
+_COLUMNS = """
+    QUERY_ID, QUERY_TAG, WAREHOUSE_NAME, WAREHOUSE_SIZE, EXECUTION_STATUS, START_TIME,
+    COMPILATION_TIME, QUEUED_PROVISIONING_TIME + QUEUED_REPAIR_TIME + QUEUED_OVERLOAD_TIME AS QUEUED_TIME,
+    EXECUTION_TIME, TOTAL_ELAPSED_TIME, BYTES_SCANNED, CREDITS_USED_CLOUD_SERVICES
+"""
+
+
+def history_query(source: str = HISTORY_INFORMATION_SCHEMA, hours: int = 24,
+                  limit: int = 10000) -> Tuple[str, Dict[str, Any]]:
+    """
+    Statement and parameters that read the dashboard's tagged queries
+
+    ``information_schema`` covers the last 7 days with no delay but only the
+    current user's queries; ``account_usage`` covers a year for every user but
+    lags by up to 45 minutes and needs access to the SNOWFLAKE database.
+
+    Args:
+        source: ``HISTORY_INFORMATION_SCHEMA`` or ``HISTORY_ACCOUNT_USAGE``
+        hours: How far back to look
+        limit: Most statements to read
+
+    Returns:
+        Tuple of (query, bind parameters)
+
+    Raises:
+        ValueError: If the source is unknown
+    """
+    params = {'hours': int(hours), 'limit': int(limit), 'tag_prefix': f'{{"app":"{QUERY_TAG_APP}"%'}
+    if source == HISTORY_INFORMATION_SCHEMA:
+        query = f"""
+        SELECT {_COLUMNS}
+        FROM TABLE(INFORMATION_SCHEMA.QUERY_HISTORY(
+            END_TIME_RANGE_START => DATEADD('hour', -%(hours)s, CURRENT_TIMESTAMP()),
+            RESULT_LIMIT => %(limit)s
+        ))
+        WHERE QUERY_TAG LIKE %(tag_prefix)s
+        """
+    elif source == HISTORY_ACCOUNT_USAGE:
+        query = f"""
+        SELECT {_COLUMNS}
+        FROM SNOWFLAKE.ACCOUNT_USAGE.QUERY_HISTORY
+        WHERE START_TIME >= DATEADD('hour', -%(hours)s, CURRENT_TIMESTAMP())
+          AND QUERY_TAG LIKE %(tag_prefix)s
+        ORDER BY START_TIME DESC
+        LIMIT %(limit)s
+        """
+    else:
+        raise ValueError(f"Unknown query history source: {source!r}")
+    return query, params
+
+
+def timings_query(query_ids: Sequence[str], minutes: int = 60) -> Tuple[str, Dict[str, Any]]:
+    """
+    Statement and parameters that read compile, queued and execution time
+    (milliseconds) for specific query ids
+
+    Args:
+        query_ids: Ids of statements that finished in the last ``minutes`` minutes
+        minutes: How far back to look
+
+    Returns:
+        Tuple of (query, bind parameters)
+    """
+    params = {f'id{n}': query_id for n, query_id in enumerate(query_ids)}
+    params['minutes'] = int(minutes)
+    placeholders = ", ".join(f"%(id{n})s" for n in range(len(query_ids)))
+    query = f"""
+    SELECT QUERY_ID, COMPILATION_TIME,
+           QUEUED_PROVISIONING_TIME + QUEUED_REPAIR_TIME + QUEUED_OVERLOAD_TIME AS QUEUED_TIME,
+           EXECUTION_TIME
+    FROM TABLE(INFORMATION_SCHEMA.QUERY_HISTORY(
+        END_TIME_RANGE_START => DATEADD('minute', -%(minutes)s, CURRENT_TIMESTAMP()),
+        RESULT_LIMIT => 10000
+    ))
+    WHERE QUERY_ID IN ({placeholders})
+    """
+    return query, params
+
+
+def attribute_history(history: pd.DataFrame) -> pd.DataFrame:
+    """
+    Add attribution and cost columns to raw query history rows
+
+    Adds PAGE, SECTION, QUERY_CLASS and CACHE from the tag, times in seconds,
+    GB scanned and EST_CREDITS: execution time billed at the warehouse size's
+    hourly rate plus cloud services credits. Warehouses running several
+    statements at once bill less than the sum, so treat it as an upper bound.
+
+    Args:
+        history: Rows from ``history_query``
+
+    Returns:
+        New DataFrame; rows whose tag is not the dashboard's are dropped
+    """
+    if history is None or history.empty:
+        return pd.DataFrame()
+    df = history.copy()
+    df.columns = [column.upper() for column in df.columns]
+    # Categorical columns (see dtype_optimizer) cannot map to dicts or fill with new values
+    tags = df['QUERY_TAG'].astype(object).map(parse_query_tag)
+    df = df[tags.notna()].copy()
+    tags = tags[tags.notna()]
+    for column, field in (('PAGE', 'page'), ('SECTION', 'section'), ('QUERY_CLASS', 'class'), ('CACHE', 'cache')):
+        df[column] = tags.map(lambda tag: tag.get(field) or '(none)')
+
+    for column in ('COMPILATION_TIME', 'QUEUED_TIME', 'EXECUTION_TIME', 'TOTAL_ELAPSED_TIME'):
+        df[column.replace('_TIME', '_SECONDS')] = pd.to_numeric(df[column], errors='coerce').fillna(0) / 1000
+    df['GB_SCANNED'] = pd.to_numeric(df['BYTES_SCANNED'], errors='coerce').fillna(0) / 1024 ** 3
+    rate = df['WAREHOUSE_SIZE'].astype(object).fillna('').str.upper().map(WAREHOUSE_CREDITS_PER_HOUR).fillna(0)
+    cloud_services = pd.to_numeric(df['CREDITS_USED_CLOUD_SERVICES'], errors='coerce').fillna(0)
+    df['EST_CREDITS'] = df['EXECUTION_SECONDS'] / 3600 * rate + cloud_services
+    return df
+
+
+def summarize_history(history: pd.DataFrame,
+                      by: Sequence[str] = ('PAGE', 'SECTION')) -> pd.DataFrame:
+    """
+    Total cost per group, most expensive first
+
+    Args:
+        history: Output of ``attribute_history``
+        by: Columns to group on
+
+    Returns:
+        One row per group with statement count, failures, total and mean
+        compile/queued/execution seconds, GB scanned and estimated credits
+    """
+    if history is None or history.empty:
+        return pd.DataFrame()
+    grouped = history.groupby(list(by), dropna=False)
+    summary = grouped.agg(
+        STATEMENTS=('QUERY_ID', 'count'),
+        FAILED=('EXECUTION_STATUS', lambda status: int((status.astype(str).str.upper() != 'SUCCESS').sum())),
+        COMPILE_SECONDS=('COMPILATION_SECONDS', 'sum'),
+        QUEUED_SECONDS=('QUEUED_SECONDS', 'sum'),
+        EXECUTION_SECONDS=('EXECUTION_SECONDS', 'sum'),
+        MEAN_ELAPSED_SECONDS=('TOTAL_ELAPSED_SECONDS', 'mean'),
+        GB_SCANNED=('GB_SCANNED', 'sum'),
+        EST_CREDITS=('EST_CREDITS', 'sum')
+    ).reset_index()
+    return summary.sort_values(['EST_CREDITS', 'EXECUTION_SECONDS'], ascending=False, ignore_index=True)
+
+
+def hourly_history(history: pd.DataFrame) -> pd.DataFrame:
+    """Statements, queued and execution seconds per hour, for trend charts"""
+    if history is None or history.empty:
+        return pd.DataFrame()
+    hours = pd.to_datetime(history['START_TIME']).dt.floor('h')
+    return history.groupby(hours).agg(
+        STATEMENTS=('QUERY_ID', 'count'),
+        QUEUED_SECONDS=('QUEUED_SECONDS', 'sum'),
+        EXECUTION_SECONDS=('EXECUTION_SECONDS', 'sum'),
+        MEAN_ELAPSED_SECONDS=('TOTAL_ELAPSED_SECONDS', 'mean')
+    ).reset_index().rename(columns={'START_TIME': 'HOUR'})
@@ -0,0 +1,213 @@
+"""
+Page-level query planner
+Sections register the queries they need up front; identical statements are
+run once and the rest execute concurrently on a bounded thread pool
+"""
+
+import logging
+import re
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional, Dict, Any
+
+import pandas as pd
+import streamlit as st
+
+from config import Config
+from snowflake_connector import QueryCancelledError
+from sql_utils import canonical_sql
+from query_tag import bind_context, current_context
+
+logger = logging.getLogger(__name__)
+
+
+def build_scalar_batch(metrics: Dict[str, str]) -> str:
+    """
+    Fuse named scalar aggregate queries into one single-row statement
+
+    Args:
+        metrics: Mapping of metric name -> statement returning exactly one value
+
+    Returns:
+        ``SELECT (q1) AS NAME1, (q2) AS NAME2 ...`` with one column per metric
+
+    Raises:
+        ValueError: If a metric name is not a plain SQL identifier
+    """
+    columns = []
+    for name, query in metrics.items():
+        if not re.fullmatch(r'[A-Za-z_][A-Za-z0-9_]*', name):
+            raise ValueError(f"Metric name must be a plain identifier: {name!r}")
+        columns.append(f"({canonical_sql(query)}) AS {name.upper()}")
+    return "SELECT " + ",\n       ".join(columns)
+
+
+def split_scalar_batch(df: Optional[pd.DataFrame], metrics: Dict[str, str]) -> Dict[str, Any]:
+    """
+    Split the row returned by a ``build_scalar_batch`` statement back into metrics
+
+    Args:
+        df: Result of the fused statement (None if it failed)
+        metrics: The mapping the statement was built from
+
+    Returns:
+        Mapping of metric name -> value; None for every metric if the query failed
+    """
+    if df is None or df.empty:
+        return {name: None for name in metrics}
+    row = df.iloc[0]
+    return {name: row.get(name.upper()) for name in metrics}
+
+
+def fetch_scalar_metrics(connector, metrics: Dict[str, str]) -> Dict[str, Any]:
+    """
+    Compute several scalar metrics in a single warehouse round trip
+
+    Args:
+        connector: SnowflakeConnector used to run the fused statement
+        metrics: Mapping of metric name -> statement returning exactly one value
+
+    Returns:
+        Mapping of metric name -> value; None for every metric if the query failed
+    """
+    return split_scalar_batch(connector.execute_query(build_scalar_batch(metrics)), metrics)
+
+
+class PagePlan:
+    """
+    Declarative set of queries for one page render
+
+    Usage::
+
+        plan = PagePlan(connector)
+        plan.add(USERS_QUERY)
+        plan.add(FLOWS_QUERY)
+        plan.execute()
+        df = plan.result(USERS_QUERY)
+
+    ``execute`` returns immediately; ``result`` blocks only until that one
+    query is done, so wall-clock time tracks the slowest query rather than
+    the sum of all of them.
+    """
+
+    def __init__(self, connector, max_workers: Optional[int] = None):
+        self.connector = connector
+        self.max_workers = max(1, max_workers or Config.QUERY_PLAN_MAX_WORKERS)
+        self._queries: Dict[tuple, tuple] = {}
+        self._futures: Dict[tuple, Future] = {}
+        self._reported: set = set()
+        self._requested = 0
+        self._started: Optional[float] = None
+
+    @staticmethod
+    def _key(query: str, params: Optional[Dict[str, Any]] = None) -> tuple:
+        return canonical_sql(query), tuple(sorted((params or {}).items()))
+
+    def add(self, query: str, params: Optional[Dict[str, Any]] = None,
+            soft_ttl: Optional[float] = None, query_class: Optional[str] = None):
+        """
+        Register a query this page needs
+
+        Args:
+            query: SQL query string
+            params: Optional parameters for parameterized queries
+            soft_ttl: Serve a cached result at once and refresh it in the
+                background once it is older than this many seconds
+            query_class: 'interactive' (default), 'lookup', 'analytics', 'adhoc'
+                or 'export'; picks the statement timeout and warehouse
+        """
+        self._requested += 1
+        key = self._key(query, params)
+        if key not in self._queries:
+            self._queries[key] = (query, params, soft_ttl, query_class, current_context())
+
+    def add_scalars(self, metrics: Dict[str, str]):
+        """
+        Register several scalar metrics as one fused statement
+
+        Args:
+            metrics: Mapping of metric name -> statement returning exactly one value
+        """
+        self.add(build_scalar_batch(metrics))
+
+    def execute(self):
+        """Start every registered query that is not already running"""
+        pending = [key for key in self._queries if key not in self._futures]
+        if not pending:
+            return
+
+        # Session credentials are only readable from the script thread
+        connection_params = self.connector._resolve_connection_params()
+        self._started = self._started or time.perf_counter()
+        executor = ThreadPoolExecutor(
+            max_workers=min(self.max_workers, len(pending)),
+            thread_name_prefix='page-plan'
+        )
+        for key in pending:
+            query, params, soft_ttl, query_class, context = self._queries[key]
+            # Attributed to the section that registered the query, not the one running the plan
+            self._futures[key] = executor.submit(
+                bind_context(self.connector.run_query, context), connection_params, query, params,
+                soft_ttl=soft_ttl, query_class=query_class
+            )
+        # Workers finish the submitted queries and then exit
+        executor.shutdown(wait=False)
+
+        logger.info(f"Page plan started {len(pending)} queries ({self._requested - len(self._queries)} duplicates skipped)")
+
+    def result(self, query: str, params: Optional[Dict[str, Any]] = None) -> Optional[pd.DataFrame]:
+        """
+        Wait for a registered query and return its results
+
+        Queries that were never registered run synchronously instead. If the
+        script reruns while waiting, the page's queries are cancelled and
+        None is returned.
+
+        Args:
+            query: SQL query string, as passed to ``add``
+            params: Optional parameters, as passed to ``add``
+
+        Returns:
+            DataFrame with query results or None if error
+        """
+        key = self._key(query, params)
+        future = self._futures.get(key)
+        if future is None:
+            return self.connector.execute_query(query, params)
+
+        try:
+            # Sections sharing a statement get their own frame to modify
+            return self.connector.wait_for(future).copy(deep=False)
+        except QueryCancelledError as e:
+            logger.info(str(e))
+            return None
+        except Exception as e:
+            if key not in self._reported:
+                self._reported.add(key)
+                logger.error(f"Query execution failed: {str(e)}")
+                st.error(f"❌ Query failed: {str(e)}")
+            return None
+
+    def scalars(self, metrics: Dict[str, str]) -> Dict[str, Any]:
+        """
+        Wait for metrics registered with ``add_scalars`` and split them out
+
+        Args:
+            metrics: The mapping passed to ``add_scalars``
+
+        Returns:
+            Mapping of metric name -> value; None for every metric if the query failed
+        """
+        return split_scalar_batch(self.result(build_scalar_batch(metrics)), metrics)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Requested vs executed query counts and elapsed time so far"""
+        done = [future for future in self._futures.values() if future.done()]
+        return {
+            'requested': self._requested,
+            'executed': len(self._futures),
+            'deduplicated': self._requested - len(self._queries),
+            'completed': len(done),
+            'failed': sum(1 for future in done if future.exception() is not None),
+            'elapsed_seconds': time.perf_counter() - self._started if self._started else 0.0
+        }
@@ -0,0 +1,207 @@
+"""
+Running-query registry
+Tracks the statements each Streamlit session has running on Snowflake so
+they can be listed and cancelled once their results are no longer wanted
+"""
+
+import itertools
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Optional, Dict, Any, List, Hashable
+
+logger = logging.getLogger(__name__)
+
+# Query classes; each has its own statement timeout and can run on its own
+# warehouse (see Config.get_statement_timeout and Config.get_query_warehouse)
+QUERY_CLASS_LOOKUP = 'lookup'
+QUERY_CLASS_INTERACTIVE = 'interactive'
+QUERY_CLASS_ANALYTICS = 'analytics'
+QUERY_CLASS_ADHOC = 'adhoc'
+QUERY_CLASS_EXPORT = 'export'
+QUERY_CLASSES = (QUERY_CLASS_LOOKUP, QUERY_CLASS_INTERACTIVE, QUERY_CLASS_ANALYTICS,
+                 QUERY_CLASS_ADHOC, QUERY_CLASS_EXPORT)
+
+# Recent durations kept per query class for the latency percentiles
+LATENCY_SAMPLES = 500
+
+
+class RunningQuery:
+    """One statement currently executing on Snowflake"""
+
+    def __init__(self, token: int, owner: Optional[str], query: str, query_class: str,
+                 connection_params: Dict[str, Any], cancellable: bool,
+                 flight_key: Optional[Hashable] = None):
+        self.token = token
+        self.owner = owner
+        self.query = query
+        self.query_class = query_class
+        self.connection_params = connection_params
+        self.cancellable = cancellable
+        self.flight_key = flight_key
+        self.warehouse = connection_params.get('warehouse')
+        self.started_at = time.time()
+        # Sent in QUERY_TAG so the statement can be found while it runs
+        self.statement_id = uuid.uuid4().hex[:16]
+        self.session_id: Optional[int] = None
+        self.query_tag: Optional[str] = None
+        self.query_id: Optional[str] = None
+        self.cancelling = False
+
+    def cancel_statement(self) -> Optional[tuple]:
+        """
+        Statement and parameters that cancel this query, or None until its id is known
+
+        Only the query id is targeted: the Snowflake session a statement ran
+        on goes back to the pool when it finishes, so cancelling by session
+        could stop another caller's statement.
+        """
+        if self.query_id:
+            return "SELECT SYSTEM$CANCEL_QUERY(%(query_id)s)", {'query_id': self.query_id}
+        return None
+
+    def lookup_statement(self) -> Optional[tuple]:
+        """
+        Statement and parameters that find the id of this query while it runs
+
+        A blocking statement's id only reaches the client when it returns.
+        Its session's history is searched for the statement's unique
+        ``QUERY_TAG`` instead; a finished statement is not matched. None until
+        the statement is about to be sent.
+        """
+        if self.session_id is None or not self.query_tag:
+            return None
+        return (
+            "SELECT QUERY_ID FROM TABLE(INFORMATION_SCHEMA.QUERY_HISTORY_BY_SESSION("
+            "SESSION_ID => %(session_id)s, RESULT_LIMIT => 100)) "
+            "WHERE QUERY_TAG = %(query_tag)s "
+            "AND EXECUTION_STATUS IN ('RUNNING', 'QUEUED', 'RESUMING_WAREHOUSE', 'BLOCKED')",
+            {'session_id': self.session_id, 'query_tag': self.query_tag}
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'token': self.token,
+            'owner': self.owner,
+            'query': self.query,
+            'query_class': self.query_class,
+            'warehouse': self.warehouse,
+            'query_id': self.query_id,
+            'started_at': self.started_at,
+            'elapsed_seconds': time.time() - self.started_at,
+            'cancellable': self.cancellable,
+            'cancelling': self.cancelling
+        }
+
+
+class QueryRegistry:
+    """
+    Process-wide list of running statements, grouped by owning session
+
+    Entries are added when a statement is sent and removed when it returns,
+    fails or is cancelled. The registry never talks to Snowflake itself; the
+    connector runs the statement returned by ``RunningQuery.cancel_statement``.
+    Durations of finished statements are kept per query class and warehouse
+    so routing can be checked.
+    """
+
+    def __init__(self):
+        self._running: Dict[int, RunningQuery] = {}
+        self._tokens = itertools.count(1)
+        self._lock = threading.Lock()
+        self._latencies: Dict[tuple, deque] = {}
+        self._stats = {
+            'started': 0,
+            'finished': 0,
+            'cancel_requests': 0
+        }
+
+    def start(self, owner: Optional[str], query: str, query_class: str,
+              connection_params: Dict[str, Any], cancellable: bool = True,
+              flight_key: Optional[Hashable] = None) -> RunningQuery:
+        """
+        Record a statement that is about to run
+
+        Args:
+            owner: Streamlit session id the statement runs for
+            query: SQL text
+            query_class: One of ``QUERY_CLASSES``
+            connection_params: Login parameters used to cancel it later
+            cancellable: False for work other sessions rely on, e.g. cache refreshes
+            flight_key: Single-flight key, so shared executions can be recognised
+
+        Returns:
+            The registry entry; set ``query_id`` once the statement is sent
+        """
+        entry = RunningQuery(next(self._tokens), owner, query, query_class,
+                             connection_params, cancellable, flight_key)
+        with self._lock:
+            self._running[entry.token] = entry
+            self._stats['started'] += 1
+        return entry
+
+    def finish(self, entry: RunningQuery):
+        """Remove a statement that returned, failed or was cancelled, and record its duration"""
+        elapsed = time.time() - entry.started_at
+        with self._lock:
+            if self._running.pop(entry.token, None) is not None:
+                self._stats['finished'] += 1
+                key = (entry.query_class, entry.warehouse or '')
+                self._latencies.setdefault(key, deque(maxlen=LATENCY_SAMPLES)).append(elapsed)
+
+    def get(self, token: int) -> Optional[RunningQuery]:
+        with self._lock:
+            return self._running.get(token)
+
+    def running(self, owner: Optional[str] = None) -> List[RunningQuery]:
+        """
+        Statements running now, oldest first
+
+        Args:
+            owner: Only this session's statements; all sessions if None
+        """
+        with self._lock:
+            entries = [entry for entry in self._running.values() if owner is None or entry.owner == owner]
+        return sorted(entries, key=lambda entry: entry.started_at)
+
+    def mark_cancelling(self, entry: RunningQuery) -> bool:
+        """Flag a statement as being cancelled; False if it already finished or is flagged"""
+        with self._lock:
+            if entry.token not in self._running or entry.cancelling:
+                return False
+            entry.cancelling = True
+            self._stats['cancel_requests'] += 1
+            return True
+
+    def get_latency_stats(self) -> List[Dict[str, Any]]:
+        """
+        Statement durations per query class and warehouse
+
+        Returns:
+            One dictionary per (class, warehouse) with the sample count and the
+            mean, median, 95th percentile and maximum of the recent durations in seconds
+        """
+        with self._lock:
+            samples = {key: sorted(durations) for key, durations in self._latencies.items()}
+        stats = []
+        for (query_class, warehouse), durations in sorted(samples.items()):
+            count = len(durations)
+            stats.append({
+                'query_class': query_class,
+                'warehouse': warehouse,
+                'samples': count,
+                'mean_seconds': sum(durations) / count,
+                'p50_seconds': durations[count // 2],
+                'p95_seconds': durations[min(count - 1, int(count * 0.95))],
+                'max_seconds': durations[-1]
+            })
+        return stats
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Statements started, finished and cancelled, and how many run now"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['running'] = len(self._running)
+        return stats
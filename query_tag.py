@@ -0,0 +1,127 @@
+"""
+Query attribution
+Every statement the dashboard sends carries a JSON ``QUERY_TAG`` naming the
+page, section, session, query class and cache status it ran for, so its
+cost can be traced back in Snowflake's query history
+"""
+
+import contextvars
+import functools
+import json
+import re
+from contextlib import contextmanager
+from typing import Optional, Dict, Any, Callable
+
+# Value of the "app" field; query history is filtered on it
+QUERY_TAG_APP = 'snowflake-dashboard'
+# Snowflake rejects longer QUERY_TAG values
+QUERY_TAG_MAX_LENGTH = 2000
+
+# Cache status values
+CACHE_MISS = 'miss'
+CACHE_REFRESH = 'refresh'
+CACHE_BYPASS = 'bypass'
+
+_context: contextvars.ContextVar = contextvars.ContextVar('query_context', default={})
+
+
+@contextmanager
+def query_context(**fields: Optional[str]):
+    """
+    Attribute statements issued inside the block, e.g. ``query_context(section='tiers')``
+
+    Fields nest: inner blocks add to or override the outer block's fields.
+    """
+    token = _context.set({**_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+def current_context() -> Dict[str, Optional[str]]:
+    """Attribution fields in effect on this thread"""
+    return dict(_context.get())
+
+
+def bind_context(fn: Callable[..., Any],
+                 context: Optional[Dict[str, Optional[str]]] = None) -> Callable[..., Any]:
+    """
+    Carry attribution into ``fn`` when it runs on another thread
+
+    Threads start with an empty context, so work handed to a worker would
+    otherwise lose its page and section.
+
+    Args:
+        fn: Callable to wrap
+        context: Fields to run it with; defaults to the caller's ``current_context()``
+    """
+    fields = current_context() if context is None else context
+
+    @functools.wraps(fn)
+    def bound(*args, **kwargs):
+        with query_context(**fields):
+            return fn(*args, **kwargs)
+    return bound
+
+
+def tag_section(fn: Callable[..., Any]) -> Callable[..., Any]:
+    """Decorator naming a dashboard method as the section of the statements it issues"""
+    section = re.sub(r'^_?(show_)?', '', fn.__name__)
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with query_context(section=section):
+            return fn(*args, **kwargs)
+    return wrapper
+
+
+def build_query_tag(session: Optional[str], query_class: str,
+                    context: Optional[Dict[str, Optional[str]]] = None,
+                    statement: Optional[str] = None) -> str:
+    """
+    ``QUERY_TAG`` value for a statement
+
+    Args:
+        session: Streamlit session id the statement runs for
+        query_class: Query class the statement runs as
+        context: Attribution fields; defaults to ``current_context()``
+        statement: Unique id of this execution, so it can be found while it runs
+
+    Returns:
+        Compact JSON, at most ``QUERY_TAG_MAX_LENGTH`` characters
+    """
+    context = current_context() if context is None else context
+    tag = {
+        'app': QUERY_TAG_APP,
+        'page': _plain_label(context.get('page')),
+        'section': context.get('section'),
+        'session': session,
+        'class': query_class,
+        'cache': context.get('cache'),
+        'statement': statement
+    }
+    text = json.dumps({name: value for name, value in tag.items() if value}, separators=(',', ':'))
+    if len(text) > QUERY_TAG_MAX_LENGTH:
+        tag['section'] = (tag['section'] or '')[:100]
+        tag['page'] = (tag['page'] or '')[:100]
+        text = json.dumps({name: value for name, value in tag.items() if value}, separators=(',', ':'))
+    return text
+
+
+def parse_query_tag(text: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Fields of a dashboard ``QUERY_TAG``, or None for statements tagged by anything else"""
+    try:
+        tag = json.loads(text or '')
+    except ValueError:
+        return None
+    if not isinstance(tag, dict) or tag.get('app') != QUERY_TAG_APP:
+        return None
+    return tag
+
+
+def _plain_label(label: Optional[str]) -> Optional[str]:
+    """Page label without its leading emoji"""
+    if not label:
+        return label
+    return re.sub(r'^[^\w]+', '', label).strip() or label
@@ -0,0 +1,263 @@
+"""
+Page render profiler
+Times each dashboard section of a rerun and splits its time into Snowflake
+waits, Plotly figure building, Streamlit element calls and the rest (pandas
+and other Python), for the waterfall shown under the page
+"""
+
+import contextvars
+import functools
+import inspect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional, Dict, Any, List, Callable
+
+logger = logging.getLogger(__name__)
+
+CATEGORY_SQL = 'sql'
+CATEGORY_PLOTLY = 'plotly'
+CATEGORY_STREAMLIT = 'streamlit'
+# Whatever a section spends outside the other categories: DataFrame work and other Python
+CATEGORY_PANDAS = 'pandas'
+CATEGORIES = (CATEGORY_SQL, CATEGORY_PANDAS, CATEGORY_PLOTLY, CATEGORY_STREAMLIT)
+
+# Figure methods that build or restyle a figure
+_FIGURE_METHODS = ('__init__', 'add_trace', 'add_traces', 'update_layout', 'update_traces',
+                   'update_xaxes', 'update_yaxes', 'add_annotation', 'add_shape', 'add_hline', 'add_vline')
+
+_profile: contextvars.ContextVar = contextvars.ContextVar('render_profile', default=None)
+_hooks_lock = threading.Lock()
+_hooks_installed = False
+
+
+class Span:
+    """One timed section of a rerun"""
+
+    __slots__ = ('name', 'depth', 'start', 'end', 'exclusive', 'children')
+
+    def __init__(self, name: str, depth: int, start: float):
+        self.name = name
+        self.depth = depth
+        self.start = start
+        self.end: Optional[float] = None
+        # Category seconds spent in this span but not in a child span
+        self.exclusive: Dict[str, float] = {}
+        self.children: List['Span'] = []
+
+    @property
+    def duration(self) -> float:
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+    def breakdown(self) -> Dict[str, float]:
+        """Seconds per category including child spans; the pandas share is what remains"""
+        totals = {category: self.exclusive.get(category, 0.0) for category in CATEGORIES}
+        own = self.duration - sum(child.duration for child in self.children)
+        totals[CATEGORY_PANDAS] = max(0.0, own - sum(totals.values()))
+        for child in self.children:
+            for category, seconds in child.breakdown().items():
+                totals[category] += seconds
+        return totals
+
+
+class RenderProfile:
+    """
+    Section spans and category time for one rerun of the script thread
+
+    Categories do not nest: time goes to the first category entered until it
+    is left, so a Plotly figure serialised inside ``st.plotly_chart`` counts
+    as Streamlit time. Overlapping waits (concurrent async queries) count once.
+    """
+
+    def __init__(self, name: str = 'rerun'):
+        self.root = Span(name, 0, time.perf_counter())
+        self._stack = [self.root]
+        self._open: Dict[str, int] = {}
+        self._active: Optional[str] = None
+        self._since = 0.0
+
+    def _charge(self):
+        """Charge the active category's time so far to the innermost span"""
+        now = time.perf_counter()
+        if self._active is not None:
+            exclusive = self._stack[-1].exclusive
+            exclusive[self._active] = exclusive.get(self._active, 0.0) + now - self._since
+        self._since = now
+
+    @contextmanager
+    def section(self, name: str):
+        self._charge()
+        span = Span(name, len(self._stack), time.perf_counter())
+        self._stack[-1].children.append(span)
+        self._stack.append(span)
+        try:
+            yield span
+        finally:
+            self._charge()
+            span.end = time.perf_counter()
+            # Tolerate sections left out of order, e.g. by an exception in a generator
+            if span in self._stack:
+                del self._stack[self._stack.index(span):]
+
+    @contextmanager
+    def category(self, category: str):
+        self._open[category] = self._open.get(category, 0) + 1
+        if self._active is None:
+            self._charge()
+            self._active = category
+        try:
+            yield
+        finally:
+            self._open[category] -= 1
+            if self._active == category and not self._open[category]:
+                self._charge()
+                # Another overlapping wait may still be open
+                self._active = next((name for name, count in self._open.items() if count), None)
+
+    def finish(self):
+        self._charge()
+        self._active = None
+        self.root.end = time.perf_counter()
+
+    def rows(self, budget: float = 0) -> List[Dict[str, Any]]:
+        """
+        Every span in start order, for the waterfall
+
+        Args:
+            budget: Seconds a section may take; 0 disables the check
+
+        Returns:
+            One dictionary per span with name, depth, start and duration in
+            seconds from the start of the rerun, seconds per category and
+            ``over_budget`` (never set for the rerun itself)
+        """
+        rows = []
+
+        def visit(span: Span):
+            row = {
+                'name': span.name,
+                'depth': span.depth,
+                'start': span.start - self.root.start,
+                'duration': span.duration,
+                'over_budget': bool(budget) and span is not self.root and span.duration > budget
+            }
+            row.update(span.breakdown())
+            rows.append(row)
+            for child in span.children:
+                visit(child)
+
+        visit(self.root)
+        return rows
+
+
+def current_profile() -> Optional[RenderProfile]:
+    """Profile of the rerun running on this thread, if profiling is on"""
+    return _profile.get()
+
+
+@contextmanager
+def profile_rerun(name: str = 'rerun'):
+    """Profile the block; yields the ``RenderProfile`` to read once the block ends"""
+    install_hooks()
+    profile = RenderProfile(name)
+    token = _profile.set(profile)
+    try:
+        yield profile
+    finally:
+        profile.finish()
+        _profile.reset(token)
+
+
+@contextmanager
+def timed(category: str):
+    """Count the block as ``category`` time when a profile is running; free otherwise"""
+    profile = _profile.get()
+    if profile is None:
+        yield
+        return
+    with profile.category(category):
+        yield
+
+
+def profile_sections(cls):
+    """
+    Class decorator timing every ``_show_*`` method as a section of the rerun
+
+    Methods run unwrapped apart from one context variable lookup while no
+    profile is active.
+    """
+    for name, member in list(vars(cls).items()):
+        if name.startswith('_show_') and inspect.isfunction(member):
+            setattr(cls, name, _section_wrapper(member, name[len('_show_'):]))
+    return cls
+
+
+def _section_wrapper(fn: Callable[..., Any], section: str) -> Callable[..., Any]:
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        profile = _profile.get()
+        if profile is None:
+            return fn(*args, **kwargs)
+        with profile.section(section):
+            return fn(*args, **kwargs)
+    return wrapper
+
+
+def _category_wrapper(fn: Callable[..., Any], category: str) -> Callable[..., Any]:
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        profile = _profile.get()
+        if profile is None:
+            return fn(*args, **kwargs)
+        with profile.category(category):
+            return fn(*args, **kwargs)
+    wrapper._render_profiler_category = category
+    return wrapper
+
+
+def install_hooks():
+    """
+    Time Plotly figure building and Streamlit element calls
+
+    Wraps the ``plotly.express`` functions, the figure-building methods of
+    ``go.Figure`` and the public ``DeltaGenerator`` methods (and their
+    ``st.*`` aliases) once per process. The wrappers only time calls made
+    on a thread with an active profile, but they stay in place for every
+    session until the process exits, so callers gate the first profile
+    behind ``Config.RENDER_PROFILER_ENABLED``.
+    """
+    global _hooks_installed
+    with _hooks_lock:
+        if _hooks_installed:
+            return
+        _hooks_installed = True
+
+        try:
+            import plotly.express as px
+            import plotly.graph_objects as go
+            for name in getattr(px, '__all__', []):
+                member = getattr(px, name, None)
+                if inspect.isfunction(member):
+                    setattr(px, name, _category_wrapper(member, CATEGORY_PLOTLY))
+            for name in _FIGURE_METHODS:
+                member = getattr(go.Figure, name, None)
+                if callable(member):
+                    setattr(go.Figure, name, _category_wrapper(member, CATEGORY_PLOTLY))
+        except ImportError:
+            pass
+
+        import streamlit as st
+        from streamlit.delta_generator import DeltaGenerator
+        for name in dir(DeltaGenerator):
+            if name.startswith('_'):
+                continue
+            member = inspect.getattr_static(DeltaGenerator, name)
+            if inspect.isfunction(member):
+                setattr(DeltaGenerator, name, _category_wrapper(member, CATEGORY_STREAMLIT))
+        for name in dir(st):
+            member = getattr(st, name)
+            if (inspect.ismethod(member) and isinstance(member.__self__, DeltaGenerator)
+                    and not hasattr(member, '_render_profiler_category')):
+                setattr(st, name, _category_wrapper(member, CATEGORY_STREAMLIT))
+        logger.info("Render profiler hooks installed")
@@ -0,0 +1,248 @@
+"""
+Retries and circuit breaking for Snowflake calls
+Transient failures are retried with jittered exponential backoff; when an
+account keeps failing, calls fail fast for a while instead of every session
+retrying and logging in again at the same time
+"""
+
+import logging
+import random
+import re
+import threading
+import time
+from typing import Optional, Dict, Any, Callable, TypeVar
+
+from snowflake.connector import errors as sf_errors
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+# Session or login token no longer valid; a fresh pooled connection fixes it
+SESSION_EXPIRED_ERRNOS = {390111, 390112, 390114}
+# Connector-side connection failures (failed to connect, connection closed, timeout)
+CONNECTION_ERRNOS = {250001, 250002, 251011}
+
+_TRANSIENT_ERROR_TYPES = (
+    ConnectionError,
+    TimeoutError,
+    sf_errors.OperationalError,
+    sf_errors.InterfaceError,
+    sf_errors.BadGatewayError,
+    sf_errors.GatewayTimeoutError,
+    sf_errors.InternalServerError,
+    sf_errors.ServiceUnavailableError,
+    sf_errors.RequestTimeoutError,
+    sf_errors.OtherHTTPRetryableError,
+    sf_errors.TokenExpiredError
+)
+_WAREHOUSE_RESUMING = re.compile(r'warehouse .*(resuming|being resumed|is starting)', re.I | re.S)
+# Wrong credentials surface as connection errors too, but retrying them only locks the account
+_PERMANENT_MESSAGES = re.compile(r'incorrect username or password|user .* is locked|not authorized', re.I)
+
+CIRCUIT_CLOSED = 'closed'
+CIRCUIT_OPEN = 'open'
+CIRCUIT_HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling Snowflake while its circuit breaker is open"""
+
+    def __init__(self, key: str, retry_in: float):
+        super().__init__(f"Snowflake is unavailable for {key or 'this account'}; retrying in {retry_in:.0f}s")
+        self.key = key
+        self.retry_in = retry_in
+
+
+def is_transient(error: BaseException) -> bool:
+    """
+    Whether a failed Snowflake call is worth retrying
+
+    Network failures, expired sessions and warehouses that are still resuming
+    are transient; SQL errors, cancellations and bad credentials are not.
+    """
+    message = str(error)
+    if _PERMANENT_MESSAGES.search(message):
+        return False
+    errno = getattr(error, 'errno', None)
+    if errno in SESSION_EXPIRED_ERRNOS or errno in CONNECTION_ERRNOS:
+        return True
+    if _WAREHOUSE_RESUMING.search(message):
+        return True
+    return isinstance(error, _TRANSIENT_ERROR_TYPES)
+
+
+class CircuitBreaker:
+    """
+    Per-account breaker: closed, then open after repeated transient failures
+
+    While open every call is refused. After ``reset_timeout`` seconds one
+    trial call is let through (half-open); its success closes the breaker,
+    its failure opens it again.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.state = CIRCUIT_CLOSED
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_running = False
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead now; call with the owner's lock held"""
+        if self.state == CIRCUIT_CLOSED:
+            return True
+        if self.state == CIRCUIT_OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = CIRCUIT_HALF_OPEN
+        if self.state == CIRCUIT_HALF_OPEN and not self._trial_running:
+            self._trial_running = True
+            return True
+        return False
+
+    def retry_in(self) -> float:
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def record_success(self):
+        self.state = CIRCUIT_CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+
+    def record_failure(self) -> bool:
+        """Count a transient failure; True if this opened the breaker"""
+        self.failures += 1
+        was_open = self.state == CIRCUIT_OPEN
+        if self.state == CIRCUIT_HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = CIRCUIT_OPEN
+            self.opened_at = time.monotonic()
+        self._trial_running = False
+        return self.state == CIRCUIT_OPEN and not was_open
+
+
+class ResilienceManager:
+    """
+    Process-wide retry policy and circuit breakers, one breaker per account
+
+    ``call`` runs a function that talks to Snowflake, retrying transient
+    failures up to ``max_attempts`` times with full-jitter exponential
+    backoff (a random delay up to ``base_delay * 2**attempt``, capped at
+    ``max_delay``). Failed calls leave their pooled connection flagged for a
+    health check, so a retry after an expired session logs in afresh.
+    """
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.5, max_delay: float = 8,
+                 failure_threshold: int = 5, reset_timeout: float = 30):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            'calls': 0,
+            'retries': 0,
+            'recovered': 0,
+            'transient_failures': 0,
+            'permanent_failures': 0,
+            'circuit_opened': 0,
+            'short_circuited': 0
+        }
+
+    def _breaker(self, key: str) -> CircuitBreaker:
+        breaker = self._breakers.get(key)
+        if breaker is None:
+            breaker = self._breakers[key] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+        return breaker
+
+    def backoff(self, attempt: int) -> float:
+        """Seconds to wait before retry number ``attempt`` (0-based)"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def call(self, key: str, fn: Callable[[], T], retry: bool = True) -> T:
+        """
+        Run ``fn`` under the breaker for ``key``, retrying transient failures
+
+        Args:
+            key: Breaker identity, normally the Snowflake account
+            fn: Zero-argument callable performing one attempt
+            retry: False for calls that must not run twice, e.g. writes
+
+        Returns:
+            Whatever ``fn`` returned
+
+        Raises:
+            CircuitOpenError: If the breaker is open
+            Exception: The last error from ``fn`` once retries are exhausted
+        """
+        attempts = self.max_attempts if retry else 1
+        for attempt in range(attempts):
+            with self._lock:
+                breaker = self._breaker(key)
+                if not breaker.allow():
+                    self._stats['short_circuited'] += 1
+                    raise CircuitOpenError(key, breaker.retry_in())
+                self._stats['calls'] += 1
+            try:
+                result = fn()
+            except Exception as e:
+                if not is_transient(e):
+                    with self._lock:
+                        # Snowflake answered, so it is healthy; the statement is at fault
+                        breaker.record_success()
+                        self._stats['permanent_failures'] += 1
+                    raise
+                with self._lock:
+                    self._stats['transient_failures'] += 1
+                    if breaker.record_failure():
+                        self._stats['circuit_opened'] += 1
+                        logger.warning(f"Circuit breaker opened for {key} after {breaker.failures} failures")
+                    give_up = attempt + 1 >= attempts or breaker.state == CIRCUIT_OPEN
+                    if not give_up:
+                        self._stats['retries'] += 1
+                if give_up:
+                    raise
+                delay = self.backoff(attempt)
+                logger.warning(f"Transient Snowflake error, retrying in {delay:.2f}s: {str(e)}")
+                time.sleep(delay)
+                continue
+            with self._lock:
+                breaker.record_success()
+                if attempt:
+                    self._stats['recovered'] += 1
+            return result
+
+    def check(self, key: str):
+        """
+        Fail fast if the breaker for ``key`` is open, without using up a half-open trial
+
+        Raises:
+            CircuitOpenError: If calls for ``key`` are being refused
+        """
+        with self._lock:
+            breaker = self._breaker(key)
+            if breaker.state == CIRCUIT_OPEN and breaker.retry_in() > 0:
+                self._stats['short_circuited'] += 1
+                raise CircuitOpenError(key, breaker.retry_in())
+
+    def state(self, key: str) -> Dict[str, Any]:
+        """Breaker state for one key: state, consecutive failures and seconds until a retry"""
+        with self._lock:
+            breaker = self._breaker(key)
+            return {
+                'state': breaker.state,
+                'failures': breaker.failures,
+                'retry_in': breaker.retry_in() if breaker.state != CIRCUIT_CLOSED else 0.0
+            }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Calls, retries, failures by kind and breaker activity, plus breakers open now"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['open_circuits'] = sorted(
+                key for key, breaker in self._breakers.items() if breaker.state != CIRCUIT_CLOSED
+            )
+        return stats
@@ -0,0 +1,290 @@
+"""
+On-demand rerun profiling
+Samples the script thread's stack at a fixed interval while one rerun runs
+(cProfile where stack sampling is unavailable) and saves a collapsed-stack
+file for flamegraph tools plus a table of the hottest functions
+"""
+
+import cProfile
+import json
+import logging
+import os
+import pstats
+import re
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Optional, Dict, Any, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+MODE_SAMPLE = 'sample'
+MODE_CPROFILE = 'cprofile'
+
+# Functions kept in a report's table
+TOP_FUNCTIONS = 50
+
+
+def _frame_label(code) -> str:
+    """``function (file.py:line)``, the label py-spy and flamegraph.pl use"""
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """
+    Profile one thread from ``start`` to ``stop``
+
+    In sample mode a daemon thread reads the target thread's stack every
+    ``interval`` seconds through ``sys._current_frames``; the target runs at
+    full speed apart from the GIL hand-offs. cProfile mode instruments every
+    call on the calling thread instead, which is exact but slows the rerun
+    down, and records no stacks.
+    """
+
+    def __init__(self, interval: float = 0.005, mode: str = MODE_SAMPLE,
+                 root_file: Optional[str] = None):
+        """
+        Args:
+            interval: Seconds between stack samples
+            mode: ``MODE_SAMPLE`` or ``MODE_CPROFILE``; sample mode falls back
+                to cProfile on interpreters without ``sys._current_frames``
+            root_file: Drop stack frames above the first frame in this file,
+                e.g. Streamlit's script runner above ``app.py``
+        """
+        if mode == MODE_SAMPLE and not hasattr(sys, '_current_frames'):
+            mode = MODE_CPROFILE
+        self.interval = max(0.001, interval)
+        self.mode = mode
+        self.root_file = os.path.abspath(root_file) if root_file else None
+        self._stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+        self._cprofile: Optional[cProfile.Profile] = None
+        self._started = 0.0
+
+    def start(self):
+        """Start profiling the calling thread"""
+        self._started = time.perf_counter()
+        if self.mode == MODE_CPROFILE:
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+            return
+        target = threading.get_ident()
+        self._sampler = threading.Thread(target=self._sample, args=(target,), name='rerun-sampler', daemon=True)
+        self._sampler.start()
+
+    def _sample(self, target: int):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(target)
+            if frame is None:
+                return
+            stack = []
+            while frame is not None:
+                stack.append(frame.f_code)
+                frame = frame.f_back
+            if self.root_file:
+                # Outermost frame in the root file, so the script runner's frames are dropped
+                root = next((index for index in range(len(stack) - 1, -1, -1)
+                             if stack[index].co_filename == self.root_file), len(stack) - 1)
+                stack = stack[:root + 1]
+            self._stacks[';'.join(_frame_label(code) for code in reversed(stack))] += 1
+
+    def stop(self) -> 'ProfileReport':
+        """Stop profiling and return what was recorded"""
+        elapsed = time.perf_counter() - self._started
+        if self.mode == MODE_CPROFILE:
+            self._cprofile.disable()
+            return ProfileReport.from_cprofile(self._cprofile, elapsed)
+        self._stop.set()
+        self._sampler.join()
+        return ProfileReport.from_stacks(dict(self._stacks), self.interval, elapsed)
+
+
+class ProfileReport:
+    """Result of profiling one rerun: hottest functions and, when sampled, collapsed stacks"""
+
+    def __init__(self, mode: str, elapsed: float, functions: List[Dict[str, Any]],
+                 stacks: Optional[Dict[str, int]] = None, samples: int = 0,
+                 interval: Optional[float] = None, stats: Optional[pstats.Stats] = None):
+        self.mode = mode
+        self.elapsed = elapsed
+        self.functions = functions
+        self.stacks = stacks or {}
+        self.samples = samples
+        self.interval = interval
+        self.stats = stats
+
+    @classmethod
+    def from_stacks(cls, stacks: Dict[str, int], interval: float, elapsed: float) -> 'ProfileReport':
+        """
+        Function table from sampled stacks
+
+        ``self`` counts samples where the function was running, ``total``
+        samples where it was anywhere on the stack (once per sample, so
+        recursion is not double counted). Seconds are samples scaled to the
+        measured wall time.
+        """
+        samples = sum(stacks.values())
+        own = Counter()
+        inclusive = Counter()
+        for stack, count in stacks.items():
+            frames = stack.split(';')
+            own[frames[-1]] += count
+            for frame in set(frames):
+                inclusive[frame] += count
+        per_sample = elapsed / samples if samples else 0.0
+        functions = [
+            {
+                'function': frame,
+                'self_samples': own[frame],
+                'total_samples': count,
+                'self_pct': own[frame] / samples * 100,
+                'total_pct': count / samples * 100,
+                'self_seconds': own[frame] * per_sample,
+                'total_seconds': count * per_sample
+            }
+            for frame, count in inclusive.items()
+        ]
+        functions.sort(key=lambda row: (row['self_samples'], row['total_samples']), reverse=True)
+        return cls(MODE_SAMPLE, elapsed, functions[:TOP_FUNCTIONS], stacks, samples, interval)
+
+    @classmethod
+    def from_cprofile(cls, profile: cProfile.Profile, elapsed: float) -> 'ProfileReport':
+        """Function table from cProfile's per-function self (tottime) and cumulative times"""
+        stats = pstats.Stats(profile)
+        functions = []
+        for (filename, line, name), (calls, _, own, cumulative, _) in stats.stats.items():
+            functions.append({
+                'function': f"{name} ({os.path.basename(filename)}:{line})",
+                'calls': calls,
+                'self_pct': own / elapsed * 100 if elapsed else 0.0,
+                'total_pct': cumulative / elapsed * 100 if elapsed else 0.0,
+                'self_seconds': own,
+                'total_seconds': cumulative
+            })
+        functions.sort(key=lambda row: row['self_seconds'], reverse=True)
+        return cls(MODE_CPROFILE, elapsed, functions[:TOP_FUNCTIONS], stats=stats)
+
+    def collapsed(self) -> str:
+        """Stacks in collapsed (folded) format: ``outer;inner;leaf count`` per line"""
+        return ''.join(f"{stack} {count}\n" for stack, count in sorted(self.stacks.items()))
+
+    def save(self, directory: str, name: str) -> Dict[str, Any]:
+        """
+        Write the report to ``directory``
+
+        Sampled reports get a ``.collapsed`` file (flamegraph.pl, speedscope,
+        inferno) and cProfile reports a ``.prof`` file (pstats, snakeviz);
+        both get a ``.json`` summary with the function table.
+
+        Args:
+            directory: Where to write; created if missing
+            name: Label stored in the summary, e.g. the page name
+
+        Returns:
+            The summary, including the paths written
+        """
+        os.makedirs(directory, exist_ok=True)
+        created = datetime.now()
+        slug = re.sub(r'[^A-Za-z0-9]+', '-', name).strip('-').lower() or 'rerun'
+        base = os.path.join(directory, f"{created.strftime('%Y%m%d-%H%M%S')}-{slug}")
+        if self.mode == MODE_SAMPLE:
+            data_path = base + '.collapsed'
+            with open(data_path, 'w', encoding='utf-8') as f:
+                f.write(self.collapsed())
+        else:
+            data_path = base + '.prof'
+            self.stats.dump_stats(data_path)
+        summary = {
+            'name': name,
+            'mode': self.mode,
+            'created_at': created.isoformat(timespec='seconds'),
+            'elapsed_seconds': self.elapsed,
+            'samples': self.samples,
+            'interval_seconds': self.interval,
+            'data_path': data_path,
+            'summary_path': base + '.json',
+            'functions': self.functions
+        }
+        with open(summary['summary_path'], 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=1)
+        logger.info(f"Saved {self.mode} profile of '{name}' to {data_path}")
+        return summary
+
+
+def default_profile_dir() -> str:
+    return os.path.join(tempfile.gettempdir(), 'dashboard_profiles')
+
+
+def list_profiles(directory: str) -> List[Dict[str, Any]]:
+    """Summaries of the saved reports in ``directory``, newest first"""
+    if not os.path.isdir(directory):
+        return []
+    summaries = []
+    for filename in sorted(os.listdir(directory), reverse=True):
+        if filename.endswith('.json'):
+            try:
+                with open(os.path.join(directory, filename), encoding='utf-8') as f:
+                    summaries.append(json.load(f))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping unreadable profile {filename}: {str(e)}")
+    return summaries
+
+
+def prune_profiles(directory: str, keep: int) -> int:
+    """Delete all but the newest ``keep`` reports; returns the number deleted"""
+    removed = 0
+    for summary in list_profiles(directory)[max(0, keep):]:
+        for path in (summary.get('data_path'), summary.get('summary_path')):
+            try:
+                if path and os.path.exists(path):
+                    os.remove(path)
+            except OSError as e:
+                logger.warning(f"Could not delete old profile {path}: {str(e)}")
+        removed += 1
+    return removed
+
+
+def read_collapsed(path: str) -> Dict[str, int]:
+    """Stacks from a collapsed-stack file"""
+    stacks = {}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            stack, _, count = line.rstrip('\n').rpartition(' ')
+            if stack and count.isdigit():
+                stacks[stack] = stacks.get(stack, 0) + int(count)
+    return stacks
+
+
+def flame_nodes(stacks: Dict[str, int],
+                min_fraction: float = 0.005) -> Tuple[List[str], List[str], List[str], List[int]]:
+    """
+    Flame graph tree for a Plotly icicle chart
+
+    Args:
+        stacks: Collapsed stacks with sample counts
+        min_fraction: Drop frames with less than this share of all samples
+
+    Returns:
+        Tuple of (ids, labels, parents, values); values are inclusive sample counts
+    """
+    total = sum(stacks.values())
+    values: Counter = Counter()
+    for stack, count in stacks.items():
+        path = ''
+        for frame in stack.split(';'):
+            path = f"{path};{frame}" if path else frame
+            values[path] += count
+    ids, labels, parents, counts = [], [], [], []
+    for path, count in values.items():
+        if total and count / total < min_fraction:
+            continue
+        parent, _, frame = path.rpartition(';')
+        ids.append(path)
+        labels.append(frame)
+        parents.append(parent)
+        counts.append(count)
+    return ids, labels, parents, counts
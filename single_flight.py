@@ -0,0 +1,89 @@
+"""
+Single-flight execution
+Concurrent callers asking for the same key share one execution instead of
+each running their own copy
+"""
+
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Dict, Any, Callable, Hashable
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """
+    Coalesce identical in-flight work across threads and sessions
+
+    The first caller for a key runs the function; callers arriving while it
+    is still running wait for the same outcome, including its exception.
+    Nothing is remembered once the call finishes; caching is left to the caller.
+    """
+
+    def __init__(self):
+        self._flights: Dict[Hashable, Future] = {}
+        self._waiters: Dict[Hashable, int] = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            'executions': 0,
+            'coalesced': 0,
+            'failures': 0
+        }
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """
+        Run ``fn`` unless an identical call is already in flight
+
+        Args:
+            key: Identity of the work, e.g. a result cache key
+            fn: Zero-argument callable performing the work
+
+        Returns:
+            The value returned by whichever call actually ran
+        """
+        with self._lock:
+            future = self._flights.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._flights[key] = future
+                self._stats['executions'] += 1
+            else:
+                self._stats['coalesced'] += 1
+                self._waiters[key] = self._waiters.get(key, 0) + 1
+
+        if not leader:
+            logger.info("Joined an identical query already in flight")
+            try:
+                return future.result()
+            finally:
+                with self._lock:
+                    self._waiters[key] -= 1
+                    if not self._waiters[key]:
+                        del self._waiters[key]
+
+        try:
+            result = fn()
+        except BaseException as e:
+            with self._lock:
+                self._stats['failures'] += 1
+                del self._flights[key]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            del self._flights[key]
+        future.set_result(result)
+        return result
+
+    def waiters(self, key: Hashable) -> int:
+        """Number of callers currently waiting on someone else's run of ``key``"""
+        with self._lock:
+            return self._waiters.get(key, 0)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Executions run, executions saved by coalescing and calls in flight"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['in_flight'] = len(self._flights)
+        return stats
@@ -1,69 +1,316 @@
-import snowflake.connector
 from snowflake.connector import DictCursor
+from snowflake.connector.cursor import SnowflakeCursor
+from snowflake.connector.errors import NotSupportedError, ProgrammingError
 import pandas as pd
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 from config import Config
+from connection_pool import ConnectionPool
+from query_cache import QueryCache, DiskResultCache
+from sql_utils import is_read_statement, is_select_statement, query_fingerprint
+from table_monitor import TableChangeMonitor
+from single_flight import SingleFlight
+from entity_loader import EntityLoader
+from background_export import ExportManager
+from query_cost import QueryCost, AdmissionPolicy, parse_explain
+from resilience import ResilienceManager, CircuitOpenError
+from render_profiler import timed, CATEGORY_SQL
+from query_tag import build_query_tag, bind_context, query_context, current_context, CACHE_MISS, CACHE_REFRESH, CACHE_BYPASS
+from query_history import history_query, attribute_history, timings_query, HISTORY_INFORMATION_SCHEMA
+from memory_accounting import AllocationTracker
+from dtype_optimizer import DtypeOptimizer
+from perf_metrics import (
+    PerfMetrics, STAGE_EXECUTE, STAGE_FETCH, STAGE_DATAFRAME, STAGE_COMPILE, STAGE_QUEUED, STAGE_WAREHOUSE,
+    OUTCOME_OK, OUTCOME_CACHED, OUTCOME_ERROR
+)
+from query_registry import (
+    QueryRegistry, RunningQuery, QUERY_CLASSES, QUERY_CLASS_LOOKUP, QUERY_CLASS_INTERACTIVE,
+    QUERY_CLASS_ANALYTICS, QUERY_CLASS_ADHOC, QUERY_CLASS_EXPORT
+)
+import asyncio
+import functools
 import logging
-from typing import Optional, Dict, Any, List
+import threading
+import time
+from concurrent.futures import Future, wait
+from typing import Optional, Dict, Any, List, Iterator, Callable, Tuple
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+FETCH_MODE_ARROW = 'arrow'
+FETCH_MODE_DICT = 'dict'
+
+# Lookups of a blocking statement's query id before its cancel is given up
+CANCEL_LOOKUP_ATTEMPTS = 3
+# Wait between those lookups, in seconds; a just-sent statement may not be in history yet
+CANCEL_LOOKUP_DELAY = 0.5
+
+class QueryCancelledError(Exception):
+    """Raised when the script stops waiting for a query because it is rerunning"""
+
+# Streamlit release whose private ``ScriptRequests._state`` script_rerun_requested reads
+SCRIPT_REQUESTS_STREAMLIT_VERSION = '1.29'
+
+_script_requests_warnings = set()
+
+def _warn_script_requests(message: str):
+    """Log a script_rerun_requested compatibility warning once per process"""
+    if message not in _script_requests_warnings:
+        _script_requests_warnings.add(message)
+        logger.warning(message)
+
+def script_rerun_requested() -> bool:
+    """
+    Whether Streamlit has asked the running script to rerun or stop
+    
+    Streamlit only acts on the request at the script's next ``st`` call, so
+    code blocked on a query checks this instead. Always False off the script thread.
+    
+    Streamlit has no public API for this: it reads the private
+    ``ctx.script_requests._state`` of Streamlit ``SCRIPT_REQUESTS_STREAMLIT_VERSION``.
+    Other versions log a warning once; if the attribute is gone, this is
+    always False and running queries are no longer cancelled on rerun.
+    """
+    ctx = get_script_run_ctx(suppress_warning=True)
+    if ctx is None:
+        return False
+    if not st.__version__.startswith(SCRIPT_REQUESTS_STREAMLIT_VERSION + '.'):
+        _warn_script_requests(f"Streamlit {st.__version__} is untested with rerun detection "
+                              f"(written for {SCRIPT_REQUESTS_STREAMLIT_VERSION}); check ScriptRequests._state")
+    state = getattr(getattr(ctx, 'script_requests', None), '_state', None)
+    if state is None:
+        _warn_script_requests("Streamlit has no ScriptRequests._state; queries will not be cancelled on rerun")
+        return False
+    return state.name != 'CONTINUE'
+
+def run_in_thread(fn: Callable[..., Any], *args, **kwargs) -> Future:
+    """Start ``fn`` on a daemon thread, with the caller's query attribution, and return a Future for its outcome"""
+    future = Future()
+    fn = bind_context(fn)
+    
+    def target():
+        future.set_running_or_notify_cancel()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+    
+    threading.Thread(target=target, name='query-worker', daemon=True).start()
+    return future
+
+def frame_from_arrow_cursor(cursor, timings: Optional[Dict[str, float]] = None) -> pd.DataFrame:
+    """
+    Build a DataFrame from an executed cursor through Arrow
+    
+    Result chunks are converted column by column, without a Python object per
+    row. Results that Snowflake does not return in Arrow format (SHOW, DESCRIBE,
+    DDL) fall back to a tuple fetch.
+    
+    Args:
+        cursor: Plain (non-dict) cursor that has already executed a statement
+        timings: Filled with the seconds spent fetching and building the DataFrame
+        
+    Returns:
+        DataFrame with query results
+    """
+    timings = {} if timings is None else timings
+    started = time.perf_counter()
+    try:
+        table = cursor.fetch_arrow_all()
+    except (NotSupportedError, ProgrammingError, ImportError) as e:
+        logger.debug(f"Arrow fetch unavailable, using tuple fetch: {str(e)}")
+        rows = cursor.fetchall()
+        fetched = time.perf_counter()
+        timings[STAGE_FETCH] = fetched - started
+        columns = [column[0] for column in cursor.description or []]
+        df = pd.DataFrame.from_records(rows, columns=columns) if rows else pd.DataFrame(columns=columns)
+        timings[STAGE_DATAFRAME] = time.perf_counter() - fetched
+        return df
+    fetched = time.perf_counter()
+    timings[STAGE_FETCH] = fetched - started
+    
+    if table is None:
+        # Empty result set - keep the column names
+        df = pd.DataFrame(columns=[column[0] for column in cursor.description or []])
+    else:
+        # self_destruct releases Arrow buffers as columns are converted
+        df = table.to_pandas(split_blocks=True, self_destruct=True)
+    timings[STAGE_DATAFRAME] = time.perf_counter() - fetched
+    return df
+
+def frame_from_dict_cursor(cursor, timings: Optional[Dict[str, float]] = None) -> pd.DataFrame:
+    """
+    Build a DataFrame from an executed ``DictCursor`` (one dict per row)
+    
+    Args:
+        cursor: DictCursor that has already executed a statement
+        timings: Filled with the seconds spent fetching and building the DataFrame
+        
+    Returns:
+        DataFrame with query results
+    """
+    timings = {} if timings is None else timings
+    started = time.perf_counter()
+    results = cursor.fetchall()
+    fetched = time.perf_counter()
+    timings[STAGE_FETCH] = fetched - started
+    df = pd.DataFrame(results) if results else pd.DataFrame()
+    timings[STAGE_DATAFRAME] = time.perf_counter() - fetched
+    return df
+
+def iter_frames_from_arrow_cursor(cursor, batch_rows: int) -> Iterator[pd.DataFrame]:
+    """
+    Yield DataFrames of at most ``batch_rows`` rows as Arrow result chunks arrive
+    
+    Only the chunks needed for the current batch are held in memory. Results
+    that are not in Arrow format fall back to ``fetchmany``.
+    
+    Args:
+        cursor: Plain (non-dict) cursor that has already executed a statement
+        batch_rows: Maximum rows per yielded DataFrame
+    """
+    try:
+        tables = cursor.fetch_arrow_batches()
+    except (NotSupportedError, ProgrammingError, ImportError) as e:
+        logger.debug(f"Arrow batches unavailable, using fetchmany: {str(e)}")
+        yield from iter_frames_from_row_cursor(cursor, batch_rows)
+        return
+    
+    import pyarrow as pa
+    
+    pending = []
+    pending_rows = 0
+    for table in tables:
+        if table.num_rows == 0:
+            continue
+        pending.append(table)
+        pending_rows += table.num_rows
+        
+        while pending_rows >= batch_rows:
+            combined = pa.concat_tables(pending)
+            yield combined.slice(0, batch_rows).to_pandas()
+            remainder = combined.slice(batch_rows)
+            pending = [remainder] if remainder.num_rows else []
+            pending_rows = remainder.num_rows
+    
+    if pending_rows:
+        yield pa.concat_tables(pending).to_pandas()
+
+def iter_frames_from_row_cursor(cursor, batch_rows: int) -> Iterator[pd.DataFrame]:
+    """
+    Yield DataFrames of at most ``batch_rows`` rows using ``fetchmany``
+    
+    Works with both tuple cursors and ``DictCursor``.
+    
+    Args:
+        cursor: Cursor that has already executed a statement
+        batch_rows: Maximum rows per yielded DataFrame
+    """
+    columns = [column[0] for column in cursor.description or []]
+    while True:
+        rows = cursor.fetchmany(batch_rows)
+        if not rows:
+            break
+        if isinstance(rows[0], dict):
+            yield pd.DataFrame(rows)
+        else:
+            yield pd.DataFrame.from_records(rows, columns=columns)
+
 class SnowflakeConnector:
     """
     A robust Snowflake connector with connection pooling and error handling
+    
+    One connector exists per Streamlit session; it resolves that session's
+    credentials on every call and borrows connections from the process-wide
+    ``ConnectionPool``, so sessions never share a mutable connection.
     """
     
-    def __init__(self):
-        self.connection = None
+    def __init__(self, pool: Optional[ConnectionPool] = None, cache: Optional[QueryCache] = None,
+                 monitor: Optional[TableChangeMonitor] = None, flights: Optional[SingleFlight] = None,
+                 loader: Optional[EntityLoader] = None, registry: Optional[QueryRegistry] = None,
+                 exports: Optional[ExportManager] = None,
+                 resilience: Optional[ResilienceManager] = None,
+                 metrics: Optional[PerfMetrics] = None,
+                 dtypes: Optional[DtypeOptimizer] = None):
+        self.pool = pool or get_connection_pool()
+        self.cache = cache or get_query_cache()
+        self.monitor = monitor or get_table_monitor()
+        self.flights = flights or get_single_flight()
+        self.loader = loader or get_entity_loader()
+        self.registry = registry or get_query_registry()
+        self.exports = exports or get_export_manager()
+        self.resilience = resilience or get_resilience_manager()
+        self.metrics = metrics or get_perf_metrics()
+        self.dtypes = dtypes or get_dtype_optimizer()
+        # Session that owns this connector's queries in the running-query registry
+        ctx = get_script_run_ctx(suppress_warning=True)
+        self.owner = ctx.session_id if ctx else None
     
-    def connect(self) -> bool:
-        """Establish connection to Snowflake using session credentials or config fallback"""
+    def _resolve_connection_params(self) -> Dict[str, Any]:
+        """Resolve connection parameters from session credentials or config fallback"""
+        # Try to get credentials from session state first (check multiple locations)
+        real_creds = st.session_state.get('real_snowflake_credentials', {})
+        
+        # Also check if credentials are stored in user_info (from auth system)
+        if not real_creds and 'user_info' in st.session_state:
+            user_info = st.session_state.user_info
+            if user_info.get('snowflake_credentials'):
+                real_creds = user_info['snowflake_credentials']
+        
+        if real_creds and real_creds.get('user'):
+            # Use session credentials (from OAuth login)
+            return {
+                'account': real_creds.get('account', Config.SNOWFLAKE_ACCOUNT),
+                'user': real_creds.get('user', Config.SNOWFLAKE_USERNAME),
+                'password': real_creds.get('password', Config.SNOWFLAKE_PASSWORD),
+                'database': real_creds.get('database', Config.SNOWFLAKE_DATABASE),
+                'schema': real_creds.get('schema', Config.SNOWFLAKE_SCHEMA),
+                'role': real_creds.get('role', Config.SNOWFLAKE_ROLE),
+                'warehouse': real_creds.get('warehouse', Config.SNOWFLAKE_WAREHOUSE),
+                'authenticator': real_creds.get('authenticator', Config.SNOWFLAKE_AUTHENTICATOR),
+                'client_session_keep_alive': True,
+                'login_timeout': 30,
+                'network_timeout': 30
+            }
+        
+        # Use config credentials as fallback
+        return Config.get_snowflake_config()
+    
+    def connect(self, force: bool = False) -> bool:
+        """
+        Ensure an authenticated connection to Snowflake is available
+        
+        Connections come from the shared pool and are reused while they are
+        healthy and were opened with the current credentials; a new login only
+        happens on first use, after a failed health check, on a credential
+        change or when ``force`` is set.
+        
+        Args:
+            force: Close idle pooled connections for these credentials and log in again
+            
+        Returns:
+            True if a usable connection is available
+        """
         try:
-            # Close existing connection if any
-            if self.connection:
-                try:
-                    self.connection.close()
-                except:
-                    pass
-                self.connection = None
-            
-            # Try to get credentials from session state first (check multiple locations)
-            real_creds = st.session_state.get('real_snowflake_credentials', {})
-            
-            # Also check if credentials are stored in user_info (from auth system)
-            if not real_creds and 'user_info' in st.session_state:
-                user_info = st.session_state.user_info
-                if user_info.get('snowflake_credentials'):
-                    real_creds = user_info['snowflake_credentials']
-            
-            if real_creds and real_creds.get('user'):
-                # Use session credentials (from OAuth login)
-                connection_params = {
-                    'account': real_creds.get('account', Config.SNOWFLAKE_ACCOUNT),
-                    'user': real_creds.get('user', Config.SNOWFLAKE_USERNAME),
-                    'password': real_creds.get('password', Config.SNOWFLAKE_PASSWORD),
-                    'database': real_creds.get('database', Config.SNOWFLAKE_DATABASE),
-                    'schema': real_creds.get('schema', Config.SNOWFLAKE_SCHEMA),
-                    'role': real_creds.get('role', Config.SNOWFLAKE_ROLE),
-                    'warehouse': real_creds.get('warehouse', Config.SNOWFLAKE_WAREHOUSE),
-                    'authenticator': real_creds.get('authenticator', Config.SNOWFLAKE_AUTHENTICATOR),
-                    'client_session_keep_alive': True,
-                    'login_timeout': 30,
-                    'network_timeout': 30
-                }
-                logger.info(f"Using session credentials - Account: {connection_params['account']}, User: {connection_params['user']}, Authenticator: {connection_params['authenticator']}")
-            else:
-                # Use config credentials as fallback
-                connection_params = Config.get_snowflake_config()
-                logger.info(f"Using config credentials - Account: {connection_params['account']}, User: {connection_params['user']}, Authenticator: {connection_params['authenticator']}")
-            
-            # Attempt connection
-            logger.info(f"Attempting connection to Snowflake with account: {connection_params['account']}")
-            self.connection = snowflake.connector.connect(**connection_params)
-            logger.info("Successfully connected to Snowflake")
+            connection_params = self._resolve_connection_params()
+            if force:
+                self.pool.evict_idle(connection_params)
+            
+            def login():
+                pooled = self.pool.checkout(connection_params)
+                self.pool.checkin(connection_params, pooled)
+            
+            # While Snowflake is down this fails fast instead of every session logging in
+            self.resilience.call(self._breaker_key(connection_params), login)
             return True
+        
+        except CircuitOpenError as e:
+            logger.warning(str(e))
+            if hasattr(st, 'warning'):
+                st.warning(f"⏳ {str(e)}")
+            return False
                 
         except Exception as e:
             error_msg = str(e)
@@ -87,46 +334,861 @@ class SnowflakeConnector:
                     st.error(f"❌ Connection failed: {error_msg}")
             return False
     
-    def execute_query(self, query: str, params: Optional[Dict[str, Any]] = None) -> Optional[pd.DataFrame]:
+    def run_query(self, connection_params: Dict[str, Any], query: str,
+                  params: Optional[Dict[str, Any]] = None,
+                  fetch_mode: Optional[str] = None,
+                  use_cache: bool = True,
+                  soft_ttl: Optional[float] = None,
+                  query_class: Optional[str] = None) -> pd.DataFrame:
+        """
+        Execute a query with already resolved connection parameters
+        
+        Does not touch session state or the UI and raises on failure, so it is
+        safe to call from worker threads. Read-only statements are answered
+        from the shared result cache when possible, and callers asking for a
+        statement that another session is already running wait for that run
+        instead of starting their own. If Snowflake fails, the last result
+        persisted on disk is returned with ``attrs['stale']`` set.
+        
+        Args:
+            connection_params: Result of ``_resolve_connection_params`` on the script thread
+            query: SQL query string
+            params: Optional parameters for parameterized queries
+            fetch_mode: 'arrow' or 'dict'; defaults to ``Config.SNOWFLAKE_FETCH_MODE``
+            use_cache: Read from and store into the result cache
+            soft_ttl: Enable stale-while-revalidate: cached results older than
+                this many seconds are returned at once and refreshed in the background
+            query_class: 'interactive' (default), 'lookup', 'analytics', 'adhoc' or
+                'export'; picks the statement timeout and warehouse
+            
+        Returns:
+            DataFrame with query results
+        """
+        started = time.perf_counter()
+        outcome = OUTCOME_ERROR
+        df = None
+        try:
+            cache_key = self._cache_key(connection_params, query, params, use_cache)
+            if cache_key is not None:
+                # Drops entries whose source tables changed; runs in the background
+                self.monitor.maybe_poll(self.cache, self._execute, connection_params)
+                df = self._cached_result(cache_key, connection_params, query, params, fetch_mode,
+                                         soft_ttl, query_class)
+                if df is not None:
+                    logger.info(f"Query served from cache, returned {len(df)} rows")
+                    outcome = OUTCOME_CACHED
+                    return df
+            
+            if cache_key is None:
+                with query_context(cache=CACHE_BYPASS):
+                    df = self._execute(connection_params, query, params, fetch_mode, query_class, cancellable=True)
+                outcome = OUTCOME_OK
+                return df
+            
+            try:
+                with query_context(cache=CACHE_MISS):
+                    df = self._execute_once(cache_key, connection_params, query, params, fetch_mode, soft_ttl,
+                                            query_class)
+            except Exception as e:
+                df = self.cache.get_stale(cache_key)
+                if df is None:
+                    raise
+                # Still counted as an error: the page shows old data
+                logger.warning(f"Query failed, serving last known good result: {str(e)}")
+                return df
+            outcome = OUTCOME_OK
+            return df.copy(deep=False)
+        finally:
+            self.metrics.record_query(time.perf_counter() - started, outcome,
+                                      len(df) if df is not None else 0,
+                                      query_fingerprint(query), current_context().get('page'))
+    
+    def _execute_once(self, cache_key: tuple, connection_params: Dict[str, Any], query: str,
+                      params: Optional[Dict[str, Any]], fetch_mode: Optional[str],
+                      soft_ttl: Optional[float], query_class: Optional[str] = None,
+                      cancellable: bool = True) -> pd.DataFrame:
+        """Execute and cache a statement, sharing the run with identical in-flight calls"""
+        return self.flights.do(
+            cache_key,
+            lambda: self._store_result(
+                cache_key,
+                self._execute(connection_params, query, params, fetch_mode, query_class,
+                              cancellable, flight_key=cache_key),
+                soft_ttl
+            )
+        )
+    
+    def _cache_key(self, connection_params: Dict[str, Any], query: str,
+                   params: Optional[Dict[str, Any]], use_cache: bool) -> Optional[tuple]:
+        """Result cache key, or None if the statement must not be cached"""
+        if use_cache and is_read_statement(query):
+            return self.cache.make_key(query, params, connection_params)
+        return None
+    
+    def _cached_result(self, cache_key: tuple, connection_params: Dict[str, Any], query: str,
+                       params: Optional[Dict[str, Any]], fetch_mode: Optional[str],
+                       soft_ttl: Optional[float], query_class: Optional[str] = None) -> Optional[pd.DataFrame]:
+        """Cached result, starting a background refresh if it is past ``soft_ttl``"""
+        if soft_ttl is None:
+            return self.cache.get(cache_key)
+        
+        cached = self.cache.get(cache_key, Config.QUERY_CACHE_STALE_TTL)
+        if cached is None:
+            return None
+        age = time.time() - cached.attrs.get('fetched_at', time.time())
+        if age > soft_ttl:
+            # The next rerun picks up the refreshed result from the cache
+            cached.attrs['refreshing'] = True
+            if self.cache.begin_refresh(cache_key):
+                threading.Thread(
+                    target=bind_context(self._refresh_in_background),
+                    args=(cache_key, connection_params, query, params, fetch_mode, soft_ttl, query_class),
+                    name='query-refresh',
+                    daemon=True
+                ).start()
+        return cached
+    
+    def _refresh_in_background(self, cache_key: tuple, connection_params: Dict[str, Any], query: str,
+                               params: Optional[Dict[str, Any]], fetch_mode: Optional[str],
+                               soft_ttl: float, query_class: Optional[str] = None):
+        """Re-run a query and replace its cached result; one at a time per key"""
+        try:
+            # Other sessions read the refreshed result, so a rerun must not cancel it
+            with query_context(cache=CACHE_REFRESH):
+                df = self._execute_once(cache_key, connection_params, query, params, fetch_mode, soft_ttl,
+                                        query_class, cancellable=False)
+            logger.info(f"Background refresh finished, cached {len(df)} rows")
+        except Exception as e:
+            logger.warning(f"Background refresh failed, keeping cached result: {str(e)}")
+        finally:
+            self.cache.end_refresh(cache_key)
+    
+    def _store_result(self, cache_key: Optional[tuple], df: pd.DataFrame,
+                      soft_ttl: Optional[float] = None) -> pd.DataFrame:
+        """Stamp a fresh result and cache it; returns the frame for the caller"""
+        df.attrs['fetched_at'] = time.time()
+        # Revalidated results stay servable until the stale TTL
+        ttl = Config.QUERY_CACHE_STALE_TTL if soft_ttl is not None else None
+        if cache_key is not None and self.cache.put(cache_key, df, ttl):
+            return df.copy(deep=False)
+        return df
+    
+    @staticmethod
+    def _breaker_key(connection_params: Dict[str, Any]) -> str:
+        """Circuit breaker identity: Snowflake health is tracked per account"""
+        return str(connection_params.get('account') or '').lower()
+    
+    @staticmethod
+    def _route(connection_params: Dict[str, Any], query_class: Optional[str]) -> Dict[str, Any]:
+        """
+        Connection parameters for running a statement of this class
+        
+        A class with its own warehouse gets its own pool key, so its statements
+        neither queue for connections nor compute behind other classes.
+        """
+        warehouse = Config.get_query_warehouse(query_class or QUERY_CLASS_INTERACTIVE)
+        if not warehouse or warehouse.upper() == str(connection_params.get('warehouse') or '').upper():
+            return connection_params
+        return dict(connection_params, warehouse=warehouse)
+    
+    def _statement_parameters(self, query_class: Optional[str],
+                              running: Optional[RunningQuery] = None,
+                              context: Optional[Dict[str, Optional[str]]] = None) -> Dict[str, Any]:
+        """
+        Parameters sent with a statement of this class
+        
+        They go with the statement itself (``_statement_params``), so a pooled
+        session never needs an ``ALTER SESSION`` when the tag or timeout
+        changes. ``QUERY_TAG`` attributes the statement to the page and
+        section in ``context`` (the calling thread's query context unless
+        given). A registered statement's tag also carries its unique
+        statement id, even with tagging disabled, so a cancel can find it.
+        """
+        query_class = query_class or QUERY_CLASS_INTERACTIVE
+        parameters = {'STATEMENT_TIMEOUT_IN_SECONDS': Config.get_statement_timeout(query_class)}
+        statement = running.statement_id if running is not None else None
+        if Config.QUERY_TAG_ENABLED:
+            parameters['QUERY_TAG'] = build_query_tag(self.owner, query_class, context, statement)
+        elif statement:
+            parameters['QUERY_TAG'] = build_query_tag(None, query_class, {}, statement)
+        return parameters
+    
+    def _execute(self, connection_params: Dict[str, Any], query: str,
+                 params: Optional[Dict[str, Any]] = None,
+                 fetch_mode: Optional[str] = None,
+                 query_class: Optional[str] = None,
+                 cancellable: bool = False,
+                 flight_key: Optional[tuple] = None) -> pd.DataFrame:
+        """
+        Run a statement on a pooled connection and fetch its results
+        
+        The statement runs with its class's timeout and is listed in the
+        running-query registry until it returns; ``cancellable`` statements
+        are cancelled when the owning session reruns. It goes to the class's
+        warehouse when one is configured. Transient failures of read
+        statements are retried, and calls fail fast with ``CircuitOpenError``
+        while the account's circuit breaker is open.
+        """
+        fetch_mode = fetch_mode or Config.SNOWFLAKE_FETCH_MODE
+        query_class = query_class or QUERY_CLASS_INTERACTIVE
+        routed_params = self._route(connection_params, query_class)
+        
+        def attempt() -> pd.DataFrame:
+            timings = {}
+            with self.pool.connection(routed_params, timings) as connection:
+                running = self.registry.start(self.owner, query, query_class, routed_params,
+                                              cancellable, flight_key)
+                try:
+                    statement_params = self._statement_parameters(query_class, running)
+                    cursor_class = DictCursor if fetch_mode == FETCH_MODE_DICT else SnowflakeCursor
+                    with connection.cursor(cursor_class) as cursor:
+                        started = time.perf_counter()
+                        self._run_statement(connection, cursor, running, params, statement_params)
+                        timings[STAGE_EXECUTE] = time.perf_counter() - started
+                        
+                        if fetch_mode == FETCH_MODE_DICT:
+                            df = frame_from_dict_cursor(cursor, timings)
+                        else:
+                            df = frame_from_arrow_cursor(cursor, timings)
+                        df = self._optimize_dtypes(df, query_class, timings)
+                        
+                        if not df.empty:
+                            logger.info(f"Query executed successfully, returned {len(df)} rows")
+                        else:
+                            logger.info("Query executed successfully but returned no results")
+                        self._record_stages(query, timings, cursor.sfqid)
+                        return df
+                finally:
+                    self.registry.finish(running)
+        
+        # Only statements that change nothing are safe to send twice
+        return self.resilience.call(self._breaker_key(connection_params), attempt,
+                                    retry=is_read_statement(query))
+    
+    def _run_statement(self, connection, cursor, running: RunningQuery,
+                       params: Optional[Dict[str, Any]] = None,
+                       statement_params: Optional[Dict[str, Any]] = None):
+        """
+        Send a registered statement and wait for it, leaving its result on ``cursor``
+        
+        A blocking ``execute``: the server enforces the statement's
+        ``STATEMENT_TIMEOUT_IN_SECONDS`` and there is no status polling. Its
+        query id only arrives with the result, so the session id and unique
+        ``QUERY_TAG`` are recorded first; ``_send_cancel`` finds the running
+        statement by them.
+        
+        Raises:
+            QueryCancelledError: If the statement was cancelled before it was sent
+            snowflake.connector.errors.Error: If the statement failed or was cancelled
+        """
+        running.session_id = getattr(connection, 'session_id', None)
+        running.query_tag = (statement_params or {}).get('QUERY_TAG')
+        # Checked after the lookup fields are set: a concurrent cancel sees one or the other
+        if running.cancelling:
+            raise QueryCancelledError(f"{running.query_class} query cancelled before it was sent")
+        if params:
+            cursor.execute(running.query, params, _statement_params=statement_params)
+        else:
+            cursor.execute(running.query, _statement_params=statement_params)
+        running.query_id = cursor.sfqid
+    
+    def _optimize_dtypes(self, df: pd.DataFrame, query_class: Optional[str],
+                         timings: Optional[Dict[str, float]] = None) -> pd.DataFrame:
+        """Shrink a fetched result's dtypes when its query class is configured for it"""
+        if not Config.get_dtype_optimization(query_class or QUERY_CLASS_INTERACTIVE):
+            return df
+        started = time.perf_counter()
+        df = self.dtypes.optimize(df)
+        if timings is not None:
+            timings[STAGE_DATAFRAME] = timings.get(STAGE_DATAFRAME, 0.0) + time.perf_counter() - started
+        return df
+    
+    def _record_stages(self, query: str, timings: Dict[str, float], query_id: Optional[str] = None):
+        """
+        Add a statement's stage timings to the latency metrics
+        
+        The query id is kept so ``refresh_server_timings`` can add the
+        compile, queued and warehouse time Snowflake reports for it.
+        """
+        fingerprint = query_fingerprint(query)
+        page = current_context().get('page')
+        self.metrics.record_stages(timings, fingerprint, page)
+        self.metrics.add_query_id(query_id, fingerprint, page)
+    
+    def wait_for(self, future: Future) -> Any:
+        """
+        Wait for a query running on another thread, giving up if the script reruns
+        
+        A script blocked on a query would otherwise hold up the rerun until
+        the warehouse finished. On a rerun this session's queries are
+        cancelled. Call only from the script thread.
+        
+        Args:
+            future: Outcome of the query, e.g. from ``run_in_thread``
+            
+        Returns:
+            The future's result
+            
+        Raises:
+            QueryCancelledError: If the script was asked to rerun or stop first
+        """
+        with timed(CATEGORY_SQL):
+            while not future.done():
+                wait([future], timeout=Config.QUERY_CANCEL_CHECK_INTERVAL)
+                if not future.done() and script_rerun_requested():
+                    cancelled = self.cancel_abandoned_queries()
+                    raise QueryCancelledError(f"Script rerun requested; cancelling {cancelled} running queries")
+        return future.result()
+    
+    def execute_query(self, query: str, params: Optional[Dict[str, Any]] = None,
+                      fetch_mode: Optional[str] = None,
+                      use_cache: bool = True,
+                      soft_ttl: Optional[float] = None,
+                      query_class: Optional[str] = None) -> Optional[pd.DataFrame]:
         """
         Execute a query and return results as a pandas DataFrame
         
+        If the script reruns while the query is running, the query is
+        cancelled and None is returned.
+        
         Args:
             query: SQL query string
             params: Optional parameters for parameterized queries
+            fetch_mode: 'arrow' (columnar fetch) or 'dict' (DictCursor rows);
+                defaults to ``Config.SNOWFLAKE_FETCH_MODE``
+            use_cache: Serve read-only statements from the shared result cache
+            soft_ttl: Serve cached results up to ``Config.QUERY_CACHE_STALE_TTL``
+                old, refreshing them in the background once older than this
+            query_class: 'interactive' (default), 'lookup', 'analytics', 'adhoc' or
+                'export'; picks the statement timeout and warehouse
             
         Returns:
             DataFrame with query results or None if error
         """
         try:
-            if not self.connect():
-                return None
+            return self.wait_for(run_in_thread(
+                self.run_query, self._resolve_connection_params(), query, params, fetch_mode,
+                use_cache, soft_ttl, query_class
+            ))
+        except QueryCancelledError as e:
+            logger.info(str(e))
+            return None
+        except CircuitOpenError as e:
+            logger.warning(str(e))
+            st.warning(f"⏳ {str(e)}")
+            return None
+        except Exception as e:
+            logger.error(f"Query execution failed: {str(e)}")
+            st.error(f"❌ Query failed: {str(e)}")
+            return None
+    
+    def execute_query_iter(self, query: str, params: Optional[Dict[str, Any]] = None,
+                           batch_rows: Optional[int] = None,
+                           fetch_mode: Optional[str] = None,
+                           query_class: Optional[str] = None) -> Iterator[pd.DataFrame]:
+        """
+        Execute a query and yield results as DataFrame batches while they arrive
+        
+        Peak memory is proportional to ``batch_rows`` rather than the result
+        size. The pooled connection stays checked out until the iterator is
+        exhausted or closed.
+        
+        Args:
+            query: SQL query string
+            params: Optional parameters for parameterized queries
+            batch_rows: Maximum rows per batch; defaults to ``Config.SNOWFLAKE_STREAM_BATCH_ROWS``
+            fetch_mode: 'arrow' or 'dict'; defaults to ``Config.SNOWFLAKE_FETCH_MODE``
+            query_class: Picks the statement timeout and warehouse; defaults to 'export'
             
-            if not self.connection:
-                logger.error("No connection available")
+        Yields:
+            DataFrames with consecutive slices of the result
+        """
+        try:
+            batches = self._iter_frames(self._resolve_connection_params(), query, params,
+                                        batch_rows, fetch_mode, query_class=query_class)
+            try:
+                while True:
+                    # Timed per batch: a block left open across yield would also time the caller
+                    with timed(CATEGORY_SQL):
+                        batch = next(batches, None)
+                    if batch is None:
+                        break
+                    yield batch
+            finally:
+                # Returns the connection at once when the caller stops early
+                batches.close()
+        except Exception as e:
+            logger.error(f"Streaming query failed: {str(e)}")
+            st.error(f"❌ Query failed: {str(e)}")
+    
+    def _iter_frames(self, connection_params: Dict[str, Any], query: str,
+                     params: Optional[Dict[str, Any]] = None,
+                     batch_rows: Optional[int] = None,
+                     fetch_mode: Optional[str] = None,
+                     cancellable: bool = True,
+                     query_class: Optional[str] = None) -> Iterator[pd.DataFrame]:
+        """Run a statement (export class unless given) and yield its result in batches; raises on failure"""
+        batch_rows = batch_rows or Config.SNOWFLAKE_STREAM_BATCH_ROWS
+        fetch_mode = fetch_mode or Config.SNOWFLAKE_FETCH_MODE
+        query_class = query_class or QUERY_CLASS_EXPORT
+        routed_params = self._route(connection_params, query_class)
+        # Rows may already be on screen when a stream fails, so streams are never retried
+        self.resilience.check(self._breaker_key(connection_params))
+        # Read here: a context opened inside a generator would leak into the caller between batches
+        context = dict(current_context(), cache=CACHE_BYPASS)
+        page = context.get('page')
+        timings = {}
+        total_rows = 0
+        try:
+            with self.pool.connection(routed_params, timings) as connection:
+                running = self.registry.start(self.owner, query, query_class, routed_params, cancellable)
+                try:
+                    statement_params = self._statement_parameters(query_class, running, context)
+                    cursor_class = DictCursor if fetch_mode == FETCH_MODE_DICT else SnowflakeCursor
+                    with connection.cursor(cursor_class) as cursor:
+                        started = time.perf_counter()
+                        self._run_statement(connection, cursor, running, params, statement_params)
+                        timings[STAGE_EXECUTE] = time.perf_counter() - started
+                        
+                        if fetch_mode == FETCH_MODE_DICT:
+                            batches = iter_frames_from_row_cursor(cursor, batch_rows)
+                        else:
+                            batches = iter_frames_from_arrow_cursor(cursor, batch_rows)
+                        
+                        # Time spent producing batches, not the caller's time consuming them
+                        timings[STAGE_FETCH] = 0.0
+                        started = time.perf_counter()
+                        for batch in batches:
+                            timings[STAGE_FETCH] += time.perf_counter() - started
+                            total_rows += len(batch)
+                            yield batch
+                            started = time.perf_counter()
+                        logger.info(f"Streaming query finished, returned {total_rows} rows")
+                        self._record_stages(query, timings, cursor.sfqid)
+                finally:
+                    self.registry.finish(running)
+        except Exception:
+            self.metrics.record_query(sum(timings.values()), OUTCOME_ERROR, total_rows,
+                                      query_fingerprint(query), page)
+            raise
+        self.metrics.record_query(sum(timings.values()), OUTCOME_OK, total_rows, query_fingerprint(query), page)
+    
+    def export_query_csv(self, query: str, path: str, params: Optional[Dict[str, Any]] = None,
+                         batch_rows: Optional[int] = None) -> int:
+        """
+        Stream a query's results to a CSV file without materialising them
+        
+        Args:
+            query: SQL query string
+            path: Destination file path
+            params: Optional parameters for parameterized queries
+            batch_rows: Maximum rows held in memory at once
+            
+        Returns:
+            Number of data rows written
+        """
+        rows_written = 0
+        with open(path, 'w', newline='', encoding='utf-8') as csv_file:
+            for batch in self.execute_query_iter(query, params, batch_rows=batch_rows):
+                batch.to_csv(csv_file, index=False, header=rows_written == 0)
+                rows_written += len(batch)
+        return rows_written
+    
+    def start_background_export(self, query: str, params: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """
+        Export a query's full result to CSV on a background thread
+        
+        The export keeps running across reruns and page changes; poll it with
+        ``get_export_jobs``.
+        
+        Args:
+            query: SQL query string
+            params: Optional parameters for parameterized queries
+            
+        Returns:
+            Export job id, or None if the export could not be started
+        """
+        try:
+            # Session credentials are only readable from the script thread
+            connection_params = self._resolve_connection_params()
+            
+            def write(path: str, progress: Callable[[int], None]) -> int:
+                rows_written = 0
+                with open(path, 'w', newline='', encoding='utf-8') as csv_file:
+                    # Started on purpose, so a rerun must not cancel it
+                    for batch in self._iter_frames(connection_params, query, params, cancellable=False):
+                        batch.to_csv(csv_file, index=False, header=rows_written == 0)
+                        rows_written += len(batch)
+                        progress(rows_written)
+                return rows_written
+            
+            job = self.exports.start(self.owner, query, bind_context(write))
+            logger.info(f"Started background export {job.id}")
+            return job.id
+        except Exception as e:
+            logger.error(f"Failed to start export: {str(e)}")
+            st.error(f"❌ Could not start export: {str(e)}")
+            return None
+    
+    def get_export_jobs(self) -> List[Dict[str, Any]]:
+        """
+        List this session's background exports, newest first
+        
+        Returns:
+            List of dictionaries with id, query, status, rows written, file path and size
+        """
+        return [job.to_dict() for job in self.exports.jobs(self.owner)]
+    
+    def discard_export(self, job_id: str) -> bool:
+        """Delete a finished export's file; returns False if it is unknown or still running"""
+        job = self.exports.get(job_id)
+        if job is None or job.owner != self.owner:
+            return False
+        return self.exports.discard(job_id)
+    
+    def estimate_query_cost(self, query: str, params: Optional[Dict[str, Any]] = None) -> Optional[QueryCost]:
+        """
+        Estimate a statement's scan size from its EXPLAIN plan, without running it
+        
+        Args:
+            query: SELECT or WITH statement
+            params: Optional parameters for parameterized queries
+            
+        Returns:
+            Cost estimate, or None if the statement cannot be explained
+        """
+        if not is_select_statement(query):
+            return None
+        try:
+            df = self.wait_for(run_in_thread(
+                self.run_query, self._resolve_connection_params(),
+                f"EXPLAIN USING JSON {query.strip().rstrip(';')}", params, query_class=QUERY_CLASS_ADHOC
+            ))
+            if df is None or df.empty:
                 return None
-                
-            with self.connection.cursor(DictCursor) as cursor:
-                if params:
-                    cursor.execute(query, params)
-                else:
-                    cursor.execute(query)
-                
-                results = cursor.fetchall()
-                
-                if results:
-                    df = pd.DataFrame(results)
-                    logger.info(f"Query executed successfully, returned {len(df)} rows")
-                    return df
-                else:
-                    logger.info("Query executed successfully but returned no results")
-                    return pd.DataFrame()
-                    
+            return parse_explain(df.iloc[0, 0])
+        except QueryCancelledError as e:
+            logger.info(str(e))
+            return None
         except Exception as e:
-            logger.error(f"Query execution failed: {str(e)}")
+            logger.warning(f"Could not estimate query cost: {str(e)}")
+            return None
+    
+    def check_query_admission(self, query: str,
+                              params: Optional[Dict[str, Any]] = None) -> Tuple[Optional[QueryCost], List[str]]:
+        """
+        Decide whether an ad-hoc statement may run without confirmation
+        
+        Args:
+            query: SQL query string
+            params: Optional parameters for parameterized queries
+            
+        Returns:
+            Tuple of (cost estimate or None, reasons to hold the statement);
+            statements that cannot be explained are never held
+        """
+        cost = self.estimate_query_cost(query, params)
+        if cost is None:
+            return None, []
+        policy = AdmissionPolicy(
+            max_gb=Config.QUERY_ADMISSION_MAX_GB,
+            max_partitions=Config.QUERY_ADMISSION_MAX_PARTITIONS,
+            business_hours=Config.QUERY_ADMISSION_BUSINESS_HOURS,
+            business_hours_max_gb=Config.QUERY_ADMISSION_BUSINESS_HOURS_MAX_GB
+        )
+        reasons = policy.check(cost)
+        if reasons:
+            logger.info(f"Holding query for confirmation: {'; '.join(reasons)}")
+        return cost, reasons
+    
+    def _submit(self, connection_params: Dict[str, Any], query: str,
+                params: Optional[Dict[str, Any]] = None,
+                query_class: Optional[str] = None) -> str:
+        """Submit a statement with ``execute_async`` on its class's warehouse and return its query id"""
+        routed_params = self._route(connection_params, query_class)
+        
+        def attempt() -> str:
+            statement_params = self._statement_parameters(query_class)
+            with self.pool.connection(routed_params) as connection:
+                with connection.cursor() as cursor:
+                    if params:
+                        cursor.execute_async(query, params, _statement_params=statement_params)
+                    else:
+                        cursor.execute_async(query, _statement_params=statement_params)
+                    return cursor.sfqid
+        
+        return self.resilience.call(self._breaker_key(connection_params), attempt,
+                                    retry=is_read_statement(query))
+    
+    def _is_running(self, connection_params: Dict[str, Any], query_id: str) -> bool:
+        """Poll a submitted query; raises if it finished with an error"""
+        with self.pool.connection(connection_params) as connection:
+            status = connection.get_query_status_throw_if_error(query_id)
+            return connection.is_still_running(status)
+    
+    def _fetch_results(self, connection_params: Dict[str, Any], query_id: str,
+                       fetch_mode: Optional[str] = None) -> pd.DataFrame:
+        """Fetch the results of a submitted query, waiting for it if needed"""
+        fetch_mode = fetch_mode or Config.SNOWFLAKE_FETCH_MODE
+        with self.pool.connection(connection_params) as connection:
+            cursor_class = DictCursor if fetch_mode == FETCH_MODE_DICT else SnowflakeCursor
+            with connection.cursor(cursor_class) as cursor:
+                cursor.get_results_from_sfqid(query_id)
+                if fetch_mode == FETCH_MODE_DICT:
+                    return frame_from_dict_cursor(cursor)
+                return frame_from_arrow_cursor(cursor)
+    
+    def submit_query(self, query: str, params: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """
+        Submit a query without waiting for it to finish
+        
+        Args:
+            query: SQL query string
+            params: Optional parameters for parameterized queries
+            
+        Returns:
+            Snowflake query id to poll and fetch with, or None if submission failed
+        """
+        try:
+            query_id = self._submit(self._resolve_connection_params(), query, params)
+            logger.info(f"Submitted async query {query_id}")
+            return query_id
+        except Exception as e:
+            logger.error(f"Async query submission failed: {str(e)}")
+            st.error(f"❌ Query failed: {str(e)}")
+            return None
+    
+    def get_query_status(self, query_id: str) -> str:
+        """
+        Get the current status of a submitted query
+        
+        Args:
+            query_id: Snowflake query id returned by ``submit_query``
+            
+        Returns:
+            Status name such as 'RUNNING', 'QUEUED', 'SUCCESS' or 'FAILED_WITH_ERROR'
+        """
+        with self.pool.connection(self._resolve_connection_params()) as connection:
+            return connection.get_query_status(query_id).name
+    
+    def is_query_running(self, query_id: str) -> bool:
+        """
+        Check whether a submitted query is still queued or running
+        
+        Args:
+            query_id: Snowflake query id returned by ``submit_query``
+            
+        Returns:
+            True while the query has not finished; False once it succeeded or failed
+        """
+        try:
+            return self._is_running(self._resolve_connection_params(), query_id)
+        except Exception:
+            return False
+    
+    def fetch_query_results(self, query_id: str, fetch_mode: Optional[str] = None) -> Optional[pd.DataFrame]:
+        """
+        Fetch the results of a submitted query with ``get_results_from_sfqid``
+        
+        Blocks until the query has finished.
+        
+        Args:
+            query_id: Snowflake query id returned by ``submit_query``
+            fetch_mode: 'arrow' or 'dict'; defaults to ``Config.SNOWFLAKE_FETCH_MODE``
+            
+        Returns:
+            DataFrame with query results or None if error
+        """
+        try:
+            df = self._fetch_results(self._resolve_connection_params(), query_id, fetch_mode)
+            logger.info(f"Async query {query_id} returned {len(df)} rows")
+            return df
+        except Exception as e:
+            logger.error(f"Async query {query_id} failed: {str(e)}")
             st.error(f"❌ Query failed: {str(e)}")
             return None
     
+    async def wait_for_query_async(self, query_id: str, poll_interval: Optional[float] = None,
+                                   fetch_mode: Optional[str] = None) -> Optional[pd.DataFrame]:
+        """
+        Await a submitted query without blocking the event loop
+        
+        Status polls and the result fetch run in worker threads; between polls
+        the coroutine sleeps, so other queries can be awaited concurrently.
+        
+        Args:
+            query_id: Snowflake query id returned by ``submit_query``
+            poll_interval: Seconds between status polls; defaults to ``Config.SNOWFLAKE_ASYNC_POLL_INTERVAL``
+            fetch_mode: 'arrow' or 'dict'; defaults to ``Config.SNOWFLAKE_FETCH_MODE``
+            
+        Returns:
+            DataFrame with query results or None if error
+        """
+        poll_interval = poll_interval or Config.SNOWFLAKE_ASYNC_POLL_INTERVAL
+        # Session credentials are only readable from the script thread
+        connection_params = self._resolve_connection_params()
+        try:
+            while await asyncio.to_thread(self._is_running, connection_params, query_id):
+                if script_rerun_requested():
+                    # Nobody will read this result once the script reruns
+                    self.cancel_abandoned_queries()
+                    # Submitted statements are not registered; cancel by id on the control connection
+                    submitted = RunningQuery(0, self.owner, '', QUERY_CLASS_INTERACTIVE, connection_params, True)
+                    submitted.query_id = query_id
+                    await asyncio.to_thread(self._send_cancel, submitted)
+                    logger.info(f"Cancelled async query {query_id} abandoned by a rerun")
+                    return None
+                await asyncio.sleep(poll_interval)
+            df = await asyncio.to_thread(self._fetch_results, connection_params, query_id, fetch_mode)
+            logger.info(f"Async query {query_id} returned {len(df)} rows")
+            return df
+        except Exception as e:
+            logger.error(f"Async query {query_id} failed: {str(e)}")
+            st.error(f"❌ Query failed: {str(e)}")
+            return None
+    
+    async def execute_query_async(self, query: str, params: Optional[Dict[str, Any]] = None,
+                                  poll_interval: Optional[float] = None,
+                                  fetch_mode: Optional[str] = None,
+                                  use_cache: bool = True,
+                                  soft_ttl: Optional[float] = None,
+                                  query_class: Optional[str] = None) -> Optional[pd.DataFrame]:
+        """
+        Run a query and await its results without blocking the event loop
+        
+        The query takes the same path as ``execute_query``: ``run_query`` on
+        a worker thread, with its result cache, table change polling,
+        single-flight sharing, latency metrics and stale fallback. The
+        statement is registered before it is sent, so a rerun of the script
+        cancels it.
+        
+        Args:
+            query: SQL query string
+            params: Optional parameters for parameterized queries
+            poll_interval: Seconds between rerun checks; defaults to ``Config.QUERY_CANCEL_CHECK_INTERVAL``
+            fetch_mode: 'arrow' or 'dict'; defaults to ``Config.SNOWFLAKE_FETCH_MODE``
+            use_cache: Read from and store into the result cache
+            soft_ttl: Stale-while-revalidate threshold in seconds
+            query_class: Picks the statement timeout and warehouse; defaults to 'interactive'
+            
+        Returns:
+            DataFrame with query results or None if error
+        """
+        poll_interval = poll_interval or Config.QUERY_CANCEL_CHECK_INTERVAL
+        # A daemon thread, not asyncio.to_thread: the event loop must not wait for an abandoned query on exit
+        future = asyncio.wrap_future(run_in_thread(
+            self.run_query, self._resolve_connection_params(), query, params, fetch_mode,
+            use_cache, soft_ttl, query_class
+        ))
+        try:
+            with timed(CATEGORY_SQL):
+                while not future.done():
+                    await asyncio.wait([future], timeout=poll_interval)
+                    if not future.done() and script_rerun_requested():
+                        cancelled = self.cancel_abandoned_queries()
+                        # Detach from the worker thread; nobody reads this outcome
+                        future.cancel()
+                        raise QueryCancelledError(f"Script rerun requested; cancelling {cancelled} running queries")
+            return future.result()
+        except QueryCancelledError as e:
+            logger.info(str(e))
+            return None
+        except CircuitOpenError as e:
+            logger.warning(str(e))
+            st.warning(f"⏳ {str(e)}")
+            return None
+        except Exception as e:
+            logger.error(f"Async query failed: {str(e)}")
+            st.error(f"❌ Query failed: {str(e)}")
+            return None
+    
+    def lookup_entities(self, entity: str, ids: List[str],
+                        columns: str = '*') -> Optional[Dict[str, pd.DataFrame]]:
+        """
+        Look up entities by ID, batched with lookups from other sessions
+        
+        Lookups for the same table arriving within ``Config.ENTITY_LOADER_WINDOW_MS``
+        share one ``WHERE <key> IN (...)`` statement.
+        
+        Args:
+            entity: Entity name, e.g. 'users', 'flows' or 'licenses'
+            ids: IDs to look up
+            columns: Select list for the rows returned
+            
+        Returns:
+            Mapping of ID -> matching rows, or None if error
+        """
+        try:
+            return self.wait_for(run_in_thread(
+                self.loader.load_many, functools.partial(self.run_query, query_class=QUERY_CLASS_LOOKUP),
+                self._resolve_connection_params(), entity, ids, columns
+            ))
+        except QueryCancelledError as e:
+            logger.info(str(e))
+            return None
+        except Exception as e:
+            logger.error(f"Entity lookup failed: {str(e)}")
+            st.error(f"❌ Lookup failed: {str(e)}")
+            return None
+    
+    def lookup_entity(self, entity: str, entity_id: str, columns: str = '*') -> Optional[pd.DataFrame]:
+        """
+        Look up the rows for a single ID (see ``lookup_entities``)
+        
+        Args:
+            entity: Entity name, e.g. 'users', 'flows' or 'licenses'
+            entity_id: ID to look up
+            columns: Select list for the rows returned
+            
+        Returns:
+            DataFrame with the matching rows (empty if none) or None if error
+        """
+        results = self.lookup_entities(entity, [entity_id], columns)
+        if results is None:
+            return None
+        return results.get(str(entity_id).strip(), pd.DataFrame())
+    
+    def bulk_lookup_iter(self, entity: str, ids: List[str], columns: str = '*',
+                         max_workers: Optional[int] = None) -> Iterator[pd.DataFrame]:
+        """
+        Look up many IDs as parallel IN-list chunks, yielding rows as chunks finish
+        
+        IDs are deduplicated and split into ``Config.ENTITY_LOADER_CHUNK_SIZE``
+        chunks; up to ``max_workers`` chunks run at once. A failed chunk is
+        reported and skipped so the other chunks still arrive. If the script
+        reruns while chunks are running, they are cancelled and nothing more
+        is yielded.
+        
+        Args:
+            entity: Entity name, e.g. 'users', 'flows' or 'exports'
+            ids: IDs to look up
+            columns: Select list for the rows returned
+            max_workers: Concurrent chunks; defaults to ``Config.BULK_LOOKUP_MAX_WORKERS``
+            
+        Yields:
+            DataFrames with one chunk's rows; ``LOOKUP_KEY`` holds the matched ID.
+            Chunks run with the export statement timeout.
+        """
+        try:
+            chunks = self.loader.iter_bulk(
+                bind_context(functools.partial(self.run_query, query_class=QUERY_CLASS_EXPORT)),
+                self._resolve_connection_params(), entity, ids, columns,
+                max_workers=max_workers or Config.BULK_LOOKUP_MAX_WORKERS,
+                stop=script_rerun_requested, check_interval=Config.QUERY_CANCEL_CHECK_INTERVAL
+            )
+            for chunk, future in chunks:
+                try:
+                    yield future.result()
+                except Exception as e:
+                    logger.error(f"Bulk lookup chunk of {len(chunk)} IDs failed: {str(e)}")
+                    st.error(f"❌ Lookup of {len(chunk)} IDs failed: {str(e)}")
+            if script_rerun_requested():
+                cancelled = self.cancel_abandoned_queries()
+                logger.info(f"Script rerun requested; cancelling {cancelled} running bulk lookup queries")
+        except ValueError as e:
+            logger.error(f"Bulk lookup failed: {str(e)}")
+            st.error(f"❌ Lookup failed: {str(e)}")
+    
     def get_table_info(self, table_name: str) -> Optional[pd.DataFrame]:
         """
         Get information about a table's structure
@@ -256,7 +1318,8 @@ class SnowflakeConnector:
                 # Get specific connection by ID
                 query = "select * from connections WHERE _id='63c530e37509483cdcc1af96'"
                 
-                result = self.execute_query(query)
+                # Always round trip; a cached answer would not prove anything
+                result = self.execute_query(query, use_cache=False)
                 if result is not None and not result.empty:
                     return {
                         'status': 'success',
@@ -277,17 +1340,428 @@ class SnowflakeConnector:
         except Exception as e:
             return {'status': 'error', 'error': str(e)}
     
+    def get_connection_stats(self) -> Dict[str, Any]:
+        """
+        Report connection lifecycle statistics for the current credentials
+        
+        Returns:
+            Dictionary with login count, login latency, reconnect and checkout counters
+        """
+        return self.pool.get_key_stats(self._resolve_connection_params())
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """
+        Report result cache statistics (shared by all sessions)
+        
+        Returns:
+            Dictionary with hit, miss, eviction and expiry counters and memory use
+        """
+        return self.cache.get_stats()
+    
+    def clear_cache(self) -> int:
+        """Drop every cached query result; returns the number of entries removed"""
+        return self.cache.clear()
+    
+    def refresh_changed_data(self) -> Optional[Dict[str, Any]]:
+        """
+        Invalidate only the cached results whose source tables changed
+        
+        Reads ``LAST_ALTERED``/``ROW_COUNT`` for every table the cached results
+        read and drops the results fetched before their tables last changed.
+        
+        Returns:
+            Dictionary with tables checked, tables changed and results
+            invalidated, or None if the check failed
+        """
+        try:
+            return self.monitor.poll(self.cache, self._execute, self._resolve_connection_params())
+        except Exception as e:
+            logger.error(f"Table change check failed: {str(e)}")
+            st.error(f"❌ Could not check for changed tables: {str(e)}")
+            return None
+    
+    def get_single_flight_stats(self) -> Dict[str, Any]:
+        """
+        Report query coalescing statistics (shared by all sessions)
+        
+        Returns:
+            Dictionary with executions run, executions saved and queries in flight
+        """
+        return self.flights.get_stats()
+    
+    def get_invalidation_stats(self) -> Dict[str, Any]:
+        """
+        Report table change polling statistics (shared by all sessions)
+        
+        Returns:
+            Dictionary with poll counts, tables changed and results invalidated
+        """
+        return self.monitor.get_stats()
+    
+    def get_entity_loader_stats(self) -> Dict[str, Any]:
+        """
+        Report ID lookup batching statistics (shared by all sessions)
+        
+        Returns:
+            Dictionary with lookups requested, batches and statements run
+        """
+        return self.loader.get_stats()
+    
+    def get_query_history(self, hours: int = 24, source: Optional[str] = None) -> Optional[pd.DataFrame]:
+        """
+        Read the dashboard's tagged statements from Snowflake's query history
+        
+        Args:
+            hours: How far back to look
+            source: 'information_schema' or 'account_usage'; defaults to ``Config.QUERY_HISTORY_SOURCE``
+            
+        Returns:
+            One row per statement with PAGE, SECTION, QUERY_CLASS and CACHE from
+            its tag plus time, scan and estimated credit columns, or None if error
+        """
+        try:
+            query, params = history_query(source or Config.QUERY_HISTORY_SOURCE or HISTORY_INFORMATION_SCHEMA, hours)
+        except ValueError as e:
+            logger.error(str(e))
+            st.error(f"❌ {str(e)}")
+            return None
+        history = self.execute_query(query, params, query_class=QUERY_CLASS_ANALYTICS)
+        if history is None:
+            return None
+        return attribute_history(history)
+    
+    def refresh_server_timings(self) -> int:
+        """
+        Add Snowflake's compile, queued and warehouse time for recent statements to the latency metrics
+        
+        Looks up the query ids of statements finished since the last call in
+        one INFORMATION_SCHEMA query. Ids not in the history yet are kept for
+        the next call.
+        
+        Returns:
+            Number of statements resolved
+        """
+        entries = self.metrics.take_query_ids()
+        if not entries:
+            return 0
+        minutes = int((time.time() - min(entry[3] for entry in entries)) // 60) + 5
+        query, params = timings_query([entry[0] for entry in entries], minutes)
+        try:
+            history = self.wait_for(run_in_thread(
+                self.run_query, self._resolve_connection_params(), query, params,
+                use_cache=False, query_class=QUERY_CLASS_LOOKUP
+            ))
+        except Exception as e:
+            logger.warning(f"Could not read server timings from query history: {str(e)}")
+            self.metrics.requeue_query_ids(entries)
+            return 0
+        
+        history.columns = [column.upper() for column in history.columns]
+        rows = {row['QUERY_ID']: row for row in history.to_dict('records')}
+        missing = []
+        for entry in entries:
+            row = rows.get(entry[0])
+            if row is None:
+                missing.append(entry)
+                continue
+            self.metrics.record_stages({
+                STAGE_COMPILE: (row['COMPILATION_TIME'] or 0) / 1000,
+                STAGE_QUEUED: (row['QUEUED_TIME'] or 0) / 1000,
+                STAGE_WAREHOUSE: (row['EXECUTION_TIME'] or 0) / 1000
+            }, entry[1], entry[2])
+        self.metrics.requeue_query_ids(missing)
+        return len(entries) - len(missing)
+    
+    def get_perf_stats(self, minutes: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Report latency and throughput of this server's Snowflake statements, from all sessions
+        
+        Args:
+            minutes: Only the last this many minutes (up to ``Config.PERF_METRICS_WINDOW_MINUTES``);
+                since start-up if None
+            
+        Returns:
+            Dictionary with the headline ``summary``, per-stage percentiles
+            (``stages``), the costliest ``fingerprints`` and ``pages`` and
+            per-minute ``throughput``
+        """
+        return {
+            'summary': self.metrics.get_stats(minutes),
+            'stages': self.metrics.get_stage_stats(minutes),
+            'fingerprints': self.metrics.get_breakdown('fingerprint'),
+            'pages': self.metrics.get_breakdown('page'),
+            'throughput': self.metrics.get_throughput(minutes)
+        }
+    
+    def get_dtype_stats(self) -> Dict[str, Any]:
+        """
+        Report memory saved by result dtype optimisation (all sessions)
+        
+        Returns:
+            Dictionary with frames optimised, bytes before and after, and conversions by kind
+        """
+        return self.dtypes.get_stats()
+    
+    def get_resilience_stats(self) -> Dict[str, Any]:
+        """
+        Report retry and circuit breaker activity across all sessions
+        
+        Returns:
+            Dictionary with retry and failure counters, breakers open now and
+            the breaker state for this session's account
+        """
+        stats = self.resilience.get_stats()
+        stats['circuit'] = self.resilience.state(self._breaker_key(self._resolve_connection_params()))
+        return stats
+    
+    def get_workload_stats(self) -> List[Dict[str, Any]]:
+        """
+        Report where each query class runs and how long its statements take
+        
+        Returns:
+            One dictionary per query class and warehouse with the configured
+            warehouse, sample count and mean/p50/p95/max seconds (None before
+            any statement of the class finished)
+        """
+        connection_params = self._resolve_connection_params()
+        latencies = {}
+        for row in self.registry.get_latency_stats():
+            latencies.setdefault(row['query_class'], []).append(row)
+        stats = []
+        for query_class in QUERY_CLASSES:
+            routed = self._route(connection_params, query_class).get('warehouse') or ''
+            rows = latencies.get(query_class) or [{'warehouse': routed, 'samples': 0}]
+            for row in rows:
+                stats.append({
+                    'query_class': query_class,
+                    'warehouse': row['warehouse'],
+                    'routed': bool(Config.get_query_warehouse(query_class)),
+                    'samples': row['samples'],
+                    'mean_seconds': row.get('mean_seconds'),
+                    'p50_seconds': row.get('p50_seconds'),
+                    'p95_seconds': row.get('p95_seconds'),
+                    'max_seconds': row.get('max_seconds')
+                })
+        return stats
+    
+    def get_running_queries(self, all_sessions: bool = False) -> List[Dict[str, Any]]:
+        """
+        List statements running on Snowflake, oldest first
+        
+        Args:
+            all_sessions: Include other sessions' statements, not just this session's
+            
+        Returns:
+            List of dictionaries with token, query, query class, elapsed seconds
+            and whether the statement is being cancelled
+        """
+        return [running.to_dict() for running in self.registry.running(None if all_sessions else self.owner)]
+    
+    def _cancel(self, running: RunningQuery) -> bool:
+        """
+        Cancel a registered query; False if it already finished or is being cancelled
+        
+        A statement not yet sent is not cancelled here; ``_run_statement``
+        sees the mark and does not send it.
+        """
+        if not self.registry.mark_cancelling(running):
+            return False
+        self._send_cancel(running)
+        return True
+    
+    def _send_cancel(self, running: RunningQuery):
+        """
+        Cancel a query by id on its pool key's control connection, not behind its pooled connections
+        
+        A statement still running has no query id on the client yet; it is
+        looked up in its session's query history by its unique ``QUERY_TAG``,
+        retrying briefly while the statement is still registered.
+        """
+        with self.pool.control_connection(running.connection_params) as connection:
+            with connection.cursor() as cursor:
+                if running.query_id is None:
+                    lookup = running.lookup_statement()
+                    if lookup is None:
+                        return
+                    for attempt in range(CANCEL_LOOKUP_ATTEMPTS):
+                        row = cursor.execute(*lookup).fetchone()
+                        if row:
+                            running.query_id = row[0]
+                            break
+                        if running.query_id is not None or self.registry.get(running.token) is None:
+                            # Finished meanwhile; there is nothing left to cancel
+                            return
+                        time.sleep(CANCEL_LOOKUP_DELAY)
+                    else:
+                        logger.warning(f"Could not find the running {running.query_class} query to cancel")
+                        return
+                cursor.execute(*running.cancel_statement())
+        logger.info(f"Cancelled {running.query_class} query after {time.time() - running.started_at:.1f}s")
+    
+    def cancel_query(self, token: int) -> bool:
+        """
+        Cancel a running statement listed by ``get_running_queries``
+        
+        Args:
+            token: The statement's ``token``
+            
+        Returns:
+            True if a cancel was sent; False if it already finished or failed to cancel
+        """
+        running = self.registry.get(token)
+        if running is None:
+            return False
+        try:
+            return self._cancel(running)
+        except Exception as e:
+            logger.error(f"Failed to cancel query: {str(e)}")
+            st.error(f"❌ Could not cancel query: {str(e)}")
+            return False
+    
+    def cancel_abandoned_queries(self, wait: bool = False) -> int:
+        """
+        Cancel this session's running queries whose results will not be read
+        
+        Called when the script reruns. Statements other sessions are waiting
+        on and background cache refreshes keep running.
+        
+        Args:
+            wait: Block until the cancel statements were sent
+            
+        Returns:
+            Number of queries being cancelled
+        """
+        abandoned = [
+            running for running in self.registry.running(self.owner)
+            if running.cancellable and not running.cancelling
+            and not (running.flight_key is not None and self.flights.waiters(running.flight_key))
+        ]
+        if not abandoned:
+            return 0
+        
+        def cancel_all():
+            for running in abandoned:
+                try:
+                    self._cancel(running)
+                except Exception as e:
+                    logger.warning(f"Failed to cancel abandoned query: {str(e)}")
+        
+        if wait:
+            cancel_all()
+        else:
+            threading.Thread(target=cancel_all, name='query-cancel', daemon=True).start()
+        return len(abandoned)
+    
     def close_connection(self):
-        """Close the Snowflake connection"""
+        """Close idle pooled connections for the current credentials"""
         try:
-            if self.connection and not self.connection.is_closed():
-                self.connection.close()
-                logger.info("Snowflake connection closed")
+            closed = self.pool.evict_idle(self._resolve_connection_params())
+            logger.info(f"Closed {closed} idle Snowflake connection(s)")
         except Exception as e:
             logger.error(f"Error closing connection: {str(e)}")
 
-# Create a global connector instance
 @st.cache_resource
-def get_snowflake_connector():
-    """Get a cached Snowflake connector instance"""
-    return SnowflakeConnector() 
\ No newline at end of file
+def get_connection_pool() -> ConnectionPool:
+    """Get the process-wide Snowflake connection pool shared by all sessions"""
+    return ConnectionPool(
+        max_size_per_key=Config.SNOWFLAKE_POOL_MAX_SIZE,
+        idle_timeout=Config.SNOWFLAKE_POOL_IDLE_TIMEOUT,
+        checkout_timeout=Config.SNOWFLAKE_POOL_CHECKOUT_TIMEOUT,
+        health_check_interval=Config.SNOWFLAKE_HEALTH_CHECK_INTERVAL
+    )
+
+@st.cache_resource
+def get_query_cache() -> QueryCache:
+    """Get the process-wide query result cache shared by all sessions"""
+    disk = None
+    if Config.QUERY_DISK_CACHE_DIR:
+        try:
+            disk = DiskResultCache(
+                Config.QUERY_DISK_CACHE_DIR,
+                max_bytes=Config.QUERY_DISK_CACHE_MAX_MB * 1024 * 1024,
+                compression=Config.QUERY_DISK_CACHE_COMPRESSION
+            )
+        except OSError as e:
+            logger.warning(f"Disk result cache disabled: {str(e)}")
+    return QueryCache(
+        max_bytes=Config.QUERY_CACHE_MAX_MB * 1024 * 1024,
+        default_ttl=Config.QUERY_CACHE_TTL,
+        disk=disk
+    )
+
+@st.cache_resource
+def get_table_monitor() -> TableChangeMonitor:
+    """Get the process-wide table change monitor that invalidates the result cache"""
+    return TableChangeMonitor(interval=Config.CACHE_INVALIDATION_POLL_INTERVAL)
+
+@st.cache_resource
+def get_single_flight() -> SingleFlight:
+    """Get the process-wide registry of in-flight queries used to coalesce duplicates"""
+    return SingleFlight()
+
+@st.cache_resource
+def get_entity_loader() -> EntityLoader:
+    """Get the process-wide loader that batches ID lookups from all sessions"""
+    return EntityLoader(
+        window_ms=Config.ENTITY_LOADER_WINDOW_MS,
+        chunk_size=Config.ENTITY_LOADER_CHUNK_SIZE
+    )
+
+@st.cache_resource
+def get_query_registry() -> QueryRegistry:
+    """Get the process-wide registry of statements running on Snowflake"""
+    return QueryRegistry()
+
+@st.cache_resource
+def get_export_manager() -> ExportManager:
+    """Get the process-wide manager of background CSV exports"""
+    return ExportManager(
+        directory=Config.QUERY_EXPORT_DIR or None,
+        retention=Config.QUERY_EXPORT_RETENTION_HOURS * 3600
+    )
+
+@st.cache_resource
+def get_resilience_manager() -> ResilienceManager:
+    """Get the process-wide retry policy and per-account circuit breakers"""
+    return ResilienceManager(
+        max_attempts=Config.QUERY_RETRY_ATTEMPTS,
+        base_delay=Config.QUERY_RETRY_BASE_DELAY,
+        max_delay=Config.QUERY_RETRY_MAX_DELAY,
+        failure_threshold=Config.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+        reset_timeout=Config.CIRCUIT_BREAKER_RESET_SECONDS
+    )
+
+@st.cache_resource
+def get_perf_metrics() -> PerfMetrics:
+    """Get the process-wide latency histograms and counters for Snowflake statements"""
+    return PerfMetrics(
+        max_keys=Config.PERF_METRICS_MAX_KEYS,
+        window_minutes=Config.PERF_METRICS_WINDOW_MINUTES
+    )
+
+@st.cache_resource
+def get_dtype_optimizer() -> DtypeOptimizer:
+    """Get the process-wide result dtype optimiser and its savings counters"""
+    return DtypeOptimizer(
+        max_category_ratio=Config.DTYPE_CATEGORY_MAX_RATIO,
+        min_rows=Config.DTYPE_OPTIMIZE_MIN_ROWS,
+        downcast_numbers=Config.DTYPE_DOWNCAST_NUMBERS
+    )
+
+@st.cache_resource
+def get_allocation_tracker() -> AllocationTracker:
+    """Get the process-wide tracemalloc tracker for per-page allocation diffs"""
+    tracker = AllocationTracker(frames=Config.TRACEMALLOC_FRAMES)
+    if Config.TRACEMALLOC_ENABLED:
+        tracker.start()
+    return tracker
+
+def get_snowflake_connector() -> SnowflakeConnector:
+    """Get this session's Snowflake connector, backed by the shared pool and result cache"""
+    if '_snowflake_connector' not in st.session_state:
+        st.session_state._snowflake_connector = SnowflakeConnector(
+            get_connection_pool(), get_query_cache(), get_table_monitor(), get_single_flight(),
+            get_entity_loader(), get_query_registry(), get_export_manager(), get_resilience_manager(),
+            get_perf_metrics(), get_dtype_optimizer()
+        )
+    return st.session_state._snowflake_connector
@@ -0,0 +1,197 @@
+"""
+SQL text helpers shared by the query planner and the result cache
+"""
+
+import functools
+import re
+from typing import Optional, Tuple
+
+_LEADING_COMMENTS = re.compile(r'^\s*(?:--[^\n]*\n|/\*.*?\*/\s*)*', re.S)
+_READ_KEYWORDS = ('select', 'with', 'show', 'describe', 'desc', 'explain')
+
+
+def canonical_sql(query: str) -> str:
+    """
+    Whitespace-normalised statement text used to spot duplicate queries
+
+    Runs of whitespace outside string literals and comments become one
+    space; literals and comments are kept as written, and a line comment
+    keeps the line break that ends it.
+    """
+    parts = []
+    position = 0
+    line_comment = False
+    for match in _STRINGS_AND_COMMENTS.finditer(query):
+        gap = re.sub(r'\s+', ' ', query[position:match.start()])
+        parts.append('\n' + gap[1:] if line_comment else gap)
+        parts.append(match.group(0))
+        line_comment = match.group(0).startswith('--')
+        position = match.end()
+    gap = re.sub(r'\s+', ' ', query[position:])
+    parts.append('\n' + gap[1:] if line_comment and gap else gap)
+    return ''.join(parts).strip().rstrip(';').strip()
+
+
+def is_read_statement(query: str) -> bool:
+    """True if the statement only reads data (SELECT, WITH, SHOW, DESCRIBE, EXPLAIN)"""
+    return _first_keyword(query) in _READ_KEYWORDS
+
+
+def is_select_statement(query: str) -> bool:
+    """True for SELECT and WITH queries, the statements that return table rows"""
+    return _first_keyword(query) in ('select', 'with')
+
+
+def _first_keyword(query: str) -> str:
+    """Lower-cased first word of a statement, skipping comments and opening parentheses"""
+    body = _LEADING_COMMENTS.sub('', query).lstrip('( \t\r\n')
+    return re.match(r'\w*', body).group(0).lower()
+
+
+_STRINGS_AND_COMMENTS = re.compile(r"'(?:[^']|'')*'|--[^\n]*|/\*.*?\*/", re.S)
+_TOKENS = re.compile(r'"[^"]+"(?:\."[^"]+"|\.[A-Za-z_][\w$]*)*|[A-Za-z_][\w$]*(?:\.(?:"[^"]+"|[A-Za-z_][\w$]*))*|[(),]')
+_CTE_NAMES = re.compile(r'\b([A-Za-z_]\w*)\s+as\s*\(', re.I)
+_NOT_ALIASES = {
+    'where', 'group', 'order', 'having', 'limit', 'union', 'intersect', 'except', 'minus',
+    'join', 'inner', 'left', 'right', 'full', 'outer', 'cross', 'natural', 'on', 'using',
+    'lateral', 'qualify', 'window', 'sample', 'tablesample', 'pivot', 'unpivot', 'at', 'before'
+}
+
+
+def referenced_tables(query: str, database: str = '', schema: str = '') -> set:
+    """
+    Tables a statement reads, from its FROM and JOIN targets
+
+    Names are upper-cased and qualified to DATABASE.SCHEMA.TABLE using the
+    session defaults; CTE names, subqueries and table functions are skipped.
+
+    Args:
+        query: SQL query string
+        database: Session database used to qualify one- and two-part names
+        schema: Session schema used to qualify one-part names
+
+    Returns:
+        Set of fully qualified table names
+    """
+    text = _STRINGS_AND_COMMENTS.sub(' ', query)
+    ctes = {name.lower() for name in _CTE_NAMES.findall(text)}
+    tokens = _TOKENS.findall(text)
+    tables = set()
+
+    i = 0
+    while i < len(tokens):
+        keyword = tokens[i].lower()
+        i += 1
+        if keyword not in ('from', 'join'):
+            continue
+        while i < len(tokens):
+            name = tokens[i]
+            if name in ('(', ',', ')') or name.lower() in ('lateral', 'table'):
+                break
+            if name.lower() not in ctes:
+                tables.add(_qualify(name, database, schema))
+            i += 1
+            # Optional alias, then a comma continues a FROM list
+            if i < len(tokens) and tokens[i].lower() == 'as':
+                i += 1
+            if i < len(tokens) and tokens[i] not in ('(', ',', ')') and tokens[i].lower() not in _NOT_ALIASES:
+                i += 1
+            if keyword == 'from' and i < len(tokens) and tokens[i] == ',':
+                i += 1
+                continue
+            break
+    return tables
+
+
+def _qualify(name: str, database: str, schema: str) -> str:
+    """Upper-case a table name and fill in the session database and schema"""
+    parts = [part.strip('"').upper() for part in re.findall(r'"[^"]+"|[^.]+', name)]
+    if len(parts) == 1:
+        parts = [schema.upper(), *parts]
+    if len(parts) == 2:
+        parts = [database.upper(), *parts]
+    return '.'.join(parts)
+
+
+def _top_level_text(query: str) -> str:
+    """Statement text with strings, comments and everything inside parentheses blanked out"""
+    text = _STRINGS_AND_COMMENTS.sub(' ', query)
+    depth = 0
+    chars = []
+    for char in text:
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth = max(0, depth - 1)
+        chars.append(char if depth == 0 and char != ')' else ' ')
+    return ''.join(chars)
+
+
+def top_level_limit(query: str) -> Optional[int]:
+    """
+    Row limit the outermost query applies with LIMIT, FETCH or TOP
+
+    Args:
+        query: SQL query string
+
+    Returns:
+        The smallest literal row limit found, or None if the result is unbounded
+    """
+    text = _top_level_text(query)
+    limits = [int(value) for value in re.findall(r'\blimit\s+(\d+)', text, re.I)]
+    limits += [int(value) for value in re.findall(r'\bfetch\s+(?:first|next)\s+(\d+)', text, re.I)]
+    limits += [int(value) for value in re.findall(r'\bselect\s+(?:distinct\s+)?top\s+(\d+)', text, re.I)]
+    return min(limits) if limits else None
+
+
+def cap_rows(query: str, max_rows: int, sample: bool = False) -> Tuple[str, bool]:
+    """
+    Bound the rows an ad-hoc SELECT can return
+
+    A capped statement fetches one row more than ``max_rows``; callers keep
+    the first ``max_rows`` and treat the extra row as proof that the cap
+    cut the result. Statements that already limit their output to
+    ``max_rows`` or fewer, and statements other than SELECT/WITH, are
+    returned unchanged.
+
+    Args:
+        query: SQL query string
+        max_rows: Most rows the caller keeps
+        sample: Return a random sample instead of the first rows
+
+    Returns:
+        Tuple of (statement to run, whether a cap was added)
+    """
+    if not is_select_statement(query):
+        return query, False
+    body = _LEADING_COMMENTS.sub('', query).strip().rstrip(';').strip()
+    limit = top_level_limit(body)
+    if limit is not None and limit <= max_rows:
+        return query, False
+    if sample:
+        return f"SELECT * FROM (\n{body}\n) SAMPLE ({int(max_rows) + 1} ROWS)", True
+    return f"SELECT * FROM (\n{body}\n) LIMIT {int(max_rows) + 1}", True
+
+
+_LITERALS = re.compile(r"%\(\w+\)s|%s|\?|:\d+|(?<![\w$.])\d+(?:\.\d+)?(?:e[-+]?\d+)?(?![\w$])", re.I)
+_VALUE_LISTS = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+
+
+@functools.lru_cache(maxsize=2048)
+def query_fingerprint(query: str) -> str:
+    """
+    Statement text with literals and bind placeholders replaced by ``?``
+
+    Statements that differ only in the values they filter on share a
+    fingerprint; IN lists of any length collapse to ``(...)``.
+
+    Args:
+        query: SQL query string
+
+    Returns:
+        Whitespace-normalised statement shape
+    """
+    text = _STRINGS_AND_COMMENTS.sub(lambda match: '?' if match.group(0).startswith("'") else ' ', query)
+    text = _LITERALS.sub('?', text)
+    text = _VALUE_LISTS.sub('(...)', text)
+    return canonical_sql(text)
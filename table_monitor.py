@@ -0,0 +1,167 @@
+"""
+Table change monitor for the query result cache
+Polls INFORMATION_SCHEMA.TABLES for the tables cached results read and
+invalidates only the results whose sources changed since they were fetched
+"""
+
+import logging
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Any, Callable
+
+import pandas as pd
+
+from query_cache import QueryCache
+
+logger = logging.getLogger(__name__)
+
+
+def _sql_literal(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+class TableChangeMonitor:
+    """
+    Invalidate cached results when the tables they read are altered
+
+    ``maybe_poll`` is cheap to call on every query: it starts a background
+    poll at most once per ``interval`` seconds per account. Each poll reads
+    ``LAST_ALTERED`` and ``ROW_COUNT`` for the tracked tables, one metadata
+    query per database.
+    """
+
+    def __init__(self, interval: float = 60):
+        self.interval = interval
+        self._versions: Dict[str, tuple] = {}
+        self._last_poll: Dict[str, float] = {}
+        self._polling: set = set()
+        self._lock = threading.Lock()
+        self._stats = {
+            'polls': 0,
+            'poll_failures': 0,
+            'tables_checked': 0,
+            'tables_changed': 0,
+            'results_invalidated': 0,
+            'last_poll_at': None,
+            'last_changed': []
+        }
+
+    @staticmethod
+    def _account(connection_params: Dict[str, Any]) -> str:
+        return str(connection_params.get('account') or '').upper()
+
+    def maybe_poll(self, cache: QueryCache, execute: Callable[[Dict[str, Any], str], pd.DataFrame],
+                   connection_params: Dict[str, Any]):
+        """
+        Start a background poll for this account if one is due
+
+        Args:
+            cache: Result cache whose entries are checked and invalidated
+            execute: Uncached ``(connection_params, query) -> DataFrame`` runner
+            connection_params: Resolved login parameters to poll with
+        """
+        if self.interval <= 0:
+            return
+        account = self._account(connection_params)
+        with self._lock:
+            if account in self._polling or time.monotonic() - self._last_poll.get(account, 0.0) < self.interval:
+                return
+            self._polling.add(account)
+        threading.Thread(
+            target=self._poll_in_background,
+            args=(cache, execute, connection_params, account),
+            name='table-monitor',
+            daemon=True
+        ).start()
+
+    def _poll_in_background(self, cache: QueryCache, execute, connection_params: Dict[str, Any],
+                            account: str):
+        try:
+            self._poll(cache, execute, connection_params, account)
+        except Exception as e:
+            logger.warning(f"Table change poll failed: {str(e)}")
+        finally:
+            with self._lock:
+                self._polling.discard(account)
+
+    def poll(self, cache: QueryCache, execute: Callable[[Dict[str, Any], str], pd.DataFrame],
+             connection_params: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Check the tracked tables now and invalidate results that read changed ones
+
+        Args:
+            cache: Result cache whose entries are checked and invalidated
+            execute: Uncached ``(connection_params, query) -> DataFrame`` runner
+            connection_params: Resolved login parameters to poll with
+
+        Returns:
+            Dictionary with the tables checked, tables changed since the last
+            poll and the number of cached results invalidated
+        """
+        return self._poll(cache, execute, connection_params, self._account(connection_params))
+
+    def _poll(self, cache: QueryCache, execute, connection_params: Dict[str, Any],
+              account: str) -> Dict[str, Any]:
+        with self._lock:
+            self._last_poll[account] = time.monotonic()
+
+        tables = cache.tracked_tables(account)
+        by_database = defaultdict(list)
+        for table in tables:
+            database, schema, name = table.split('.', 2)
+            by_database[database].append((schema, name))
+
+        altered: Dict[str, float] = {}
+        changed = []
+        try:
+            for database, names in by_database.items():
+                schemas = sorted({schema for schema, _ in names})
+                table_names = sorted({name for _, name in names})
+                query = (
+                    f'SELECT TABLE_CATALOG, TABLE_SCHEMA, TABLE_NAME, LAST_ALTERED, ROW_COUNT '
+                    f'FROM "{database}".INFORMATION_SCHEMA.TABLES '
+                    f'WHERE TABLE_SCHEMA IN ({", ".join(map(_sql_literal, schemas))}) '
+                    f'AND TABLE_NAME IN ({", ".join(map(_sql_literal, table_names))})'
+                )
+                df = execute(connection_params, query)
+                for row in df.itertuples(index=False):
+                    table = f"{row.TABLE_CATALOG}.{row.TABLE_SCHEMA}.{row.TABLE_NAME}".upper()
+                    if table not in tables:
+                        continue
+                    last_altered = pd.Timestamp(row.LAST_ALTERED)
+                    if last_altered.tzinfo is None:
+                        last_altered = last_altered.tz_localize('UTC')
+                    altered[table] = last_altered.timestamp()
+                    version = (altered[table], row.ROW_COUNT)
+                    with self._lock:
+                        previous = self._versions.get(table)
+                        self._versions[table] = version
+                    if previous is not None and previous != version:
+                        changed.append(table)
+        except Exception:
+            with self._lock:
+                self._stats['poll_failures'] += 1
+            raise
+
+        invalidated = cache.invalidate_changed(altered, account) if altered else 0
+
+        with self._lock:
+            self._stats['polls'] += 1
+            self._stats['tables_checked'] = len(tables)
+            self._stats['tables_changed'] += len(changed)
+            self._stats['results_invalidated'] += invalidated
+            self._stats['last_poll_at'] = time.time()
+            if changed:
+                self._stats['last_changed'] = sorted(changed)
+
+        if invalidated:
+            logger.info(f"Invalidated {invalidated} cached results after changes to {', '.join(sorted(changed)) or 'source tables'}")
+        return {'tables_checked': len(tables), 'changed': sorted(changed), 'invalidated': invalidated}
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Poll counters and the tables seen changing most recently"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['tracked_tables'] = len(self._versions)
+        return stats
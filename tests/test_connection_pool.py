@@ -0,0 +1,196 @@
+import threading
+import time
+
+import pytest
+
+from connection_pool import ConnectionPool, PoolTimeoutError
+
+PARAMS = {'account': 'acct', 'user': 'u', 'role': 'r', 'warehouse': 'w', 'password': 'p'}
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=None):
+        self.connection.executed.append(query)
+        if self.connection.fail_health_check:
+            raise ConnectionError('connection reset')
+        return self
+
+    def fetchone(self):
+        return (1,)
+
+
+class FakeConnection:
+    def __init__(self, **params):
+        self.params = params
+        self.closed = False
+        self.fail_health_check = False
+        self.executed = []
+
+    def cursor(self, *args):
+        return FakeCursor(self)
+
+    def is_closed(self):
+        return self.closed
+
+    def close(self):
+        self.closed = True
+
+
+class Connector:
+    """``connect_fn`` recording every login"""
+
+    def __init__(self):
+        self.connections = []
+
+    def __call__(self, **params):
+        connection = FakeConnection(**params)
+        self.connections.append(connection)
+        return connection
+
+
+def make_pool(**kwargs):
+    connector = Connector()
+    return ConnectionPool(connect_fn=connector, **kwargs), connector
+
+
+def test_connection_is_reused_between_checkouts():
+    pool, connector = make_pool()
+    with pool.connection(PARAMS) as first:
+        pass
+    with pool.connection(PARAMS) as second:
+        pass
+    assert first is second
+    assert len(connector.connections) == 1
+    assert pool.get_key_stats(PARAMS)['checkouts'] == 2
+
+
+def test_keys_do_not_share_connections():
+    pool, connector = make_pool()
+    with pool.connection(PARAMS) as first:
+        with pool.connection(dict(PARAMS, warehouse='other')) as second:
+            assert first is not second
+    assert len(connector.connections) == 2
+
+
+def test_credential_change_forces_a_new_login():
+    pool, connector = make_pool()
+    with pool.connection(PARAMS):
+        pass
+    with pool.connection(dict(PARAMS, password='rotated')) as connection:
+        assert connection.params['password'] == 'rotated'
+    assert len(connector.connections) == 2
+    assert connector.connections[0].closed
+
+
+def test_saturated_key_times_out():
+    pool, _ = make_pool(max_size_per_key=1, checkout_timeout=0.05)
+    with pool.connection(PARAMS):
+        with pytest.raises(PoolTimeoutError):
+            pool.checkout(PARAMS)
+    assert pool.get_key_stats(PARAMS)['timeouts'] == 1
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out waiting'
+        time.sleep(0.005)
+
+
+def test_waiters_are_served_in_fifo_order():
+    pool, _ = make_pool(max_size_per_key=1, checkout_timeout=5)
+    served = []
+
+    def worker(name):
+        with pool.connection(PARAMS):
+            served.append(name)
+
+    held = pool.checkout(PARAMS)
+    threads = []
+    for count, name in enumerate(['first', 'second', 'third'], start=1):
+        thread = threading.Thread(target=worker, args=(name,))
+        thread.start()
+        threads.append(thread)
+        wait_until(lambda: pool.get_key_stats(PARAMS)['waiting'] == count)
+    pool.checkin(PARAMS, held)
+    for thread in threads:
+        thread.join(5)
+    assert served == ['first', 'second', 'third']
+    assert pool.get_key_stats(PARAMS)['waits'] == 3
+
+
+def test_idle_connection_is_health_checked_after_interval():
+    pool, connector = make_pool(health_check_interval=0)
+    with pool.connection(PARAMS):
+        pass
+    with pool.connection(PARAMS) as connection:
+        assert connection.executed == ['SELECT 1']
+    assert len(connector.connections) == 1
+    assert pool.get_key_stats(PARAMS)['health_checks'] == 1
+
+
+def test_health_check_is_skipped_within_interval():
+    pool, _ = make_pool(health_check_interval=300)
+    with pool.connection(PARAMS):
+        pass
+    with pool.connection(PARAMS) as connection:
+        assert connection.executed == []
+
+
+def test_failed_health_check_reconnects():
+    pool, connector = make_pool(health_check_interval=0)
+    with pool.connection(PARAMS) as connection:
+        connection.fail_health_check = True
+    with pool.connection(PARAMS) as connection:
+        assert connection is connector.connections[1]
+    assert connector.connections[0].closed
+    assert pool.get_key_stats(PARAMS)['reconnects'] == 1
+
+
+def test_closed_connection_is_not_reused():
+    pool, connector = make_pool()
+    with pool.connection(PARAMS) as connection:
+        connection.close()
+    with pool.connection(PARAMS) as connection:
+        assert not connection.closed
+    assert len(connector.connections) == 2
+
+
+def test_failed_statement_forces_a_health_check_before_reuse():
+    pool, _ = make_pool(health_check_interval=300)
+    with pytest.raises(RuntimeError):
+        with pool.connection(PARAMS):
+            raise RuntimeError('statement failed')
+    with pool.connection(PARAMS) as connection:
+        assert connection.executed == ['SELECT 1']
+
+
+def test_control_connection_is_outside_the_pool_limit():
+    pool, connector = make_pool(max_size_per_key=1, checkout_timeout=0.05)
+    with pool.connection(PARAMS) as busy:
+        with pool.control_connection(PARAMS) as control:
+            assert control is not busy
+    with pool.control_connection(PARAMS) as again:
+        assert again is control
+    assert len(connector.connections) == 2
+    assert pool.get_stats()[0]['control']
+
+
+def test_evict_idle_closes_idle_and_control_connections():
+    pool, connector = make_pool()
+    with pool.connection(PARAMS):
+        pass
+    with pool.control_connection(PARAMS):
+        pass
+    assert pool.evict_idle() == 2
+    assert all(connection.closed for connection in connector.connections)
+    assert pool.get_key_stats(PARAMS)['idle'] == 0
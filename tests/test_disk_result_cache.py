@@ -0,0 +1,61 @@
+import os
+
+import pandas as pd
+
+import query_cache
+from query_cache import DiskResultCache, QueryCache
+
+CONNECTION = {'account': 'acct', 'role': 'analyst', 'warehouse': 'wh', 'database': 'db', 'schema': 'sc'}
+KEY = QueryCache.make_key("SELECT * FROM t", None, CONNECTION)
+
+
+def frame():
+    return pd.DataFrame({'a': range(10), 'b': ['x'] * 10})
+
+
+def test_put_and_get_round_trip_survives_a_restart(tmp_path):
+    DiskResultCache(str(tmp_path)).put(KEY, frame(), fetched_at=123.0)
+    df = DiskResultCache(str(tmp_path)).get(KEY)
+    assert df.equals(frame())
+    assert df.attrs['fetched_at'] == 123.0
+
+
+def test_failed_move_into_place_returns_false(tmp_path, monkeypatch):
+    cache = DiskResultCache(str(tmp_path))
+
+    def fail(*args):
+        raise OSError('disk full')
+
+    monkeypatch.setattr(query_cache.os, 'replace', fail)
+    assert not cache.put(KEY, frame())
+    assert cache.get_stats()['entries'] == 0
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.tmp')]
+
+
+def test_failed_manifest_save_returns_false(tmp_path, monkeypatch):
+    cache = DiskResultCache(str(tmp_path))
+
+    def fail():
+        raise OSError('read-only file system')
+
+    monkeypatch.setattr(cache, '_save_manifest', fail)
+    assert not cache.put(KEY, frame())
+
+
+def test_put_async_writes_in_the_background(tmp_path):
+    cache = DiskResultCache(str(tmp_path))
+    keys = [QueryCache.make_key(f"SELECT {n}", None, CONNECTION) for n in range(5)]
+    for key in keys:
+        assert cache.put_async(key, frame())
+    cache.flush()
+    assert cache.get_stats()['entries'] == 5
+    # One manifest for the whole batch, readable by a new process
+    assert DiskResultCache(str(tmp_path)).get(keys[-1]) is not None
+
+
+def test_query_cache_put_hands_results_to_the_disk_writer(tmp_path):
+    disk = DiskResultCache(str(tmp_path))
+    cache = QueryCache(disk=disk)
+    cache.put(KEY, frame())
+    disk.flush()
+    assert disk.get(KEY) is not None
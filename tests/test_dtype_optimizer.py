@@ -0,0 +1,93 @@
+import decimal
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from dtype_optimizer import (
+    DtypeOptimizer, CONVERSION_CATEGORY, CONVERSION_DATETIME, CONVERSION_DECIMAL,
+    CONVERSION_FLOAT, CONVERSION_INTEGER
+)
+
+ROWS = 2000
+
+
+def optimize(df, **kwargs):
+    return DtypeOptimizer(min_rows=0, **kwargs).optimize(df)
+
+
+def test_small_frames_are_returned_unchanged():
+    df = pd.DataFrame({'tier': ['a', 'b'] * 10})
+    assert DtypeOptimizer(min_rows=1000).optimize(df)['tier'].dtype == object
+    assert 'dtype_optimization' not in df.attrs
+
+
+def test_numbers_stay_64_bit_by_default():
+    df = optimize(pd.DataFrame({'count': np.arange(ROWS, dtype=np.int64), 'ratio': np.full(ROWS, 0.5)}))
+    assert df['count'].dtype == np.int64
+    assert df['ratio'].dtype == np.float64
+    assert df.attrs['dtype_optimization']['columns'] == {}
+
+
+def test_numbers_are_downcast_when_enabled():
+    df = optimize(pd.DataFrame({
+        'count': np.arange(ROWS, dtype=np.int64),
+        'exact': np.full(ROWS, 0.5),
+        'inexact': np.full(ROWS, 0.1)
+    }), downcast_numbers=True)
+    assert df['count'].dtype == np.int16
+    assert df['exact'].dtype == np.float32
+    # 0.1 does not survive a float32 round trip
+    assert df['inexact'].dtype == np.float64
+    assert df.attrs['dtype_optimization']['columns'] == {'count': CONVERSION_INTEGER, 'exact': CONVERSION_FLOAT}
+
+
+def test_low_cardinality_strings_become_categories():
+    df = optimize(pd.DataFrame({'tier': ['gold', 'silver', None, 'bronze'] * (ROWS // 4)}))
+    assert df['tier'].dtype == 'category'
+    report = df.attrs['dtype_optimization']
+    assert report['columns'] == {'tier': CONVERSION_CATEGORY}
+    assert report['bytes_after'] < report['bytes_before']
+
+
+def test_high_cardinality_strings_stay_objects():
+    df = optimize(pd.DataFrame({'_id': [f'{i:024x}' for i in range(ROWS)]}))
+    assert df['_id'].dtype == object
+
+
+def test_iso_timestamp_strings_are_parsed():
+    start = datetime(2026, 1, 1)
+    values = [(start + timedelta(minutes=i)).isoformat() for i in range(ROWS)]
+    df = optimize(pd.DataFrame({'time': values}))
+    assert df['time'].dtype.kind == 'M'
+    assert df['time'].iloc[1] == pd.Timestamp(start + timedelta(minutes=1))
+    assert df.attrs['dtype_optimization']['columns'] == {'time': CONVERSION_DATETIME}
+
+
+def test_mixed_offsets_are_converted_to_utc():
+    values = ['2026-01-01T10:00:00+02:00', '2026-01-01T10:00:00-05:00'] * (ROWS // 2)
+    df = optimize(pd.DataFrame({'time': values}))
+    assert str(df['time'].dt.tz) == 'UTC'
+    assert df['time'].iloc[0] == pd.Timestamp('2026-01-01T08:00:00Z')
+
+
+def test_unparseable_timestamps_are_kept():
+    values = ['2026-01-01'] * (ROWS - 1) + ['2026-13-45']
+    df = optimize(pd.DataFrame({'time': values}))
+    assert df['time'].dtype == object
+
+
+def test_decimals_become_float64():
+    df = optimize(pd.DataFrame({'amount': [decimal.Decimal('1.25')] * ROWS}))
+    assert df['amount'].dtype == np.float64
+    assert df.attrs['dtype_optimization']['columns'] == {'amount': CONVERSION_DECIMAL}
+
+
+def test_stats_accumulate_across_frames():
+    optimizer = DtypeOptimizer(min_rows=0)
+    optimizer.optimize(pd.DataFrame({'tier': ['a', 'b'] * (ROWS // 2)}))
+    optimizer.optimize(pd.DataFrame({'_id': [str(i) for i in range(ROWS)]}))
+    stats = optimizer.get_stats()
+    assert (stats['frames'], stats['optimized'], stats['columns_converted']) == (2, 1, 1)
+    assert stats['conversions'] == {CONVERSION_CATEGORY: 1}
+    assert stats['bytes_saved'] > 0
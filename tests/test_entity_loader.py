@@ -0,0 +1,109 @@
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from entity_loader import EntityLoader, LOOKUP_KEY_COLUMN, parse_id_csv, parse_id_list
+
+CONNECTION = {'account': 'acct', 'role': 'analyst', 'warehouse': 'wh', 'database': 'db', 'schema': 'sc'}
+
+
+class Runner:
+    """Lookup runner returning one row per bound ID, except ``missing``"""
+
+    def __init__(self, fail=False):
+        self.calls = []
+        self.fail = fail
+        self._lock = threading.Lock()
+
+    def __call__(self, connection_params, query, params):
+        with self._lock:
+            self.calls.append((connection_params, query, params))
+        if self.fail:
+            raise RuntimeError('lookup failed')
+        ids = [value for value in params.values() if value != 'missing']
+        return pd.DataFrame({LOOKUP_KEY_COLUMN: ids, 'NAME': [f'name-{value}' for value in ids]})
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out waiting'
+        time.sleep(0.005)
+
+
+def test_lookups_within_the_window_share_one_statement():
+    loader = EntityLoader(window_ms=500)
+    run = Runner()
+    results = {}
+
+    def lookup(name, ids, connection):
+        results[name] = loader.load_many(run, connection, 'users', ids)
+
+    first = threading.Thread(target=lookup, args=('first', ['1', '2'], CONNECTION))
+    first.start()
+    wait_until(lambda: loader.get_stats()['pending'] == 1)
+    second = threading.Thread(target=lookup, args=('second', ['2', '3'], dict(CONNECTION)))
+    second.start()
+    first.join(5)
+    second.join(5)
+
+    assert len(run.calls) == 1
+    assert sorted(run.calls[0][2].values()) == ['1', '2', '3']
+    assert set(results['first']) == {'1', '2'}
+    assert set(results['second']) == {'2', '3'}
+    assert results['second']['3']['NAME'].tolist() == ['name-3']
+    # The lookup key column is dropped from each caller's rows
+    assert LOOKUP_KEY_COLUMN not in results['first']['1'].columns
+    stats = loader.get_stats()
+    assert (stats['requests'], stats['batches'], stats['queries']) == (2, 1, 1)
+
+
+def test_lookups_with_different_scope_are_not_batched():
+    loader = EntityLoader(window_ms=300)
+    run = Runner()
+    threads = [
+        threading.Thread(target=loader.load_many, args=(run, CONNECTION, 'users', ['1'])),
+        threading.Thread(target=loader.load_many, args=(run, dict(CONNECTION, role='admin'), 'users', ['1']))
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    assert len(run.calls) == 2
+
+
+def test_batch_is_split_into_chunks():
+    loader = EntityLoader(window_ms=0, chunk_size=2)
+    run = Runner()
+    results = loader.load_many(run, CONNECTION, 'users', ['1', '2', '3', '2', ' '])
+    assert [len(params) for _, _, params in run.calls] == [2, 1]
+    assert list(results) == ['1', '2', '3']
+
+
+def test_missing_ids_get_empty_frames():
+    loader = EntityLoader(window_ms=0)
+    results = loader.load_many(Runner(), CONNECTION, 'users', ['1', 'missing'])
+    assert len(results['1']) == 1
+    assert results['missing'].empty
+    assert list(results['missing'].columns) == ['NAME']
+
+
+def test_failed_chunk_raises_for_its_callers():
+    loader = EntityLoader(window_ms=0)
+    with pytest.raises(RuntimeError):
+        loader.load_many(Runner(fail=True), CONNECTION, 'users', ['1'])
+    assert loader.get_stats()['failures'] == 1
+    assert loader.get_stats()['pending'] == 0
+
+
+def test_unknown_entity_is_rejected():
+    with pytest.raises(ValueError):
+        EntityLoader(window_ms=0).load_many(Runner(), CONNECTION, 'nope', ['1'])
+
+
+def test_parse_id_list_and_csv():
+    assert parse_id_list("a1, a2 a2\n'a3';(a4)") == ['a1', 'a2', 'a2', 'a3', 'a4']
+    assert parse_id_csv(b"name,_id\nx,1\ny,2\n") == ['1', '2']
+    assert parse_id_csv(b"abc\ndef\n") == ['abc', 'def']
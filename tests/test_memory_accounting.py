@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import memory_accounting
+from memory_accounting import RESULT_AGES_KEY, enforce_session_cap, is_result, object_size
+
+MB = 1024 * 1024
+
+
+def result(megabytes):
+    return pd.DataFrame({'a': np.zeros(int(megabytes * MB) // 8)})
+
+
+class Clock:
+    """Stands in for ``time.monotonic`` in the memory_accounting module"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(memory_accounting.time, 'monotonic', clock)
+    return clock
+
+
+def test_is_result():
+    assert is_result(result(0.01))
+    assert is_result({'rows': result(0.01)})
+    assert is_result([1, np.zeros(3)])
+    assert not is_result({'page': 'home'})
+    assert not is_result('text')
+
+
+def test_object_size_counts_shared_objects_once():
+    df = result(1)
+    single = object_size(df)
+    assert single >= MB
+    assert object_size([df, df]) < 2 * single
+
+
+def test_under_the_cap_nothing_is_evicted(clock):
+    state = {'a': result(1), 'b': result(1), 'page': 'home'}
+    assert enforce_session_cap(state, 10 * MB) == []
+    assert set(state) == {'a', 'b', 'page', RESULT_AGES_KEY}
+
+
+def test_oldest_results_are_evicted_first(clock):
+    state = {'old': result(2)}
+    enforce_session_cap(state, 10 * MB)
+    clock.now += 10
+    state['new'] = result(2)
+    enforce_session_cap(state, 10 * MB)
+    clock.now += 10
+    state['newest'] = result(2)
+
+    evicted = enforce_session_cap(state, 5 * MB)
+    assert [key for key, _ in evicted] == ['old']
+    assert evicted[0][1] >= 2 * MB
+    assert 'old' not in state and 'new' in state and 'newest' in state
+    assert 'old' not in state[RESULT_AGES_KEY]
+
+
+def test_replacing_a_result_restarts_its_age(clock):
+    state = {'first': result(2)}
+    enforce_session_cap(state, 10 * MB)
+    clock.now += 10
+    state['second'] = result(2)
+    enforce_session_cap(state, 10 * MB)
+    clock.now += 10
+    state['first'] = result(2)
+
+    evicted = enforce_session_cap(state, 3 * MB)
+    assert [key for key, _ in evicted] == ['second']
+
+
+def test_results_are_measured_once_per_object(clock, monkeypatch):
+    state = {'a': result(1), 'b': result(1)}
+    enforce_session_cap(state, 10 * MB)
+    measured = []
+    original = memory_accounting.object_size
+    monkeypatch.setattr(memory_accounting, 'object_size',
+                        lambda obj, *args, **kwargs: measured.append(obj) or original(obj, *args, **kwargs))
+    enforce_session_cap(state, 10 * MB)
+    assert measured == []
+    state['b'] = result(1)
+    enforce_session_cap(state, 10 * MB)
+    assert len(measured) == 1 and measured[0] is state['b']
+
+
+def test_private_keys_and_other_values_are_never_evicted(clock):
+    state = {'_connector_cache': result(3), 'settings': {'big': 'x' * (3 * MB)}, 'result': result(1)}
+    evicted = enforce_session_cap(state, 1 * MB)
+    assert [key for key, _ in evicted] == ['result']
+    assert '_connector_cache' in state and 'settings' in state
+
+
+def test_zero_cap_disables_eviction(clock):
+    state = {'a': result(2)}
+    assert enforce_session_cap(state, 0) == []
+    assert 'a' in state[RESULT_AGES_KEY]
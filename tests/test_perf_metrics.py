@@ -0,0 +1,59 @@
+import pytest
+
+from perf_metrics import LatencyHistogram
+
+
+def histogram(*observations):
+    result = LatencyHistogram()
+    for seconds in observations:
+        result.observe(seconds)
+    return result
+
+
+def test_empty_histogram_has_no_quantiles():
+    assert histogram().quantile(0.5) is None
+    assert histogram().summary()['mean_seconds'] is None
+
+
+def test_quantile_is_interpolated_within_the_bucket():
+    # 100 observations spread over the (0.25, 0.5] bucket
+    result = histogram(*[0.5] * 100)
+    assert result.quantile(0.5) == pytest.approx(0.375)
+    assert result.quantile(0.1) == pytest.approx(0.275)
+
+
+def test_quantile_never_exceeds_the_largest_observation():
+    result = histogram(0.3)
+    for q in (0.5, 0.95, 0.99, 1.0):
+        assert 0.25 <= result.quantile(q) <= 0.3
+
+
+def test_quantiles_land_in_the_right_buckets():
+    result = histogram(*[0.004] * 90, *[0.04] * 10)
+    assert 0.0025 <= result.quantile(0.5) <= 0.005
+    assert 0.025 <= result.quantile(0.95) <= 0.04
+    assert result.quantile(0.0) == 0.0025
+
+
+def test_overflow_bucket_is_bounded_by_the_maximum():
+    result = histogram(1000.0, 2000.0)
+    assert result.quantile(1.0) == 2000.0
+    assert 600 <= result.quantile(0.5) <= 2000.0
+
+
+def test_negative_durations_count_as_zero():
+    result = histogram(-1.0)
+    assert result.quantile(0.5) == 0.0
+    assert result.total == 0.0
+
+
+def test_merge_adds_counts_and_keeps_the_maximum():
+    merged = histogram(0.004, 0.004)
+    merged.merge(histogram(0.04, 3.0))
+    assert merged.count == 4
+    assert merged.max == 3.0
+    assert merged.total == pytest.approx(3.048)
+    summary = merged.summary()
+    assert summary['mean_seconds'] == pytest.approx(0.762)
+    assert summary['max_seconds'] == 3.0
+    assert summary['p50_seconds'] <= summary['p95_seconds'] <= summary['p99_seconds'] <= 3.0
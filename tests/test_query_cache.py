@@ -0,0 +1,130 @@
+import pandas as pd
+import pytest
+
+import query_cache
+from query_cache import QueryCache
+from sql_utils import canonical_sql
+
+CONNECTION = {'account': 'acct', 'role': 'analyst', 'warehouse': 'wh', 'database': 'db', 'schema': 'sc'}
+
+
+def frame(rows=10):
+    return pd.DataFrame({'a': range(rows)})
+
+
+def frame_bytes(df):
+    return int(df.memory_usage(deep=True, index=True).sum())
+
+
+def key(query, params=None):
+    return QueryCache.make_key(query, params, CONNECTION)
+
+
+class Clock:
+    """Stands in for ``time.monotonic`` in the query_cache module"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(query_cache.time, 'monotonic', clock)
+    return clock
+
+
+def test_canonical_sql_collapses_whitespace_and_trailing_semicolon():
+    assert canonical_sql("  SELECT a,\n\tb\nFROM t ;  ") == "SELECT a, b FROM t"
+
+
+def test_canonical_sql_keeps_literals_and_comments():
+    assert (canonical_sql("SELECT 'a   b' AS x  /* keep   this */ FROM t")
+            == "SELECT 'a   b' AS x /* keep   this */ FROM t")
+
+
+def test_canonical_sql_keeps_line_comment_line_break():
+    assert canonical_sql("SELECT a -- note\n   FROM t") == "SELECT a -- note\nFROM t"
+
+
+def test_make_key_ignores_formatting_but_not_literals_or_scope():
+    assert key("select  a\nfrom t") == key("select a from t;")
+    assert key("select 'a  b'") != key("select 'a b'")
+    assert key("select a from t", {'id': 1}) != key("select a from t", {'id': 2})
+    assert key("select 1") != QueryCache.make_key("select 1", None, dict(CONNECTION, role='admin'))
+
+
+def test_get_returns_a_copy_of_a_stored_result():
+    cache = QueryCache()
+    cache.put(key("select 1"), frame())
+    cached = cache.get(key("select 1"))
+    cached['b'] = 1
+    assert list(cache.get(key("select 1")).columns) == ['a']
+    stats = cache.get_stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (2, 0, 1)
+
+
+def test_miss_is_counted():
+    cache = QueryCache()
+    assert cache.get(key("select 1")) is None
+    assert cache.get_stats()['misses'] == 1
+
+
+def test_entry_expires_after_ttl(clock):
+    cache = QueryCache(default_ttl=60)
+    cache.put(key("select 1"), frame())
+    clock.now += 59
+    assert cache.get(key("select 1")) is not None
+    clock.now += 2
+    assert cache.get(key("select 1")) is None
+    assert cache.get_stats()['expirations'] == 1
+
+
+def test_non_positive_ttl_is_not_stored():
+    cache = QueryCache()
+    assert not cache.put(key("select 1"), frame(), ttl=0)
+    assert cache.get_stats()['entries'] == 0
+
+
+def test_least_recently_used_entry_is_evicted_over_budget():
+    size = frame_bytes(frame())
+    cache = QueryCache(max_bytes=size * 2)
+    cache.put(key("select 1"), frame())
+    cache.put(key("select 2"), frame())
+    # Reading the first makes the second least recently used
+    cache.get(key("select 1"))
+    cache.put(key("select 3"), frame())
+    assert cache.get(key("select 2")) is None
+    assert cache.get(key("select 1")) is not None
+    assert cache.get(key("select 3")) is not None
+    stats = cache.get_stats()
+    assert stats['evictions'] == 1
+    assert stats['bytes'] == size * 2
+
+
+def test_result_larger_than_budget_is_rejected():
+    cache = QueryCache(max_bytes=frame_bytes(frame()) - 1)
+    assert not cache.put(key("select 1"), frame())
+    assert cache.get_stats()['rejected'] == 1
+
+
+def test_replacing_a_key_keeps_byte_count_exact():
+    cache = QueryCache()
+    cache.put(key("select 1"), frame(10))
+    cache.put(key("select 1"), frame(100))
+    stats = cache.get_stats()
+    assert stats['entries'] == 1
+    assert stats['bytes'] == frame_bytes(frame(100))
+
+
+def test_clear_and_invalidate():
+    cache = QueryCache()
+    cache.put(key("select 1"), frame())
+    cache.put(key("select 2"), frame())
+    assert cache.invalidate(key("select 1"))
+    assert not cache.invalidate(key("select 1"))
+    assert cache.clear() == 1
+    assert cache.get_stats()['bytes'] == 0
@@ -0,0 +1,89 @@
+import json
+from datetime import datetime
+
+import pytest
+
+from query_cost import AdmissionPolicy, QueryCost, parse_explain
+
+GB = 1024 ** 3
+
+PLAN = {
+    'GlobalStats': {'partitionsTotal': 100, 'partitionsAssigned': 25, 'bytesAssigned': 3 * GB},
+    'Operations': [[
+        {'id': 0, 'operation': 'Result'},
+        {'id': 1, 'operation': 'CartesianJoin'},
+        {'id': 2, 'operation': 'TableScan', 'objects': ['DB.SC.EVENTS'],
+         'partitionsAssigned': 20, 'partitionsTotal': 80, 'bytesAssigned': 2 * GB},
+        {'id': 3, 'operation': 'InnerJoin'},
+        {'id': 4, 'operation': 'TableScan', 'objects': ['DB.SC.USERS'],
+         'partitionsAssigned': 5, 'partitionsTotal': 20, 'bytesAssigned': GB},
+    ]]
+}
+
+# A Wednesday, and the Saturday after it
+WEEKDAY_NOON = datetime(2026, 10, 14, 12)
+WEEKDAY_NIGHT = datetime(2026, 10, 14, 22)
+SATURDAY_NOON = datetime(2026, 10, 17, 12)
+
+
+def test_parse_explain_reads_totals_scans_and_joins():
+    cost = parse_explain(json.dumps(PLAN))
+    assert (cost.partitions_total, cost.partitions_assigned) == (100, 25)
+    assert cost.gb_assigned == pytest.approx(3.0)
+    assert cost.pruned_fraction == pytest.approx(0.75)
+    assert [table['table'] for table in cost.tables] == ['DB.SC.EVENTS', 'DB.SC.USERS']
+    assert cost.tables[0]['bytes_assigned'] == 2 * GB
+    assert cost.joins == ['CartesianJoin', 'InnerJoin']
+    assert cost.cartesian_joins == 1
+
+
+def test_parse_explain_accepts_a_parsed_plan_and_missing_sections():
+    cost = parse_explain({})
+    assert cost.bytes_assigned == 0
+    assert cost.pruned_fraction is None
+    assert cost.tables == [] and cost.joins == []
+
+
+def test_parse_explain_rejects_non_plans():
+    with pytest.raises(ValueError):
+        parse_explain('not json')
+    with pytest.raises(ValueError):
+        parse_explain('[1, 2]')
+
+
+def test_check_passes_small_statements():
+    policy = AdmissionPolicy(max_gb=10, max_partitions=1000)
+    assert policy.check(QueryCost(partitions_assigned=10, bytes_assigned=GB)) == []
+
+
+def test_check_reports_each_exceeded_limit():
+    policy = AdmissionPolicy(max_gb=1, max_partitions=10)
+    reasons = policy.check(parse_explain(PLAN), now=SATURDAY_NOON)
+    assert len(reasons) == 3
+    assert 'over the 1 GB limit' in reasons[0]
+    assert '25 partitions' in reasons[1]
+    assert 'cartesian' in reasons[2]
+
+
+def test_zero_thresholds_disable_checks():
+    policy = AdmissionPolicy()
+    assert policy.check(QueryCost(partitions_assigned=10 ** 6, bytes_assigned=10 ** 6 * GB)) == []
+
+
+@pytest.mark.parametrize('now, held', [(WEEKDAY_NOON, True), (WEEKDAY_NIGHT, False), (SATURDAY_NOON, False)])
+def test_business_hours_limit_applies_on_weekdays_within_hours(now, held):
+    policy = AdmissionPolicy(max_gb=10, business_hours='8-18', business_hours_max_gb=2)
+    reasons = policy.check(QueryCost(bytes_assigned=3 * GB), now=now)
+    assert bool(reasons) is held
+    if held:
+        assert 'business-hours limit' in reasons[0]
+
+
+def test_business_hours_limit_never_loosens_the_general_limit():
+    policy = AdmissionPolicy(max_gb=1, business_hours='8-18', business_hours_max_gb=5)
+    assert policy.check(QueryCost(bytes_assigned=3 * GB), now=WEEKDAY_NOON)
+
+
+@pytest.mark.parametrize('spec', ['', 'nine-five', '18-8', '8-25'])
+def test_malformed_business_hours_are_ignored(spec):
+    assert AdmissionPolicy(business_hours=spec).business_hours is None
@@ -0,0 +1,146 @@
+import pytest
+from snowflake.connector import errors as sf_errors
+
+from resilience import (
+    CircuitBreaker, CircuitOpenError, ResilienceManager, is_transient,
+    CIRCUIT_CLOSED, CIRCUIT_OPEN, CIRCUIT_HALF_OPEN
+)
+
+
+def operational_error(msg='Failed to get response', errno=250003):
+    return sf_errors.OperationalError(msg=msg, errno=errno)
+
+
+@pytest.mark.parametrize('error', [
+    ConnectionError('reset by peer'),
+    TimeoutError('timed out'),
+    operational_error(),
+    sf_errors.ProgrammingError(msg='Authentication token has expired', errno=390114),
+    sf_errors.ProgrammingError(msg="Warehouse 'W' is being resumed", errno=0),
+])
+def test_is_transient_retries_network_and_session_failures(error):
+    assert is_transient(error)
+
+
+@pytest.mark.parametrize('error', [
+    sf_errors.ProgrammingError(msg="SQL compilation error: invalid identifier 'X'", errno=904),
+    sf_errors.ProgrammingError(msg='SQL execution canceled', errno=604),
+    operational_error('Incorrect username or password was specified.', 250001),
+    ValueError('bad parameter'),
+])
+def test_is_transient_rejects_sql_errors_and_bad_credentials(error):
+    assert not is_transient(error)
+
+
+def test_breaker_opens_at_threshold_and_refuses_calls():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    assert not breaker.record_failure()
+    assert breaker.state == CIRCUIT_CLOSED
+    assert breaker.record_failure()
+    assert breaker.state == CIRCUIT_OPEN
+    assert not breaker.allow()
+    assert 0 < breaker.retry_in() <= 60
+
+
+def test_breaker_half_open_allows_a_single_trial():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.allow()
+    assert breaker.state == CIRCUIT_HALF_OPEN
+    assert not breaker.allow()
+
+
+def test_breaker_half_open_trial_success_closes():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CIRCUIT_CLOSED
+    assert breaker.failures == 0
+    assert breaker.allow()
+
+
+def test_breaker_half_open_trial_failure_reopens():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=0)
+    for _ in range(3):
+        breaker.record_failure()
+    assert breaker.allow()
+    # One failure in half-open is enough, whatever the threshold
+    assert breaker.record_failure()
+    assert breaker.state == CIRCUIT_OPEN
+    breaker.reset_timeout = 60
+    assert not breaker.allow()
+
+
+def flaky(failures, error=None):
+    """Callable failing ``failures`` times with ``error`` before returning 'ok'"""
+    calls = []
+
+    def fn():
+        calls.append(1)
+        if len(calls) <= failures:
+            raise error or operational_error()
+        return 'ok'
+    fn.calls = calls
+    return fn
+
+
+def test_call_retries_transient_failures():
+    manager = ResilienceManager(max_attempts=3, base_delay=0)
+    fn = flaky(2)
+    assert manager.call('acct', fn) == 'ok'
+    assert len(fn.calls) == 3
+    stats = manager.get_stats()
+    assert stats['retries'] == 2
+    assert stats['recovered'] == 1
+
+
+def test_call_gives_up_after_max_attempts():
+    manager = ResilienceManager(max_attempts=2, base_delay=0)
+    fn = flaky(5)
+    with pytest.raises(sf_errors.OperationalError):
+        manager.call('acct', fn)
+    assert len(fn.calls) == 2
+
+
+def test_call_does_not_retry_when_retry_is_false():
+    manager = ResilienceManager(max_attempts=3, base_delay=0)
+    fn = flaky(1)
+    with pytest.raises(sf_errors.OperationalError):
+        manager.call('acct', fn, retry=False)
+    assert len(fn.calls) == 1
+
+
+def test_call_permanent_error_is_raised_once_and_keeps_breaker_closed():
+    manager = ResilienceManager(max_attempts=3, base_delay=0, failure_threshold=1)
+    fn = flaky(1, ValueError('bad SQL'))
+    with pytest.raises(ValueError):
+        manager.call('acct', fn)
+    assert len(fn.calls) == 1
+    assert manager.state('acct')['state'] == CIRCUIT_CLOSED
+    assert manager.get_stats()['permanent_failures'] == 1
+
+
+def test_call_short_circuits_while_open():
+    manager = ResilienceManager(max_attempts=3, base_delay=0, failure_threshold=2, reset_timeout=60)
+    with pytest.raises(sf_errors.OperationalError):
+        manager.call('acct', flaky(5))
+    assert manager.state('acct')['state'] == CIRCUIT_OPEN
+    fn = flaky(0)
+    with pytest.raises(CircuitOpenError):
+        manager.call('acct', fn)
+    with pytest.raises(CircuitOpenError):
+        manager.check('acct')
+    assert not fn.calls
+    assert manager.get_stats()['open_circuits'] == ['acct']
+    # Breakers are per key
+    assert manager.call('other', flaky(0)) == 'ok'
+
+
+def test_call_half_open_trial_closes_breaker():
+    manager = ResilienceManager(max_attempts=1, base_delay=0, failure_threshold=1, reset_timeout=0)
+    with pytest.raises(sf_errors.OperationalError):
+        manager.call('acct', flaky(1))
+    assert manager.state('acct')['state'] == CIRCUIT_OPEN
+    assert manager.call('acct', flaky(0)) == 'ok'
+    assert manager.state('acct')['state'] == CIRCUIT_CLOSED
@@ -0,0 +1,95 @@
+import threading
+import time
+
+import pytest
+
+from single_flight import SingleFlight
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out waiting'
+        time.sleep(0.005)
+
+
+def run_concurrently(flight, key, fn, callers):
+    """Start a leader, then ``callers - 1`` followers once it is in flight; returns their outcomes"""
+    outcomes = [None] * callers
+
+    def call(index):
+        try:
+            outcomes[index] = flight.do(key, fn)
+        except Exception as e:
+            outcomes[index] = e
+
+    threads = [threading.Thread(target=call, args=(0,))]
+    threads[0].start()
+    wait_until(lambda: flight.get_stats()['in_flight'] == 1)
+    for index in range(1, callers):
+        threads.append(threading.Thread(target=call, args=(index,)))
+        threads[-1].start()
+    wait_until(lambda: flight.waiters(key) == callers - 1)
+    return threads, outcomes
+
+
+def test_concurrent_callers_share_one_execution():
+    flight = SingleFlight()
+    release = threading.Event()
+    runs = []
+
+    def fn():
+        runs.append(1)
+        release.wait(5)
+        return 'result'
+
+    threads, outcomes = run_concurrently(flight, 'key', fn, 4)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert outcomes == ['result'] * 4
+    assert len(runs) == 1
+    stats = flight.get_stats()
+    assert (stats['executions'], stats['coalesced'], stats['in_flight']) == (1, 3, 0)
+    assert flight.waiters('key') == 0
+
+
+def test_waiters_receive_the_leaders_exception():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def fn():
+        release.wait(5)
+        raise ValueError('query failed')
+
+    threads, outcomes = run_concurrently(flight, 'key', fn, 3)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert all(isinstance(outcome, ValueError) for outcome in outcomes)
+    assert flight.get_stats()['failures'] == 1
+
+
+def test_nothing_is_remembered_after_a_call_finishes():
+    flight = SingleFlight()
+    assert flight.do('key', lambda: 1) == 1
+    assert flight.do('key', lambda: 2) == 2
+    assert flight.get_stats()['executions'] == 2
+
+
+def test_failed_call_does_not_block_the_next_one():
+    flight = SingleFlight()
+
+    def fail():
+        raise RuntimeError('boom')
+
+    with pytest.raises(RuntimeError):
+        flight.do('key', fail)
+    assert flight.do('key', lambda: 'ok') == 'ok'
+
+
+def test_different_keys_run_independently():
+    flight = SingleFlight()
+    assert flight.do('a', lambda: 'a') == 'a'
+    assert flight.do('b', lambda: 'b') == 'b'
+    assert flight.get_stats()['coalesced'] == 0
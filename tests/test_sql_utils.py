@@ -0,0 +1,87 @@
+import pytest
+
+from sql_utils import cap_rows, referenced_tables, top_level_limit
+
+
+@pytest.mark.parametrize('query, expected', [
+    ("SELECT * FROM t", None),
+    ("SELECT * FROM t LIMIT 50", 50),
+    ("select * from t order by a limit 10 offset 5", 10),
+    ("SELECT * FROM t FETCH FIRST 20 ROWS ONLY", 20),
+    ("SELECT TOP 5 * FROM t", 5),
+    ("SELECT DISTINCT TOP 7 a FROM t", 7),
+    # Limits inside subqueries, strings and comments do not bound the result
+    ("SELECT * FROM (SELECT * FROM t LIMIT 5) s", None),
+    ("SELECT 'limit 5' AS x FROM t", None),
+    ("SELECT * FROM t -- limit 5\n", None),
+    ("SELECT * FROM (SELECT * FROM t LIMIT 500) s LIMIT 30", 30),
+])
+def test_top_level_limit(query, expected):
+    assert top_level_limit(query) == expected
+
+
+def test_cap_rows_fetches_one_probe_row_past_the_cap():
+    query, capped = cap_rows("SELECT * FROM t;", 100)
+    assert capped
+    assert query == "SELECT * FROM (\nSELECT * FROM t\n) LIMIT 101"
+
+
+def test_cap_rows_sample():
+    query, capped = cap_rows("SELECT * FROM t", 100, sample=True)
+    assert capped
+    assert query.endswith(") SAMPLE (101 ROWS)")
+
+
+def test_cap_rows_strips_leading_comments_into_the_subquery():
+    query, capped = cap_rows("-- daily check\nSELECT a FROM t", 10)
+    assert capped
+    assert query == "SELECT * FROM (\nSELECT a FROM t\n) LIMIT 11"
+
+
+@pytest.mark.parametrize('query', [
+    "SELECT * FROM t LIMIT 100",
+    "SELECT * FROM t LIMIT 5",
+    "SELECT TOP 10 * FROM t",
+])
+def test_cap_rows_keeps_queries_limited_within_the_cap(query):
+    assert cap_rows(query, 100) == (query, False)
+
+
+def test_cap_rows_wraps_queries_limited_above_the_cap():
+    query, capped = cap_rows("SELECT * FROM t LIMIT 5000", 100)
+    assert capped
+    assert query.endswith("LIMIT 101")
+
+
+@pytest.mark.parametrize('query', ["SHOW TABLES", "DESCRIBE TABLE t", "INSERT INTO t VALUES (1)"])
+def test_cap_rows_leaves_other_statements_alone(query):
+    assert cap_rows(query, 100) == (query, False)
+
+
+def test_cap_rows_wraps_with_queries():
+    query, capped = cap_rows("WITH x AS (SELECT 1 AS a) SELECT * FROM x", 10)
+    assert capped
+    assert query == "SELECT * FROM (\nWITH x AS (SELECT 1 AS a) SELECT * FROM x\n) LIMIT 11"
+
+
+@pytest.mark.parametrize('query, expected', [
+    ("SELECT * FROM users", {'DB.SC.USERS'}),
+    ("SELECT * FROM mongodb.users u JOIN data_room.mongodb.flows f ON u.id = f.uid",
+     {'DB.MONGODB.USERS', 'DATA_ROOM.MONGODB.FLOWS'}),
+    ("SELECT * FROM a, b AS bee, c WHERE a.x = bee.x", {'DB.SC.A', 'DB.SC.B', 'DB.SC.C'}),
+    ('SELECT * FROM "My Db"."Odd Schema"."Table"', {'MY DB.ODD SCHEMA.TABLE'}),
+    ("SELECT * FROM (SELECT * FROM inner_t) s LEFT JOIN outer_t o ON s.id = o.id",
+     {'DB.SC.INNER_T', 'DB.SC.OUTER_T'}),
+])
+def test_referenced_tables(query, expected):
+    assert referenced_tables(query, 'db', 'sc') == expected
+
+
+def test_referenced_tables_skips_ctes_table_functions_strings_and_comments():
+    query = (
+        "WITH recent AS (SELECT * FROM events) "
+        "SELECT * FROM recent, TABLE(FLATTEN(input => x)) "
+        "WHERE note = 'from fake_table' -- join other_fake\n"
+        "/* from hidden */"
+    )
+    assert referenced_tables(query, 'db', 'sc') == {'DB.SC.EVENTS'}